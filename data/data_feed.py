@@ -130,19 +130,22 @@ class RealTimeDataFeed:
             # Limit to first 20 pairs for performance
             pairs = pairs[:20]
             
+            # 🆕 อ่าน bid/ask ของทุกคู่ในรอบเดียวจาก tick snapshot ของ broker
+            ticks = self.broker.get_ticks(pairs)
+            
             tick_data = {}
             for symbol in pairs:
                 try:
-                    # Get current price
-                    price = self.broker.get_current_price(symbol)
-                    if price is not None:
-                        # Get spread
-                        spread = self.broker.get_spread(symbol)
+                    bid, ask = ticks.get_bid_ask(symbol)
+                    if bid is not None:
+                        # Spread ในหน่วย pips (สูตรเดียวกับ BrokerAPI.get_spread)
+                        spread = round((ask - bid) * 10000, 2)
                         
                         tick_data[symbol] = {
-                            'bid': price,
-                            'ask': price + (spread or 0.0001),
+                            'bid': bid,
+                            'ask': ask,
                             'spread': spread or 0.0001,
+                            'time_msc': ticks.get_time_msc(symbol),
                             'timestamp': datetime.now(),
                             'volume': 0  # Volume not available in tick data
                         }
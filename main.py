@@ -19,6 +19,7 @@ import re
 import sys
 import os
 import logging
+import multiprocessing
 import signal
 import threading
 import time
@@ -820,4 +821,6 @@ def main():
 
 
 if __name__ == "__main__":
+    # MT5 process bridge ใช้ multiprocessing - exe จาก PyInstaller ต้องไม่รัน main ซ้ำใน child process
+    multiprocessing.freeze_support()
     main()
@@ -0,0 +1,69 @@
+"""
+TriangleEngine vs the scalar calculate_arbitrage_direction() formula
+"""
+
+import numpy as np
+import pytest
+
+from trading.tick_snapshot import TickSnapshot
+from trading.triangle_engine import TriangleEngine
+
+COMMISSION_RATE = 0.0001
+MAX_SLIPPAGE = 0.0005
+
+# (pair1, pair2, pair3) -> bids, asks
+QUOTES = [
+    (('EURUSD', 'USDJPY', 'EURJPY'), (1.08512, 151.234, 164.118), (1.08527, 151.251, 164.142)),
+    (('GBPUSD', 'USDCHF', 'GBPCHF'), (1.27105, 0.88412, 1.12391), (1.27121, 0.88430, 1.12420)),
+    (('EURGBP', 'GBPJPY', 'EURJPY'), (0.85402, 192.215, 164.118), (0.85417, 192.248, 164.142)),
+    (('AUDUSD', 'USDCAD', 'AUDCAD'), (0.65812, 1.36020, 0.89514), (0.65826, 1.36041, 0.89540)),
+]
+
+
+def calculate_arbitrage_direction(bids, asks):
+    """Baseline scalar formula (calculate_arbitrage_direction + _calculate_total_cost)"""
+    bid1, bid2, bid3 = bids
+    ask1, ask2, ask3 = asks
+
+    # Forward Path (BUY pair1, BUY pair2, SELL pair3)
+    forward_profit_percent = ((1 / ask1) / ask2 * bid3 - 1.0) * 100
+    # Reverse Path (BUY pair3, SELL pair2, SELL pair1)
+    reverse_profit_percent = ((1 / ask3) * bid2 * bid1 - 1.0) * 100
+
+    spread_cost_total = (ask1 - bid1) / bid1 * 100 + (ask2 - bid2) / bid2 * 100 + (ask3 - bid3) / bid3 * 100
+    total_cost_percent = spread_cost_total + COMMISSION_RATE * 3 * 100 + MAX_SLIPPAGE * 3 * 100
+
+    forward_net = forward_profit_percent - total_cost_percent
+    reverse_net = reverse_profit_percent - total_cost_percent
+    if forward_net >= reverse_net:
+        return 'forward', forward_net, forward_profit_percent, total_cost_percent
+    return 'reverse', reverse_net, reverse_profit_percent, total_cost_percent
+
+
+@pytest.fixture
+def evaluated():
+    engine = TriangleEngine([q[0] for q in QUOTES], commission_rate=COMMISSION_RATE, max_slippage=MAX_SLIPPAGE)
+    bid, ask = {}, {}
+    for symbols, bids, asks in QUOTES:
+        bid.update(zip(symbols, bids))
+        ask.update(zip(symbols, asks))
+    symbols = list(engine.symbols)
+    ticks = TickSnapshot(symbols, np.array([bid[s] for s in symbols]), np.array([ask[s] for s in symbols]),
+                         np.ones(len(symbols), dtype=np.int64))
+    return engine, engine.evaluate(ticks)
+
+
+@pytest.mark.parametrize('index', range(len(QUOTES)))
+def test_matches_scalar_formula(evaluated, index):
+    engine, evaluation = evaluated
+    symbols, bids, asks = QUOTES[index]
+    direction, net, raw, cost = calculate_arbitrage_direction(bids, asks)
+
+    info = engine.direction_info(index, evaluation=evaluation)
+    assert info['direction'] == direction
+    assert info['profit_percent'] == pytest.approx(net, abs=1e-9)
+    assert info['raw_profit'] == pytest.approx(raw, abs=1e-9)
+    assert info['cost_percent'] == pytest.approx(cost, abs=1e-9)
+
+    sides = ('BUY', 'BUY', 'SELL') if direction == 'forward' else ('SELL', 'SELL', 'BUY')
+    assert info['orders'] == dict(zip(symbols, sides))
@@ -0,0 +1,150 @@
+"""
+Account State Cache
+===================
+
+Caches balance, equity, margin, free margin and margin level so the many
+balance-dependent checks in one cycle share a single account_info() read.
+
+Key Features:
+- Immutable AccountState snapshot with the get_account_info() fields
+- Coalesced refresh: concurrent callers wait for one in-flight read
+- invalidate() hook for fills and closes
+"""
+
+import logging
+import threading
+import time
+from typing import Callable, Dict, Optional
+
+
+class AccountState:
+    """Read-only account values taken at one point in time."""
+
+    __slots__ = ('login', 'balance', 'equity', 'margin', 'free_margin', 'margin_level',
+                 'currency', 'leverage', 'server', 'taken_at')
+
+    def __init__(self, balance: float, equity: float, margin: float = 0.0, free_margin: float = 0.0,
+                 margin_level: float = 0.0, login: int = None, currency: str = 'USD',
+                 leverage: int = None, server: str = None, taken_at: float = None):
+        self.login = login
+        self.balance = balance
+        self.equity = equity
+        self.margin = margin
+        self.free_margin = free_margin
+        self.margin_level = margin_level
+        self.currency = currency
+        self.leverage = leverage
+        self.server = server
+        self.taken_at = taken_at if taken_at is not None else time.monotonic()
+
+    @classmethod
+    def from_mt5(cls, account) -> 'AccountState':
+        """Build from an mt5.account_info() result"""
+        return cls(
+            balance=account.balance,
+            equity=account.equity,
+            margin=account.margin,
+            free_margin=account.margin_free,
+            margin_level=account.margin_level,
+            login=account.login,
+            currency=account.currency,
+            leverage=account.leverage,
+            server=account.server
+        )
+
+    def age(self) -> float:
+        """Seconds since this state was read"""
+        return time.monotonic() - self.taken_at
+
+    def to_dict(self) -> Dict:
+        """Same format as BrokerAPI.get_account_info()"""
+        return {
+            'login': self.login,
+            'balance': self.balance,
+            'equity': self.equity,
+            'margin': self.margin,
+            'free_margin': self.free_margin,
+            'margin_level': self.margin_level,
+            'currency': self.currency,
+            'leverage': self.leverage,
+            'server': self.server
+        }
+
+
+class AccountStateCache:
+    """
+    Single-flight cache around an account fetch function.
+
+    The first caller that finds the state stale performs the read; callers
+    arriving while it is in flight wait for that result instead of issuing
+    their own account_info() call.
+    """
+
+    def __init__(self, fetch: Callable[[], Optional[AccountState]], max_age: float = 1.0):
+        """
+        Args:
+            fetch: Function returning a fresh AccountState (or None on failure)
+            max_age: Seconds a state may be served before it is refreshed
+        """
+        self._fetch = fetch
+        self.max_age = max_age
+        self.logger = logging.getLogger(__name__)
+
+        self._state: Optional[AccountState] = None
+        self._refreshed: Optional[AccountState] = None  # result of the last refresh, handed to coalesced waiters
+        self._generation = 0  # bumped by invalidate() so in-flight reads can't resurrect old state
+        self._condition = threading.Condition()
+        self._refreshing = False
+
+        self.stats = {'hits': 0, 'refreshes': 0, 'coalesced': 0, 'invalidations': 0}
+
+    def get(self, max_age: float = None) -> Optional[AccountState]:
+        """
+        Return a state no older than max_age, refreshing at most once across threads.
+
+        Args:
+            max_age: Override for the cache max age (0 forces a read)
+        """
+        if max_age is None:
+            max_age = self.max_age
+
+        state = self._state
+        if state is not None and state.age() <= max_age:
+            self.stats['hits'] += 1
+            return state
+
+        with self._condition:
+            if self._refreshing:
+                # Another thread is already reading - share its result
+                self.stats['coalesced'] += 1
+                self._condition.wait_for(lambda: not self._refreshing, timeout=5.0)
+                # not self._state - invalidate() may have cleared it while the read was in flight
+                return self._refreshed if self._refreshed is not None else self._state
+            self._refreshing = True
+            generation = self._generation
+
+        state = None
+        try:
+            state = self._fetch()
+            self.stats['refreshes'] += 1
+        except Exception as e:
+            self.logger.error(f"Error refreshing account state: {e}")
+        finally:
+            with self._condition:
+                if state is not None and generation == self._generation:
+                    self._state = state
+                elif state is None:
+                    state = self._state if self._state is not None else self._refreshed  # keep serving the last good value
+                if state is not None:
+                    self._refreshed = state
+                self._refreshing = False
+                self._condition.notify_all()
+
+        return state
+
+    def invalidate(self):
+        """Force the next get() to read fresh values (call after fills and closes)"""
+        with self._condition:
+            self._state = None
+            self._generation += 1
+            self.stats['invalidations'] += 1
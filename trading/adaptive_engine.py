@@ -21,6 +21,7 @@ from typing import Dict, List, Optional, Tuple
 import threading
 import json
 from utils.symbol_mapper import SymbolMapper
+from utils.config_service import ADAPTIVE_PARAMS, get_config_service
 
 class AdaptiveEngine:
     """
@@ -110,23 +111,27 @@ class AdaptiveEngine:
             'last_rebalance_time': None
         }
         
+        # 🆕 Hot reload - ConfigService แจ้งเมื่อไฟล์ config เปลี่ยน
+        self.config_service = get_config_service()
+        self.config_service.subscribe(self._apply_config)
+        
         self.logger.info("Adaptive Engine initialized successfully")
     
     def reload_config(self):
-        """Reload configuration from adaptive_params.json"""
+        """Reload configuration from adaptive_params.json (applied via _apply_config when the file changed)"""
         try:
-            import json
-            import os
-            
-            config_path = os.path.join("config", "adaptive_params.json")
-            
-            if not os.path.exists(config_path):
+            self.config_service.refresh()
+        except Exception as e:
+            self.logger.error(f"❌ Error reloading adaptive engine config: {e}")
+    
+    def _apply_config(self, snapshot):
+        """Apply a new config snapshot (called by ConfigService after a reload)"""
+        try:
+            config = snapshot.section(ADAPTIVE_PARAMS)
+            if not config:
                 self.logger.warning("Config file not found, using default settings")
                 return
             
-            with open(config_path, 'r', encoding='utf-8') as f:
-                config = json.load(f)
-            
             # Update position sizing parameters
             position_sizing = config.get('position_sizing', {})
             lot_calc = position_sizing.get('lot_calculation', {})
@@ -739,6 +744,10 @@ class AdaptiveEngine:
             # Scan and map symbols
             mapping_result = self.symbol_mapper.scan_and_map(all_pairs, required_pairs)
             
+            # Refresh static symbol metadata for the newly mapped symbols
+            if hasattr(self.broker, 'refresh_symbol_metadata'):
+                self.broker.refresh_symbol_metadata([real for real in mapping_result.values() if real])
+            
             # Show mapping summary
             self.logger.info("\n" + self.symbol_mapper.get_mapping_summary())
             
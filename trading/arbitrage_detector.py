@@ -20,6 +20,7 @@
 
 import pandas as pd
 import numpy as np
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
 import logging
 from typing import Dict, List, Tuple, Optional
@@ -45,8 +46,34 @@ except Exception:
     pass
 from utils.calculations import TradingCalculations
 from utils.symbol_mapper import SymbolMapper
+from utils.config_service import ADAPTIVE_PARAMS, ConfigSnapshot, get_config_service
+from utils.snapshot_journal import SnapshotJournal
+from utils.metrics import MetricsExporter, MetricsRegistry
+from trading.position_snapshot import PositionSnapshot
+from trading.group_pnl import GroupPnLAggregator, GroupPnLTable
+from trading.tick_snapshot import TickSnapshot
+from trading.triangle_executor import TriangleExecutor, TriangleLeg
+from trading.tick_watcher import TickWatcher
+from trading.spread_stats import SpreadStats, hour_of_week
+from trading.mark_to_market import MarkToMarketEngine
+from trading.trailing_stop_engine import TrailingStopEngine
+from trading.triangle_engine import TriangleEngine, OPPORTUNITY_DTYPE, LEGACY_FORWARD_SIDES
+from trading.triangle_discovery import (
+    TRIANGLE_MAGIC_BASE, TriangleSpec, discover_triangles, is_triangle_magic, orient, triangle_magic,
+    triangle_number_from_name
+)
 # Removed AccountTierManager - using GUI Risk per Trade only
 
+# 🆕 ลำดับการคำนวณคะแนน (ถูก -> แพง) และคะแนนเต็มของแต่ละปัจจัย
+SCORING_STAGES = (
+    ('profit', 35.0),
+    ('spread', 20.0),
+    ('execution', 10.0),
+    ('risk', 5.0),
+    ('time', 10.0),
+    ('market', 20.0),      # regime + H1 volatility (MarketAnalyzer)
+)
+
 class TriangleArbitrageDetector:
     def __init__(self, broker_api, ai_engine=None, correlation_manager=None):
         self.broker = broker_api
@@ -85,6 +112,7 @@ class TriangleArbitrageDetector:
         # Rate limiting for order placement
         self.last_order_time = 0  # เวลาที่ส่งออเดอร์ล่าสุด
         self.min_order_interval = 10  # ระยะห่างขั้นต่ำระหว่างออเดอร์ (วินาที)
+        self._rejected_at_pass = {}  # 🆕 triangle_name -> engine pass ของราคาที่ถูกปฏิเสธล่าสุด
         self.daily_order_limit = 50  # จำกัดออเดอร์ต่อวัน
         self.daily_order_count = 0  # จำนวนออเดอร์ที่ส่งวันนี้
         self.last_reset_date = datetime.now().date()  # วันที่รีเซ็ตตัวนับ
@@ -120,11 +148,6 @@ class TriangleArbitrageDetector:
         # 🆕 Symbol Mapper - จับคู่ชื่อคู่เงินกับนามสกุลจริงของ Broker
         self.symbol_mapper = SymbolMapper()
         
-        # 🆕 Spread Cache - เก็บข้อมูล spread จริง
-        self.spread_cache = {}
-        self.spread_cache_file = "data/spread_cache.json"
-        self._load_spread_cache()
-        
         # ใช้ 6 สามเหลี่ยม Arbitrage แยกกัน (Optimized - ทุกคู่ซ้ำ Hedged!)
         self.arbitrage_pairs = [
             'EURUSD', 'GBPUSD', 'EURGBP',  # Group 1
@@ -147,57 +170,113 @@ class TriangleArbitrageDetector:
         # 🆕 Scan and Map Symbols from Broker
         self._initialize_symbol_mapping()
         
-        # เริ่มต้นตัวนับกลุ่มสำหรับแต่ละสามเหลี่ยม
-        for i, triangle in enumerate(self.triangle_combinations, 1):
-            triangle_name = f"triangle_{i}"
-            self.group_counters[triangle_name] = 0
-            self.is_arbitrage_paused[triangle_name] = False
-            self.used_currency_pairs[triangle_name] = set()
-        
-        # Magic numbers สำหรับแต่ละสามเหลี่ยม (Optimized - All Hedged!)
-        self.triangle_magic_numbers = {
-            'triangle_1': 234001,  # EURUSD(BUY), GBPUSD(SELL), EURGBP
-            'triangle_2': 234002,  # EURUSD(SELL), USDCHF(BUY), EURCHF ✅
-            'triangle_3': 234003,  # GBPUSD(BUY), USDJPY(SELL), GBPJPY ✅
-            'triangle_4': 234004,  # AUDUSD(BUY), USDCAD(SELL), AUDCAD
-            'triangle_5': 234005,  # NZDUSD(BUY), USDCHF(SELL), NZDCHF ✅
-            'triangle_6': 234006   # AUDUSD(SELL), NZDUSD(SELL), AUDNZD ✅
-        }
+        # 🆕 Config snapshot จาก ConfigService (ต้องมาก่อน discovery - ใช้ค่า triangles.auto_discovery)
+        self.config_service = get_config_service()
+        self.config_snapshot = self.config_service.snapshot
+        
+        # 🆕 Triangle Discovery - หา triangle ทั้งหมดจาก currency graph ของคู่เงินที่ broker มี
+        # 6 triangle ข้างบนคงหมายเลขเดิม (magic 234001-234006) ตัวที่พบเพิ่มได้หมายเลขต่อจากนั้น
+        self._discover_triangles()
         
         # ⭐ ไม่ใช้ standard_lot_size แล้ว - ใช้ risk-based calculation เท่านั้น
         
         # ⭐ เพิ่ม Account Tier Manager
         # Removed AccountTierManager - using GUI Risk per Trade only
         
-        # โหลด config สำหรับ Account Tier
-        self._load_tier_config()
-        
         # ระบบป้องกันการส่ง recovery ซ้ำ
         self.recovery_in_progress = set()  # เก็บ group_id ที่กำลัง recovery
         
         # ระบบ Save/Load ข้อมูล
         self.persistence_file = "data/active_groups.json"
+        # 🆕 Write-ahead journal - บันทึกเฉพาะกลุ่มที่เปลี่ยน (1 บรรทัดต่อการเปลี่ยนแปลง) + compact เป็น snapshot เป็นระยะ
+        self.group_journal = SnapshotJournal(self.persistence_file)
+        self._configure_group_journal()
         
         # การตั้งค่าการปิดกลุ่ม
         self.profit_threshold_per_lot = 1.0  # 1 USD ต่อ lot เดี่ยว
         
-        # 🆕 Trailing Stop System (Group-Level)
-        self.group_trailing_stops = {}  # {group_id: {'peak': float, 'stop': float, 'active': bool}}
-        
         # ⭐ โหลด Trailing Stop Config จาก adaptive_params.json
         self._load_trailing_stop_config()
         
+        # 🆕 Triangle Executor - ตรวจสอบทุก leg ก่อน แล้วส่งพร้อมกัน พร้อมวัด latency/deviation ต่อ leg
+        self.triangle_executor = TriangleExecutor(
+            self.broker,
+            dispatch_mode=self.leg_dispatch_mode,
+            leg_order=self.leg_order,
+            max_legs=max((spec.legs for spec in self.triangle_specs.values()), default=3)
+        )
+        
+        # 🆕 Pre-trade pool - ตรวจสอบหลาย triangle พร้อมกัน (ส่งออเดอร์ทีละตัวตามลำดับใน send stage)
+        self._pretrade_pool = ThreadPoolExecutor(max_workers=self.pretrade_workers, thread_name_prefix="PreTrade")
+        self._metrics_lock = threading.Lock()
+        
+        # 🆕 Metrics registry - funnel counters (evaluated -> rejected -> sent) + เวลาแต่ละ stage
+        self.metrics = MetricsRegistry()
+        
+        # 🆕 Staged scoring - cache ปัจจัยที่เปลี่ยนช้า + สถิติการตัดจบก่อนคำนวณครบ
+        self._factor_cache = {}
+        self.scoring_stats = {'complete': 0, 'short_circuited': 0, 'skipped_profit': 0, 'skipped_spread': 0,
+                              'skipped_execution': 0, 'skipped_risk': 0, 'skipped_time': 0, 'skipped_market': 0}
+        
+        # 🆕 Group PnL - รวม arbitrage/recovery PnL ทุกกลุ่มในรอบเดียวต่อ snapshot
+        self.group_pnl = GroupPnLAggregator()
+        
         # 🆕 Min Profit Threshold (Scale with Balance) - จะถูกโหลดจาก config
         
         # If no triangles generated, create fallback triangles
         if len(self.triangle_combinations) == 0 and len(self.available_pairs) > 0:
             self.logger.warning("No triangles generated, creating fallback triangles...")
-            self.triangle_combinations = [('EURUSD', 'GBPUSD', 'EURGBP')]  # Fixed fallback
+            fallback = ('EURUSD', 'GBPUSD', 'EURGBP')  # Fixed fallback
+            self._set_triangle_specs([TriangleSpec(1, fallback, *orient(fallback))])
         elif len(self.triangle_combinations) == 0:
             self.logger.error("❌ No triangles generated and no available pairs!")
         
+        # 🆕 Vectorized engine - ประเมินทุก triangle ในรอบเดียวต่อ tick
+        self.triangle_engine = self._build_triangle_engine(
+            self.triangle_combinations,
+            [spec.forward_sides for spec in self.triangle_specs.values()]
+        )
+        
+        # 🆕 Tick Watcher - ปลุก trading loop ทันทีเมื่อคู่เงินที่ติดตามมี tick ใหม่ (แทน sleep 1 วินาที)
+        self.tick_watcher = TickWatcher(self.broker, poll_interval=self.tick_poll_interval)
+        self.tick_watcher.watch(self.triangle_engine.symbols)
+        
+        # 🆕 Spread Statistics - mean/p95/max spread ต่อ symbol และต่อชั่วโมงของสัปดาห์ (อัปเดตจาก tick stream)
+        self.spread_stats = SpreadStats(
+            path=self._get_config_value('arbitrage_params.spread_stats.path', 'data/spread_stats.npz'),
+            window=int(self._get_config_value('arbitrage_params.spread_stats.window', 300)),
+            bucket_samples=int(self._get_config_value('arbitrage_params.spread_stats.bucket_samples', 120)),
+            pip_size=self._get_pip_size
+        )
+        self._configure_spread_stats()
+        self.tick_watcher.subscribe(lambda event: self.spread_stats.observe(event.snapshot))
+        self._loop_wake_ms = self.metrics.histogram('loop.wake_ms')           # tick detected -> loop awake
+        self._loop_decision_ms = self.metrics.histogram('loop.decision_ms')   # tick detected -> loop decisions done
+        
+        # 🆕 Mark-to-Market - PnL ต่อ position/กลุ่มคำนวณเองทุก tick, เทียบกับ profit ของ MT5 เป็นระยะ (drift)
+        self.mark_to_market = MarkToMarketEngine(self.broker, max_age=self.tick_poll_interval)
+        self._configure_mark_to_market()
+        self.tick_watcher.subscribe(self.mark_to_market.on_tick)
+        
+        # 🆕 Trailing Stop Engine (Group-Level) - peak/stop ต่อกลุ่มในหน่วยความจำ อัปเดตทุก tick จาก PnL ที่คำนวณเอง
+        self.trailing_engine = TrailingStopEngine(self.mark_to_market, self.tick_watcher, on_stop=self._on_trailing_stop,
+                                                  heartbeat=self.loop_heartbeat_seconds)
+        self._configure_trailing_engine()
+        self._close_lock = threading.Lock()     # ปิดกลุ่มทีละกลุ่ม (trading loop / trailing engine)
+        
         # Load existing active groups on startup
         self._load_active_groups()
+        
+        # 🆕 Metrics export - snapshot ลงไฟล์ (และ endpoint บน localhost ถ้าตั้ง port) เป็นระยะ
+        self._register_metrics_sources()
+        self.metrics_exporter = MetricsExporter(
+            self.metrics,
+            http_port=int(self._get_config_value('arbitrage_params.metrics.http_port', 0))
+        )
+        self._configure_metrics_exporter()
+        
+        # 🆕 Hot reload - ConfigService แจ้งเมื่อไฟล์ config เปลี่ยน
+        self.config_service.subscribe(self._apply_config)
     
     def _get_available_pairs(self) -> List[str]:
         """Get list of available trading pairs from broker"""
@@ -294,6 +373,12 @@ class TriangleArbitrageDetector:
         """Start the simple trading system"""
         self.is_running = True
         self.logger.info("Starting simple trading system...")
+        self.tick_watcher.start()
+        self.spread_stats.start()
+        if self.tick_trailing_enabled:
+            self.trailing_engine.start()
+        if self._get_config_value('arbitrage_params.metrics.enabled', True):
+            self.metrics_exporter.start()
         
         # Run simple trading in separate thread
         self.detection_thread = threading.Thread(target=self._simple_trading_loop, daemon=True)
@@ -303,35 +388,52 @@ class TriangleArbitrageDetector:
     def stop_detection(self):
         """Stop the arbitrage detection loop"""
         self.is_running = False
-        # บันทึกข้อมูลก่อนปิด
+        self.trailing_engine.stop()
+        self.tick_watcher.stop()
+        self.spread_stats.stop()
+        # บันทึกข้อมูลก่อนปิด (snapshot เต็ม + ล้าง journal)
         self._save_active_groups()
+        self.group_journal.close()
+        self.metrics_exporter.stop()
         self.logger.info("Stopping arbitrage detection...")
     
     def _simple_trading_loop(self):
         """Simple trading loop - ออกไม้ทันทีและต่อเนื่อง"""
         self.logger.info("🚀 Simple trading system started")
         loop_count = 0
+        tick_event = None
+        spread_floors_at = -float('inf')
+        
+        metrics = self.metrics
         
         while self.is_running:
             try:
                 loop_count += 1
-                # self.logger.info(f"🔄 Trading loop #{loop_count} - Checking system status...")  # DISABLED - ไม่จำเป็น
+                metrics.counter('loop.iterations').inc()
+                iteration_started = time.perf_counter()
                 
-                # Sync arbitrage orders with MT5
-                if hasattr(self, 'correlation_manager') and self.correlation_manager:
-                    sync_results = self.correlation_manager.order_tracker.sync_with_mt5()
-                    if sync_results.get('arbitrage_orders_removed', 0) > 0:
-                        self.logger.debug(f"🔄 Arbitrage sync: {sync_results['arbitrage_orders_removed']} orders removed")
+                # 🆕 ต้นทุน spread ใน engine = max(spread ปัจจุบัน, spread ที่คาดไว้) - อัปเดตทุก heartbeat
+                if iteration_started - spread_floors_at >= self.loop_heartbeat_seconds:
+                    self._refresh_spread_floors()
+                    spread_floors_at = iteration_started
+                # self.logger.info(f"🔄 Trading loop #{loop_count} - Checking system status...")  # DISABLED - ไม่จำเป็น
                 
-                # เช็คจาก MT5 จริงๆ ไม่ใช่จาก memory
-                all_positions = self.broker.get_all_positions()
-                active_magic_numbers = set()
+                # 🆕 เช็คจาก MT5 จริงๆ ครั้งเดียวต่อรอบ - snapshot นี้ใช้ร่วมกันทุก component ในรอบนี้
+                with metrics.timer('loop.positions_ms'):
+                    snapshot = self.broker.get_positions_snapshot()
+                    
+                    # Sync arbitrage orders with MT5
+                    if hasattr(self, 'correlation_manager') and self.correlation_manager:
+                        sync_results = self.correlation_manager.order_tracker.sync_with_mt5(snapshot)
+                        if sync_results.get('arbitrage_orders_removed', 0) > 0:
+                            self.logger.debug(f"🔄 Arbitrage sync: {sync_results['arbitrage_orders_removed']} orders removed")
                 
+                stage_started = time.perf_counter()
                 # หา magic numbers ที่มี positions อยู่จริงใน MT5
-                for pos in all_positions:
-                    magic = pos.get('magic', 0)
-                    if 234001 <= magic <= 234006:  # magic numbers ของ arbitrage groups
-                        active_magic_numbers.add(magic)
+                active_magic_numbers = set(
+                    magic for magic in snapshot.active_magics()
+                    if is_triangle_magic(magic)  # magic numbers ของ arbitrage groups
+                )
                 
                 # ลบ groups ที่ไม่มี positions ใน MT5 ออกจาก memory
                 groups_to_remove = []
@@ -357,42 +459,50 @@ class TriangleArbitrageDetector:
                     # ตรวจสอบว่า group_id มีอยู่จริงก่อนลบ
                     if group_id in self.active_groups:
                         del self.active_groups[group_id]
-                        self._save_active_groups()
+                        self._save_group(group_id)
                         self._reset_group_data_after_close(group_id)
                     else:
                         self.logger.warning(f"⚠️ Group {group_id} not found in active_groups - already removed")
                 
+                # 🆕 positions ของ snapshot นี้ → mark-to-market ต่อ tick (reconcile กับ MT5 ตามรอบ), trailing engine ใช้ผลนั้น
+                group_pnl_table = self._get_group_pnl(snapshot)
+                self.mark_to_market.sync(group_pnl_table)
+                self.trailing_engine.sync(group_pnl_table, self.active_groups.keys())
+                stage_started = self._record_stage('loop.group_sync_ms', stage_started)
+                
                 # ตรวจสอบ triangles ที่ปิดแล้วและส่งไม้ใหม่
                 closed_triangles = []
                 active_triangles = []
                 
                 # ตรวจสอบแต่ละ triangle
-                for i, triangle in enumerate(self.triangle_combinations, 1):
-                    triangle_name = f"triangle_{i}"
-                    triangle_magic = self.triangle_magic_numbers.get(triangle_name, 234000)
+                for triangle_name, spec in self.triangle_specs.items():
+                    triangle_magic = spec.magic
                     
                     if triangle_magic in active_magic_numbers:
                         active_triangles.append(triangle_name)
                         
                         # ตรวจสอบว่าควรปิด Group หรือไม่ (ใช้ Trailing Stop Logic)
-                        group_id = f"group_{triangle_name}_1"
+                        group_id = spec.group_id
                         
                         # ถ้ามี group_data ใน active_groups ให้ใช้ _should_close_group (มี Trailing Stop!)
-                        if group_id in self.active_groups:
-                            group_data = self.active_groups[group_id]
-                            if self._should_close_group(group_id, group_data):
+                        # trailing thread อาจลบกลุ่มออกจาก active_groups ได้ทุกเมื่อ - อ่านครั้งเดียวด้วย get()
+                        group_data = self.active_groups.get(group_id)
+                        if group_data is not None:
+                            if self._should_close_group(group_id, group_data, snapshot):
                                 self.logger.info(f"✅ Group {triangle_name} meets closing criteria (Trailing Stop) - closing group")
-                                self._close_group_by_magic(triangle_magic, group_id)
+                                with self._close_lock:
+                                    # trailing engine อาจปิดกลุ่มนี้ไปแล้วระหว่างรอบ
+                                    if group_id in self.active_groups:
+                                        self._close_group_by_magic(triangle_magic, group_id, snapshot)
                                 closed_triangles.append(triangle_name)
                         else:
                             # ถ้าไม่มีใน active_groups แต่มี positions ใน MT5 → orphan positions
                             self.logger.warning(f"⚠️ Found orphan positions for {triangle_name} (not in active_groups)")
                             
                             # 🆕 ไม่มีการปิดทันทีอีกต่อไป ให้ reconstruct เสมอ แล้วให้ Trailing Stop เป็นผู้ตัดสินใจ
-                            all_positions = self.broker.get_all_positions()
-                            orphan_pnl = sum(pos.get('profit', 0) for pos in all_positions if pos.get('magic', 0) == triangle_magic)
+                            orphan_pnl = sum(pos.get('profit', 0) for pos in snapshot.get_by_magic(triangle_magic))
                             self.logger.info(f"🔄 Orphan current PnL: ${orphan_pnl:.2f} → Reconstructing group and delegating to Trailing Stop...")
-                            self._reconstruct_orphan_group(triangle_name, triangle_magic, group_id)
+                            self._reconstruct_orphan_group(triangle_name, triangle_magic, group_id, snapshot)
                         continue
                         
                         # ตรวจสอบ recovery จะทำใน _check_and_close_groups
@@ -400,6 +510,8 @@ class TriangleArbitrageDetector:
                         # Triangle นี้ปิดแล้ว
                         closed_triangles.append(triangle_name)
                 
+                stage_started = self._record_stage('loop.close_check_ms', stage_started)
+                
                 # แสดงสถานะเฉพาะเมื่อมีการเปลี่ยนแปลง
                 if closed_triangles:
                     self.logger.debug(f"📊 Closed triangles: {closed_triangles}")
@@ -410,6 +522,7 @@ class TriangleArbitrageDetector:
                 if closed_triangles:
                     self.logger.debug(f"🎯 Sending new orders for closed triangles: {closed_triangles}")
                     self._send_orders_for_closed_triangles(closed_triangles)
+                    self._record_stage('loop.open_ms', stage_started)
                 else:
                     self.logger.debug("⏭️ No closed triangles to process")
                 
@@ -418,10 +531,14 @@ class TriangleArbitrageDetector:
                     self.logger.info("🔄 No active triangles - resetting data")
                     self._reset_group_data()
                 
-                time.sleep(1.0)  # ⭐ UPGRADED: รอ 1 วินาที (เช็ค trailing stop เร็วขึ้น)
+                # 🆕 รอ tick ใหม่ของคู่เงินที่ติดตาม (หรือ heartbeat) แทน sleep 1 วินาทีตายตัว
+                self._record_stage('loop.iteration_ms', iteration_started)
+                self._record_loop_latency(tick_event)
+                tick_event = self._wait_for_tick(tick_event)
                 continue
                     
             except Exception as e:
+                metrics.counter('loop.errors').inc()
                 self.logger.error(f"Trading error: {e}")
                 import traceback
                 self.logger.error(traceback.format_exc())
@@ -429,6 +546,116 @@ class TriangleArbitrageDetector:
         
         self.logger.info("🛑 Simple trading system stopped")
     
+    def _wait_for_tick(self, last_event):
+        """
+        🆕 รอจนกว่าคู่เงินที่ติดตามจะมี tick ใหม่ หรือครบ heartbeat
+        
+        Returns:
+            TickEvent ที่ปลุก loop หรือ None ถ้าเป็น heartbeat
+        """
+        sequence = last_event.sequence if last_event else self.tick_watcher.sequence
+        event = self.tick_watcher.wait(sequence, self.loop_heartbeat_seconds)
+        if event is None:
+            self.metrics.counter('loop.heartbeats').inc()
+            return None
+        
+        self.metrics.counter('loop.tick_wakeups').inc()
+        self._loop_wake_ms.record((time.perf_counter() - event.detected_at) * 1000)
+        return event
+    
+    def _record_loop_latency(self, tick_event):
+        """🆕 บันทึกเวลาจาก tick ที่ปลุก loop จนตัดสินใจครบทั้งรอบ (close/open)"""
+        if tick_event is not None:
+            self._loop_decision_ms.record((time.perf_counter() - tick_event.detected_at) * 1000)
+    
+    def _record_stage(self, name: str, started: float) -> float:
+        """🆕 บันทึกเวลาของ stage ลง histogram `name` แล้วคืนเวลาปัจจุบัน (จุดเริ่ม stage ถัดไป)"""
+        now = time.perf_counter()
+        self.metrics.histogram(name).record((now - started) * 1000)
+        return now
+    
+    def get_loop_latency_stats(self) -> Dict:
+        """🆕 สถิติ wake-to-decision latency ของ trading loop (ms)"""
+        stats = {
+            'tick_wakeups': self.metrics.counter('loop.tick_wakeups').total,
+            'heartbeats': self.metrics.counter('loop.heartbeats').total
+        }
+        for name, histogram in (('wake', self._loop_wake_ms), ('decision', self._loop_decision_ms)):
+            summary = histogram.snapshot()
+            stats[name] = {'samples': summary['count'], 'p50_ms': summary['p50'], 'p95_ms': summary['p95'],
+                           'max_ms': summary['max']}
+        stats['watcher'] = self.tick_watcher.get_stats()
+        return stats
+    
+    def get_metrics_snapshot(self) -> Dict:
+        """🆕 counters / gauges / histograms ทั้งหมด + stats ของ component (รูปแบบเดียวกับไฟล์ export)"""
+        return self.metrics.snapshot()
+    
+    def _register_metrics_sources(self):
+        """🆕 gauges และ stats ของ component ที่รวมไว้ใน metrics snapshot"""
+        self.metrics.gauge('groups.active', lambda: len(self.active_groups))
+        self.metrics.gauge('groups.recovering', lambda: len(self.recovery_in_progress))
+        self.metrics.gauge('orders.daily_count', lambda: self.daily_order_count)
+        self.metrics.register_source('performance', lambda: dict(self.performance_metrics))
+        self.metrics.register_source('scoring', lambda: dict(self.scoring_stats))
+        self.metrics.register_source('watcher', self.tick_watcher.get_stats)
+        self.metrics.register_source('trailing', self.trailing_engine.get_stats)
+        self.metrics.register_source('spread_stats', self.spread_stats.get_stats)
+        self.metrics.register_source('mark_to_market', self.mark_to_market.get_stats)
+        self.metrics.register_source('group_pnl', self.group_pnl.get_stats)
+        self.metrics.register_source('group_journal', self.group_journal.get_stats)
+    
+    def _configure_metrics_exporter(self):
+        """🆕 ไฟล์ / ช่วงเวลา export ของ metrics จาก config (http_port มีผลเมื่อเริ่มระบบใหม่)"""
+        self.metrics_exporter.path = self._get_config_value('arbitrage_params.metrics.export_path', 'data/metrics.json')
+        self.metrics_exporter.interval = self._get_config_value('arbitrage_params.metrics.export_interval_seconds', 10.0)
+    
+    def _configure_trailing_engine(self):
+        """🆕 ส่งค่า trailing stop จาก config ให้ trailing engine"""
+        self.trailing_engine.configure(self.trailing_stop_enabled, self.min_profit_base,
+                                       self.lock_profit_percentage, self.trailing_stop_distance)
+        self.trailing_engine.heartbeat = self.loop_heartbeat_seconds
+    
+    def _configure_mark_to_market(self):
+        """🆕 รอบ reconcile / เกณฑ์ drift ของ mark-to-market จาก config"""
+        self.mark_to_market.configure(
+            reconcile_interval=self._get_config_value('arbitrage_params.mark_to_market.reconcile_interval_seconds', 30.0),
+            drift_alert=self._get_config_value('arbitrage_params.mark_to_market.drift_alert_usd', 5.0),
+            correct_drift=self._get_config_value('arbitrage_params.mark_to_market.correct_drift', True)
+        )
+        self.mark_to_market.max_age = self.tick_poll_interval
+    
+    def get_mark_to_market_report(self) -> Dict:
+        """🆕 drift ระหว่าง PnL ที่คำนวณเองกับ profit ของ MT5 (ต่อ symbol / กลุ่ม / position ที่แย่สุด)"""
+        report = self.mark_to_market.get_drift_report()
+        report['engine'] = self.mark_to_market.get_stats()
+        return report
+    
+    def _on_trailing_stop(self, group_id: str):
+        """🆕 Trailing stop ถูกชนจาก tick (เรียกจาก thread ของ trailing engine) - ปิดกลุ่มทันที"""
+        with self._close_lock:
+            if group_id in self.active_groups:
+                self.logger.info(f"✅ Group {group_id} hit trailing stop on tick - closing group")
+                self._close_group(group_id)
+    
+    def get_trailing_stop_report(self) -> Dict:
+        """🆕 Drawdown จาก peak ถึงราคาปิด แยกส่วนที่มาจาก trailing rule กับ decision latency"""
+        report = self.trailing_engine.get_drawdown_report()
+        report['engine'] = self.trailing_engine.get_stats()
+        return report
+    
+    def get_spread_report(self) -> Dict:
+        """🆕 spread เฉลี่ย/p95/max ต่อ symbol (window ล่าสุด + ชั่วโมงนี้ของสัปดาห์) ในหน่วย pips"""
+        hour = hour_of_week()
+        report = {'hour_of_week': hour, 'stats': self.spread_stats.get_stats(), 'symbols': {}}
+        for symbol in self.spread_stats.symbols():
+            report['symbols'][symbol] = {
+                'recent': self.spread_stats.get(symbol),
+                'this_hour': self.spread_stats.get(symbol, hour),
+                'expected': self.spread_stats.expected_spread(symbol, hour=hour)
+            }
+        return report
+    
     def _send_orders_for_closed_triangles(self, closed_triangles: List[str]):
         """⭐ ปรับปรุงใหม่ - ตรวจสอบสถานะออเดอร์จริงและ rate limiting"""
         
@@ -449,85 +676,184 @@ class TriangleArbitrageDetector:
             self.logger.warning(f"⚠️ Daily order limit reached: {self.daily_order_count}/{self.daily_order_limit}")
             return
         
+        # snapshot ถูก invalidate หลังปิด/เปิดออเดอร์ จึงได้ข้อมูลล่าสุดเสมอ
+        existing_positions = self.broker.get_positions_snapshot()
+        
+        # 🆕 ส่ง triangle ที่มีโอกาสดีที่สุดก่อน (top-k จาก engine, ที่เหลือตามลำดับเดิม)
+        # 🆕 engine re-score เฉพาะ triangle ที่มีคู่เงินได้ tick ใหม่ และอัปเดต top-k แบบ incremental
+        ranked = self.get_ranked_opportunities()
+        triangle_names = list(self.triangle_specs)
+        rank_of = {triangle_names[int(index)]: rank for rank, index in enumerate(ranked['triangle'])}
+        closed_triangles = sorted(closed_triangles, key=lambda name: rank_of.get(name, len(rank_of)))
+        
+        # 🆕 จำกัดจำนวน triangle ที่เปิดพร้อมกัน (discovery อาจพบหลายสิบ triangle)
+        active_count = sum(1 for magic in existing_positions.active_magics() if is_triangle_magic(magic))
+        if active_count >= self.max_active_triangles_config:
+            self.logger.debug(f"⏭️ Max active triangles reached ({active_count}/{self.max_active_triangles_config})")
+            return
+        
+        # 1. เลือก triangle ที่พร้อมตรวจสอบ (ไม่มี I/O)
+        candidates = []
+        metrics = self.metrics
         for triangle_name in closed_triangles:
             if self.is_arbitrage_paused.get(triangle_name, False):
+                metrics.counter('funnel.skipped_paused').inc()
                 continue
             
             # ตรวจสอบว่ามีออเดอร์เปิดอยู่สำหรับ triangle นี้หรือไม่
             triangle_magic = self.triangle_magic_numbers.get(triangle_name, 234000)
-            existing_positions = self.broker.get_all_positions()
             
             # ตรวจสอบว่ามีออเดอร์ที่ magic number นี้อยู่หรือไม่
-            has_existing_orders = any(pos.get('magic', 0) == triangle_magic for pos in existing_positions)
+            has_existing_orders = bool(existing_positions.get_by_magic(triangle_magic))
             
             if has_existing_orders:
                 self.logger.debug(f"⏭️ {triangle_name}: Still has existing orders (magic: {triangle_magic}) - skipping")
+                metrics.counter('funnel.skipped_open').inc()
                 continue
             
-            triangle_index = int(triangle_name.split('_')[-1]) - 1
-            if triangle_index < len(self.triangle_combinations):
-                triangle = self.triangle_combinations[triangle_index]
-                self.logger.debug(f"🚀 Executing new orders for {triangle_name} (no existing orders found)")
-                
-                # อัปเดตเวลาที่ส่งออเดอร์ล่าสุด
-                self.last_order_time = current_time
-                
-                success = self._execute_new_triangle_orders(triangle, triangle_name)
-                
-                # นับจำนวนออเดอร์เฉพาะเมื่อสำเร็จ
-                if success:
-                    self.daily_order_count += 1
-                    self.logger.info(f"📊 Order count: {self.daily_order_count}/{self.daily_order_limit}")
-                else:
-                    self.logger.debug(f"⚠️ Order execution failed for {triangle_name} - not counting")
+            spec = self.triangle_specs.get(triangle_name)
+            if spec is None:
+                continue
+            
+            # 🆕 ราคาของ triangle นี้ยังไม่เปลี่ยนตั้งแต่ถูกปฏิเสธครั้งก่อน - ผลจะเหมือนเดิม ข้ามไป
+            engine_index = self.triangle_engine.index_of(spec.symbols)
+            if engine_index is not None and \
+                    self._rejected_at_pass.get(triangle_name) == self.triangle_engine.scored_at(engine_index):
+                self.logger.debug(f"⏭️ {triangle_name}: No new ticks since last rejection - skipping")
+                metrics.counter('funnel.skipped_unchanged').inc()
+                continue
+            
+            candidates.append((triangle_name, spec.symbols, engine_index))
+        
+        if not candidates:
+            return
+        
+        # อัปเดตเวลาที่ส่งออเดอร์ล่าสุด
+        self.last_order_time = current_time
+        
+        # 2. 🆕 Pre-trade pipeline ของทุก triangle พร้อมกันบน pool (ใช้ market snapshot / balance / config ชุดเดียวกัน)
+        context = self._build_pretrade_context()
+        started = time.perf_counter()
+        futures = [
+            (triangle_name, engine_index,
+             self._pretrade_pool.submit(self._prepare_triangle_orders, triangle, triangle_name, context))
+            for triangle_name, triangle, engine_index in candidates
+        ]
+        
+        # 3. Send stage: ส่งตามลำดับ rank - max active / daily limit บังคับที่นี่เท่านั้น
+        for triangle_name, engine_index, future in futures:
+            plan = future.result()
+            
+            if plan is None:
+                self.logger.debug(f"⚠️ Order execution failed for {triangle_name} - not counting")
+                if engine_index is not None:
+                    self._rejected_at_pass[triangle_name] = self.triangle_engine.scored_at(engine_index)
+                continue
+            
+            if active_count >= self.max_active_triangles_config:
+                self.logger.debug(f"⏭️ Max active triangles reached ({active_count}/{self.max_active_triangles_config}) "
+                                  f"- {triangle_name} not sent")
+                metrics.counter('funnel.blocked_limit').inc()
+                continue
+            if self.daily_order_count >= self.daily_order_limit:
+                self.logger.warning(f"⚠️ Daily order limit reached: {self.daily_order_count}/{self.daily_order_limit}")
+                metrics.counter('funnel.blocked_limit').inc()
+                continue
+            
+            self.logger.debug(f"🚀 Executing new orders for {triangle_name} (no existing orders found)")
+            with metrics.timer('send.triangle_ms'):
+                success = self._send_prepared_triangle_orders(plan)
+            
+            # นับจำนวนออเดอร์เฉพาะเมื่อสำเร็จ
+            if success:
+                metrics.counter('funnel.sent').inc()
+                active_count += 1
+                self.daily_order_count += 1
+                self.logger.info(f"📊 Order count: {self.daily_order_count}/{self.daily_order_limit}")
+            else:
+                metrics.counter('funnel.send_failed').inc()
+                self.logger.debug(f"⚠️ Order execution failed for {triangle_name} - not counting")
+        
+        self._record_stage('pretrade.pass_ms', started)
+        self.logger.debug(f"⏱️ Pre-trade pass: {len(candidates)} triangles in "
+                          f"{(time.perf_counter() - started) * 1000:.1f} ms ({self.pretrade_workers} workers)")
+    
+    def _build_pretrade_context(self) -> Dict:
+        """🆕 ข้อมูลที่ทุก triangle ในรอบเดียวกันใช้ร่วมกัน: tick snapshot, balance, lot config"""
+        context = {
+            'ticks': self.broker.get_ticks(list(self.triangle_engine.symbols)),
+            'balance': self.broker.get_account_balance(),
+            # 🆕 cross rates + pip value ต่อ lot ของทุก symbol (สร้างครั้งเดียวต่อ snapshot)
+            'rates': self.broker.get_rate_table() if hasattr(self.broker, 'get_rate_table') else None,
+            'lot_config': self.config_snapshot.section(f"{ADAPTIVE_PARAMS}.position_sizing.lot_calculation")
+        }
+        return context
     
     def _execute_new_triangle_orders(self, triangle, triangle_name):
         """⭐ ปรับปรุงใหม่ - คำนวณทิศทางและตรวจสอบก่อนส่งออเดอร์"""
+        plan = self._prepare_triangle_orders(triangle, triangle_name, self._build_pretrade_context())
+        if plan is None:
+            return False
+        return self._send_prepared_triangle_orders(plan)
+    
+    def _prepare_triangle_orders(self, triangle, triangle_name, context: Dict) -> Optional[Dict]:
+        """
+        🆕 Pre-trade pipeline ของ triangle เดียว (ทิศทาง, feasibility, lot sizes) - ไม่ส่งออเดอร์
+        
+        ปลอดภัยที่จะรันพร้อมกันหลาย triangle บน pool
+        
+        Returns:
+            Dict (triangle, triangle_name, direction_info, lot_sizes) ถ้าพร้อมส่ง, None ถ้าไม่ผ่าน
+        """
+        started = time.perf_counter()
         try:
             # Track: ตรวจสอบโอกาสใหม่
-            self.performance_metrics['opportunities_checked'] += 1
+            with self._metrics_lock:
+                self.performance_metrics['opportunities_checked'] += 1
+            self.metrics.counter('funnel.checked').inc()
             
             self.logger.info(f"🔍 {triangle_name}: Checking arbitrage conditions for {triangle}")
             
             # 1. คำนวณทิศทางที่ถูกต้อง
-            direction_info = self.calculate_arbitrage_direction(triangle)
+            direction_info = self.calculate_arbitrage_direction(triangle, context['ticks'])
             
             if not direction_info:
                 self.logger.info(f"❌ {triangle_name}: No profitable arbitrage opportunity - skipping")
-                return
+                self.metrics.counter('funnel.no_prices').inc()
+                return None
             
             # Track: ผ่านการตรวจสอบทิศทาง
-            self.performance_metrics['passed_direction_check'] += 1
-            if direction_info['direction'] == 'forward':
-                self.performance_metrics['forward_path_selected'] += 1
-            else:
-                self.performance_metrics['reverse_path_selected'] += 1
+            with self._metrics_lock:
+                self.performance_metrics['passed_direction_check'] += 1
+                if direction_info['direction'] == 'forward':
+                    self.performance_metrics['forward_path_selected'] += 1
+                else:
+                    self.performance_metrics['reverse_path_selected'] += 1
             
             self.logger.info(f"✅ {triangle_name}: Direction check passed - {direction_info['direction'].upper()} path, profit: {direction_info.get('profit_percent', 0):.4f}%")
             
             # 2. ตรวจสอบความเป็นไปได้
             if not self._validate_execution_feasibility(triangle, direction_info):
                 self.logger.info(f"❌ {triangle_name}: Failed feasibility check (profit: {direction_info.get('profit_percent', 0):.4f}% too low)")
-                return
+                return None
             
             # Track: ผ่านการตรวจสอบความเป็นไปได้
-            self.performance_metrics['passed_feasibility_check'] += 1
+            with self._metrics_lock:
+                self.performance_metrics['passed_feasibility_check'] += 1
             self.logger.info(f"✅ {triangle_name}: Feasibility check passed")
             
-            # 3. ดึง balance จาก MT5
-            balance = self.broker.get_account_balance()
+            # 3. balance จาก MT5 (ดึงครั้งเดียวต่อรอบ)
+            balance = context['balance']
             if not balance:
                 self.logger.error("❌ Cannot get balance from MT5")
-                return
+                self.metrics.counter('funnel.blocked_sizing').inc()
+                return None
             
             self.logger.info(f"💰 {triangle_name}: Account balance: ${balance:,.2f}")
             
-            # 4. โหลด risk_per_trade_percent จาก config
-            import json
-            config_path = 'config/adaptive_params.json'
-            with open(config_path, 'r', encoding='utf-8') as f:
-                config = json.load(f)
-            risk_per_trade_percent = config.get('position_sizing', {}).get('lot_calculation', {}).get('risk_per_trade_percent')
+            # 4. risk_per_trade_percent จาก config (อ่านครั้งเดียวต่อรอบ)
+            lot_config = context['lot_config']
+            risk_per_trade_percent = lot_config.get('risk_per_trade_percent')
             if not risk_per_trade_percent:
                 self.logger.error("❌ risk_per_trade_percent not found in config")
                 risk_per_trade_percent = 1.0  # fallback
@@ -535,7 +861,7 @@ class TriangleArbitrageDetector:
             self.logger.info(f"⚙️ {triangle_name}: Risk per trade: {risk_per_trade_percent}%")
             
             risk_per_trade_percent = float(risk_per_trade_percent)
-            max_loss_pips = config.get('position_sizing', {}).get('lot_calculation', {}).get('max_loss_pips', 50.0)
+            max_loss_pips = lot_config.get('max_loss_pips', 50.0)
             
             # 5. สูตร: Risk Amount = Balance × (Risk% ÷ 100)
             risk_amount = balance * (risk_per_trade_percent / 100.0)
@@ -546,12 +872,15 @@ class TriangleArbitrageDetector:
             # 6. คำนวณ lot สำหรับแต่ละคู่
             triangle_symbols = list(triangle)
             lot_sizes = {}
+            rates = context.get('rates')
             
             for symbol in triangle_symbols:
-                pip_value = TradingCalculations.calculate_pip_value(symbol, 1.0, self.broker)
+                pip_value = (rates.pip_value(symbol) if rates is not None else None) or \
+                    TradingCalculations.calculate_pip_value(symbol, 1.0, self.broker)
                 if pip_value <= 0:
                     self.logger.error(f"❌ Invalid pip value for {symbol}")
-                    return
+                    self.metrics.counter('funnel.blocked_sizing').inc()
+                    return None
                 
                 # สูตร: Lot = Risk Amount ÷ (Pip Value × Max Loss Pips)
                 lot_size = risk_amount / (pip_value * max_loss_pips)
@@ -563,33 +892,59 @@ class TriangleArbitrageDetector:
             # 7. ตรวจสอบความสมดุลของ Triangle
             balance_ok = self._verify_triangle_balance(triangle, lot_sizes)
             if balance_ok:
-                self.performance_metrics['passed_balance_check'] += 1
+                with self._metrics_lock:
+                    self.performance_metrics['passed_balance_check'] += 1
                 self.logger.info(f"✅ {triangle_name}: Triangle balance check passed")
             else:
                 self.logger.warning(f"⚠️ {triangle_name}: Triangle not balanced, adjusting...")
                 # ยังคงส่งต่อไป แต่เตือน (เพราะ deviation อาจยอมรับได้)
             
+            self.metrics.counter('funnel.prepared').inc()
+            return {
+                'triangle': triangle,
+                'triangle_name': triangle_name,
+                'direction_info': direction_info,
+                'lot_sizes': lot_sizes
+            }
+            
+        except Exception as e:
+            self.metrics.counter('funnel.errors').inc()
+            self.logger.error(f"Error in _prepare_triangle_orders: {e}")
+            return None
+        finally:
+            self._record_stage('pretrade.triangle_ms', started)
+    
+    def _send_prepared_triangle_orders(self, plan: Dict) -> bool:
+        """🆕 Send stage: ส่งออเดอร์ของ triangle ที่ผ่าน pre-trade pipeline แล้ว"""
+        try:
+            triangle_name = plan['triangle_name']
+            direction_info = plan['direction_info']
+            
             # Track: บันทึกกำไรที่คาดหวัง
             expected_profit = direction_info.get('profit_percent', 0)
-            self.performance_metrics['total_expected_profit'] += expected_profit
-            if self.performance_metrics['passed_feasibility_check'] > 0:
-                self.performance_metrics['avg_expected_profit'] = (
-                    self.performance_metrics['total_expected_profit'] / 
-                    self.performance_metrics['passed_feasibility_check']
-                )
+            with self._metrics_lock:
+                self.performance_metrics['total_expected_profit'] += expected_profit
+                if self.performance_metrics['passed_feasibility_check'] > 0:
+                    self.performance_metrics['avg_expected_profit'] = (
+                        self.performance_metrics['total_expected_profit'] / 
+                        self.performance_metrics['passed_feasibility_check']
+                    )
             
             # 8. ส่งออเดอร์พร้อมทิศทางที่คำนวณแล้ว
             self.logger.info(f"🚀 {triangle_name}: All checks passed! Sending orders...")
-            success = self._send_new_triangle_orders(triangle, triangle_name, lot_sizes, direction_info)
+            success = self._send_new_triangle_orders(plan['triangle'], triangle_name, plan['lot_sizes'], direction_info)
             
             if success:
-                self.performance_metrics['successful_trades'] += 1
+                with self._metrics_lock:
+                    self.performance_metrics['successful_trades'] += 1
                 self.logger.info(f"🎉 {triangle_name}: All orders placed successfully!")
             else:
                 self.logger.error(f"❌ {triangle_name}: Failed to place orders")
+            return success
             
         except Exception as e:
-            self.logger.error(f"Error in _execute_new_triangle_orders: {e}")
+            self.logger.error(f"Error in _send_prepared_triangle_orders: {e}")
+            return False
     
     def _send_new_triangle_orders(self, triangle, triangle_name, lot_sizes, direction_info):
         """⭐ ปรับปรุงใหม่ - ใช้ทิศทางที่คำนวณได้จาก direction_info"""
@@ -605,57 +960,49 @@ class TriangleArbitrageDetector:
             self.logger.info(f"🚀 Sending {path_direction.upper()} arbitrage for {triangle_name}: {triangle_symbols}")
             self.logger.info(f"   Expected Net Profit: {expected_profit:.4f}%")
             
-            placed_orders = []
-            
-            # ส่งออเดอร์สำหรับแต่ละคู่ตามทิศทางที่คำนวณ
+            # 🆕 สร้างทุก leg ไว้ก่อน แล้วให้ TriangleExecutor ตรวจสอบ + ส่งพร้อมกัน (rollback ถ้า leg ใดล้มเหลว)
+            evaluated_prices = direction_info.get('prices', {})
+            spec = self.triangle_specs.get(triangle_name)
+            legs = []
             for symbol in triangle_symbols:
                 # ใช้ทิศทางจาก direction_info (ไม่ใช่ hard-coded)
                 direction = orders_direction.get(symbol, 'BUY')
-                lot_size = lot_sizes.get(symbol, 0.01)
-                
-                # สร้าง comment ตามหมายเลขสามเหลี่ยม
-                triangle_number = triangle_name.split('_')[-1]  # ได้ 1, 2, 3, 4, 5, 6
-                comment = f"G{triangle_number}_{symbol}_{direction[:1]}"  # เช่น G1_EURUSD_B
-                
-                # ส่งออเดอร์ (ใช้ real symbol จาก SymbolMapper)
-                real_symbol = self.symbol_mapper.get_real_symbol(symbol)
-                result = self.broker.place_order(
-                    symbol=real_symbol,
-                    order_type=direction,
-                    volume=lot_size,
-                    comment=comment,
-                    magic=triangle_magic
-                )
-                
-                if result and result.get('success', False):
-                    placed_orders.append({
-                        'symbol': symbol,
-                        'direction': direction,
-                        'lot_size': lot_size,
-                        'ticket': result.get('ticket')
-                    })
-                    self.logger.info(f"✅ {symbol} {direction} {lot_size} lots - SUCCESS (Ticket: {result.get('ticket')})")
-                else:
-                    # ถ้าออเดอร์ล้มเหลว ยกเลิกทั้งหมดเพื่อไม่ให้เหลือ partial fill
-                    error_msg = result.get('error', 'Unknown error') if result else 'No result'
-                    self.logger.error(f"❌ {symbol} {direction} {lot_size} lots - FAILED: {error_msg}")
-                    self.logger.warning(f"🔄 Cancelling all orders for {triangle_name} due to failure")
-                    
-                    # Track: นับจำนวนครั้งที่ยกเลิกออเดอร์
-                    self.performance_metrics['orders_cancelled_due_to_failure'] += len(placed_orders)
-                    
-                    # ยกเลิกออเดอร์ที่ส่งไปแล้ว
-                    for order in placed_orders:
-                        try:
-                            self.broker.close_position(order['ticket'])
-                            self.logger.info(f"🔄 Cancelled {order['symbol']} (Ticket: {order['ticket']})")
-                        except Exception as cancel_error:
-                            self.logger.error(f"Error cancelling order {order['ticket']}: {cancel_error}")
-                    
-                    return False
+                bid, ask = evaluated_prices.get(symbol, (None, None))
+                legs.append(TriangleLeg(
+                    symbol=symbol,
+                    direction=direction,
+                    volume=lot_sizes.get(symbol, 0.01),
+                    comment=spec.comment(symbol, direction) if spec else f"{triangle_name}_{symbol}_{direction[:1]}",  # เช่น G1_EURUSD_B
+                    magic=triangle_magic,
+                    bid=bid,
+                    ask=ask
+                ))
+            
+            result = self.triangle_executor.execute(legs)
+            
+            for leg in result['legs']:
+                if leg['ticket'] is not None:
+                    deviation = leg['deviation_pips']
+                    deviation_text = f"{deviation:+.2f} pips" if deviation is not None else "n/a"
+                    self.logger.info(f"✅ {leg['symbol']} {leg['direction']} {leg['lot_size']} lots - SUCCESS "
+                                     f"(Ticket: {leg['ticket']}, {leg['latency_ms']:.1f} ms, deviation {deviation_text})")
+                elif leg['error']:
+                    self.logger.error(f"❌ {leg['symbol']} {leg['direction']} {leg['lot_size']} lots - FAILED: {leg['error']}")
+            
+            if not result['success']:
+                # ถ้าออเดอร์ล้มเหลว ยกเลิกทั้งหมดเพื่อไม่ให้เหลือ partial fill
+                self.logger.warning(f"🔄 Cancelling all orders for {triangle_name} due to failure: {result['error']}")
+                # Track: นับจำนวนครั้งที่ยกเลิกออเดอร์
+                with self._metrics_lock:
+                    self.performance_metrics['orders_cancelled_due_to_failure'] += len(result['rolled_back'])
+                if result['rollback_failed']:
+                    self.logger.error(f"🚨 {triangle_name}: rollback left {len(result['rollback_failed'])} leg(s) open "
+                                      f"and unhedged - tickets {result['rollback_failed']}")
+                return False
             
             # บันทึกข้อมูล arbitrage ที่สำเร็จ
-            self.logger.info(f"✅ {triangle_name}: All {len(placed_orders)} orders placed successfully!")
+            self.logger.info(f"✅ {triangle_name}: All {len(result['legs'])} orders placed successfully! "
+                             f"({self.triangle_executor.dispatch_mode}, {result['total_ms']:.1f} ms)")
             return True
                     
         except Exception as e:
@@ -666,13 +1013,12 @@ class TriangleArbitrageDetector:
         """⭐ ฟังก์ชันใหม่ - ใช้แค่สูตรใหม่เท่านั้น"""
         try:
             all_positions = self.broker.get_all_positions()
-            arbitrage_positions = [pos for pos in all_positions if 234001 <= pos.get('magic', 0) <= 234006]
+            arbitrage_positions = [pos for pos in all_positions if is_triangle_magic(pos.get('magic', 0))]
             
             if not arbitrage_positions:
-                for i, triangle in enumerate(self.triangle_combinations):
-                    triangle_name = f"triangle_{i+1}"
+                for triangle_name, spec in self.triangle_specs.items():
                     if not self.is_arbitrage_paused.get(triangle_name, False):
-                        self._execute_new_triangle_orders(triangle, triangle_name)
+                        self._execute_new_triangle_orders(spec.symbols, triangle_name)
                         
         except Exception as e:
             self.logger.error(f"Error in _send_simple_orders: {e}")
@@ -742,60 +1088,63 @@ class TriangleArbitrageDetector:
         except Exception as e:
             self.logger.error(f"Error syncing active groups from MT5: {e}")
     
-    def _load_tier_config(self):
-        """โหลดการตั้งค่า Account Tier จาก config"""
+    def _discover_triangles(self):
+        """
+        🆕 สร้าง currency graph จากคู่เงินที่ map ได้ แล้วหา triangle ทั้งหมด
+        
+        ตาราง orientation ของแต่ละ leg (leg ไหน inverted = BUY บน forward path),
+        magic number และ comment ถูกคำนวณครั้งเดียวตอนเริ่มระบบ
+        """
         try:
-            import json
-            with open('config/adaptive_params.json', 'r', encoding='utf-8') as f:
-                self.tier_config = json.load(f)
-        except UnicodeDecodeError as e:
-            self.logger.error(f"Unicode decode error in config file: {e}")
-            # Try with different encodings
-            for encoding in ['cp1252', 'latin-1', 'iso-8859-1']:
-                try:
-                    with open('config/adaptive_params.json', 'r', encoding=encoding) as f:
-                        self.tier_config = json.load(f)
-                    self.logger.info(f"Successfully loaded config with {encoding} encoding")
-                    return
-                except:
-                    continue
-            self.logger.error("Failed to load config with any encoding")
-            self.tier_config = {}
+            preferred = [tuple(triangle) for triangle in self.triangle_combinations]
+            symbols = self.symbol_mapper.get_all_mapped_pairs()
+            if not symbols:
+                # ยังไม่ได้ map (เช่น offline) - ใช้รายชื่อคู่เงินมาตรฐาน
+                symbols = self.arbitrage_pairs
+            
+            # 🆕 Cycle search mode: รวม cycle 4-5 legs (เช่น EUR→USD→JPY→GBP→EUR) เข้า pipeline เดียวกัน
+            max_legs = 3
+            if self._get_config_value('arbitrage_params.triangles.cycle_search', False):
+                max_legs = int(self._get_config_value('arbitrage_params.triangles.max_cycle_legs', 5))
+            
+            if self._get_config_value('arbitrage_params.triangles.auto_discovery', True):
+                specs = discover_triangles(symbols, preferred, max_legs=max_legs)
+            else:
+                # ใช้เฉพาะ 6 triangle เดิม (แต่ยังได้ orientation ที่ถูกต้องจาก graph)
+                specs = [spec for spec in discover_triangles(symbols, preferred) if spec.number <= len(preferred)]
+            
+            self._set_triangle_specs(specs)
+            discovered = sum(1 for spec in specs if spec.number > len(preferred))
+            cycles = sum(1 for spec in specs if spec.legs > 3)
+            self.logger.info(f"🔺 Triangles: {len(specs)} tradeable "
+                             f"({len(specs) - discovered} preset, {discovered} discovered from {len(symbols)} pairs"
+                             f"{f', {cycles} with 4-{max_legs} legs' if cycles else ''})")
+            for spec in specs:
+                self.logger.debug(f"   {spec.name} (magic {spec.magic}): {spec.symbols} "
+                                  f"forward {'/'.join(spec.forward_sides)}")
         except Exception as e:
-            self.logger.error(f"Error loading tier config: {e}")
-            self.tier_config = {}
+            self.logger.error(f"Error discovering triangles: {e}")
+            self._set_triangle_specs([])
+    
+    def _set_triangle_specs(self, specs: List[TriangleSpec]):
+        """ตั้งค่า triangle ทั้งหมด (combinations, magic numbers, ตัวนับ) จากผล discovery"""
+        self.triangle_specs: Dict[str, TriangleSpec] = {spec.name: spec for spec in specs}
+        self.triangle_combinations = [spec.symbols for spec in specs]
+        self.triangle_magic_numbers = {spec.name: spec.magic for spec in specs}
+        
+        # เริ่มต้นตัวนับกลุ่มสำหรับแต่ละสามเหลี่ยม
+        for triangle_name in self.triangle_specs:
+            self.group_counters.setdefault(triangle_name, 0)
+            self.is_arbitrage_paused.setdefault(triangle_name, False)
+            self.used_currency_pairs.setdefault(triangle_name, set())
+        
+        # Correlation manager ใช้ magic numbers ชุดเดียวกัน
+        if getattr(self, 'correlation_manager', None):
+            self.correlation_manager.triangle_magic_numbers = dict(self.triangle_magic_numbers)
     
     def _get_config_value(self, path: str, default_value=None):
-        """ดึงค่าจาก config โดยใช้ dot notation"""
-        try:
-            keys = path.split('.')
-            value = self.tier_config
-            for key in keys:
-                if isinstance(value, dict) and key in value:
-                    value = value[key]
-                else:
-                    return default_value
-            return value
-        except Exception as e:
-            self.logger.error(f"Error getting config value {path}: {e}")
-            return default_value
-    
-    def reload_config(self):
-        """โหลด config ใหม่ (สำหรับ GUI Settings)"""
-        try:
-            self._load_tier_config()
-            # Removed AccountTierManager - using GUI Risk per Trade only  # รีโหลด tier manager
-            
-            # 🔄 Cache lot calculation config เพื่อไม่ต้องโหลดทุกครั้ง
-            import json
-            with open('config/adaptive_params.json', 'r', encoding='utf-8') as f:
-                config = json.load(f)
-            self.lot_calc_config = config.get('position_sizing', {}).get('lot_calculation', {})
-            
-            self.logger.info("✅ Account Tier config reloaded successfully")
-            self.logger.info(f"🔍 Cached lot calc config: {self.lot_calc_config}")
-        except Exception as e:
-            self.logger.error(f"Error reloading tier config: {e}")
+        """ดึงค่าจาก config โดยใช้ dot notation (🆕 lookup เดียวใน snapshot ที่ flatten ไว้แล้ว)"""
+        return self.config_snapshot.get(f"{ADAPTIVE_PARAMS}.{path}", default_value)
     
     # ⭐ ฟังก์ชันเก่าถูกลบแล้ว - ใช้ _execute_new_triangle_orders และ _send_new_triangle_orders แทน
     
@@ -812,70 +1161,22 @@ class TriangleArbitrageDetector:
             
             groups_to_close = []
             
+            # 🆕 ใช้ snapshot เดียวสำหรับทุกกลุ่ม/ทุกขา + PnL ทุกกลุ่มจาก pass เดียว
+            snapshot = self.broker.get_positions_snapshot()
+            pnl_table = self._get_group_pnl(snapshot)
+            
             for group_id, group_data in list(self.active_groups.items()):
                 # 🆕 ลบ Timeout 24h - Never Cut Loss = Never Expire!
                 # ให้ _should_close_group() (Trailing Stop) ตัดสินเดี่ยว
                 
-                # ตรวจสอบ PnL จริงของแต่ละตำแหน่ง (รวม recovery positions)
-                total_group_pnl = 0.0
-                all_positions_profitable = True
-                valid_positions = 0
+                # PnL จริงของกลุ่ม (arbitrage + recovery positions)
+                group_pnl = pnl_table.get(group_id)
+                total_group_pnl = group_pnl.net_pnl
+                valid_positions = group_pnl.arbitrage_legs
                 
-                # คำนวณ PnL ของ arbitrage positions
-                for position in group_data['positions']:
-                    # หา order_id จาก broker API
-                    order_id = position.get('order_id')
-                    if order_id:
-                        # ตรวจสอบ PnL จาก broker API
-                        all_positions = self.broker.get_all_positions()
-                        position_pnl = 0.0
-                        position_found = False
-                        
-                        for pos in all_positions:
-                            if pos['ticket'] == order_id:
-                                position_pnl = pos['profit']
-                                position_found = True
-                                valid_positions += 1
-                                break
-                        
-                        if position_found:
-                            total_group_pnl += position_pnl
-                            
-                            # ตรวจสอบว่าตำแหน่งนี้กำไรหรือไม่
-                            if position_pnl < 0:
-                                all_positions_profitable = False
-                            
-                            self.logger.debug(f"   Arbitrage {position['symbol']}: PnL = {position_pnl:.2f} USD")
-                        else:
-                            self.logger.warning(f"   Position {position['symbol']} not found in broker - may be closed")
-                    else:
-                        self.logger.warning(f"   No order_id found for position {position['symbol']}")
-                        all_positions_profitable = False
-                
-                # คำนวณ PnL ของ recovery positions ที่เกี่ยวข้องกับกลุ่มนี้ (using order_tracker)
-                recovery_pnl = 0.0
-                if self.correlation_manager:
-                    all_orders = self.correlation_manager.order_tracker.get_all_orders()
-                    all_positions = self.broker.get_all_positions()
-                    
-                    for order_key, order_data in all_orders.items():
-                        # Only count recovery orders for this group
-                        if (order_data.get('type') == 'RECOVERY' and 
-                            order_data.get('group_id') == group_id):
-                            recovery_ticket = order_data.get('ticket')
-                            if recovery_ticket:
-                                # ตรวจสอบ PnL ของ recovery position จาก MT5
-                                for pos in all_positions:
-                                    if str(pos.get('ticket')) == str(recovery_ticket):
-                                        recovery_pnl += pos.get('profit', 0)
-                                        symbol = order_data.get('symbol', 'N/A')
-                                        self.logger.debug(f"   Recovery {symbol}: PnL = {pos['profit']:.2f} USD")
-                                        break
-                
-                # รวม PnL ทั้งหมด (arbitrage + recovery)
-                total_group_pnl += recovery_pnl
-                if recovery_pnl != 0:
-                    self.logger.info(f"   🔄 Recovery PnL: {recovery_pnl:.2f} USD")
+                self.logger.debug(f"   {group_id}: Arbitrage PnL = {group_pnl.arbitrage_pnl:.2f} USD ({group_pnl.arbitrage_legs} legs)")
+                if group_pnl.recovery_pnl != 0:
+                    self.logger.info(f"   🔄 Recovery PnL: {group_pnl.recovery_pnl:.2f} USD")
                 
                 # ถ้าไม่มีตำแหน่งที่เปิดอยู่จริง ให้ลบกลุ่มนี้ทันที
                 if valid_positions == 0:
@@ -890,25 +1191,15 @@ class TriangleArbitrageDetector:
                     if group_id in self.recovery_in_progress:
                         self.recovery_in_progress.remove(group_id)
                     # บันทึกการเปลี่ยนแปลง
-                    self._save_active_groups()
+                    self._save_group(group_id)
                     continue
                 
                 # แสดงผล PnL รวมของกลุ่ม (เฉพาะเมื่อมีการเปลี่ยนแปลงมาก)
                 pnl_status = "💰" if total_group_pnl > 0 else "💸" if total_group_pnl < 0 else "⚖️"
                 # self.logger.info(f"📊 Group {group_id} PnL: {pnl_status} {total_group_pnl:.2f} USD")  # DISABLED - too verbose
                 
-                # คำนวณ % ของทุนจาก broker API (ใช้ Balance ไม่ใช่ Equity)
-                account_balance = self.broker.get_account_balance()
-                if account_balance is None:
-                    account_balance = 1000.0  # fallback ถ้าไม่สามารถดึงได้
-                    self.logger.warning("⚠️ Cannot get account balance, using fallback: 1000 USD")
-                
-                profit_percentage = (total_group_pnl / account_balance) * 100
-                # self.logger.info(f"   💰 Account Balance: {account_balance:.2f} USD")  # DISABLED - too verbose
-                # self.logger.info(f"   📊 Profit Percentage: {profit_percentage:.3f}%")  # DISABLED - too verbose
-                
                 # 🆕 ใช้ _should_close_group() แทน logic เก่า (มี Trailing Stop + Never Cut Loss!)
-                if self._should_close_group(group_id, group_data):
+                if self._should_close_group(group_id, group_data, snapshot):
                     self.logger.info(f"✅ Group {group_id} meets closing criteria (Trailing Stop)")
                     groups_to_close.append(group_id)
                 elif total_group_pnl < 0:
@@ -916,7 +1207,7 @@ class TriangleArbitrageDetector:
                     triangle_type = group_data.get('triangle_type', 'unknown')
                     triangle_magic = self.triangle_magic_numbers.get(triangle_type, 234000)
                     
-                    if self._should_start_recovery_from_mt5(triangle_magic, triangle_type):
+                    if self._should_start_recovery_from_mt5(triangle_magic, triangle_type, snapshot):
                         # เริ่ม correlation recovery ตามเงื่อนไขที่กำหนด
                         self._start_correlation_recovery(group_id, group_data, total_group_pnl)
             
@@ -932,21 +1223,20 @@ class TriangleArbitrageDetector:
         except Exception as e:
             self.logger.error(f"Error checking group status: {e}")
             
-    def _should_start_recovery_from_mt5(self, magic_num: int, triangle_type: str) -> bool:
+    def _should_start_recovery_from_mt5(self, magic_num: int, triangle_type: str,
+                                        snapshot: PositionSnapshot = None) -> bool:
         """ตรวจสอบว่าควรเริ่ม recovery หรือไม่ - เช็คจาก MT5 จริงๆ"""
         try:
-            all_positions = self.broker.get_all_positions()
-            group_positions = []
-            total_pnl = 0.0
-            
-            for pos in all_positions:
-                if pos.get('magic', 0) == magic_num:
-                    group_positions.append(pos)
-                    total_pnl += pos.get('profit', 0)
+            if snapshot is None:
+                snapshot = self.broker.get_positions_snapshot()
+            group_positions = list(snapshot.get_by_magic(magic_num))
             
             if not group_positions:
                 return False
             
+            group_pnl = self._get_group_pnl(snapshot).get(f"group_{triangle_type}_1")
+            total_pnl = group_pnl.arbitrage_pnl
+            
             # ตรวจสอบว่ามีการขาดทุนหรือไม่
             if total_pnl >= 0:
                 self.logger.info(f"💰 Group {triangle_type} has profit: ${total_pnl:.2f} - No recovery needed")
@@ -955,7 +1245,7 @@ class TriangleArbitrageDetector:
                 return False
             
             # คำนวณ risk per lot
-            total_lot_size = sum(pos.get('volume', 0) for pos in group_positions)
+            total_lot_size = group_pnl.arbitrage_volume
             if total_lot_size <= 0:
                 return False
                 
@@ -1022,27 +1312,22 @@ class TriangleArbitrageDetector:
         except Exception as e:
             self.logger.error(f"Error logging group status for recovery: {e}")
     
-    def _close_group_by_magic(self, magic_num: int, group_id: str):
+    def _close_group_by_magic(self, magic_num: int, group_id: str, snapshot: PositionSnapshot = None):
         """ปิด Group โดยใช้ magic number"""
         try:
-            all_positions = self.broker.get_all_positions()
-            positions_to_close = []
-            
-            for pos in all_positions:
-                if pos.get('magic', 0) == magic_num:
-                    positions_to_close.append(pos)
+            if snapshot is None:
+                snapshot = self.broker.get_positions_snapshot()
+            positions_to_close = list(snapshot.get_by_magic(magic_num))
             
             if not positions_to_close:
                 self.logger.warning(f"No positions found for magic {magic_num}")
                 return
             
             # 🆕 Safety Check: คำนวณ Net PnL ก่อนปิด (Never Cut Loss!)
-            arbitrage_pnl = sum(pos.get('profit', 0) for pos in positions_to_close)
-            recovery_pnl = 0.0
-            if self.correlation_manager:
-                recovery_pnl = self._get_recovery_pnl_for_group(group_id)
-            
-            net_pnl = arbitrage_pnl + recovery_pnl
+            group_pnl = self._get_group_pnl(snapshot).get(group_id)
+            arbitrage_pnl = group_pnl.arbitrage_pnl
+            recovery_pnl = group_pnl.recovery_pnl
+            net_pnl = group_pnl.net_pnl
             
             self.logger.info(f"💰 Closing Group {group_id}:")
             self.logger.info(f"   Arbitrage PnL: ${arbitrage_pnl:.2f}")
@@ -1053,15 +1338,18 @@ class TriangleArbitrageDetector:
                 self.logger.error(f"❌❌❌ BLOCKED! Net PnL is NEGATIVE: ${net_pnl:.2f}")
                 self.logger.error(f"   NEVER CUT LOSS! Group {group_id} will NOT be closed!")
                 self.logger.error(f"   Waiting for recovery to turn profitable...")
+                self.trailing_engine.cancel(group_id)
                 return
             
             self.logger.info(f"✅ Net PnL is POSITIVE (${net_pnl:.2f}) - Proceeding to close...")
             
             # ปิด positions ทั้งหมด
+            realized_pnl = 0.0
             for pos in positions_to_close:
                 try:
                     result = self.broker.close_position(pos.get('ticket'))
                     if result and result.get('success'):
+                        realized_pnl += result.get('pnl', pos.get('profit', 0))
                         self.logger.info(f"✅ Closed: {pos.get('symbol')} {pos.get('type')} (Order: {pos.get('ticket')})")
                     else:
                         self.logger.warning(f"❌ Failed to close: {pos.get('symbol')} {pos.get('type')}")
@@ -1076,10 +1364,12 @@ class TriangleArbitrageDetector:
                     # Individual order tracker handles cleanup automatically via sync
                     self.logger.info(f"🔄 Reset hedge tracker for {group_id}:{symbol}")
             
+            self.trailing_engine.record_exit(group_id, realized_pnl + recovery_pnl)
+            
             # ลบจาก memory และ reset ข้อมูล
             if group_id in self.active_groups:
                 del self.active_groups[group_id]
-            self._save_active_groups()
+            self._save_group(group_id)
             self._reset_group_data_after_close(group_id)
             
             self.logger.info(f"✅ Group {group_id} closed successfully")
@@ -1087,14 +1377,16 @@ class TriangleArbitrageDetector:
         except Exception as e:
             self.logger.error(f"Error closing group by magic: {e}")
     
-    def _reconstruct_orphan_group(self, triangle_name: str, triangle_magic: int, group_id: str):
+    def _reconstruct_orphan_group(self, triangle_name: str, triangle_magic: int, group_id: str,
+                                  snapshot: PositionSnapshot = None):
         """Reconstruct orphan group data from MT5 positions"""
         try:
             self.logger.info(f"🔄 Attempting to reconstruct orphan group: {group_id}")
             
-            # ดึง positions จาก MT5
-            all_positions = self.broker.get_all_positions()
-            orphan_positions = [pos for pos in all_positions if pos.get('magic', 0) == triangle_magic]
+            # ดึง positions จาก snapshot
+            if snapshot is None:
+                snapshot = self.broker.get_positions_snapshot()
+            orphan_positions = list(snapshot.get_by_magic(triangle_magic))
             
             if not orphan_positions:
                 self.logger.warning(f"⚠️ No positions found for reconstruction")
@@ -1103,7 +1395,7 @@ class TriangleArbitrageDetector:
             # สร้าง group_data ใหม่
             group_data = {
                 'group_id': group_id,
-                'triangle': self.triangle_combinations[int(triangle_name.split('_')[1]) - 1] if len(self.triangle_combinations) >= int(triangle_name.split('_')[1]) else ('EURUSD', 'GBPUSD', 'EURGBP'),
+                'triangle': self.triangle_specs[triangle_name].symbols if triangle_name in self.triangle_specs else ('EURUSD', 'GBPUSD', 'EURGBP'),
                 'triangle_type': triangle_name,
                 'created_at': datetime.now(),  # ใช้เวลาปัจจุบัน
                 'positions': [],
@@ -1125,7 +1417,7 @@ class TriangleArbitrageDetector:
             
             # บันทึกลง active_groups
             self.active_groups[group_id] = group_data
-            self._save_active_groups()
+            self._save_group(group_id)
             
             self.logger.info(f"✅ Reconstructed orphan group: {group_id} with {len(orphan_positions)} positions")
             self.logger.info(f"   Group will now be managed by Trailing Stop logic")
@@ -1133,92 +1425,31 @@ class TriangleArbitrageDetector:
         except Exception as e:
             self.logger.error(f"❌ Error reconstructing orphan group: {e}")
     
-    def _should_close_group(self, group_id: str, group_data: Dict) -> bool:
+    def _should_close_group(self, group_id: str, group_data: Dict, snapshot: PositionSnapshot = None) -> bool:
         """ตรวจสอบว่าควรปิด Group หรือไม่ - ตรวจสอบกำไรรวม"""
         try:
-            # ดึงข้อมูล positions จาก MT5 โดยใช้ magic number
+            # ดึงข้อมูล positions จาก snapshot โดยใช้ magic number
             triangle_type = group_data.get('triangle_type', 'unknown')
             triangle_magic = self.triangle_magic_numbers.get(triangle_type, 234000)
             
-            all_positions = self.broker.get_all_positions()
-            group_positions = []
-            total_pnl = 0.0
-            
-            for pos in all_positions:
-                magic = pos.get('magic', 0)
-                if magic == triangle_magic:
-                    group_positions.append(pos)
-                    total_pnl += pos.get('profit', 0)
+            if snapshot is None:
+                snapshot = self.broker.get_positions_snapshot()
+            group_pnl = self._get_group_pnl(snapshot).get(group_id)
             
-            if not group_positions:
+            if not group_pnl.arbitrage_legs:
                 self.logger.warning(f"⚠️ No positions found for group {group_id} (Magic: {triangle_magic})")
                 self.logger.warning(f"   This could be a timing issue or positions already closed")
                 return False  # ✅ ไม่ปิด! (Never Cut Loss - หา positions ไม่เจอไม่ควรปิด)
             
-            # ✅ NEW: ดึง recovery PnL และคำนวณ net PnL
-            recovery_pnl = 0.0
-            if self.correlation_manager:
-                recovery_pnl = self._get_recovery_pnl_for_group(group_id)
-            
-            net_pnl = total_pnl + recovery_pnl
-            
-            # 🆕 STEP 1: คำนวณ Min Profit Threshold (Scale with Balance)
-            balance = self.broker.get_account_balance()
-            if not balance or balance <= 0:
-                balance = 10000.0  # Fallback
+            # ✅ net PnL = arbitrage + recovery (จาก group PnL table)
+            net_pnl = group_pnl.net_pnl
             
             # ⭐ ใช้ min_profit_base ตรงๆ ไม่คูณด้วย balance_multiplier
             min_profit_threshold = self.min_profit_base
             
-            self.logger.debug(f"💰 {group_id}: Balance=${balance:.2f}, Min Profit=${min_profit_threshold:.2f} (Base $10 @ $10K)")
-            
-            # 🆕 STEP 2: Trailing Stop Logic (เช็ค trailing_stop_enabled ก่อน)
-            if self.trailing_stop_enabled:
-                if group_id not in self.group_trailing_stops:
-                    self.group_trailing_stops[group_id] = {
-                        'peak': 0.0,
-                        'stop': 0.0,
-                        'active': False
-                    }
-                
-                trailing_data = self.group_trailing_stops[group_id]
-                
-                # ถ้ากำไรเกิน min_profit → เริ่ม trailing stop
-                if net_pnl >= min_profit_threshold:
-                    if not trailing_data['active']:
-                        # เริ่ม trailing stop
-                        trailing_data['active'] = True
-                        trailing_data['peak'] = net_pnl
-                        # 🔒 Lock 50% of Peak: Stop = max(Peak × 0.5, Peak - Distance)
-                        trailing_data['stop'] = max(net_pnl * self.lock_profit_percentage, net_pnl - self.trailing_stop_distance)
-                        self.logger.info(f"🎯 {group_id} Trailing Stop ACTIVATED: Peak=${net_pnl:.2f}, Stop=${trailing_data['stop']:.2f} (Lock {self.lock_profit_percentage*100:.0f}%)")
-                    else:
-                        # อัปเดต peak ถ้ากำไรเพิ่ม
-                        if net_pnl > trailing_data['peak']:
-                            trailing_data['peak'] = net_pnl
-                            # 🔒 Lock 50% of Peak: Stop = max(Peak × 0.5, Peak - Distance)
-                            trailing_data['stop'] = max(net_pnl * self.lock_profit_percentage, net_pnl - self.trailing_stop_distance)
-                            self.logger.info(f"📈 {group_id} Peak Updated: ${net_pnl:.2f}, Stop=${trailing_data['stop']:.2f} (Lock {self.lock_profit_percentage*100:.0f}%)")
-                        
-                        # เช็คว่า hit trailing stop ไหม (และต้องกำไรด้วย!)
-                        if net_pnl < trailing_data['stop'] and net_pnl > 0:
-                            self.logger.info(f"🚨 {group_id} TRAILING STOP HIT!")
-                            self.logger.info(f"   Peak: ${trailing_data['peak']:.2f}")
-                            self.logger.info(f"   Stop: ${trailing_data['stop']:.2f}")
-                            self.logger.info(f"   Current Net: ${net_pnl:.2f}")
-                            self.logger.info(f"   Locking profit: ${net_pnl:.2f} ✅")
-                            return True
-                        elif net_pnl < trailing_data['stop'] and net_pnl <= 0:
-                            # ถ้า hit stop แต่ติดลบ → ยกเลิก trailing, รอ recovery
-                            self.logger.warning(f"⚠️ {group_id} Hit stop but negative (${net_pnl:.2f}) - Canceling trailing, waiting for recovery")
-                            trailing_data['active'] = False
-                            trailing_data['peak'] = 0.0
-                            trailing_data['stop'] = 0.0
-            else:
-                # Trailing Stop ปิดอยู่ — ใช้ Min Profit เพียงอย่างเดียว
-                if net_pnl >= min_profit_threshold:
-                    self.logger.info(f"✅ {group_id} Min Profit Reached: ${net_pnl:.2f} >= ${min_profit_threshold:.2f} (Trailing Stop DISABLED)")
-                    return True
+            # 🆕 STEP 2: Trailing Stop - state เดียวกับที่ trailing engine อัปเดตทุก tick
+            if self.trailing_engine.evaluate(group_id, net_pnl):
+                return True
             
             # 🆕 STEP 3: ไม่ปิดทันทีที่ถึง Min Profit — ให้ Trailing Stop ควบคุมเท่านั้น
             # หากเพิ่งถึงขั้นต่ำ ให้รอให้ trailing_data['active'] ถูกตั้งในรอบนี้ แล้วค่อยพิจารณา HIT ในรอบถัดไป
@@ -1227,6 +1458,7 @@ class TriangleArbitrageDetector:
             if net_pnl > 0:
                 self.logger.debug(f"💰 Group {group_id} profitable but below threshold:")
                 self.logger.debug(f"   Net PnL: ${net_pnl:.2f} < Min ${min_profit_threshold:.2f}")
+                trailing_data = self.trailing_engine.get_state(group_id)
                 if trailing_data['active']:
                     self.logger.debug(f"   Trailing: Peak=${trailing_data['peak']:.2f}, Stop=${trailing_data['stop']:.2f}")
             
@@ -1248,6 +1480,7 @@ class TriangleArbitrageDetector:
             # 🆕 ใช้ Smart Recovery Flow แทนการส่งข้อมูลแบบเก่า
             # ตั้งค่าว่ากำลัง recovery
             self.recovery_in_progress.add(group_id)
+            self._save_group(group_id)
             
             # Smart Recovery จะทำงานผ่าน check_recovery_positions() อัตโนมัติ
             # ไม่ต้องส่งข้อมูลแบบเก่าแล้ว เพราะ Smart Recovery หาเองจาก MT5
@@ -1259,6 +1492,7 @@ class TriangleArbitrageDetector:
         """ปิดกลุ่ม arbitrage พร้อมกันทั้งกลุ่ม"""
         try:
             if group_id not in self.active_groups:
+                self.trailing_engine.remove(group_id)
                 return
             
             group_data = self.active_groups[group_id]
@@ -1267,21 +1501,15 @@ class TriangleArbitrageDetector:
             triangle_type = group_data.get('triangle_type', 'unknown')
             triangle_magic = self.triangle_magic_numbers.get(triangle_type, 234000)
             
-            # ดึงข้อมูล positions จาก MT5 โดยใช้ magic number
-            all_positions = self.broker.get_all_positions()
-            positions_to_close = []
-            for pos in all_positions:
-                magic = pos.get('magic', 0)
-                if magic == triangle_magic:
-                    positions_to_close.append(pos)
+            # ดึงข้อมูล positions จาก MT5 โดยใช้ magic number (max_age=0 = อ่านสดก่อนปิดเสมอ)
+            snapshot = self.broker.get_positions_snapshot(max_age=0)
+            positions_to_close = list(snapshot.get_by_magic(triangle_magic))
             
             # 🆕 FINAL SAFETY CHECK: คำนวณ Net PnL อีกครั้งก่อนปิด! (Never Cut Loss!)
-            arbitrage_pnl = sum(pos.get('profit', 0) for pos in positions_to_close)
-            recovery_pnl = 0.0
-            if self.correlation_manager:
-                recovery_pnl = self._get_recovery_pnl_for_group(group_id)
-            
-            net_pnl = arbitrage_pnl + recovery_pnl
+            group_pnl = self._get_group_pnl(snapshot).get(group_id)
+            arbitrage_pnl = group_pnl.arbitrage_pnl
+            recovery_pnl = group_pnl.recovery_pnl
+            net_pnl = group_pnl.net_pnl
             
             self.logger.info(f"🔍 FINAL CHECK before closing Group {group_id}:")
             self.logger.info(f"   Arbitrage PnL: ${arbitrage_pnl:.2f}")
@@ -1295,11 +1523,8 @@ class TriangleArbitrageDetector:
                 self.logger.error(f"   Canceling Trailing Stop, waiting for recovery...")
                 
                 # ยกเลิก Trailing Stop (ให้เริ่มใหม่เมื่อกลับมาบวก)
-                if group_id in self.group_trailing_stops:
-                    self.group_trailing_stops[group_id]['active'] = False
-                    self.group_trailing_stops[group_id]['peak'] = 0.0
-                    self.group_trailing_stops[group_id]['stop'] = 0.0
-                    self.logger.warning(f"   🔄 Trailing Stop canceled for {group_id}")
+                self.trailing_engine.cancel(group_id)
+                self.logger.warning(f"   🔄 Trailing Stop canceled for {group_id}")
                 
                 return
             
@@ -1475,6 +1700,8 @@ class TriangleArbitrageDetector:
                 # ล้างข้อมูลการแก้ไม้สำหรับกลุ่มนี้
                 self.correlation_manager.clear_hedged_data_for_group(group_id)
             
+            self.trailing_engine.record_exit(group_id, total_pnl + correlation_pnl)
+            
             # Reset hedge tracker ก่อนลบข้อมูล
             if hasattr(self, 'correlation_manager') and self.correlation_manager:
                 # Reset ไม้ arbitrage ทั้งหมดใน group นี้
@@ -1529,51 +1756,36 @@ class TriangleArbitrageDetector:
             
         except Exception as e:
             self.logger.error(f"Error closing group {group_id}: {e}")
+            # ปิดไม่สำเร็จ - ล้างสถานะ closing ของ trailing เพื่อให้กลุ่มนี้ trail ต่อได้
+            self.trailing_engine.cancel(group_id)
     
-    def _get_recovery_pnl_for_group(self, group_id: str) -> float:
+    def _get_recovery_pnl_for_group(self, group_id: str, snapshot: PositionSnapshot = None) -> float:
         """ดึง PnL ของ recovery positions ที่เกี่ยวข้องกับกลุ่ม (ไม่ปิด) - using order_tracker"""
         try:
             if not self.correlation_manager:
                 return 0.0
             
-            total_recovery_pnl = 0.0
-            all_positions = self.broker.get_all_positions()
-            all_orders = self.correlation_manager.order_tracker.get_all_orders()
-            
-            # หา recovery orders ที่เกี่ยวข้องกับกลุ่มนี้
-            for order_key, order_data in all_orders.items():
-                if (order_data.get('type') == 'RECOVERY' and 
-                    order_data.get('group_id') == group_id):
-                    # หา PnL จาก MT5
-                    ticket = order_data.get('ticket')
-                    if ticket:
-                        for pos in all_positions:
-                            if str(pos.get('ticket')) == str(ticket):
-                                total_recovery_pnl += pos.get('profit', 0)
-                                break
-            
-            return total_recovery_pnl
+            return self._get_group_pnl(snapshot).get(group_id).recovery_pnl
             
         except Exception as e:
             self.logger.error(f"Error getting recovery PnL for group: {e}")
             return 0.0
     
+    def _get_group_pnl(self, snapshot: PositionSnapshot = None) -> GroupPnLTable:
+        """PnL ทุกกลุ่มจาก snapshot (recovery ผูกกับกลุ่มผ่าน order_tracker) - คำนวณครั้งเดียวต่อ snapshot"""
+        if snapshot is None:
+            snapshot = self.broker.get_positions_snapshot()
+        order_tracker = getattr(self.correlation_manager, 'order_tracker', None) if self.correlation_manager else None
+        return self.group_pnl.aggregate(snapshot, order_tracker)
+    
     def _get_magic_for_group(self, group_id: str) -> int:
         """Get magic number for a group_id"""
         try:
             # Extract triangle number from group_id (e.g., "group_triangle_1_1" -> "1")
-            if 'triangle_' in group_id:
-                triangle_part = group_id.split('triangle_')[1].split('_')[0]
-                magic_map = {
-                    '1': 234001,
-                    '2': 234002,
-                    '3': 234003,
-                    '4': 234004,
-                    '5': 234005,
-                    '6': 234006
-                }
-                return magic_map.get(triangle_part, 234000)
-            return 234000
+            triangle_number = triangle_number_from_name(group_id)
+            if triangle_number is not None and f"triangle_{triangle_number}" in self.triangle_specs:
+                return triangle_magic(triangle_number)
+            return TRIANGLE_MAGIC_BASE
         except Exception as e:
             self.logger.error(f"Error getting magic for group {group_id}: {e}")
             return 234000
@@ -1728,14 +1940,11 @@ class TriangleArbitrageDetector:
                 for group_id, group_data in list(self.active_groups.items()):
                     # ตรวจสอบว่า Group ยังเปิดอยู่จริงใน broker หรือไม่
                     valid_positions = 0
+                    snapshot = self.broker.get_positions_snapshot()
                     for position in group_data['positions']:
                         order_id = position.get('order_id')
-                        if order_id:
-                            all_positions = self.broker.get_all_positions()
-                            for pos in all_positions:
-                                if pos['ticket'] == order_id:
-                                    valid_positions += 1
-                                    break
+                        if order_id and snapshot.has_ticket(order_id):
+                            valid_positions += 1
                     
                     if valid_positions > 0:
                         # Group ยังเปิดอยู่จริง
@@ -1831,10 +2040,11 @@ class TriangleArbitrageDetector:
             real_pair2 = self.symbol_mapper.get_real_symbol(pair2)
             real_pair3 = self.symbol_mapper.get_real_symbol(pair3)
             
-            # Get current prices
-            price1 = self.broker.get_current_price(real_pair1)
-            price2 = self.broker.get_current_price(real_pair2)
-            price3 = self.broker.get_current_price(real_pair3)
+            # Get current prices (one tick snapshot for all legs)
+            ticks = self.broker.get_ticks([real_pair1, real_pair2, real_pair3])
+            price1 = ticks.get_bid(real_pair1)
+            price2 = ticks.get_bid(real_pair2)
+            price3 = ticks.get_bid(real_pair3)
             
             if price1 is None or price2 is None or price3 is None:
                 # Log missing prices for first few triangles to debug
@@ -2088,7 +2298,7 @@ class TriangleArbitrageDetector:
             if spread1 is None or spread2 is None or spread3 is None:
                 self.logger.info(f"⚠️ {triangle}: Some spreads unavailable, using bid/ask calculation")
                 # ถ้าไม่มีข้อมูล spread ให้อนุญาตผ่าน (ไม่บล็อก arbitrage)
-                # เพราะระบบจะคำนวณต้นทุนจาก Bid-Ask ใน _calculate_total_cost แทน
+                # เพราะ TriangleEngine คำนวณต้นทุนจาก Bid-Ask (และ spread floor จาก SpreadStats) แทน
                 return True
             
             # 🆕 ใช้ Strategy Preset เพื่อปรับ spread tolerance
@@ -2118,102 +2328,95 @@ class TriangleArbitrageDetector:
             self.logger.error(f"Error checking spread for {triangle}: {e}")
             return True  # Return True on error to not block trades
     
-    def calculate_arbitrage_direction(self, triangle: Tuple[str, str, str]) -> Optional[Dict]:
+    def calculate_arbitrage_direction(self, triangle: Tuple[str, str, str],
+                                      ticks: Optional[TickSnapshot] = None) -> Optional[Dict]:
         """
         ⭐ คำนวณทิศทางที่ถูกต้องสำหรับ Triangle Arbitrage
         
-        คำนวณ Forward Path (BUY-BUY-SELL) และ Reverse Path (BUY-SELL-SELL)
+        คำนวณ Forward Path และ Reverse Path (ทิศทางแต่ละ leg จากตาราง orientation ของ triangle)
         เลือกทางที่ให้กำไรสูงกว่าหลังหักต้นทุนทั้งหมด
         
+        🆕 ใช้ผลจาก TriangleEngine (คำนวณทุก triangle พร้อมกันครั้งเดียวต่อ tick snapshot)
+        
+        Args:
+            triangle: Symbols ของ triangle
+            ticks: Snapshot ที่ใช้ร่วมกันทั้งรอบ (default: อ่านจาก broker)
+        
         Returns:
-            Dict with keys: direction, profit_percent, orders, raw_profit
-            None if no profitable opportunity
+            Dict with keys: direction, profit_percent, orders, raw_profit, cost_percent, prices
+            None if prices are unavailable
         """
         try:
-            pair1, pair2, pair3 = triangle
-            
-            self.logger.info(f"🧮 {triangle}: Calculating arbitrage direction...")
-            
-            # 1. ดึงราคา Bid/Ask
-            bid1, ask1 = self._get_bid_ask(pair1)
-            bid2, ask2 = self._get_bid_ask(pair2)
-            bid3, ask3 = self._get_bid_ask(pair3)
-            
-            if not all([bid1, ask1, bid2, ask2, bid3, ask3]):
+            engine = self.triangle_engine
+            index = engine.index_of(triangle)
+            if index is None:
+                # Triangle นอกชุดที่ติดตาม - ประเมินด้วย engine ชั่วคราว
+                engine = self._build_triangle_engine([tuple(triangle)])
+                index = 0
+            
+            if ticks is None or not ticks.covers(engine.symbols):
+                ticks = self.broker.get_ticks(list(engine.symbols))
+            evaluation = engine.evaluate(ticks)
+            direction_info = engine.direction_info(index, evaluation=evaluation)
+            
+            if direction_info is None:
                 self.logger.info(f"❌ {triangle}: Cannot get bid/ask prices")
                 return None
             
-            self.logger.info(f"💱 {triangle}: Prices - {pair1}: {bid1:.5f}/{ask1:.5f}, {pair2}: {bid2:.5f}/{ask2:.5f}, {pair3}: {bid3:.5f}/{ask3:.5f}")
-            
-            # 2. คำนวณ Forward Path (BUY pair1, BUY pair2, SELL pair3)
-            # เริ่มด้วย 1 USD
-            forward_step1 = 1 / ask1          # ซื้อ pair1 ได้ base currency
-            forward_step2 = forward_step1 / ask2  # ซื้อ pair2 ได้ counter currency
-            forward_step3 = forward_step2 * bid3  # ขาย pair3 ได้ USD กลับมา
-            forward_result = forward_step3
-            forward_profit_percent = (forward_result - 1.0) * 100
-            
-            # 3. คำนวณ Reverse Path (BUY pair3, SELL pair2, SELL pair1)
-            reverse_step1 = 1 / ask3          # ซื้อ pair3
-            reverse_step2 = reverse_step1 * bid2  # ขาย pair2
-            reverse_step3 = reverse_step2 * bid1  # ขาย pair1 ได้ USD กลับมา
-            reverse_result = reverse_step3
-            reverse_profit_percent = (reverse_result - 1.0) * 100
-            
-            # 4. คำนวณต้นทุนรวม
-            total_cost_percent = self._calculate_total_cost(triangle, bid1, ask1, bid2, ask2, bid3, ask3)
-            
-            self.logger.info(f"🔄 {triangle}: Forward path = {forward_profit_percent:.4f}%, Reverse path = {reverse_profit_percent:.4f}%, Cost = {total_cost_percent:.4f}%")
-            
-            # 5. คำนวณกำไรสุทธิ
-            forward_net = forward_profit_percent - total_cost_percent
-            reverse_net = reverse_profit_percent - total_cost_percent
-            
-            # 6. เลือกทิศทางที่ดีกว่า (ไม่ตัดสินใจ threshold ที่นี่)
-            self.logger.info(f"📊 {triangle}: Net profits - Forward: {forward_net:.4f}%, Reverse: {reverse_net:.4f}%")
-            
-            if forward_net >= reverse_net:
-                self.logger.info(f"✅ {triangle}: FORWARD path selected - Net profit: {forward_net:.4f}%")
-                return {
-                    'direction': 'forward',
-                    'profit_percent': forward_net,
-                    'raw_profit': forward_profit_percent,
-                    'cost_percent': total_cost_percent,
-                    'orders': {
-                        pair1: 'BUY',
-                        pair2: 'BUY',
-                        pair3: 'SELL'
-                    }
-                }
-            else:
-                self.logger.info(f"✅ {triangle}: REVERSE path selected - Net profit: {reverse_net:.4f}%")
-                return {
-                    'direction': 'reverse',
-                    'profit_percent': reverse_net,
-                    'raw_profit': reverse_profit_percent,
-                    'cost_percent': total_cost_percent,
-                    'orders': {
-                        pair1: 'SELL',
-                        pair2: 'SELL',
-                        pair3: 'BUY'
-                    }
-                }
+            self.logger.debug(f"📊 {triangle}: {direction_info['direction'].upper()} - Net {direction_info['profit_percent']:.4f}% "
+                              f"(raw {direction_info['raw_profit']:.4f}%, cost {direction_info['cost_percent']:.4f}%)")
+            return direction_info
                 
         except Exception as e:
             self.logger.error(f"Error calculating arbitrage direction for {triangle}: {e}")
             return None
     
-    def _get_bid_ask(self, symbol: str) -> Tuple[Optional[float], Optional[float]]:
-        """ดึงราคา Bid และ Ask สำหรับ symbol"""
+    def get_ranked_opportunities(self, min_profit: float = None) -> np.ndarray:
+        """
+        🆕 ประเมินทุก triangle ในรอบเดียว (vectorized) แล้วคืน top-k ตามกำไรสุทธิ
+        (engine อัปเดต top-k เฉพาะ triangle ที่ re-score - ไม่ sort ทุก triangle ทุก tick)
+        
+        Returns:
+            Structured array (triangle, direction, profit_percent, raw_profit, cost_percent), best first,
+            at most arbitrage_params.triangles.rank_depth rows;
+            triangle คือ index ใน self.triangle_combinations (ลำดับเดียวกับ self.triangle_specs)
+        """
         try:
-            # ใช้ real symbol
-            real_symbol = self.symbol_mapper.get_real_symbol(symbol)
-            
-            # ใช้ MT5 ดึงราคา
-            tick = mt5.symbol_info_tick(real_symbol)
+            with self.metrics.timer('engine.rank_ms'):
+                ticks = self.broker.get_ticks(list(self.triangle_engine.symbols))
+                ranked = self.triangle_engine.top(ticks, min_profit)
+            self.metrics.counter('funnel.evaluated').inc(len(self.triangle_engine.triangles))
+            return ranked
+        except Exception as e:
+            self.logger.error(f"Error ranking opportunities: {e}")
+            return np.empty(0, dtype=OPPORTUNITY_DTYPE)
+    
+    def _build_triangle_engine(self, triangles: List[Tuple[str, ...]],
+                               forward_sides: List[Tuple[str, ...]] = None) -> TriangleEngine:
+        """สร้าง TriangleEngine พร้อมต้นทุน commission/slippage จาก config และ leg orientation จาก discovery"""
+        if forward_sides is None:
+            forward_sides = []
+            for triangle in triangles:
+                oriented = orient(triangle)
+                forward_sides.append(tuple('BUY' if flag else 'SELL' for flag in oriented[1])
+                                     if oriented else LEGACY_FORWARD_SIDES)
+        return TriangleEngine(
+            triangles,
+            forward_sides=forward_sides,
+            commission_rate=self._get_config_value('arbitrage_params.execution.commission_rate', 0.0001),
+            max_slippage=self._get_config_value('arbitrage_params.execution.max_slippage', 0.0005),
+            top_k=self._get_config_value('arbitrage_params.triangles.rank_depth', 16)
+        )
+    
+    def _get_bid_ask(self, symbol: str, ticks: Optional[TickSnapshot] = None) -> Tuple[Optional[float], Optional[float]]:
+        """ดึงราคา Bid และ Ask สำหรับ symbol (จาก tick snapshot ของ broker)"""
+        try:
+            if ticks is None or symbol not in ticks:
+                ticks = self.broker.get_ticks([symbol])
             
-            if tick:
-                return tick.bid, tick.ask
+            bid, ask = ticks.get_bid_ask(symbol)
+            if bid is not None:
+                return bid, ask
             
             # 🔮 Intelligent fallback: ใช้ราคาปัจจุบัน + estimated spread
             price = self.broker.get_current_price(symbol)
@@ -2239,89 +2442,84 @@ class TriangleArbitrageDetector:
             self.logger.error(f"Error getting bid/ask for {symbol}: {e}")
             return None, None
     
-    def _calculate_total_cost(self, triangle: Tuple[str, str, str], 
-                            bid1: float, ask1: float, 
-                            bid2: float, ask2: float, 
-                            bid3: float, ask3: float) -> float:
-        """
-        คำนวณต้นทุนรวมทั้งหมด (Spread + Commission + Slippage)
-        """
-        try:
-            # ตรวจสอบว่ามีข้อมูล Bid-Ask ครบถ้วนหรือไม่
-            if None in [bid1, ask1, bid2, ask2, bid3, ask3]:
-                self.logger.warning(f"Incomplete bid/ask data for {triangle}")
-                return 0.5  # Return default 0.5% if incomplete data
-            
-            # 1. Spread Cost (คำนวณจากความต่างระหว่าง Bid-Ask)
-            spread_cost_1 = (ask1 - bid1) / bid1 * 100
-            spread_cost_2 = (ask2 - bid2) / bid2 * 100
-            spread_cost_3 = (ask3 - bid3) / bid3 * 100
-            spread_cost_total = spread_cost_1 + spread_cost_2 + spread_cost_3
-            
-            # 2. Commission Cost (ดึงจาก config หรือใช้ค่า default)
-            commission_rate = self._get_config_value('arbitrage_params.execution.commission_rate', 0.0001)
-            commission_cost = commission_rate * 3 * 100  # 3 legs
-            
-            # 3. Slippage Cost (ดึงจาก config หรือใช้ค่า default)
-            slippage = self._get_config_value('arbitrage_params.execution.max_slippage', 0.0005)
-            slippage_cost = slippage * 3 * 100  # 3 legs
-            
-            # รวมต้นทุน
-            total_cost = spread_cost_total + commission_cost + slippage_cost
-            
-            self.logger.debug(f"Cost breakdown for {triangle}: Spread={spread_cost_total:.4f}%, Commission={commission_cost:.4f}%, Slippage={slippage_cost:.4f}%, Total={total_cost:.4f}%")
-            
-            return total_cost
-            
-        except Exception as e:
-            self.logger.error(f"Error calculating total cost: {e}")
-            return 0.5  # Return default 0.5% if error
-    
     # ==================================================================================
     # 🎯 INTELLIGENT SCORING SYSTEM (6 FACTORS)
     # ==================================================================================
     
-    def _calculate_opportunity_score(self, triangle: Tuple[str, str, str], direction_info: Dict) -> Optional[Dict]:
-        """🎯 คำนวณคะแนนโอกาส Arbitrage จาก 6 ปัจจัยหลัก (0-100 คะแนน)"""
+    def _calculate_opportunity_score(self, triangle: Tuple[str, str, str], direction_info: Dict,
+                                     threshold: float = None) -> Optional[Dict]:
+        """
+        🎯 คำนวณคะแนนโอกาส Arbitrage จาก 6 ปัจจัยหลัก (0-100 คะแนน)
+        
+        🆕 คำนวณทีละ stage จากปัจจัยที่ถูกไปแพง (SCORING_STAGES) และหยุดทันทีเมื่อ
+        คะแนนที่ได้ + คะแนนเต็มของ stage ที่เหลือยังไม่ถึง threshold
+        
+        Args:
+            triangle: Symbols ของ triangle
+            direction_info: ผลจาก calculate_arbitrage_direction
+            threshold: Adaptive threshold (None = คำนวณครบทุกปัจจัย)
+        
+        Returns:
+            Dict: total_score, factors (เฉพาะที่คำนวณแล้ว), complete, max_possible
+        """
         try:
             factors = {}
+            total_score = 0.0
+            remaining = sum(max_score for _, max_score in SCORING_STAGES)
+            
+            for name, max_score in SCORING_STAGES:
+                if threshold is not None and total_score + remaining < threshold:
+                    # ถึงได้คะแนนเต็มทุก stage ที่เหลือก็ไม่ผ่าน - ไม่ต้องคำนวณปัจจัยที่แพงกว่า
+                    with self._metrics_lock:
+                        self.scoring_stats['short_circuited'] += 1
+                        self.scoring_stats['skipped_' + name] += 1
+                    return {
+                        'total_score': total_score,
+                        'factors': factors,
+                        'complete': False,
+                        'max_possible': total_score + remaining
+                    }
+                
+                if name == 'profit':
+                    factors[name] = self._get_profit_score(direction_info)                          # 0-35
+                elif name == 'spread':
+                    factors[name] = self._get_spread_score(triangle)                                # 0-20
+                elif name == 'execution':
+                    factors[name] = self._get_execution_probability_score(triangle, direction_info) # 0-10
+                elif name == 'risk':
+                    factors[name] = self._get_risk_score(triangle, direction_info)                  # 0-5
+                elif name == 'time':
+                    factors[name] = self._get_time_pattern_score()                                  # 0-10
+                else:
+                    factors[name] = self._get_market_condition_score(triangle)                      # 0-20
+                
+                total_score += factors[name]['score']
+                remaining -= max_score
             
-            # Factor 1: Profit Score (0-35 คะแนน)
-            profit_data = self._get_profit_score(direction_info)
-            factors['profit'] = profit_data
-            
-            # Factor 2: Spread Score (0-20 คะแนน)
-            spread_data = self._get_spread_score(triangle)
-            factors['spread'] = spread_data
-            
-            # Factor 3: Market Condition Score (0-20 คะแนน)
-            market_data = self._get_market_condition_score(triangle)
-            factors['market'] = market_data
-            
-            # Factor 4: Time Pattern Score (0-10 คะแนน)
-            time_data = self._get_time_pattern_score()
-            factors['time'] = time_data
-            
-            # Factor 5: Execution Probability (0-10 คะแนน)
-            execution_data = self._get_execution_probability_score(triangle, direction_info)
-            factors['execution'] = execution_data
-            
-            # Factor 6: Risk Score (0-5 คะแนน)
-            risk_data = self._get_risk_score(triangle, direction_info)
-            factors['risk'] = risk_data
-            
-            # คำนวณคะแนนรวม
-            total_score = sum(f['score'] for f in factors.values())
+            with self._metrics_lock:
+                self.scoring_stats['complete'] += 1
             
             return {
                 'total_score': total_score,
-                'factors': factors
+                'factors': factors,
+                'complete': True,
+                'max_possible': total_score
             }
             
         except Exception as e:
             self.logger.error(f"Error calculating opportunity score: {e}")
             return None
     
+    def _memoized_factor(self, key, ttl: float, compute):
+        """🆕 คืนค่าที่คำนวณไว้ภายใน ttl วินาที (สำหรับปัจจัยที่เปลี่ยนช้า: regime, time pattern)"""
+        now = time.monotonic()
+        cached = self._factor_cache.get(key)
+        if cached is not None and cached[0] > now:
+            return cached[1]
+        value = compute()
+        self._factor_cache[key] = (now + ttl, value)
+        return value
+    
     def _get_profit_score(self, direction_info: Dict) -> Dict:
         """📈 คะแนนจากกำไรที่คาดหวัง (0-35 คะแนน) | 0.05%=35, 0.03%=21, 0.01%=7"""
         try:
@@ -2360,13 +2558,12 @@ class TriangleArbitrageDetector:
     def _get_spread_score(self, triangle: Tuple[str, str, str]) -> Dict:
         """📊 คะแนนจาก Spread (0-20 คะแนน) | <=2pips=20, 5pips=10, >=10pips=0"""
         try:
-            pair1, pair2, pair3 = triangle
-            
-            # 🔍 พยายามดึงข้อมูลจริงก่อน - ไม่ว่าจะเชื่อมต่อหรือไม่
+            # 🔍 ใช้ rolling spread จาก SpreadStats ก่อน (O(1) ไม่เรียก terminal) - ทุก leg (triangle หรือ cycle 4-5 legs)
             spreads = []
             real_data_count = 0
+            legs = len(triangle)
             
-            for pair in [pair1, pair2, pair3]:
+            for pair in triangle:
                 real_pair = self.symbol_mapper.get_real_symbol(pair)
                 
                 # ลองดึงข้อมูลจริงหลายวิธี
@@ -2382,19 +2579,13 @@ class TriangleArbitrageDetector:
                     spreads.append(estimated)
                     self.logger.debug(f"📊 {pair} ({real_pair}): Estimated spread {estimated:.2f} pips")
             
-            avg_spread = sum(spreads) / 3.0
+            avg_spread = sum(spreads) / legs
             
             # แสดงข้อมูลว่าได้ข้อมูลจริงกี่ตัว
             if real_data_count == 0:
-                self.logger.warning(f"⚠️ {triangle}: No real spread data - using all estimated spreads")
-            elif real_data_count < 3:
-                self.logger.info(f"📊 {triangle}: {real_data_count}/3 real spreads, {3-real_data_count} estimated")
-            else:
-                self.logger.info(f"✅ {triangle}: All 3 real spreads available")
-            
-            # บันทึก cache ถ้ามีข้อมูลใหม่
-            if real_data_count > 0:
-                self._save_spread_cache()
+                self.logger.debug(f"⚠️ {triangle}: No real spread data - using all estimated spreads")
+            elif real_data_count < legs:
+                self.logger.debug(f"📊 {triangle}: {real_data_count}/{legs} real spreads, {legs-real_data_count} estimated")
             
             if avg_spread <= 2.0:
                 score = 20.0
@@ -2415,12 +2606,7 @@ class TriangleArbitrageDetector:
     
     def _get_estimated_spreads(self, triangle: Tuple[str, str, str]) -> List[float]:
         """🔮 คำนวณ estimated spreads สำหรับ triangle ทั้งหมด"""
-        pair1, pair2, pair3 = triangle
-        return [
-            self._get_estimated_spread_for_pair(pair1),
-            self._get_estimated_spread_for_pair(pair2),
-            self._get_estimated_spread_for_pair(pair3)
-        ]
+        return [self._get_estimated_spread_for_pair(pair) for pair in triangle]
     
     def _get_estimated_spread_for_pair(self, pair: str) -> float:
         """🔮 คำนวณ estimated spread ตามประเภทคู่เงิน (ฉลาดกว่า fallback!)"""
@@ -2454,75 +2640,18 @@ class TriangleArbitrageDetector:
         # Default - spread ปานกลาง
         return 3.0
     
-    def _try_get_real_spread(self, base_symbol: str, real_symbol: str) -> Optional[float]:
-        """🔍 พยายามดึงข้อมูล spread จริงหลายวิธี"""
+    def _try_get_real_spread(self, base_symbol: str, real_symbol: str = None) -> Optional[float]:
+        """🔍 spread (pips) ที่คาดไว้ของ symbol - 🆕 จาก SpreadStats แล้วจึง tick snapshot ล่าสุด (ไม่เรียก terminal)"""
         try:
-            # วิธีที่ 0: ลองดึงจาก cache ก่อน
-            cached_spread = self._get_cached_spread(base_symbol)
-            if cached_spread is not None:
-                self.logger.debug(f"📋 {base_symbol}: Using cached spread {cached_spread:.2f} pips")
-                return cached_spread
-            
-            # วิธีที่ 1: ใช้ broker.get_spread()
-            spread = self.broker.get_spread(base_symbol)
+            # วิธีที่ 1: rolling statistics (ชั่วโมงนี้ของสัปดาห์ หรือ window ล่าสุด)
+            spread = self.spread_stats.expected_spread(base_symbol)
             if spread is not None and spread > 0:
-                # บันทึกลง cache
-                self._update_spread_cache(base_symbol, spread)
                 return spread
             
-            # วิธีที่ 2: ใช้ MT5 โดยตรง (ถ้ามี)
-            try:
-                import MetaTrader5 as mt5
-                if mt5.initialize():
-                    # 🔧 Force login ถ้ายังไม่ได้เชื่อมต่อ
-                    account_info = mt5.account_info()
-                    if account_info is None:
-                        self.logger.info("🔌 MT5 not connected - attempting login...")
-                        if mt5.login():
-                            account_info = mt5.account_info()
-                            if account_info:
-                                self.logger.info(f"✅ MT5 Connected - Account: {account_info.login}")
-                    
-                    # ลองดึงจาก real symbol
-                    tick = mt5.symbol_info_tick(real_symbol)
-                    if tick and tick.bid is not None and tick.ask is not None:
-                        spread_price = tick.ask - tick.bid
-                        
-                        # แปลงเป็น pips
-                        symbol_info = mt5.symbol_info(real_symbol)
-                        if symbol_info:
-                            digits = symbol_info.digits
-                            if digits == 5 or digits == 3:
-                                spread_pips = spread_price * 10000
-                            elif digits == 4 or digits == 2:
-                                spread_pips = spread_price * 10000
-                            else:
-                                spread_pips = spread_price * 10000
-                            
-                            if spread_pips > 0:
-                                # บันทึกลง cache
-                                self._update_spread_cache(base_symbol, spread_pips)
-                                self.logger.info(f"📊 Real spread from MT5: {base_symbol} = {spread_pips:.2f} pips")
-                                return spread_pips
-                    
-                    mt5.shutdown()
-            except ImportError:
-                pass  # MT5 ไม่พร้อมใช้งาน
-            
-            # วิธีที่ 3: คำนวณจาก bid/ask ที่มี
-            bid, ask = self._get_bid_ask(base_symbol)
+            # วิธีที่ 2: คำนวณจาก bid/ask ของ tick snapshot ที่ broker cache ไว้
+            bid, ask = self.broker.get_ticks([base_symbol]).get_bid_ask(base_symbol)
             if bid is not None and ask is not None and ask > bid:
-                spread_price = ask - bid
-                # แปลงเป็น pips
-                if 'JPY' in base_symbol:
-                    spread_pips = spread_price * 100
-                else:
-                    spread_pips = spread_price * 10000
-                
-                if spread_pips > 0:
-                    # บันทึกลง cache
-                    self._update_spread_cache(base_symbol, spread_pips)
-                    return spread_pips
+                return (ask - bid) / self._get_pip_size(base_symbol)
             
             return None
             
@@ -2530,62 +2659,32 @@ class TriangleArbitrageDetector:
             self.logger.debug(f"Error getting real spread for {base_symbol}: {e}")
             return None
     
-    def _load_spread_cache(self):
-        """📂 โหลดข้อมูล spread cache จากไฟล์"""
-        try:
-            import json
-            import os
-            
-            if os.path.exists(self.spread_cache_file):
-                with open(self.spread_cache_file, 'r', encoding='utf-8') as f:
-                    cache_data = json.load(f)
-                    self.spread_cache = cache_data.get('spreads', {})
-                    self.logger.info(f"📂 Loaded {len(self.spread_cache)} spread cache entries")
-            else:
-                self.logger.debug("No spread cache file found - starting with empty cache")
-                
-        except Exception as e:
-            self.logger.error(f"Error loading spread cache: {e}")
-            self.spread_cache = {}
+    def _get_pip_size(self, symbol: str) -> float:
+        """🆕 pip size จาก symbol registry (ไม่โหลด metadata ใหม่) หรือตามสกุลเงิน quote"""
+        registry = getattr(self.broker, 'symbol_registry', None)
+        meta = registry.get(symbol) if registry is not None else None
+        if meta is not None and meta.pip_size > 0:
+            return meta.pip_size
+        return 0.01 if 'JPY' in symbol.upper() else 0.0001
     
-    def _save_spread_cache(self):
-        """💾 บันทึกข้อมูล spread cache ลงไฟล์"""
+    def _refresh_spread_floors(self):
+        """🆕 spread ที่คาดไว้ (ชั่วโมงนี้ของสัปดาห์ / rolling) จาก SpreadStats → spread floor ต่อ leg ใน TriangleEngine"""
         try:
-            import json
-            import os
-            from datetime import datetime
-            
-            cache_data = {
-                "_comment": "Spread Cache - เก็บข้อมูล spread จริงจากโบรกเกอร์",
-                "_last_updated": datetime.now().isoformat(),
-                "_source": "Real broker data",
-                "spreads": self.spread_cache,
-                "metadata": {
-                    "broker": "MetaTrader5",
-                    "timeframe": "real-time",
-                    "accuracy": "high",
-                    "note": "ข้อมูลนี้จะถูกอัปเดตเมื่อดึงข้อมูลจริงได้"
-                }
-            }
-            
-            os.makedirs(os.path.dirname(self.spread_cache_file), exist_ok=True)
-            with open(self.spread_cache_file, 'w', encoding='utf-8') as f:
-                json.dump(cache_data, f, indent=2, ensure_ascii=False)
-                
-            self.logger.debug(f"💾 Saved spread cache with {len(self.spread_cache)} entries")
-            
+            floors = {}
+            for symbol in self.triangle_engine.symbols:
+                expected_pips = self.spread_stats.expected_spread(symbol)
+                if expected_pips is not None:
+                    floors[symbol] = expected_pips * self._get_pip_size(symbol)
+            self.triangle_engine.set_spread_floors(floors)
         except Exception as e:
-            self.logger.error(f"Error saving spread cache: {e}")
-    
-    def _update_spread_cache(self, symbol: str, spread: float):
-        """🔄 อัปเดต spread cache"""
-        if spread > 0:
-            self.spread_cache[symbol.upper()] = spread
-            self.logger.debug(f"🔄 Updated spread cache: {symbol} = {spread:.2f} pips")
+            self.logger.error(f"Error refreshing spread floors: {e}")
     
-    def _get_cached_spread(self, symbol: str) -> Optional[float]:
-        """📋 ดึงข้อมูล spread จาก cache"""
-        return self.spread_cache.get(symbol.upper())
+    def _configure_spread_stats(self):
+        """🆕 ช่วงเวลาเก็บตัวอย่าง / บันทึกไฟล์ของ SpreadStats จาก config"""
+        self.spread_stats.sample_interval = self._get_config_value('arbitrage_params.spread_stats.sample_interval_seconds', 1.0)
+        self.spread_stats.bucket_interval = self._get_config_value('arbitrage_params.spread_stats.bucket_interval_seconds', 30.0)
+        self.spread_stats.save_interval = self._get_config_value('arbitrage_params.spread_stats.save_interval_seconds', 60.0)
+        self.spread_stats.min_samples = int(self._get_config_value('arbitrage_params.spread_stats.min_bucket_samples', 10))
     
     def _get_market_condition_score(self, triangle: Tuple[str, str, str]) -> Dict:
         """🌍 คะแนนจากสภาพตลาด (0-20 คะแนน) | Ranging=20, Normal=15, Trending=10, Volatile=5"""
@@ -2594,17 +2693,12 @@ class TriangleArbitrageDetector:
             regime_scores = {'ranging': 20.0, 'normal': 15.0, 'trending': 10.0, 'volatile': 5.0}
             base_score = regime_scores.get(current_regime, 10.0)
             
-            volatility_adjustment = 0.0
-            try:
-                if hasattr(self, 'market_analyzer') and self.market_analyzer:
-                    market_conditions = self.market_analyzer.analyze_market_conditions(list(triangle))
-                    volatility = market_conditions.get('volatility_level', 0.001)
-                    if volatility < 0.0005:
-                        volatility_adjustment = 2.0
-                    elif volatility > 0.002:
-                        volatility_adjustment = -3.0
-            except Exception:
-                pass
+            # 🆕 analyze_market_conditions ดึง H1 history ของทุกคู่ - memoize ต่อ triangle
+            volatility_adjustment = self._memoized_factor(
+                ('volatility', tuple(triangle)),
+                self._get_config_value('arbitrage_params.scoring.regime_cache_seconds', 60.0),
+                lambda: self._get_volatility_adjustment(triangle)
+            )
             
             final_score = base_score + volatility_adjustment
             
@@ -2618,8 +2712,30 @@ class TriangleArbitrageDetector:
             self.logger.error(f"Error calculating market condition score: {e}")
             return {'score': 10.0, 'weight': 0.20, 'regime': 'UNKNOWN'}
     
+    def _get_volatility_adjustment(self, triangle: Tuple[str, str, str]) -> float:
+        """ปรับคะแนนตลาดตาม volatility ของ triangle (+2 ต่ำ, -3 สูง)"""
+        try:
+            if hasattr(self, 'market_analyzer') and self.market_analyzer:
+                market_conditions = self.market_analyzer.analyze_market_conditions(list(triangle))
+                volatility = market_conditions.get('volatility_level', 0.001)
+                if volatility < 0.0005:
+                    return 2.0
+                elif volatility > 0.002:
+                    return -3.0
+        except Exception:
+            pass
+        return 0.0
+    
     def _get_time_pattern_score(self) -> Dict:
-        """🕐 คะแนนจากเวลา (0-10 คะแนน) | LDN/NY=10, LDN=9, NY=9, Asian=6, Off=3"""
+        """🕐 คะแนนจากเวลา (0-10 คะแนน) | LDN/NY=10, LDN=9, NY=9, Asian=6, Off=3 (🆕 memoized)"""
+        return self._memoized_factor(
+            'time_pattern',
+            self._get_config_value('arbitrage_params.scoring.time_cache_seconds', 60.0),
+            self._compute_time_pattern_score
+        )
+    
+    def _compute_time_pattern_score(self) -> Dict:
+        """คำนวณคะแนนเวลาจาก session ปัจจุบัน"""
         try:
             current_time = datetime.now()
             hour_gmt = current_time.hour
@@ -2741,7 +2857,15 @@ class TriangleArbitrageDetector:
             return 70.0
     
     def _get_current_market_regime(self) -> str:
-        """📊 ดึง Market Regime ปัจจุบัน | volatile/trending/ranging/normal"""
+        """📊 ดึง Market Regime ปัจจุบัน | volatile/trending/ranging/normal (🆕 memoized)"""
+        return self._memoized_factor(
+            'market_regime',
+            self._get_config_value('arbitrage_params.scoring.regime_cache_seconds', 60.0),
+            self._compute_current_market_regime
+        )
+    
+    def _compute_current_market_regime(self) -> str:
+        """วิเคราะห์ regime จาก MarketAnalyzer หรือ volatility ของ EURUSD H1"""
         try:
             if hasattr(self, 'market_analyzer') and self.market_analyzer:
                 try:
@@ -2778,18 +2902,30 @@ class TriangleArbitrageDetector:
         try:
             if not direction_info:
                 self.logger.info(f"❌ {triangle}: No direction info provided")
+                self.metrics.counter('funnel.blocked_feasibility').inc()
                 return False
             
+            # 🆕 threshold ก่อน - ใช้ตัดการคำนวณปัจจัยที่แพงเมื่อไม่มีทางผ่าน
+            adaptive_threshold = self._get_adaptive_score_threshold()
+            
             # คำนวณคะแนนจาก 6 ปัจจัย
-            score_result = self._calculate_opportunity_score(triangle, direction_info)
+            with self.metrics.timer('pretrade.scoring_ms'):
+                score_result = self._calculate_opportunity_score(triangle, direction_info, adaptive_threshold)
             
             if not score_result:
                 self.logger.info(f"❌ {triangle}: Failed to calculate score")
+                self.metrics.counter('funnel.blocked_feasibility').inc()
                 return False
             
             total_score = score_result['total_score']
             factors = score_result['factors']
             
+            if not score_result['complete']:
+                self.logger.info(f"❌ DECISION: SKIP {triangle} (max possible {score_result['max_possible']:.1f} "
+                                 f"< {adaptive_threshold:.1f} after {', '.join(factors)})")
+                self._count_score_rejection(direction_info)
+                return False
+            
             # Log รายละเอียดคะแนน
             self.logger.info(f"")
             self.logger.info(f"{'='*60}")
@@ -2804,9 +2940,6 @@ class TriangleArbitrageDetector:
             self.logger.info(f"━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━")
             self.logger.info(f"📈 TOTAL SCORE:     {total_score:.1f} / 100")
             
-            # ใช้ adaptive threshold ตาม market regime
-            adaptive_threshold = self._get_adaptive_score_threshold()
-            
             strategy_preset = self._get_config_value('arbitrage_params.strategy_preset', 'balanced')
             self.logger.info(f"🎯 Threshold:       {adaptive_threshold:.1f} ({self._get_current_market_regime().upper()} market, {strategy_preset.upper()} preset)")
             self.logger.info(f"{'='*60}")
@@ -2817,31 +2950,47 @@ class TriangleArbitrageDetector:
                 self.logger.info(f"")
                 
                 # Track metrics
-                self.performance_metrics['passed_feasibility_check'] = self.performance_metrics.get('passed_feasibility_check', 0) + 1
+                with self._metrics_lock:
+                    self.performance_metrics['passed_feasibility_check'] = self.performance_metrics.get('passed_feasibility_check', 0) + 1
                 
                 return True
             else:
                 self.logger.info(f"❌ DECISION: SKIP ({total_score:.1f} < {adaptive_threshold:.1f})")
                 self.logger.info(f"")
+                self._count_score_rejection(direction_info)
                 return False
             
         except Exception as e:
+            self.metrics.counter('funnel.blocked_feasibility').inc()
             self.logger.error(f"Error in intelligent scoring: {e}")
             import traceback
             self.logger.error(traceback.format_exc())
             return False
     
+    def _count_score_rejection(self, direction_info: Dict):
+        """🆕 แยก funnel: ต้นทุนกินกำไรหมด (net <= 0) กับคะแนนไม่ถึง threshold"""
+        if direction_info.get('profit_percent', 0) <= 0:
+            self.metrics.counter('funnel.rejected_cost').inc()
+        else:
+            self.metrics.counter('funnel.rejected_score').inc()
+    
     def _verify_triangle_balance(self, triangle: Tuple[str, str, str], lot_sizes: Dict) -> bool:
         """
         ⭐ ตรวจสอบว่า lot sizes ที่คำนวณได้ทำให้ triangle สมดุลหรือไม่
         """
         try:
+            if len(triangle) != 3:
+                # 🆕 สูตรมูลค่าข้างล่างใช้ได้กับ 3 legs เท่านั้น
+                self.logger.debug(f"Balance check skipped for {len(triangle)}-leg cycle {triangle}")
+                return False
+            
             pair1, pair2, pair3 = triangle
             
-            # ดึงราคาปัจจุบัน
-            price1 = self.broker.get_current_price(pair1)
-            price2 = self.broker.get_current_price(pair2)
-            price3 = self.broker.get_current_price(pair3)
+            # ดึงราคาปัจจุบัน (tick snapshot เดียวสำหรับทั้ง 3 ขา)
+            ticks = self.broker.get_ticks([pair1, pair2, pair3])
+            price1 = ticks.get_bid(pair1)
+            price2 = ticks.get_bid(pair2)
+            price3 = ticks.get_bid(pair3)
             
             if not all([price1, price2, price3]):
                 self.logger.warning(f"Cannot get prices for balance check: {triangle}")
@@ -3120,14 +3269,8 @@ class TriangleArbitrageDetector:
             return False
     
     def _save_active_groups(self):
-        """บันทึกข้อมูล active groups ลงไฟล์ (รองรับการแยกกันของแต่ละสามเหลี่ยม)"""
+        """บันทึกข้อมูล active groups ทั้งหมดเป็น snapshot (compact journal) - การเปลี่ยนแปลงรายกลุ่มใช้ _save_group()"""
         try:
-            import json
-            import os
-            
-            # สร้างโฟลเดอร์ data ถ้าไม่มี
-            os.makedirs(os.path.dirname(self.persistence_file), exist_ok=True)
-            
             # เตรียมข้อมูลสำหรับบันทึก (รองรับการแยกกันของแต่ละสามเหลี่ยม)
             save_data = {
                 'active_groups': self.active_groups,
@@ -3141,29 +3284,94 @@ class TriangleArbitrageDetector:
                 'saved_at': datetime.now().isoformat()
             }
             
-            # บันทึกลงไฟล์
-            with open(self.persistence_file, 'w') as f:
-                json.dump(save_data, f, indent=2, default=str)
+            # บันทึกลงไฟล์ (atomic replace) แล้วเริ่ม journal ใหม่
+            self.group_journal.compact(save_data)
             
             self.logger.debug(f"💾 Saved {len(self.active_groups)} active groups to {self.persistence_file}")
             
         except Exception as e:
             self.logger.error(f"Error saving active groups: {e}")
     
+    def _save_group(self, group_id: str):
+        """🆕 บันทึกการเปลี่ยนแปลงของกลุ่มเดียวลง journal (ต้นทุนคงที่ ไม่ขึ้นกับจำนวนกลุ่ม)"""
+        try:
+            group_data = self.active_groups.get(group_id)
+            triangle_type = (group_data or {}).get('triangle_type')
+            if not triangle_type:
+                triangle_number = triangle_number_from_name(group_id)
+                triangle_type = f"triangle_{triangle_number}" if triangle_number is not None else None
+            
+            self.group_journal.append({
+                'op': 'put' if group_data is not None else 'delete',
+                'group_id': group_id,
+                'group': group_data,
+                'currency_pairs': self.group_currency_mapping.get(group_id),
+                'recovering': group_id in self.recovery_in_progress,
+                # state ระดับสามเหลี่ยมของกลุ่มนี้ (ขนาดคงที่)
+                'triangle': triangle_type,
+                'counter': self.group_counters.get(triangle_type),
+                'paused': self.is_arbitrage_paused.get(triangle_type),
+                'used_pairs': list(self.used_currency_pairs.get(triangle_type, ()))
+            })
+            
+            if self.group_journal.needs_compaction:
+                self._save_active_groups()
+                
+        except Exception as e:
+            self.logger.error(f"Error journaling group {group_id}: {e}")
+    
+    @staticmethod
+    def _apply_group_record(save_data: Dict, record: Dict):
+        """🆕 Replay journal record หนึ่งรายการลงข้อมูลที่โหลดจาก snapshot (รูปแบบเดียวกับ _save_active_groups)"""
+        group_id = record['group_id']
+        groups = save_data.setdefault('active_groups', {})
+        currency_mapping = save_data.setdefault('group_currency_mapping', {})
+        recovering = set(save_data.get('recovery_in_progress', []))
+        
+        if record.get('op') == 'put':
+            groups[group_id] = record['group']
+        else:
+            groups.pop(group_id, None)
+        
+        if record.get('currency_pairs') is not None:
+            currency_mapping[group_id] = record['currency_pairs']
+        else:
+            currency_mapping.pop(group_id, None)
+        
+        if record.get('recovering'):
+            recovering.add(group_id)
+        else:
+            recovering.discard(group_id)
+        save_data['recovery_in_progress'] = sorted(recovering)
+        
+        triangle_type = record.get('triangle')
+        if triangle_type:
+            if record.get('counter') is not None:
+                save_data.setdefault('group_counters', {})[triangle_type] = record['counter']
+            if record.get('paused') is not None:
+                save_data.setdefault('is_arbitrage_paused', {})[triangle_type] = record['paused']
+            if not isinstance(save_data.get('used_currency_pairs'), dict):
+                save_data['used_currency_pairs'] = {}
+            save_data['used_currency_pairs'][triangle_type] = record.get('used_pairs', [])
+    
+    def _configure_group_journal(self):
+        """🆕 ค่า fsync batching / compaction ของ journal จาก config"""
+        self.group_journal.configure(
+            fsync_mode=self._get_config_value('arbitrage_params.persistence.fsync_mode', 'batch'),
+            fsync_interval=self._get_config_value('arbitrage_params.persistence.fsync_interval_ms', 200) / 1000.0,
+            fsync_batch=int(self._get_config_value('arbitrage_params.persistence.fsync_batch_size', 32)),
+            compact_every=int(self._get_config_value('arbitrage_params.persistence.compact_every', 500))
+        )
+    
     def _load_active_groups(self):
         """โหลดข้อมูล active groups จากไฟล์ (รองรับการแยกกันของแต่ละสามเหลี่ยม)"""
         try:
-            import json
-            import os
-            from datetime import datetime
-            
-            if not os.path.exists(self.persistence_file):
+            # 🆕 snapshot + replay journal ที่บันทึกหลัง snapshot
+            save_data = self.group_journal.load(self._apply_group_record)
+            if save_data is None:
                 self.logger.debug("No persistence file found, starting fresh")
                 return
             
-            with open(self.persistence_file, 'r') as f:
-                save_data = json.load(f)
-            
             # โหลดข้อมูลกลับมา (รองรับการแยกกันของแต่ละสามเหลี่ยม)
             self.active_groups = save_data.get('active_groups', {})
             self.recovery_in_progress = set(save_data.get('recovery_in_progress', []))
@@ -3182,6 +3390,12 @@ class TriangleArbitrageDetector:
                 self.used_currency_pairs = {f"triangle_{i}": set(used_currency_pairs_data) for i in range(1, 7)}
             
             self.group_currency_mapping = save_data.get('group_currency_mapping', {})
+            
+            # 🆕 triangle ที่เพิ่งถูก discover ยังไม่มีในไฟล์ - เติมค่าเริ่มต้น
+            for triangle_name in getattr(self, 'triangle_specs', {}):
+                self.group_counters.setdefault(triangle_name, 0)
+                self.is_arbitrage_paused.setdefault(triangle_name, False)
+                self.used_currency_pairs.setdefault(triangle_name, set())
             # self.arbitrage_sent = save_data.get('arbitrage_sent', False)  # ไม่ใช้แล้ว - ระบบเก่า
             
             # แปลง arbitrage_send_time กลับเป็น datetime (ไม่ใช้แล้ว - ระบบเก่า)
@@ -3216,7 +3430,7 @@ class TriangleArbitrageDetector:
         """อัปเดตข้อมูลกลุ่มและบันทึกลงไฟล์"""
         try:
             self.active_groups[group_id] = group_data
-            self._save_active_groups()
+            self._save_group(group_id)
         except Exception as e:
             self.logger.error(f"Error updating group data: {e}")
     
@@ -3226,13 +3440,15 @@ class TriangleArbitrageDetector:
             if group_id in self.active_groups:
                 del self.active_groups[group_id]
             self.recovery_in_progress.discard(group_id)
-            self._save_active_groups()
+            self._save_group(group_id)
         except Exception as e:
             self.logger.error(f"Error removing group data: {e}")
     
     def _reset_group_data_after_close(self, group_id: str):
         """Reset ข้อมูลหลังจากปิด Group เพื่อให้สามารถส่งไม้ใหม่ได้"""
         try:
+            self.trailing_engine.remove(group_id)
+            
             # ดึงข้อมูล triangle_type จาก group_id
             triangle_type = None
             for gid, gdata in list(self.active_groups.items()):
@@ -3304,42 +3520,14 @@ class TriangleArbitrageDetector:
             # Get basic group data
             group_data = self.active_groups.get(group_id, {})
             
-            # Calculate Arbitrage PnL
-            arbitrage_pnl = 0.0
             arbitrage_count = len(group_data.get('positions', []))
             
-            triangle_type = group_data.get('triangle_type', 'unknown')
-            triangle_magic = self.triangle_magic_numbers.get(triangle_type, 234000)
-            
-            all_positions = self.broker.get_all_positions()
-            for pos in all_positions:
-                if pos.get('magic') == triangle_magic:
-                    arbitrage_pnl += pos.get('profit', 0)
-            
-            # Calculate Recovery PnL
-            recovery_pnl = 0.0
-            recovery_count = 0
-            if self.correlation_manager:
-                recovery_pnl = self._get_recovery_pnl_for_group(group_id)
-                
-                # Count recovery orders
-                all_orders = self.correlation_manager.order_tracker.get_all_orders()
-                for order_key, order_data in all_orders.items():
-                    if order_data.get('type') == 'RECOVERY':
-                        # Check if this recovery belongs to this group
-                        hedging_for = order_data.get('hedging_for', '')
-                        if hedging_for:
-                            # Extract original ticket
-                            original_ticket = hedging_for.split('_')[0] if '_' in hedging_for else None
-                            if original_ticket:
-                                # Check if original ticket belongs to this group
-                                for pos in all_positions:
-                                    if str(pos.get('ticket')) == str(original_ticket) and pos.get('magic') == triangle_magic:
-                                        recovery_count += 1
-                                        break
-            
-            # Calculate Net PnL
-            net_pnl = arbitrage_pnl + recovery_pnl
+            # Arbitrage / Recovery / Net PnL จาก mark-to-market ของ tick ล่าสุด (ถ้ายังไม่ได้ mark ใช้ group PnL table)
+            group_pnl = self.mark_to_market.get_group_pnl(group_id) or self._get_group_pnl().get(group_id)
+            arbitrage_pnl = group_pnl.arbitrage_pnl
+            recovery_pnl = group_pnl.recovery_pnl
+            recovery_count = group_pnl.recovery_legs
+            net_pnl = group_pnl.net_pnl
             
             # Calculate Min Profit Target (scaled with balance)
             balance = self.broker.get_account_balance()
@@ -3354,11 +3542,10 @@ class TriangleArbitrageDetector:
             trailing_peak = 0.0
             trailing_stop = 0.0
             
-            if group_id in self.group_trailing_stops:
-                trailing_data = self.group_trailing_stops[group_id]
-                trailing_active = trailing_data.get('active', False)
-                trailing_peak = trailing_data.get('peak', 0.0)
-                trailing_stop = trailing_data.get('stop', 0.0)
+            trailing_data = self.trailing_engine.get_state(group_id)
+            trailing_active = trailing_data['active']
+            trailing_peak = trailing_data['peak']
+            trailing_stop = trailing_data['stop']
             
             # Return enhanced data
             return {
@@ -3400,26 +3587,23 @@ class TriangleArbitrageDetector:
     def _load_trailing_stop_config(self):
         """โหลด Trailing Stop Config จาก adaptive_params.json"""
         try:
-            import json
-            import os
-            
-            try:
-                import json
-                with open('config/adaptive_params.json', 'r', encoding='utf-8') as f:
-                    config = json.load(f)
-            except Exception:
-                config_path = 'config/adaptive_params.json'
-                if os.path.exists(config_path):
-                    with open(config_path, 'r', encoding='utf-8') as f:
-                        config = json.load(f)
-                else:
-                    config = {}
+            config = self.config_snapshot.section(ADAPTIVE_PARAMS)
             
             # Load arbitrage params
             arb_params = config.get('arbitrage_params', {})
             detection = arb_params.get('detection', {})
             closing = arb_params.get('closing', {})
             triangles = arb_params.get('triangles', {})
+            execution = arb_params.get('execution', {})
+            
+            # 🆕 Load Triangle Execution Settings
+            self.leg_dispatch_mode = execution.get('leg_dispatch_mode', 'concurrent')
+            self.leg_order = execution.get('leg_order', 'as_evaluated')
+            self.pretrade_workers = max(1, int(execution.get('pretrade_workers', 4)))
+            
+            # 🆕 Tick-driven loop: ตื่นเมื่อมี tick ใหม่ + heartbeat สำหรับงาน housekeeping
+            self.loop_heartbeat_seconds = execution.get('loop_heartbeat_seconds', 1.0)
+            self.tick_poll_interval = execution.get('tick_poll_interval_seconds', 0.05)
             
             # ⭐ Load Trailing Stop Settings
             self.trailing_stop_enabled = closing.get('trailing_stop_enabled', True)
@@ -3427,6 +3611,7 @@ class TriangleArbitrageDetector:
             self.min_profit_base = closing.get('min_profit_base', 10.0)
             self.min_profit_base_balance = closing.get('min_profit_base_balance', 10000.0)
             self.lock_profit_percentage = closing.get('lock_profit_percentage', 0.5)
+            self.tick_trailing_enabled = closing.get('tick_trailing_enabled', True)
             
             # ⭐ Load Arbitrage Detection Settings
             self.min_arbitrage_threshold = detection.get('min_threshold', 0.0001)
@@ -3443,9 +3628,13 @@ class TriangleArbitrageDetector:
                 self.logger.info(f"   Distance: ${self.trailing_stop_distance}")
                 self.logger.info(f"   Min Profit: ${self.min_profit_base} @ ${self.min_profit_base_balance}")
                 self.logger.info(f"   Lock Profit: {self.lock_profit_percentage*100:.0f}% of Peak")
+                self.logger.info(f"   Evaluated: {'every tick' if self.tick_trailing_enabled else 'trading loop only'}")
             self.logger.info(f"⚡ Min Threshold: {self.min_arbitrage_threshold}")
             self.logger.info(f"📊 Spread Tolerance: {self.spread_tolerance} pips")
             self.logger.info(f"🔺 Max Active Triangles: {self.max_active_triangles_config}")
+            self.logger.info(f"🚀 Leg Dispatch: {self.leg_dispatch_mode} ({self.leg_order})")
+            self.logger.info(f"⏱️ Loop: tick-driven (poll {self.tick_poll_interval * 1000:.0f} ms, "
+                             f"heartbeat {self.loop_heartbeat_seconds}s)")
             self.logger.info("=" * 60)
             
         except Exception as e:
@@ -3456,18 +3645,48 @@ class TriangleArbitrageDetector:
             self.min_profit_base = 10.0
             self.min_profit_base_balance = 10000.0
             self.lock_profit_percentage = 0.5
+            self.tick_trailing_enabled = True
             self.min_arbitrage_threshold = 0.0001
             self.spread_tolerance = 0.5
             self.max_active_triangles_config = 4
+            self.leg_dispatch_mode = 'concurrent'
+            self.leg_order = 'as_evaluated'
+            self.pretrade_workers = 4
+            self.loop_heartbeat_seconds = 1.0
+            self.tick_poll_interval = 0.05
     
     def reload_config(self):
-        """โหลดการตั้งค่าใหม่จาก config file (Hot Reload!)"""
+        """โหลดการตั้งค่าใหม่จาก config file (Hot Reload!) - 🆕 ConfigService เรียก _apply_config ถ้าไฟล์เปลี่ยน"""
+        try:
+            self.config_service.refresh()
+            return True
+        except Exception as e:
+            self.logger.error(f"❌ Error reloading arbitrage config: {e}")
+            return False
+    
+    def _apply_config(self, snapshot: ConfigSnapshot):
+        """🆕 ใช้ config snapshot ใหม่ (เรียกโดย ConfigService หลังสลับ snapshot)"""
         try:
             self.logger.info("🔄 Reloading arbitrage config from adaptive_params.json...")
+            self.config_snapshot = snapshot
             self._load_trailing_stop_config()
+            self.triangle_executor.dispatch_mode = self.leg_dispatch_mode
+            self.triangle_executor.leg_order = self.leg_order
+            self.tick_watcher.poll_interval = self.tick_poll_interval
+            self._configure_trailing_engine()
+            self._configure_group_journal()
+            self._configure_spread_stats()
+            self._configure_mark_to_market()
+            self._configure_metrics_exporter()
+            if self.is_running and self.tick_trailing_enabled:
+                self.trailing_engine.start()
+            elif not self.tick_trailing_enabled:
+                self.trailing_engine.stop()
+            self.triangle_engine.top_k = max(1, int(self._get_config_value('arbitrage_params.triangles.rank_depth', 16)))
+            self.triangle_engine.set_costs(
+                self._get_config_value('arbitrage_params.execution.commission_rate', 0.0001),
+                self._get_config_value('arbitrage_params.execution.max_slippage', 0.0005)
+            )
             self.logger.info("✅ Arbitrage config reloaded!")
-            return True
-                
         except Exception as e:
             self.logger.error(f"❌ Error reloading arbitrage config: {e}")
-            return False
@@ -26,12 +26,14 @@ except ImportError:
 import pandas as pd
 import numpy as np
 from datetime import datetime, timedelta
+from types import SimpleNamespace
 import logging
 from typing import Dict, List, Optional, Tuple
 import json
 import os
 import time
 import sys
+import threading
 
 # Import SymbolMapper
 try:
@@ -43,6 +45,17 @@ except ImportError:
     SymbolMapper = None
     print("⚠️ SymbolMapper not available - using direct symbol names")
 
+from trading.position_snapshot import PositionSnapshot
+from trading.tick_snapshot import TickSnapshot
+from trading.symbol_registry import SymbolMetadata, SymbolRegistry
+from trading.rate_table import USD_MAJORS, RateTable, RateTableCache
+from trading.account_state import AccountState, AccountStateCache
+from trading.mt5_gateway import (MT5Gateway, PRIORITY_ORDER, PRIORITY_TICKS,
+                                 PRIORITY_POSITIONS, PRIORITY_HISTORY)
+from trading.mt5_bridge import MT5ProcessBridge, MT5OrderOutcomeUnknown
+from trading.tick_recorder import TickRecorder, DEFAULT_TICK_DIRECTORY
+from trading.execution_stats import ExecutionStats, ACTION_OPEN, ACTION_CLOSE
+
 class BrokerAPI:
     def __init__(self, broker_type: str = "MetaTrader5", config_file: str = "config/broker_config.json"):
         self.broker_type = broker_type
@@ -51,6 +64,74 @@ class BrokerAPI:
         self._connected = False
         self.account_info = None
         
+        # 🆕 MT5 backend: module ในโปรเซสนี้ หรือ worker process แยก (bridge) ที่ restart ได้เมื่อค้าง
+        bridge_config = self.config.get('bridge', {})
+        self.use_process_bridge = bool(bridge_config.get('enabled', False))
+        if self.use_process_bridge:
+            self.mt5 = MT5ProcessBridge(
+                call_timeout=float(bridge_config.get('call_timeout_seconds', 30.0)),
+                on_restart=self._on_bridge_restart
+            )
+            self.logger.info("🔀 MT5 calls will run in a separate bridge process")
+        else:
+            self.mt5 = mt5 if MT5_AVAILABLE else None
+        # 🆕 order_send ที่ค้างจน bridge restart - ตรวจ positions หา order ที่อาจเข้าไปแล้ว
+        self.order_reconcile_attempts = int(bridge_config.get('order_reconcile_attempts', 5))
+        self.order_reconcile_delay = float(bridge_config.get('order_reconcile_delay_seconds', 0.5))
+        
+        # 🆕 MT5 gateway - thread เดียวเป็นเจ้าของทุก mt5.* call (order > ticks > positions > history)
+        gateway_config = self.config.get('gateway', {})
+        self.gateway = MT5Gateway(
+            enabled=(MT5_AVAILABLE or self.use_process_bridge) and gateway_config.get('enabled', True),
+            call_timeout=float(gateway_config.get('call_timeout_seconds', 30.0))
+        )
+        
+        # 🆕 Per-cycle position snapshot (one positions_get() shared by all components)
+        cache_config = self.config.get('cache', {})
+        self.position_snapshot_max_age = float(cache_config.get('position_snapshot_max_age_seconds', 0.5))
+        self._position_snapshot: Optional[PositionSnapshot] = None
+        self._position_snapshot_lock = threading.Lock()         # one positions_get() at a time
+        self._position_state_lock = threading.Lock()            # _position_snapshot / _position_generation
+        self._position_generation = 0                           # bumped by every invalidation
+        
+        # 🆕 Batched tick snapshot (bid/ask/time_msc ของทุก symbol ในรอบเดียว)
+        self.tick_snapshot_max_age = float(cache_config.get('tick_snapshot_max_age_seconds', 0.1))
+        self._tick_symbols: Dict[str, str] = {}  # requested name -> real symbol
+        self._tick_snapshot: Optional[TickSnapshot] = None
+        self._tick_snapshot_lock = threading.Lock()
+        
+        # 🆕 Tick recorder - บันทึก bid/ask/time_msc ทุก tick ของ symbol ที่เทรดลงไฟล์ binary (เขียนใน thread แยก)
+        recorder_config = self.config.get('recorder', {})
+        self.tick_recorder: Optional[TickRecorder] = None
+        if recorder_config.get('enabled', False):
+            self.tick_recorder = TickRecorder(
+                directory=recorder_config.get('directory', DEFAULT_TICK_DIRECTORY),
+                flush_interval=float(recorder_config.get('flush_interval_seconds', 1.0)),
+                chunk_rows=int(recorder_config.get('chunk_rows', 65536)),
+                max_queue=int(recorder_config.get('max_queue', 10000)),
+                retention_days=int(recorder_config.get('retention_days', 7))
+            )
+        
+        # 🆕 Execution stats - latency (p50/p95/p99) และ slippage ของทุก order/close ต่อ symbol
+        execution_config = self.config.get('execution_stats', {})
+        self.execution_stats = ExecutionStats(
+            file_path=execution_config.get('file', 'data/execution_stats.json'),
+            window=int(execution_config.get('window', 500)),
+            save_interval=float(execution_config.get('save_interval_seconds', 60.0))
+        )
+        
+        # 🆕 Static symbol metadata (contract size, digits, volume step, filling modes) - โหลดครั้งเดียวตอน connect
+        self.symbol_registry = SymbolRegistry()
+        
+        # 🆕 Cross rates + pip value ต่อ lot ของทุก symbol - สร้างครั้งเดียวต่อ tick snapshot
+        self.rate_tables = RateTableCache(self.symbol_registry.get)
+        
+        # 🆕 Account state cache (balance/equity/margin) - caller พร้อมกันใช้ refresh เดียวกัน
+        self.account_cache = AccountStateCache(
+            self._fetch_account_state,
+            max_age=float(cache_config.get('account_state_max_age_seconds', 1.0))
+        )
+        
         # 🆕 Initialize SymbolMapper
         self.symbol_mapper = SymbolMapper() if SymbolMapper else None
         if self.symbol_mapper:
@@ -71,11 +152,7 @@ class BrokerAPI:
         """Connect to broker with auto-detection"""
         try:
             if self.broker_type == "MetaTrader5":
-                # Try auto-connect first
-                if self._auto_connect_mt5():
-                    return True
-                # Fallback to manual connection
-                return self._connect_mt5(login, password, server)
+                return self.gateway.call(PRIORITY_ORDER, self._connect_mt5_session, login, password, server)
             elif self.broker_type == "OANDA":
                 return self._connect_oanda(login, password, server)
             elif self.broker_type == "FXCM":
@@ -88,16 +165,32 @@ class BrokerAPI:
             self.logger.error(f"Error connecting to broker: {e}")
             return False
     
+    def _on_bridge_restart(self):
+        """Bridge worker was replaced - force a reconnect on the next call"""
+        self.logger.warning("⚠️ MT5 bridge restarted - marking broker disconnected, will reconnect on next request")
+        self._connected = False
+        self.invalidate_positions_snapshot()
+        self.invalidate_account_state()
+        self._tick_snapshot = None
+    
+    def _connect_mt5_session(self, login: int = None, password: str = None, server: str = None) -> bool:
+        """Connect and load symbol metadata (runs on the gateway thread)"""
+        # Try auto-connect first, fallback to manual connection
+        connected = self._auto_connect_mt5() or self._connect_mt5(login, password, server)
+        if connected:
+            self.refresh_symbol_metadata()
+        return connected
+    
     def _auto_connect_mt5(self) -> bool:
         """Auto-connect to MT5 using existing terminal connection"""
         try:
             # Initialize MT5
-            if not mt5.initialize():
+            if not self.mt5.initialize():
                 self.logger.error("MT5 initialization failed")
                 return False
             
             # Check if already connected
-            account_info = mt5.account_info()
+            account_info = self.mt5.account_info()
             if account_info is not None:
                 self.logger.info("✅ MT5 already connected - using existing connection")
                 self.account_info = account_info
@@ -112,8 +205,8 @@ class BrokerAPI:
             
             # Try to connect using terminal's connection
             self.logger.info("🔌 Attempting to connect using MT5 terminal connection...")
-            if mt5.login():
-                account_info = mt5.account_info()
+            if self.mt5.login():
+                account_info = self.mt5.account_info()
                 if account_info is not None:
                     self.account_info = account_info
                     self._connected = True
@@ -157,8 +250,8 @@ class BrokerAPI:
                 return False
             
             # Attempt to login
-            if mt5.login(login, password=password, server=server, timeout=timeout):
-                account_info = mt5.account_info()
+            if self.mt5.login(login, password=password, server=server, timeout=timeout):
+                account_info = self.mt5.account_info()
                 if account_info:
                     self.account_info = account_info
                     self._connected = True
@@ -169,7 +262,7 @@ class BrokerAPI:
                     self.logger.error("Login successful but no account info received")
                     return False
             else:
-                error_code = mt5.last_error()
+                error_code = self.mt5.last_error()
                 self.logger.error(f"MT5 login failed with error code: {error_code}")
                 return False
                 
@@ -180,11 +273,11 @@ class BrokerAPI:
     def auto_detect_mt5_config(self) -> bool:
         """Auto-detect MT5 configuration and update config file"""
         try:
-            if not mt5.initialize():
+            if not self.mt5.initialize():
                 self.logger.error("MT5 initialization failed")
                 return False
             
-            account_info = mt5.account_info()
+            account_info = self.mt5.account_info()
             if account_info is None:
                 self.logger.warning("No MT5 account info available for auto-detection")
                 return False
@@ -226,12 +319,12 @@ class BrokerAPI:
         """Connect to MetaTrader5 with auto-detection"""
         try:
             # Initialize MT5
-            if not mt5.initialize():
+            if not self.mt5.initialize():
                 self.logger.error("MT5 initialization failed")
                 return False
             
             # Try to get account info first (if already logged in)
-            account_info = mt5.account_info()
+            account_info = self.mt5.account_info()
             if account_info is not None:
                 self.logger.info("MT5 already connected - using existing connection")
                 self.account_info = account_info
@@ -250,8 +343,8 @@ class BrokerAPI:
             if login == 0 or not password or not server:
                 self.logger.info("No credentials provided - attempting to use MT5 terminal connection")
                 # Try to connect without explicit login (use terminal's connection)
-                if mt5.login():
-                    account_info = mt5.account_info()
+                if self.mt5.login():
+                    account_info = self.mt5.account_info()
                     if account_info is not None:
                         self.account_info = account_info
                         self._connected = True
@@ -261,12 +354,12 @@ class BrokerAPI:
             
             # If explicit login is needed
             if login and password and server:
-                if not mt5.login(login, password=password, server=server):
-                    self.logger.error(f"MT5 login failed: {mt5.last_error()}")
+                if not self.mt5.login(login, password=password, server=server):
+                    self.logger.error(f"MT5 login failed: {self.mt5.last_error()}")
                     return False
                 
                 # Get account info
-                self.account_info = mt5.account_info()
+                self.account_info = self.mt5.account_info()
                 if self.account_info is None:
                     self.logger.error("Failed to get account info")
                     return False
@@ -309,35 +402,44 @@ class BrokerAPI:
         """Disconnect from broker"""
         try:
             if self.broker_type == "MetaTrader5":
-                mt5.shutdown()
+                self.gateway.call(PRIORITY_ORDER, self.mt5.shutdown)
+                self.gateway.stop()
+                if self.use_process_bridge:
+                    self.mt5.stop()
+            
+            if self.tick_recorder is not None:
+                self.tick_recorder.stop()
+            self.execution_stats.save()
             
             self._connected = False
             self.account_info = None
+            self.invalidate_positions_snapshot()
+            self.invalidate_account_state()
+            self._tick_snapshot = None
             self.logger.info("Disconnected from broker")
             
         except Exception as e:
             self.logger.error(f"Error disconnecting: {e}")
     
+    def get_gateway_stats(self) -> Dict:
+        """Queue depth, wait and service time per gateway priority"""
+        return self.gateway.get_stats()
+    
+    def get_tick_recorder_stats(self) -> Optional[Dict]:
+        """Ticks written, dropped snapshots and queue depth of the tick recorder (None if disabled)"""
+        if self.tick_recorder is None:
+            return None
+        return self.tick_recorder.get_stats()
+    
     def get_account_info(self) -> Optional[Dict]:
         """Get account information"""
         try:
             if not self._connected:
                 return None
             
-            if self.broker_type == "MetaTrader5":
-                account = mt5.account_info()
-                if account:
-                    return {
-                        'login': account.login,
-                        'balance': account.balance,
-                        'equity': account.equity,
-                        'margin': account.margin,
-                        'free_margin': account.margin_free,
-                        'margin_level': account.margin_level,
-                        'currency': account.currency,
-                        'leverage': account.leverage,
-                        'server': account.server
-                    }
+            state = self.get_account_state()
+            if state:
+                return state.to_dict()
             
             return None
             
@@ -345,6 +447,24 @@ class BrokerAPI:
             self.logger.error(f"Error getting account info: {e}")
             return None
     
+    def get_account_state(self, max_age: float = None) -> Optional[AccountState]:
+        """Get cached account state (balance, equity, margin, free margin, margin level)"""
+        if not self._connected:
+            return None
+        return self.account_cache.get(max_age)
+    
+    def invalidate_account_state(self):
+        """Drop cached account values so the next read hits the terminal"""
+        self.account_cache.invalidate()
+    
+    def _fetch_account_state(self) -> Optional[AccountState]:
+        """Read account values from the broker"""
+        if self.broker_type == "MetaTrader5":
+            account = self.gateway.call(PRIORITY_POSITIONS, self.mt5.account_info, coalesce_key=('account_info',))
+            if account:
+                return AccountState.from_mt5(account)
+        return None
+    
     def get_available_pairs(self) -> List[str]:
         """Get list of available trading pairs"""
         try:
@@ -353,7 +473,7 @@ class BrokerAPI:
                 return self._get_fallback_pairs()
             
             if self.broker_type == "MetaTrader5":
-                symbols = mt5.symbols_get()
+                symbols = self.gateway.call(PRIORITY_HISTORY, self.mt5.symbols_get, coalesce_key=('symbols_get',))
                 if symbols:
                     pairs = [symbol.name for symbol in symbols]
                     self.logger.info(f"✅ Retrieved {len(pairs)} pairs from MT5")
@@ -381,6 +501,70 @@ class BrokerAPI:
         ]
         return fallback_pairs
     
+    def refresh_symbol_metadata(self, symbols: List[str] = None) -> int:
+        """
+        (Re)load static symbol metadata into the registry.
+        
+        Selects each symbol in Market Watch and reads symbol_info once. Defaults to all
+        symbols known to the SymbolMapper (or the fallback pairs when nothing is mapped).
+        
+        Returns:
+            int: Number of symbols loaded
+        """
+        try:
+            if not self._connected or self.broker_type != "MetaTrader5":
+                return 0
+            
+            if symbols is None:
+                symbols = list(self.symbol_mapper.symbol_map.keys()) if self.symbol_mapper else []
+                if not symbols:
+                    symbols = self._get_fallback_pairs()
+            
+            aliases = {symbol: self._get_real_symbol(symbol) for symbol in dict.fromkeys(symbols)}
+            infos = self.gateway.call(PRIORITY_HISTORY, self._select_symbols, list(dict.fromkeys(aliases.values())))
+            entries = [SymbolMetadata.from_mt5(info) for info in infos if info is not None]
+            
+            self.symbol_registry.load(entries, aliases)
+            self.rate_tables.invalidate()
+            self.logger.info(f"✅ Symbol metadata loaded: {len(entries)} symbols")
+            return len(entries)
+            
+        except Exception as e:
+            self.logger.error(f"Error loading symbol metadata: {e}")
+            return 0
+    
+    def get_symbol_metadata(self, symbol: str) -> Optional[SymbolMetadata]:
+        """Get static metadata for a symbol (loads it once if it was not in the registry)"""
+        meta = self.symbol_registry.get(symbol)
+        if meta is not None:
+            return meta
+        
+        try:
+            if not self._connected or self.broker_type != "MetaTrader5":
+                return None
+            
+            real_symbol = self._get_real_symbol(symbol)
+            info = self.gateway.call(PRIORITY_HISTORY, self._select_symbols, [real_symbol],
+                                     coalesce_key=('symbol_info', real_symbol))[0]
+            if info is None:
+                return None
+            
+            meta = SymbolMetadata.from_mt5(info)
+            self.symbol_registry.load([meta], {symbol: real_symbol}, replace=False)
+            return meta
+            
+        except Exception as e:
+            self.logger.error(f"Error getting symbol metadata for {symbol}: {e}")
+            return None
+    
+    def _select_symbols(self, real_symbols: List[str]) -> List:
+        """Add symbols to Market Watch and read their symbol_info (runs on the gateway thread)"""
+        infos = []
+        for real_symbol in real_symbols:
+            self.mt5.symbol_select(real_symbol, True)
+            infos.append(self.mt5.symbol_info(real_symbol))
+        return infos
+    
     def _get_real_symbol(self, symbol: str) -> str:
         """🆕 แปลง base symbol เป็น real symbol ของ broker"""
         if self.symbol_mapper:
@@ -401,11 +585,8 @@ class BrokerAPI:
                     self.logger.info(f"✅ Connected to broker successfully")
             
             if self.broker_type == "MetaTrader5":
-                # 🆕 ใช้ real symbol จาก mapper
-                real_symbol = self._get_real_symbol(symbol)
-                tick = mt5.symbol_info_tick(real_symbol)
-                if tick:
-                    return tick.bid  # Return bid price
+                # 🆕 อ่านจาก tick snapshot ที่ใช้ร่วมกัน (ไม่มี IPC ซ้ำภายใน tick เดียวกัน)
+                return self.get_ticks([symbol]).get_bid(symbol)  # Return bid price
             
             return None
             
@@ -413,16 +594,70 @@ class BrokerAPI:
             self.logger.error(f"Error getting current price for {symbol}: {e}")
             return None
     
+    def get_ticks(self, symbols: List[str], max_age: float = None) -> TickSnapshot:
+        """
+        Get bid/ask/time_msc for a set of symbols as one shared TickSnapshot.
+        
+        Every symbol ever requested is kept in the tracked set, so one refresh reads
+        the whole universe in a single pass and later calls within max_age (default:
+        cache.tick_snapshot_max_age_seconds) cost no IPC. Pass max_age=0 to force a read.
+        """
+        if max_age is None:
+            max_age = self.tick_snapshot_max_age
+        
+        snapshot = self._tick_snapshot
+        if snapshot is not None and snapshot.is_fresh(max_age) and snapshot.covers(symbols):
+            return snapshot
+        
+        with self._tick_snapshot_lock:
+            snapshot = self._tick_snapshot
+            if snapshot is not None and snapshot.is_fresh(max_age) and snapshot.covers(symbols):
+                return snapshot
+            
+            for symbol in symbols:
+                if symbol not in self._tick_symbols:
+                    self._tick_symbols[symbol] = self._get_real_symbol(symbol)
+            
+            snapshot = self._read_ticks(self._tick_symbols)
+            self._tick_snapshot = snapshot
+            if self.tick_recorder is not None and len(snapshot.symbols):
+                self.tick_recorder.record(snapshot)
+            return snapshot
+    
+    def get_rate_table(self, max_age: float = None) -> RateTable:
+        """
+        Cross-rate matrix and per-lot pip values for the current tick snapshot.
+        
+        The snapshot covers every tracked symbol plus the seven USD majors, so
+        lot/hedge sizing for any mapped symbol is an array lookup.
+        """
+        return self.rate_tables.get(self.get_ticks(list(USD_MAJORS), max_age))
+    
+    def _read_ticks(self, tracked_symbols: Dict[str, str]) -> TickSnapshot:
+        """Read ticks for all tracked symbols in one pass"""
+        real_symbols = list(dict.fromkeys(tracked_symbols.values()))
+        ticks = [None] * len(real_symbols)
+        try:
+            if self._connected and self.broker_type == "MetaTrader5":
+                ticks = self.gateway.call(PRIORITY_TICKS, self._read_tick_objects, real_symbols,
+                                          coalesce_key=('ticks', tuple(real_symbols)))
+        except Exception as e:
+            self.logger.error(f"Error reading ticks: {e}")
+        return TickSnapshot.from_ticks(real_symbols, ticks, tracked_symbols)
+    
+    def _read_tick_objects(self, real_symbols: List[str]) -> List:
+        """symbol_info_tick for each symbol (runs on the gateway thread)"""
+        return [self.mt5.symbol_info_tick(real_symbol) for real_symbol in real_symbols]
+    
     def get_account_balance(self) -> Optional[float]:
         """Get account balance"""
         try:
             if not self._connected:
                 return None
             
-            if self.broker_type == "MetaTrader5":
-                account_info = mt5.account_info()
-                if account_info:
-                    return account_info.balance
+            state = self.get_account_state()
+            if state:
+                return state.balance
             
             return None
             
@@ -436,10 +671,9 @@ class BrokerAPI:
             if not self._connected:
                 return None
             
-            if self.broker_type == "MetaTrader5":
-                account_info = mt5.account_info()
-                if account_info:
-                    return account_info.equity
+            state = self.get_account_state()
+            if state:
+                return state.equity
             
             return None
             
@@ -453,10 +687,9 @@ class BrokerAPI:
             if not self._connected:
                 return None
             
-            if self.broker_type == "MetaTrader5":
-                account_info = mt5.account_info()
-                if account_info:
-                    return account_info.margin_free
+            state = self.get_account_state()
+            if state:
+                return state.free_margin
             
             return None
             
@@ -481,21 +714,21 @@ class BrokerAPI:
                 # 🆕 ใช้ real symbol จาก mapper
                 real_symbol = self._get_real_symbol(symbol)
                 
-                # ดึงข้อมูล symbol info เพื่อรู้ digits
-                symbol_info = mt5.symbol_info(real_symbol)
+                # ดึงข้อมูล symbol metadata เพื่อรู้ digits
+                symbol_info = self.get_symbol_metadata(symbol)
                 if not symbol_info:
                     # 🔇 ไม่แสดง warning สำหรับ symbol ที่ไม่มีใน MT5 (เป็นเรื่องปกติ)
                     self.logger.debug(f"Symbol info not found for {symbol} (real: {real_symbol}) - using estimated")
                     return None
                 
-                # ดึงราคา tick
-                tick = mt5.symbol_info_tick(real_symbol)
-                if not tick or tick.bid is None or tick.ask is None:
-                    self.logger.warning(f"Tick data unavailable for {symbol}: bid={tick.bid if tick else None}, ask={tick.ask if tick else None}")
+                # ดึงราคา tick จาก snapshot
+                bid, ask = self.get_ticks([symbol]).get_bid_ask(symbol)
+                if bid is None or ask is None:
+                    self.logger.warning(f"Tick data unavailable for {symbol}: bid={bid}, ask={ask}")
                     return None
                 
                 # คำนวณ spread ใน pips
-                spread_price = tick.ask - tick.bid
+                spread_price = ask - bid
                 
                 # แปลงเป็น pips ตาม digits
                 digits = symbol_info.digits
@@ -528,19 +761,20 @@ class BrokerAPI:
                 
                 # Convert timeframe string to MT5 constant
                 tf_map = {
-                    'M1': mt5.TIMEFRAME_M1,
-                    'M5': mt5.TIMEFRAME_M5,
-                    'M15': mt5.TIMEFRAME_M15,
-                    'M30': mt5.TIMEFRAME_M30,
-                    'H1': mt5.TIMEFRAME_H1,
-                    'H4': mt5.TIMEFRAME_H4,
-                    'D1': mt5.TIMEFRAME_D1
+                    'M1': self.mt5.TIMEFRAME_M1,
+                    'M5': self.mt5.TIMEFRAME_M5,
+                    'M15': self.mt5.TIMEFRAME_M15,
+                    'M30': self.mt5.TIMEFRAME_M30,
+                    'H1': self.mt5.TIMEFRAME_H1,
+                    'H4': self.mt5.TIMEFRAME_H4,
+                    'D1': self.mt5.TIMEFRAME_D1
                 }
                 
-                tf = tf_map.get(timeframe, mt5.TIMEFRAME_M1)
+                tf = tf_map.get(timeframe, self.mt5.TIMEFRAME_M1)
                 
                 # Get rates
-                rates = mt5.copy_rates_from_pos(real_symbol, tf, 0, count)
+                rates = self.gateway.call(PRIORITY_HISTORY, self.mt5.copy_rates_from_pos, real_symbol, tf, 0, count,
+                                          coalesce_key=('rates', real_symbol, tf, count))
                 
                 if rates is None or len(rates) == 0:
                     return None
@@ -573,9 +807,9 @@ class BrokerAPI:
             if self.broker_type == "MetaTrader5":
                 # Convert order type
                 if order_type.upper() == 'BUY':
-                    order_type_mt5 = mt5.ORDER_TYPE_BUY
+                    order_type_mt5 = self.mt5.ORDER_TYPE_BUY
                 elif order_type.upper() == 'SELL':
-                    order_type_mt5 = mt5.ORDER_TYPE_SELL
+                    order_type_mt5 = self.mt5.ORDER_TYPE_SELL
                 else:
                     self.logger.error(f"Invalid order type: {order_type}")
                     return {
@@ -597,10 +831,6 @@ class BrokerAPI:
                             'type': order_type
                         }
                 
-                # Simple symbol validation - just try to select (like before)
-                if not mt5.symbol_select(symbol, True):
-                    self.logger.warning(f"⚠️ Could not select symbol {symbol}, but continuing...")
-                
                 # Prepare request for REAL TRADING (แบบง่ายเหมือน Huakuy_)
                 # ใช้ comment ตามกลุ่มและลำดับ
                 simple_comment = comment if comment else "Trade"
@@ -609,7 +839,7 @@ class BrokerAPI:
                 magic_number = magic if magic is not None else 234000
                 
                 request = {
-                    "action": mt5.TRADE_ACTION_DEAL,
+                    "action": self.mt5.TRADE_ACTION_DEAL,
                     "symbol": symbol,
                     "volume": volume,
                     "type": order_type_mt5,
@@ -640,25 +870,23 @@ class BrokerAPI:
                         'type': order_type
                     }
                 
-                # Check symbol info (symbol should already be real symbol from arbitrage_detector)
-                symbol_info = mt5.symbol_info(symbol)
+                # Check symbol metadata (symbol should already be real symbol from arbitrage_detector)
+                # Registry ถูกโหลด (และ symbol_select แล้ว) ตอน connect - ไม่มี IPC ใน critical path
+                symbol_info = self.get_symbol_metadata(symbol)
                 if symbol_info is None:
                     self.logger.error(f"❌ Symbol {symbol} not found in MT5")
-                    # ลองใช้ mapper อีกครั้ง
-                    real_symbol = self._get_real_symbol(symbol)
-                    if real_symbol != symbol:
-                        symbol_info = mt5.symbol_info(real_symbol)
-                        if symbol_info:
-                            symbol = real_symbol  # อัปเดต symbol
-                            self.logger.info(f"✅ Found symbol using mapper: {real_symbol}")
-                    
-                    if symbol_info is None:
-                        return {
-                            'success': False,
-                            'error': f'Symbol {symbol} not found',
-                            'symbol': symbol,
-                            'type': order_type
-                        }
+                    return {
+                        'success': False,
+                        'error': f'Symbol {symbol} not found',
+                        'symbol': symbol,
+                        'type': order_type
+                    }
+                
+                # ใช้ชื่อจริงของ broker (กรณีส่ง base symbol มา)
+                if symbol_info.name != symbol:
+                    self.logger.debug(f"Found symbol using mapper: {symbol_info.name}")
+                    symbol = symbol_info.name
+                    request["symbol"] = symbol
                 
                 # Check if symbol is tradeable
                 if not symbol_info.trade_mode:
@@ -671,13 +899,19 @@ class BrokerAPI:
                     }
                 
                 
+                # 🆕 ราคาอ้างอิงสำหรับ slippage: ask สำหรับ BUY, bid สำหรับ SELL
+                quote_bid, quote_ask = self.get_ticks([symbol]).get_bid_ask(symbol)
+                reference_price = (quote_ask if order_type.upper() == 'BUY' else quote_bid) or price
+                
                 # Send order
                 self.logger.info(f"🚀 ส่ง Order: {symbol} {order_type_mt5} Volume: {volume}")
-                result = mt5.order_send(request)
+                sent_at = time.perf_counter()
+                result, last_error = self.gateway.call(PRIORITY_ORDER, self._order_send, request)
+                execution_time_ms = (time.perf_counter() - sent_at) * 1000
                 
                 # Check result
                 if result is None:
-                    last_error = mt5.last_error()
+                    self.execution_stats.record(symbol, ACTION_OPEN, execution_time_ms, success=False)
                     error_code = last_error[0] if last_error else 0
                     error_msg = last_error[1] if last_error else 'Unknown error'
                     
@@ -703,10 +937,28 @@ class BrokerAPI:
                 # ตรวจสอบผลลัพธ์แบบง่าย ๆ
                 try:
                     if result.retcode == 10009:  # สำเร็จ
-                        self.logger.info(f"✅ Order successful: {symbol} {order_type}")
-                        return {'success': True, 'symbol': symbol, 'type': order_type, 'volume': volume}
+                        self._invalidate_after_trade()
+                        fill_price = getattr(result, 'price', None) or price
+                        slippage_points = self._slippage_points(symbol_info, order_type, reference_price, fill_price)
+                        self.execution_stats.record(symbol, ACTION_OPEN, execution_time_ms, slippage_points)
+                        self.logger.info(f"✅ Order successful: {symbol} {order_type} ({execution_time_ms:.1f} ms)")
+                        return {
+                            'success': True,
+                            'symbol': symbol,
+                            'type': order_type,
+                            'volume': getattr(result, 'volume', volume),
+                            'ticket': getattr(result, 'order', None),
+                            'order_id': getattr(result, 'order', None),
+                            'deal_id': getattr(result, 'deal', None),
+                            'price': fill_price,
+                            'requested_price': reference_price,
+                            'slippage': slippage_points,
+                            'execution_time_ms': execution_time_ms
+                        }
                     else:
-                        return {'success': False, 'error': f'Order failed: {result.retcode}'}
+                        self.execution_stats.record(symbol, ACTION_OPEN, execution_time_ms, success=False)
+                        return {'success': False, 'error': f'Order failed: {result.retcode}',
+                                'execution_time_ms': execution_time_ms}
                 except:
                     # ถ้า result ไม่มี retcode attribute
                     return {'success': False, 'error': 'Order result invalid'}
@@ -736,7 +988,7 @@ class BrokerAPI:
             
             if self.broker_type == "MetaTrader5":
                 # Get position info
-                position = mt5.positions_get(ticket=order_id)
+                position = self.gateway.call(PRIORITY_ORDER, self.mt5.positions_get, ticket=order_id)
                 if not position:
                     self.logger.warning(f"Position {order_id} not found")
                     return False
@@ -744,14 +996,14 @@ class BrokerAPI:
                 position = position[0]
                 
                 # Determine close order type
-                close_type = mt5.ORDER_TYPE_SELL if position.type == mt5.POSITION_TYPE_BUY else mt5.ORDER_TYPE_BUY
+                close_type = self.mt5.ORDER_TYPE_SELL if position.type == self.mt5.POSITION_TYPE_BUY else self.mt5.ORDER_TYPE_BUY
                 
                 # Prepare close request (แบบง่ายเหมือน Huakuy_)
                 # ใช้ comment ง่ายๆ เพื่อหลีกเลี่ยงปัญหา encoding
                 close_comment = "Close"
                 
                 request = {
-                    "action": mt5.TRADE_ACTION_DEAL,
+                    "action": self.mt5.TRADE_ACTION_DEAL,
                     "symbol": position.symbol,
                     "volume": position.volume,
                     "type": close_type,
@@ -762,10 +1014,12 @@ class BrokerAPI:
                 
                 # Send close order
                 self.logger.info(f"🚀 ปิด Position: {order_id}")
-                result = mt5.order_send(request)
+                sent_at = time.perf_counter()
+                result, last_error = self.gateway.call(PRIORITY_ORDER, self._order_send, request)
+                execution_time_ms = (time.perf_counter() - sent_at) * 1000
                 
                 if result is None:
-                    last_error = mt5.last_error()
+                    self.execution_stats.record(position.symbol, ACTION_CLOSE, execution_time_ms, success=False)
                     self.logger.error(f"❌ ปิด Position ไม่สำเร็จ: {last_error}")
                     return False
                 
@@ -773,9 +1027,16 @@ class BrokerAPI:
                 self.logger.info(f"📋 Close Result: RetCode={getattr(result, 'retcode', 'N/A')}")
                 
                 if getattr(result, 'retcode', 0) == 10009:  # TRADE_RETCODE_DONE
+                    self._invalidate_after_trade()
                     # คำนวณ PnL จากข้อมูล position
                     pnl = position.profit
-                    self.logger.info(f"✅ ปิดสำเร็จ! Deal: {getattr(result, 'deal', 'N/A')}, Order: {getattr(result, 'order', 'N/A')}")
+                    # 🆕 slippage เทียบกับราคาปัจจุบันของ position ตอนส่งปิด
+                    close_side = 'SELL' if close_type == self.mt5.ORDER_TYPE_SELL else 'BUY'
+                    fill_price = getattr(result, 'price', None)
+                    slippage_points = self._slippage_points(self.get_symbol_metadata(position.symbol), close_side,
+                                                            position.price_current, fill_price)
+                    self.execution_stats.record(position.symbol, ACTION_CLOSE, execution_time_ms, slippage_points)
+                    self.logger.info(f"✅ ปิดสำเร็จ! Deal: {getattr(result, 'deal', 'N/A')}, Order: {getattr(result, 'order', 'N/A')} ({execution_time_ms:.1f} ms)")
                     self.logger.info(f"   💰 PnL: {pnl:.2f} USD")
                     return {
                         'success': True,
@@ -783,9 +1044,14 @@ class BrokerAPI:
                         'deal_id': getattr(result, 'deal', None),
                         'pnl': pnl,
                         'symbol': position.symbol,
-                        'volume': position.volume
+                        'volume': position.volume,
+                        'price': fill_price,
+                        'requested_price': position.price_current,
+                        'slippage': slippage_points,
+                        'execution_time_ms': execution_time_ms
                     }
                 else:
+                    self.execution_stats.record(position.symbol, ACTION_CLOSE, execution_time_ms, success=False)
                     error_desc = self._get_error_message(getattr(result, 'retcode', 0))
                     self.logger.error(f"❌ ไม่สำเร็จ: RetCode {getattr(result, 'retcode', 0)} - {error_desc}")
                     return {
@@ -799,18 +1065,143 @@ class BrokerAPI:
             self.logger.error(f"Error closing order {order_id}: {e}")
             return False
     
+    def _order_send(self, request: Dict) -> Tuple:
+        """order_send + last_error as one gateway request so no other call can overwrite the error"""
+        known = self._position_snapshot
+        try:
+            result = self.mt5.order_send(request)
+        except MT5OrderOutcomeUnknown as e:
+            self.logger.error(f"🚨 {e}: {request.get('symbol', '')} {request.get('comment', '')} - reconciling")
+            return self._reconcile_order(request, known)
+        return result, (self.mt5.last_error() if result is None else None)
+    
+    def _reconcile_order(self, request: Dict, known: Optional[PositionSnapshot]) -> Tuple:
+        """
+        Resolve an order_send whose outcome is unknown (bridge worker restarted mid-call).
+        
+        Runs on the gateway thread after the restart: reconnects, then looks for the
+        position the order would have opened (symbol, magic, comment, type, volume;
+        tickets already open before the send are ignored) or, for a close, checks that
+        the position is gone. A match is reported as a filled order.
+        
+        Args:
+            request: The order_send request
+            known: Position snapshot cached before the send (may be None)
+            
+        Returns:
+            Tuple: (result, last_error) in the _order_send format
+        """
+        closing = request.get('position')
+        known_tickets = {pos.get('ticket') for pos in known.positions} if known is not None else set()
+        for attempt in range(self.order_reconcile_attempts):
+            if attempt:
+                time.sleep(self.order_reconcile_delay)
+            try:
+                if not self._connected and not self._connect_mt5_session():
+                    continue
+                if closing:
+                    positions = self.mt5.positions_get(ticket=closing)
+                    if positions is not None and len(positions) == 0:
+                        self.logger.warning(f"✅ Reconciled: position {closing} is closed")
+                        return SimpleNamespace(retcode=10009, order=None, deal=None, price=None,
+                                               volume=request.get('volume')), None
+                    continue
+                matches = [
+                    pos for pos in (self.mt5.positions_get(symbol=request.get('symbol')) or ())
+                    if pos.magic == request.get('magic') and pos.comment == request.get('comment')
+                    and pos.type == request.get('type') and abs(pos.volume - request.get('volume', 0)) < 1e-9
+                    and pos.ticket not in known_tickets
+                ]
+                if matches:
+                    pos = max(matches, key=lambda p: p.ticket)
+                    self.logger.warning(f"✅ Reconciled: {request.get('symbol')} filled as position {pos.ticket} "
+                                        f"@ {pos.price_open}")
+                    return SimpleNamespace(retcode=10009, order=pos.ticket, deal=None, price=pos.price_open,
+                                           volume=pos.volume), None
+            except Exception as e:
+                self.logger.error(f"Error reconciling order {request.get('symbol', '')}: {e}")
+        self.logger.error(f"🚨 Order outcome still unknown after {self.order_reconcile_attempts} checks: "
+                          f"{request.get('symbol', '')} {request.get('comment', '')}")
+        return None, (-1, 'Order outcome unknown - no matching position after bridge restart')
+    
+    def _slippage_points(self, metadata: Optional[SymbolMetadata], side: str,
+                         reference_price: Optional[float], fill_price: Optional[float]) -> Optional[float]:
+        """Adverse fill distance in points (positive = filled worse than the reference quote)"""
+        if not reference_price or not fill_price:
+            return None
+        point = metadata.point if metadata is not None and metadata.point else 0.00001
+        move = fill_price - reference_price
+        return round((move if side.upper() == 'BUY' else -move) / point, 2)
+    
+    def get_execution_stats(self, symbol: str = None, action: str = None) -> Dict[str, Dict]:
+        """Rolling order/close latency percentiles and slippage per 'SYMBOL:action'"""
+        return self.execution_stats.get_stats(symbol, action)
+    
     def close_position(self, position_id: int) -> bool:
         """Close a position by ID (alias for close_order)"""
         return self.close_order(position_id)
     
     def get_all_positions(self) -> List[Dict]:
-        """Get all open positions"""
+        """Get all open positions (served from the shared position snapshot)"""
+        try:
+            return self.get_positions_snapshot().to_list()
+        except Exception as e:
+            self.logger.error(f"Error getting positions: {e}")
+            return []
+    
+    def get_positions_snapshot(self, max_age: float = None) -> PositionSnapshot:
+        """
+        Get the shared position snapshot, refreshing it from MT5 when stale.
+        
+        Concurrent callers share a single positions_get(); a snapshot younger than
+        max_age (default: cache.position_snapshot_max_age_seconds) is reused as-is.
+        Pass max_age=0 to force a fresh read.
+        """
+        if max_age is None:
+            max_age = self.position_snapshot_max_age
+        
+        snapshot = self._position_snapshot
+        if snapshot is not None and snapshot.is_fresh(max_age):
+            return snapshot
+        
+        with self._position_snapshot_lock:
+            # Another thread may have refreshed while we waited for the lock
+            snapshot = self._position_snapshot
+            if snapshot is not None and snapshot.is_fresh(max_age):
+                return snapshot
+            
+            generation = self._position_generation
+            positions = self._fetch_positions()
+            if positions is None:
+                # Read failed - keep serving the last good snapshot rather than "no positions"
+                return snapshot if snapshot is not None else PositionSnapshot.empty()
+            
+            snapshot = PositionSnapshot(positions)
+            with self._position_state_lock:
+                # A fill/close invalidated the cache during the read - this snapshot may predate it
+                if generation == self._position_generation:
+                    self._position_snapshot = snapshot
+            return snapshot
+    
+    def invalidate_positions_snapshot(self):
+        """Drop the cached position snapshot (called after fills and closes)"""
+        with self._position_state_lock:
+            self._position_generation += 1
+            self._position_snapshot = None
+    
+    def _invalidate_after_trade(self):
+        """Invalidate position and account caches after a fill or close"""
+        self.invalidate_positions_snapshot()
+        self.invalidate_account_state()
+    
+    def _fetch_positions(self) -> Optional[List[Dict]]:
+        """Read open positions from the broker (None on error)"""
         try:
             if not self._connected:
                 return []
             
             if self.broker_type == "MetaTrader5":
-                positions = mt5.positions_get()
+                positions = self.gateway.call(PRIORITY_POSITIONS, self.mt5.positions_get, coalesce_key=('positions_get',))
                 if not positions:
                     return []
                 
@@ -822,7 +1213,7 @@ class BrokerAPI:
                     position_list.append({
                         'ticket': position_id,
                         'symbol': pos.symbol,
-                        'type': 'BUY' if pos.type == mt5.POSITION_TYPE_BUY else 'SELL',
+                        'type': 'BUY' if pos.type == self.mt5.POSITION_TYPE_BUY else 'SELL',
                         'volume': pos.volume,
                         'price': pos.price_open,
                         'current_price': pos.price_current,
@@ -841,7 +1232,7 @@ class BrokerAPI:
             
         except Exception as e:
             self.logger.error(f"Error getting positions: {e}")
-            return []
+            return None
     
     def get_stuck_positions(self, min_age_hours: int = 1) -> List[Dict]:
         """Get positions that have been open for too long and are losing"""
@@ -871,22 +1262,22 @@ class BrokerAPI:
             
             if self.broker_type == "MetaTrader5":
                 # Get order info
-                orders = mt5.orders_get(ticket=order_id)
+                orders = self.gateway.call(PRIORITY_ORDER, self.mt5.orders_get, ticket=order_id)
                 if not orders:
                     self.logger.warning(f"Order {order_id} not found")
                     return False
                 
                 # Prepare cancel request
                 request = {
-                    "action": mt5.TRADE_ACTION_REMOVE,
+                    "action": self.mt5.TRADE_ACTION_REMOVE,
                     "order": order_id,
                     "magic": 234000,
                 }
                 
                 # Send cancel request
-                result = mt5.order_send(request)
+                result, _ = self.gateway.call(PRIORITY_ORDER, self._order_send, request)
                 
-                if getattr(result, 'retcode', 0) != mt5.TRADE_RETCODE_DONE:
+                if getattr(result, 'retcode', 0) != self.mt5.TRADE_RETCODE_DONE:
                     self.logger.error(f"Cancel order failed: {getattr(result, 'retcode', 0)} - {getattr(result, 'comment', 'No comment')}")
                     return False
                 
@@ -905,18 +1296,18 @@ class BrokerAPI:
                 return {}
             
             if self.broker_type == "MetaTrader5":
-                symbols = self.get_available_pairs()
+                symbols = self.get_available_pairs()[:10]  # Limit to first 10 symbols for performance
+                ticks = self.get_ticks(symbols)
                 tick_data = {}
                 
-                for symbol in symbols[:10]:  # Limit to first 10 symbols for performance
-                    tick = mt5.symbol_info_tick(symbol)
-                    if tick:
+                for symbol in symbols:
+                    bid, ask = ticks.get_bid_ask(symbol)
+                    if bid is not None:
                         tick_data[symbol] = {
-                            'bid': tick.bid,
-                            'ask': tick.ask,
-                            'last': tick.last,
-                            'volume': tick.volume,
-                            'time': tick.time
+                            'bid': bid,
+                            'ask': ask,
+                            'time_msc': ticks.get_time_msc(symbol),
+                            'time': (ticks.get_time_msc(symbol) or 0) // 1000
                         }
                 
                 return tick_data
@@ -928,76 +1319,79 @@ class BrokerAPI:
             return {}
     
     def _get_filling_type(self, symbol_info) -> int:
-        """Determine appropriate filling type for symbol"""
+        """Determine appropriate filling type for symbol (SymbolMetadata, symbol_info or symbol name)"""
         try:
+            if isinstance(symbol_info, str):
+                symbol_info = self.get_symbol_metadata(symbol_info)
+            
             # Check if filling_mode attribute exists
             if not hasattr(symbol_info, 'filling_mode'):
                 self.logger.warning("Symbol info has no filling_mode attribute, using RETURN")
-                return mt5.ORDER_FILLING_RETURN
+                return self.mt5.ORDER_FILLING_RETURN
             
             # Check symbol filling modes
             filling_mode = symbol_info.filling_mode
             
             # Check if MT5 constants exist
-            if hasattr(mt5, 'SYMBOL_FILLING_FOK') and hasattr(mt5, 'ORDER_FILLING_FOK'):
+            if hasattr(self.mt5, 'SYMBOL_FILLING_FOK') and hasattr(self.mt5, 'ORDER_FILLING_FOK'):
                 # Prefer FOK (Fill or Kill) for better execution
-                if filling_mode & mt5.SYMBOL_FILLING_FOK:
-                    return mt5.ORDER_FILLING_FOK
+                if filling_mode & self.mt5.SYMBOL_FILLING_FOK:
+                    return self.mt5.ORDER_FILLING_FOK
                 # Fallback to IOC (Immediate or Cancel)
-                elif filling_mode & mt5.SYMBOL_FILLING_IOC:
-                    return mt5.ORDER_FILLING_IOC
+                elif filling_mode & self.mt5.SYMBOL_FILLING_IOC:
+                    return self.mt5.ORDER_FILLING_IOC
                 # Last resort - Return (Fill at any price)
-                elif filling_mode & mt5.SYMBOL_FILLING_RETURN:
-                    return mt5.ORDER_FILLING_RETURN
+                elif filling_mode & self.mt5.SYMBOL_FILLING_RETURN:
+                    return self.mt5.ORDER_FILLING_RETURN
                 else:
                     # Default to FOK
-                    return mt5.ORDER_FILLING_FOK
+                    return self.mt5.ORDER_FILLING_FOK
             else:
                 # Fallback to RETURN if constants don't exist
                 self.logger.warning("MT5 filling constants not available, using RETURN")
-                return mt5.ORDER_FILLING_RETURN
+                return self.mt5.ORDER_FILLING_RETURN
                 
         except Exception as e:
             self.logger.warning(f"Error determining filling type: {e}, using RETURN")
-            return mt5.ORDER_FILLING_RETURN
+            return self.mt5.ORDER_FILLING_RETURN
     
     def _get_error_message(self, retcode: int) -> str:
         """Get human-readable error message for MT5 retcode"""
         error_messages = {
-            mt5.TRADE_RETCODE_REQUOTE: "ราคาเปลี่ยนแปลง - ต้องใช้ราคาใหม่",
-            mt5.TRADE_RETCODE_REJECT: "คำสั่งถูกปฏิเสธ",
-            mt5.TRADE_RETCODE_ERROR: "ข้อผิดพลาดทั่วไป",
-            mt5.TRADE_RETCODE_TIMEOUT: "หมดเวลา - คำสั่งไม่สำเร็จ",
-            mt5.TRADE_RETCODE_INVALID_VOLUME: "ปริมาณการเทรดไม่ถูกต้อง",
-            mt5.TRADE_RETCODE_INVALID_PRICE: "ราคาไม่ถูกต้อง",
-            mt5.TRADE_RETCODE_INVALID_STOPS: "Stop Loss/Take Profit ไม่ถูกต้อง",
-            mt5.TRADE_RETCODE_TRADE_DISABLED: "การเทรดถูกปิดใช้งาน",
-            mt5.TRADE_RETCODE_MARKET_CLOSED: "ตลาดปิด",
-            mt5.TRADE_RETCODE_NO_MONEY: "เงินไม่เพียงพอ",
-            mt5.TRADE_RETCODE_PRICE_CHANGED: "ราคาเปลี่ยนแปลง",
-            mt5.TRADE_RETCODE_TOO_MANY_REQUESTS: "คำขอมากเกินไป",
-            mt5.TRADE_RETCODE_NO_CHANGES: "ไม่มีการเปลี่ยนแปลง",
-            mt5.TRADE_RETCODE_SERVER_DISABLES_AT: "เซิร์ฟเวอร์ปิดใช้งาน AT",
-            mt5.TRADE_RETCODE_CLIENT_DISABLES_AT: "ไคลเอนต์ปิดใช้งาน AT",
-            mt5.TRADE_RETCODE_LOCKED: "บัญชีถูกล็อค",
-            mt5.TRADE_RETCODE_FROZEN: "คำสั่งถูกแช่แข็ง",
-            mt5.TRADE_RETCODE_INVALID_FILL: "การเติมคำสั่งไม่ถูกต้อง",
-            mt5.TRADE_RETCODE_CONNECTION: "ปัญหาการเชื่อมต่อ",
-            mt5.TRADE_RETCODE_ONLY_REAL: "เฉพาะบัญชีจริงเท่านั้น",
-            mt5.TRADE_RETCODE_LIMIT_ORDERS: "เกินขีดจำกัดคำสั่ง",
-            mt5.TRADE_RETCODE_LIMIT_VOLUME: "เกินขีดจำกัดปริมาณ",
-            mt5.TRADE_RETCODE_INVALID_ORDER: "คำสั่งไม่ถูกต้อง",
-            mt5.TRADE_RETCODE_POSITION_CLOSED: "ตำแหน่งปิดแล้ว",
-            mt5.TRADE_RETCODE_INVALID_CLOSE_VOLUME: "ปริมาณปิดไม่ถูกต้อง",
-            mt5.TRADE_RETCODE_CLOSE_ORDER_EXIST: "มีคำสั่งปิดอยู่แล้ว",
-            mt5.TRADE_RETCODE_LIMIT_POSITIONS: "เกินขีดจำกัดตำแหน่ง",
-            mt5.TRADE_RETCODE_REJECT_CANCEL: "การยกเลิกถูกปฏิเสธ",
-            mt5.TRADE_RETCODE_LONG_ONLY: "เฉพาะ Long เท่านั้น",
-            mt5.TRADE_RETCODE_SHORT_ONLY: "เฉพาะ Short เท่านั้น",
-            mt5.TRADE_RETCODE_CLOSE_ONLY: "เฉพาะการปิดเท่านั้น",
-            mt5.TRADE_RETCODE_FIFO_CLOSE: "FIFO close required",
-            mt5.TRADE_RETCODE_CLOSE_ORDER_EXIST: "มีคำสั่งปิดอยู่แล้ว",
-            mt5.TRADE_RETCODE_LIMIT_POSITIONS: "เกินขีดจำกัดตำแหน่ง",
+            self.mt5.TRADE_RETCODE_REQUOTE: "ราคาเปลี่ยนแปลง - ต้องใช้ราคาใหม่",
+            self.mt5.TRADE_RETCODE_REJECT: "คำสั่งถูกปฏิเสธ",
+            self.mt5.TRADE_RETCODE_ERROR: "ข้อผิดพลาดทั่วไป",
+            self.mt5.TRADE_RETCODE_TIMEOUT: "หมดเวลา - คำสั่งไม่สำเร็จ",
+            self.mt5.TRADE_RETCODE_INVALID_VOLUME: "ปริมาณการเทรดไม่ถูกต้อง",
+            self.mt5.TRADE_RETCODE_INVALID_PRICE: "ราคาไม่ถูกต้อง",
+            self.mt5.TRADE_RETCODE_INVALID_STOPS: "Stop Loss/Take Profit ไม่ถูกต้อง",
+            self.mt5.TRADE_RETCODE_TRADE_DISABLED: "การเทรดถูกปิดใช้งาน",
+            self.mt5.TRADE_RETCODE_MARKET_CLOSED: "ตลาดปิด",
+            self.mt5.TRADE_RETCODE_NO_MONEY: "เงินไม่เพียงพอ",
+            self.mt5.TRADE_RETCODE_PRICE_CHANGED: "ราคาเปลี่ยนแปลง",
+            self.mt5.TRADE_RETCODE_TOO_MANY_REQUESTS: "คำขอมากเกินไป",
+            self.mt5.TRADE_RETCODE_NO_CHANGES: "ไม่มีการเปลี่ยนแปลง",
+            self.mt5.TRADE_RETCODE_SERVER_DISABLES_AT: "เซิร์ฟเวอร์ปิดใช้งาน AT",
+            self.mt5.TRADE_RETCODE_CLIENT_DISABLES_AT: "ไคลเอนต์ปิดใช้งาน AT",
+            self.mt5.TRADE_RETCODE_LOCKED: "บัญชีถูกล็อค",
+            self.mt5.TRADE_RETCODE_FROZEN: "คำสั่งถูกแช่แข็ง",
+            self.mt5.TRADE_RETCODE_INVALID_FILL: "การเติมคำสั่งไม่ถูกต้อง",
+            self.mt5.TRADE_RETCODE_CONNECTION: "ปัญหาการเชื่อมต่อ",
+            self.mt5.TRADE_RETCODE_ONLY_REAL: "เฉพาะบัญชีจริงเท่านั้น",
+            self.mt5.TRADE_RETCODE_LIMIT_ORDERS: "เกินขีดจำกัดคำสั่ง",
+            self.mt5.TRADE_RETCODE_LIMIT_VOLUME: "เกินขีดจำกัดปริมาณ",
+            self.mt5.TRADE_RETCODE_INVALID_ORDER: "คำสั่งไม่ถูกต้อง",
+            self.mt5.TRADE_RETCODE_POSITION_CLOSED: "ตำแหน่งปิดแล้ว",
+            self.mt5.TRADE_RETCODE_INVALID_CLOSE_VOLUME: "ปริมาณปิดไม่ถูกต้อง",
+            self.mt5.TRADE_RETCODE_CLOSE_ORDER_EXIST: "มีคำสั่งปิดอยู่แล้ว",
+            self.mt5.TRADE_RETCODE_LIMIT_POSITIONS: "เกินขีดจำกัดตำแหน่ง",
+            self.mt5.TRADE_RETCODE_REJECT_CANCEL: "การยกเลิกถูกปฏิเสธ",
+            self.mt5.TRADE_RETCODE_LONG_ONLY: "เฉพาะ Long เท่านั้น",
+            self.mt5.TRADE_RETCODE_SHORT_ONLY: "เฉพาะ Short เท่านั้น",
+            self.mt5.TRADE_RETCODE_CLOSE_ONLY: "เฉพาะการปิดเท่านั้น",
+            self.mt5.TRADE_RETCODE_FIFO_CLOSE: "FIFO close required",
+            self.mt5.TRADE_RETCODE_CLOSE_ORDER_EXIST: "มีคำสั่งปิดอยู่แล้ว",
+            self.mt5.TRADE_RETCODE_LIMIT_POSITIONS: "เกินขีดจำกัดตำแหน่ง",
             10030: "Unsupported filling mode - ใช้ filling type ที่ไม่รองรับ",
         }
         
@@ -1011,7 +1405,7 @@ class BrokerAPI:
             
             # Verify connection is still active
             if self.broker_type == "MetaTrader5":
-                account_info = mt5.account_info()
+                account_info = self.gateway.call(PRIORITY_POSITIONS, self.mt5.account_info, coalesce_key=('account_info',))
                 if account_info is None:
                     self._connected = False
                     self.logger.warning("⚠️ MT5 connection lost")
@@ -1037,21 +1431,22 @@ class BrokerAPI:
         }
         
         try:
-            # Check if MT5 module is available
-            try:
-                import MetaTrader5 as mt5
+            # Check if MT5 module is available (in this process or in the bridge process)
+            if self.mt5 is not None:
                 status['mt5_available'] = True
-            except ImportError:
+            else:
                 status['issues'].append("MetaTrader5 module not installed")
                 status['recommendations'].append("Install MetaTrader5: pip install MetaTrader5")
                 return status
             
             # Check if MT5 is initialized
-            if mt5.initialize():
+            terminal_running, account_info = self.gateway.call(
+                PRIORITY_POSITIONS, lambda: (True, self.mt5.account_info()) if self.mt5.initialize() else (False, None)
+            )
+            if terminal_running:
                 status['terminal_running'] = True
                 
                 # Check account connection
-                account_info = mt5.account_info()
                 if account_info:
                     status['account_connected'] = True
                     status['connected'] = True
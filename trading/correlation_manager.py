@@ -34,28 +34,24 @@ except Exception:
 
 # Removed AccountTierManager - using GUI Risk per Trade only
 from utils.calculations import TradingCalculations
+from utils.config_service import ADAPTIVE_PARAMS, get_config_service
 from trading.individual_order_tracker import IndividualOrderTracker
+from trading.triangle_discovery import (
+    TRIANGLE_MAGIC_BASE, is_triangle_magic, triangle_group_id, triangle_magic,
+    triangle_number_from_magic, triangle_number_from_name
+)
 
 class CorrelationManager:
     
     def _get_magic_number_from_group_id(self, group_id: str) -> int:
         """หา magic number จาก group_id"""
         try:
-            if 'triangle_1' in group_id:
-                return 234001
-            elif 'triangle_2' in group_id:
-                return 234002
-            elif 'triangle_3' in group_id:
-                return 234003
-            elif 'triangle_4' in group_id:
-                return 234004
-            elif 'triangle_5' in group_id:
-                return 234005
-            elif 'triangle_6' in group_id:
-                return 234006
+            triangle_number = triangle_number_from_name(group_id)
+            if triangle_number is not None:
+                return triangle_magic(triangle_number)
             else:
                 self.logger.warning(f"⚠️ Unknown group_id format: '{group_id}' → using default magic 234000")
-                return 234000  # default
+                return TRIANGLE_MAGIC_BASE  # default
         except Exception as e:
             self.logger.error(f"Error getting magic number from group_id {group_id}: {e}")
             return 234000  # return default on error
@@ -172,6 +168,7 @@ class CorrelationManager:
         self.logger = logging.getLogger(__name__)
         
         # Magic numbers สำหรับแต่ละสามเหลี่ยม (เหมือนกับ arbitrage_detector)
+        # 🆕 arbitrage_detector แทนที่ชุดนี้ด้วย triangle ทั้งหมดที่ discover ได้ตอนเริ่มระบบ
         self.triangle_magic_numbers = {
             'triangle_1': 234001,  # EURUSD, GBPUSD, EURGBP
             'triangle_2': 234002,  # USDJPY, EURUSD, EURJPY
@@ -191,7 +188,9 @@ class CorrelationManager:
         self.multi_timeframe_analysis = True
         
         # Load configuration from config file
+        self.config_service = get_config_service()
         self._load_config_from_file()
+        self.config_service.subscribe(self._apply_config)
         
         # Never-Cut-Loss flag
         self.never_cut_loss = True
@@ -265,24 +264,11 @@ class CorrelationManager:
         
         self.logger.info("✅ CorrelationManager initialization completed")
     
-    def _load_config_from_file(self):
+    def _load_config_from_file(self, snapshot=None):
         """โหลดการตั้งค่าจาก config file"""
         try:
-            import json
-            import os
-            # โหลด config โดยตรง
-            try:
-                import json
-                with open('config/adaptive_params.json', 'r', encoding='utf-8') as f:
-                    config = json.load(f)
-            except Exception:
-                # Fallback to direct path if helper unavailable
-                config_path = 'config/adaptive_params.json'
-                if os.path.exists(config_path):
-                    with open(config_path, 'r', encoding='utf-8') as f:
-                        config = json.load(f)
-                else:
-                    config = {}
+            # 🆕 อ่านจาก config snapshot ในหน่วยความจำ (ConfigService)
+            config = (snapshot or self.config_service.snapshot).section(ADAPTIVE_PARAMS)
                 
             # โหลด recovery parameters
             recovery_params = config.get('recovery_params', {})
@@ -785,7 +771,7 @@ class CorrelationManager:
                 magic = pos.get('magic', 0)
                 comment = pos.get('comment', '')
                 
-                if magic in [234001, 234002, 234003, 234004, 234005, 234006]:
+                if is_triangle_magic(magic):
                     if magic not in groups_data:
                         groups_data[magic] = []
                     groups_data[magic].append(pos)
@@ -928,15 +914,8 @@ class CorrelationManager:
     
     def _get_group_number_from_magic(self, magic: int) -> str:
         """แปลง magic number เป็น Group number"""
-        magic_to_group = {
-            234001: "G1",
-            234002: "G2", 
-            234003: "G3",
-            234004: "G4",
-            234005: "G5",
-            234006: "G6"
-        }
-        return magic_to_group.get(magic, "GX")
+        triangle_number = triangle_number_from_magic(magic)
+        return f"G{triangle_number}" if triangle_number is not None else "GX"
     
     def _get_recovery_symbol_usage(self) -> Dict[str, int]:
         """นับว่าแต่ละคู่เงินถูกใช้แก้กี่ครั้งแล้ว"""
@@ -1111,18 +1090,9 @@ class CorrelationManager:
     def _get_group_magic_number(self, group_id: str) -> int:
         """ห magic number ของ group"""
         try:
-            if 'triangle_1' in group_id:
-                return 234001
-            elif 'triangle_2' in group_id:
-                return 234002
-            elif 'triangle_3' in group_id:
-                return 234003
-            elif 'triangle_4' in group_id:
-                return 234004
-            elif 'triangle_5' in group_id:
-                return 234005
-            elif 'triangle_6' in group_id:
-                return 234006
+            triangle_number = triangle_number_from_name(group_id)
+            if triangle_number is not None:
+                return triangle_magic(triangle_number)
             else:
                 return 0
         except Exception as e:
@@ -1962,9 +1932,10 @@ class CorrelationManager:
             real_base = self.symbol_mapper.get_real_symbol(base_symbol) if self.symbol_mapper else base_symbol
             real_target = self.symbol_mapper.get_real_symbol(target_symbol) if self.symbol_mapper else target_symbol
             
-            # ดึงข้อมูลราคาจาก MT5
-            base_price = self.broker.get_current_price(real_base)
-            target_price = self.broker.get_current_price(real_target)
+            # ดึงข้อมูลราคาจาก tick snapshot (อ่านทั้งคู่ในรอบเดียว)
+            ticks = self.broker.get_ticks([real_base, real_target])
+            base_price = ticks.get_bid(real_base)
+            target_price = ticks.get_bid(real_target)
             
             if not base_price or not target_price:
                 return self._calculate_dynamic_correlation(base_symbol, target_symbol)
@@ -2328,9 +2299,8 @@ class CorrelationManager:
                 
                 # Extract group_id from magic number
                 magic = original_position.get('magic', 234000)
-                if magic in [234001, 234002, 234003, 234004, 234005, 234006]:
-                    group_num = str(magic)[-1]
-                    group_id = f"group_triangle_{group_num}_1"
+                if is_triangle_magic(magic):
+                    group_id = triangle_group_id(triangle_number_from_magic(magic))
                     
                     # Register the order
                     success = self.order_tracker.register_original_order(
@@ -2431,11 +2401,34 @@ class CorrelationManager:
                     self.logger.error("❌ No recovery ticket received from order")
                     return False
                 
-                # ดึงราคาปัจจุบันเป็น entry price
-                entry_price = self.broker.get_current_price(symbol)
+                # ใช้ราคา fill จริงเป็น entry price (fallback: ราคาปัจจุบัน)
+                execution = order_result.get('execution', {})
+                entry_price = execution.get('filled_price') or self.broker.get_current_price(symbol)
                 if not entry_price:
                     entry_price = 0.0
                 
+                # 🆕 บันทึก ML log พร้อม execution ที่วัดจริง (latency/slippage)
+                if getattr(self, 'ml_logger', None):
+                    self.ml_logger.log_recovery_attempt({
+                        'original': {
+                            'ticket': original_ticket,
+                            'symbol': original_symbol,
+                            'direction': original_position.get('type'),
+                            'entry': original_position.get('price'),
+                            'current': original_position.get('current_price'),
+                            'loss_usd': original_position.get('profit'),
+                            'lot_size': original_position.get('volume')
+                        },
+                        'decision': {
+                            'recovery_symbol': symbol,
+                            'recovery_direction': direction,
+                            'recovery_lot_size': correlation_lot_size,
+                            'correlation': correlation,
+                            'method': 'correlation'
+                        },
+                        'execution': execution
+                    })
+                
                 # Store correlation position (legacy support)
                 correlation_position = {
                     'symbol': symbol,
@@ -2559,7 +2552,15 @@ class CorrelationManager:
                     'success': True,
                     'order_id': result.get('order_id'),
                     'symbol': symbol,
-                    'lot_size': lot_size
+                    'lot_size': lot_size,
+                    # 🆕 ค่าที่วัดจริงสำหรับ ml_recovery_logs (requested/filled price, slippage, execution_time_ms)
+                    'execution': {
+                        'requested_price': result.get('requested_price'),
+                        'filled_price': result.get('price'),
+                        'slippage': result.get('slippage'),
+                        'execution_time_ms': result.get('execution_time_ms'),
+                        'recovery_ticket': result.get('ticket')
+                    }
                 }
             else:
                 self.logger.error(f"❌ Failed to send correlation recovery order: {symbol}")
@@ -2707,7 +2708,7 @@ class CorrelationManager:
             # เก็บข้อมูลแต่ละ Group
             groups_data = {}
             
-            for magic in [234001, 234002, 234003, 234004, 234005, 234006]:
+            for magic in sorted(self.triangle_magic_numbers.values()):
                 group_positions = []
                 total_pnl = 0.0
                 losing_count = 0
@@ -2773,7 +2774,7 @@ class CorrelationManager:
     def _log_detailed_group_info(self, all_positions: List[Dict]):
         """📋 แสดงรายละเอียดแต่ละ Group: คู่เงิน, ไม้ไหนแก้ไม้ไหน (รวม chain recovery)"""
         try:
-            for magic in [234001, 234002, 234003, 234004, 234005, 234006]:
+            for magic in sorted(self.triangle_magic_numbers.values()):
                 group_positions = []
                 recovery_positions = []
                 
@@ -2976,8 +2977,8 @@ class CorrelationManager:
             all_positions = self.broker.get_all_positions()
             self.logger.info(f"🔍 DEBUG: Total positions from MT5: {len(all_positions)}")
             
-            # ตรวจสอบ Groups ทั้งหมด (Magic 234001-234006)
-            for magic in [234001, 234002, 234003, 234004, 234005, 234006]:
+            # ตรวจสอบ Groups ทั้งหมด (Magic ของทุก triangle)
+            for magic in sorted(self.triangle_magic_numbers.values()):
                 group_positions = []
                 
                 # หา positions ใน group นี้
@@ -3261,13 +3262,9 @@ class CorrelationManager:
             return 'SELL'
 
     def _get_position_by_ticket(self, ticket: str) -> Optional[Dict]:
-        """Get position from MT5 by ticket number"""
+        """Get position from MT5 by ticket number (O(1) lookup in the shared position snapshot)"""
         try:
-            all_positions = self.broker.get_all_positions()
-            for pos in all_positions:
-                if str(pos.get('ticket', '')) == str(ticket):
-                    return pos
-            return None
+            return self.broker.get_positions_snapshot().get_by_ticket(ticket)
         except Exception as e:
             self.logger.error(f"Error getting position by ticket {ticket}: {e}")
             return None
@@ -3403,9 +3400,8 @@ class CorrelationManager:
                 original_magic = position.get('magic', 234000)
                 
                 # Create group_id that matches the magic number format
-                if original_magic in [234001, 234002, 234003, 234004, 234005, 234006]:
-                    group_num = str(original_magic)[-1]  # Extract last digit (1-6)
-                    group_id = f"group_triangle_{group_num}_1"
+                if is_triangle_magic(original_magic):
+                    group_id = triangle_group_id(triangle_number_from_magic(original_magic))
                 else:
                     # Fallback for non-standard magic numbers
                     group_id = f"recovery_{ticket}_{symbol}"
@@ -3676,7 +3672,7 @@ class CorrelationManager:
                     continue
                 
                 # STRICT VALIDATION: Only track arbitrage orders with specific magic and comment patterns
-                if not (234001 <= magic <= 234006):
+                if not is_triangle_magic(magic):
                     continue
                 
                 # Additional validation: Check comment pattern (G1_, G2_, etc.)
@@ -3748,8 +3744,8 @@ class CorrelationManager:
                     continue
                 
                 # STRICT VALIDATION: Only register arbitrage orders with specific magic and comment patterns
-                if not (234001 <= magic <= 234006):
-                    self.logger.debug(f"⚠️ Skipping order {ticket}_{symbol}: Magic {magic} not in range 234001-234006")
+                if not is_triangle_magic(magic):
+                    self.logger.debug(f"⚠️ Skipping order {ticket}_{symbol}: Magic {magic} is not a triangle magic")
                     continue
                 
                 # Additional validation: Check comment pattern (G1_, G2_, etc.)
@@ -3786,15 +3782,8 @@ class CorrelationManager:
     
     def _get_group_id_from_magic(self, magic: int) -> str:
         """Get group_id from magic number"""
-        magic_to_group = {
-            234001: "group_triangle_1_1",
-            234002: "group_triangle_2_1", 
-            234003: "group_triangle_3_1",
-            234004: "group_triangle_4_1",
-            234005: "group_triangle_5_1",
-            234006: "group_triangle_6_1"
-        }
-        return magic_to_group.get(magic, f"group_unknown_{magic}")
+        triangle_number = triangle_number_from_magic(magic)
+        return triangle_group_id(triangle_number) if triangle_number is not None else f"group_unknown_{magic}"
     
     def clear_old_order_tracking(self):
         """Clear all old order tracking data to start fresh"""
@@ -3831,7 +3820,7 @@ class CorrelationManager:
         """Enable auto-registration of new orders (use with caution)"""
         try:
             self.logger.info("🔧 ENABLING AUTO-REGISTRATION")
-            self.logger.warning("⚠️ Auto-registration will track ALL orders with magic 234001-234006")
+            self.logger.warning("⚠️ Auto-registration will track ALL orders with triangle magic numbers")
             self.logger.warning("⚠️ Make sure this is what you want!")
             
             # Enable auto-registration by uncommenting the line in check_recovery_chain
@@ -3896,8 +3885,8 @@ class CorrelationManager:
                     continue
                 
                 # STRICT VALIDATION: Only register arbitrage orders
-                if not (234001 <= magic <= 234006):
-                    self.logger.debug(f"⚠️ Skipping order {ticket}_{symbol}: Magic {magic} not in range 234001-234006")
+                if not is_triangle_magic(magic):
+                    self.logger.debug(f"⚠️ Skipping order {ticket}_{symbol}: Magic {magic} is not a triangle magic")
                     skipped_count += 1
                     continue
                 
@@ -4160,10 +4149,19 @@ class CorrelationManager:
             self.logger.debug(f"Error stopping Correlation Manager: {e}")
     
     def reload_config(self):
-        """โหลดการตั้งค่าใหม่จาก config file (Hot Reload!)"""
+        """โหลดการตั้งค่าใหม่จาก config file (Hot Reload!) - 🆕 ConfigService เรียก _apply_config ถ้าไฟล์เปลี่ยน"""
+        try:
+            self.config_service.refresh()
+            return True
+        except Exception as e:
+            self.logger.error(f"❌ Error reloading config: {e}")
+            return False
+    
+    def _apply_config(self, snapshot):
+        """🆕 ใช้ config snapshot ใหม่ (เรียกโดย ConfigService หลังสลับ snapshot)"""
         try:
             self.logger.info("🔄 Reloading config from adaptive_params.json...")
-            self._load_config_from_file()
+            self._load_config_from_file(snapshot)
             
             # Reinitialize ML components if needed
             if self.ml_logging_enabled and not hasattr(self, 'ml_logger'):
@@ -4178,7 +4176,5 @@ class CorrelationManager:
                 )
             
             self.logger.info("✅ Config reloaded successfully!")
-            return True
         except Exception as e:
             self.logger.error(f"❌ Error reloading config: {e}")
-            return False
@@ -0,0 +1,208 @@
+"""
+Execution Statistics
+====================
+
+Rolling latency and slippage statistics for every order send and close,
+per symbol and action, so terminal or broker degradation is visible.
+
+Key Features:
+- Fixed-size numpy ring buffers per (symbol, action) - O(1) record
+- Latency p50/p95/p99/max and slippage mean/p95/max (points, adverse > 0)
+- Success/failure counters
+- Persisted to JSON (windows + summary) and restored on start
+"""
+
+import json
+import logging
+import os
+import threading
+import time
+from typing import Dict, Optional
+
+import numpy as np
+
+ACTION_OPEN = 'open'
+ACTION_CLOSE = 'close'
+
+
+class _RollingWindow:
+    """Ring buffer of the last N latency/slippage samples for one key."""
+
+    __slots__ = ('latency_ms', 'slippage_points', 'count', 'next', 'slippage_count',
+                 'slippage_next', 'successes', 'failures', 'last_at')
+
+    def __init__(self, size: int):
+        self.latency_ms = np.zeros(size, dtype=np.float64)
+        self.slippage_points = np.zeros(size, dtype=np.float64)
+        self.count = 0
+        self.next = 0
+        self.slippage_count = 0
+        self.slippage_next = 0
+        self.successes = 0
+        self.failures = 0
+        self.last_at = None
+
+    def add(self, latency_ms: float, slippage_points: Optional[float], success: bool):
+        size = len(self.latency_ms)
+        self.latency_ms[self.next] = latency_ms
+        self.next = (self.next + 1) % size
+        self.count = min(self.count + 1, size)
+        if slippage_points is not None:
+            self.slippage_points[self.slippage_next] = slippage_points
+            self.slippage_next = (self.slippage_next + 1) % size
+            self.slippage_count = min(self.slippage_count + 1, size)
+        if success:
+            self.successes += 1
+        else:
+            self.failures += 1
+        self.last_at = time.time()
+
+    def summary(self) -> Dict:
+        latency = self.latency_ms[:self.count]
+        slippage = self.slippage_points[:self.slippage_count]
+        if len(latency):
+            p50, p95, p99 = np.percentile(latency, [50, 95, 99])
+        else:
+            p50 = p95 = p99 = 0.0
+        return {
+            'samples': int(self.count),
+            'successes': self.successes,
+            'failures': self.failures,
+            'latency_p50_ms': float(p50),
+            'latency_p95_ms': float(p95),
+            'latency_p99_ms': float(p99),
+            'latency_max_ms': float(latency.max()) if len(latency) else 0.0,
+            'slippage_avg_points': float(slippage.mean()) if len(slippage) else 0.0,
+            'slippage_p95_points': float(np.percentile(slippage, 95)) if len(slippage) else 0.0,
+            'slippage_max_points': float(slippage.max()) if len(slippage) else 0.0,
+            'last_at': self.last_at
+        }
+
+    @staticmethod
+    def ordered(values: np.ndarray, count: int, next_index: int) -> np.ndarray:
+        """Samples oldest -> newest"""
+        if count < len(values):
+            return values[:count]
+        return np.concatenate((values[next_index:], values[:next_index]))
+
+
+class ExecutionStats:
+    """
+    Per-symbol, per-action execution latency and slippage.
+
+    Usage:
+        stats = ExecutionStats('data/execution_stats.json')
+        stats.record('EURUSD', ACTION_OPEN, latency_ms=42.0, slippage_points=1.0)
+        stats.get_stats('EURUSD')
+    """
+
+    def __init__(self, file_path: str = 'data/execution_stats.json', window: int = 500,
+                 save_interval: float = 60.0):
+        """
+        Args:
+            file_path: JSON file for persistence (None to keep in memory only)
+            window: Samples kept per (symbol, action)
+            save_interval: Minimum seconds between background saves
+        """
+        self.file_path = file_path
+        self.window = window
+        self.save_interval = save_interval
+        self.logger = logging.getLogger(__name__)
+
+        self._windows: Dict[str, _RollingWindow] = {}
+        self._lock = threading.Lock()
+        self._last_save = time.monotonic()
+        self._saving = False
+        self.load()
+
+    def record(self, symbol: str, action: str, latency_ms: float,
+               slippage_points: float = None, success: bool = True):
+        """Add one execution sample (called on the order path - no I/O here)"""
+        key = f"{symbol}:{action}"
+        with self._lock:
+            window = self._windows.get(key)
+            if window is None:
+                window = _RollingWindow(self.window)
+                self._windows[key] = window
+            window.add(latency_ms, slippage_points, success)
+
+            save_due = (self.file_path and not self._saving
+                        and time.monotonic() - self._last_save >= self.save_interval)
+            if save_due:
+                self._saving = True
+        if save_due:
+            threading.Thread(target=self._save_in_background, name="ExecutionStatsSave", daemon=True).start()
+
+    def get_stats(self, symbol: str = None, action: str = None) -> Dict[str, Dict]:
+        """
+        Summaries keyed by 'SYMBOL:action', optionally filtered.
+
+        Returns:
+            Dict: key -> samples, successes, failures, latency p50/p95/p99/max (ms),
+                  slippage avg/p95/max (points, positive = worse than requested)
+        """
+        with self._lock:
+            result = {}
+            for key, window in self._windows.items():
+                key_symbol, key_action = key.rsplit(':', 1)
+                if symbol is not None and key_symbol != symbol:
+                    continue
+                if action is not None and key_action != action:
+                    continue
+                result[key] = window.summary()
+            return result
+
+    def save(self):
+        """Write windows and summaries to file_path (atomic)"""
+        if not self.file_path:
+            return
+        try:
+            with self._lock:
+                data = {'saved_at': time.time(), 'window': self.window, 'keys': {}}
+                for key, window in self._windows.items():
+                    data['keys'][key] = {
+                        'summary': window.summary(),
+                        'latency_ms': window.ordered(window.latency_ms, window.count, window.next).tolist(),
+                        'slippage_points': window.ordered(window.slippage_points, window.slippage_count,
+                                                          window.slippage_next).tolist()
+                    }
+            os.makedirs(os.path.dirname(self.file_path) or '.', exist_ok=True)
+            tmp_path = self.file_path + '.tmp'
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(data, f)
+            os.replace(tmp_path, self.file_path)
+        except Exception as e:
+            self.logger.error(f"Error saving execution stats: {e}")
+
+    def load(self):
+        """Restore windows saved by a previous session"""
+        if not self.file_path or not os.path.exists(self.file_path):
+            return
+        try:
+            with open(self.file_path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            with self._lock:
+                for key, saved in data.get('keys', {}).items():
+                    window = _RollingWindow(self.window)
+                    for latency in saved.get('latency_ms', [])[-self.window:]:
+                        window.add(latency, None, True)
+                    for slippage in saved.get('slippage_points', [])[-self.window:]:
+                        window.slippage_points[window.slippage_next] = slippage
+                        window.slippage_next = (window.slippage_next + 1) % self.window
+                        window.slippage_count = min(window.slippage_count + 1, self.window)
+                    summary = saved.get('summary', {})
+                    window.successes = summary.get('successes', window.successes)
+                    window.failures = summary.get('failures', 0)
+                    window.last_at = summary.get('last_at')
+                    self._windows[key] = window
+            self.logger.info(f"📈 Execution stats restored ({len(self._windows)} symbol/actions)")
+        except Exception as e:
+            self.logger.error(f"Error loading execution stats: {e}")
+
+    def _save_in_background(self):
+        try:
+            self.save()
+        finally:
+            with self._lock:
+                self._saving = False
+                self._last_save = time.monotonic()
@@ -0,0 +1,223 @@
+"""
+Group PnL Aggregator
+====================
+
+Arbitrage PnL, recovery PnL, net PnL, volume and leg count for every
+arbitrage group, computed in one pass over a PositionSnapshot.
+
+Key Features:
+- Arbitrage legs are attributed by magic number (triangle N -> group_triangle_N_1)
+- Recovery legs are attributed through the order tracker's links: a recovery
+  order follows hedging_for back to the original order it (or its chain) hedges,
+  and takes that order's group (or, without a usable group id, the group of the
+  original's magic number while it is still open)
+- Recovery -> group links are rebuilt only when the tracker version changes
+- One GroupPnLTable per snapshot object; every consumer within the same
+  snapshot reads the cached table
+"""
+
+import re
+import threading
+from typing import Dict, Optional, Tuple
+
+from trading.position_snapshot import PositionSnapshot
+from trading.triangle_discovery import triangle_group_id, triangle_number_from_magic, triangle_number_from_name
+
+_SHORT_GROUP_RE = re.compile(r'^G(\d+)$')   # tracker group ids from comments (G12)
+_MAX_CHAIN_DEPTH = 16
+
+
+class GroupPnL:
+    """PnL and exposure of one arbitrage group (arbitrage legs + linked recovery legs)."""
+
+    __slots__ = ('group_id', 'arbitrage_pnl', 'recovery_pnl', 'arbitrage_volume', 'recovery_volume',
+                 'arbitrage_legs', 'recovery_legs', 'losing_legs', 'positions')
+
+    def __init__(self, group_id: str):
+        self.group_id = group_id
+        self.arbitrage_pnl = 0.0
+        self.recovery_pnl = 0.0
+        self.arbitrage_volume = 0.0
+        self.recovery_volume = 0.0
+        self.arbitrage_legs = 0
+        self.recovery_legs = 0
+        self.losing_legs = 0          # arbitrage legs with profit < 0
+        self.positions = []           # snapshot position dicts (arbitrage + recovery legs), read-only
+
+    @property
+    def net_pnl(self) -> float:
+        return self.arbitrage_pnl + self.recovery_pnl
+
+    @property
+    def volume(self) -> float:
+        return self.arbitrage_volume + self.recovery_volume
+
+    @property
+    def legs(self) -> int:
+        return self.arbitrage_legs + self.recovery_legs
+
+    def to_dict(self) -> Dict:
+        return {
+            'group_id': self.group_id,
+            'arbitrage_pnl': self.arbitrage_pnl,
+            'recovery_pnl': self.recovery_pnl,
+            'net_pnl': self.net_pnl,
+            'arbitrage_volume': self.arbitrage_volume,
+            'recovery_volume': self.recovery_volume,
+            'arbitrage_count': self.arbitrage_legs,
+            'recovery_count': self.recovery_legs,
+            'losing_legs': self.losing_legs
+        }
+
+    def __repr__(self) -> str:
+        return (f"GroupPnL({self.group_id}, net={self.net_pnl:.2f}, arb={self.arbitrage_pnl:.2f}"
+                f"/{self.arbitrage_legs}, rec={self.recovery_pnl:.2f}/{self.recovery_legs})")
+
+
+class GroupPnLTable:
+    """Per-group PnL for one PositionSnapshot (read-only once built)."""
+
+    __slots__ = ('snapshot', 'groups', 'tracker_version')
+
+    def __init__(self, snapshot: PositionSnapshot, groups: Dict[str, GroupPnL], tracker_version):
+        self.snapshot = snapshot
+        self.groups = groups
+        self.tracker_version = tracker_version
+
+    def get(self, group_id: str) -> GroupPnL:
+        """PnL of a group (all zero if it has no open legs)"""
+        pnl = self.groups.get(group_id)
+        if pnl is None:
+            # group ids rebuilt from MT5 carry another suffix (group_triangle_3_3) - same triangle, same magic
+            canonical = normalize_group_id(group_id)
+            pnl = self.groups.get(canonical) if canonical else None
+        return pnl if pnl is not None else GroupPnL(group_id)
+
+    def __contains__(self, group_id: str) -> bool:
+        return self.get(group_id).legs > 0
+
+    def __len__(self) -> int:
+        return len(self.groups)
+
+
+def normalize_group_id(group_id: Optional[str]) -> Optional[str]:
+    """Tracker group id ('group_triangle_12_1' or 'G12') -> detector group id, or None"""
+    if not group_id:
+        return None
+    number = triangle_number_from_name(group_id)
+    if number is None:
+        match = _SHORT_GROUP_RE.match(group_id)
+        number = int(match.group(1)) if match else None
+    return triangle_group_id(number) if number is not None else None
+
+
+class GroupPnLAggregator:
+    """
+    Builds GroupPnLTable from a position snapshot and the order tracker.
+
+    Usage:
+        aggregator = GroupPnLAggregator()
+        table = aggregator.aggregate(broker.get_positions_snapshot(), order_tracker)
+        table.get('group_triangle_1_1').net_pnl
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._table: Optional[GroupPnLTable] = None
+        self._links: Dict[str, Tuple[Optional[str], str]] = {}    # recovery ticket -> (group id, root ticket)
+        self._links_version = None
+        self.stats = {'passes': 0, 'hits': 0, 'link_rebuilds': 0}
+
+    def aggregate(self, snapshot: PositionSnapshot, order_tracker=None) -> GroupPnLTable:
+        """
+        Per-group PnL for a snapshot (cached per snapshot object and tracker version).
+
+        Args:
+            snapshot: Open positions
+            order_tracker: IndividualOrderTracker providing recovery -> original links (optional)
+        """
+        version = self._tracker_version(order_tracker)
+        table = self._table
+        if table is not None and table.snapshot is snapshot and table.tracker_version == version:
+            self.stats['hits'] += 1
+            return table
+
+        with self._lock:
+            links = self._recovery_links(order_tracker, version)
+            groups: Dict[str, GroupPnL] = {}
+            for pos in snapshot:
+                profit = pos.get('profit', 0.0) or 0.0
+                volume = pos.get('volume', 0.0) or 0.0
+                number = triangle_number_from_magic(pos.get('magic', 0))
+                if number is not None:
+                    group_id = triangle_group_id(number)
+                    pnl = groups.get(group_id) or groups.setdefault(group_id, GroupPnL(group_id))
+                    pnl.arbitrage_pnl += profit
+                    pnl.arbitrage_volume += volume
+                    pnl.arbitrage_legs += 1
+                    pnl.positions.append(pos)
+                    if profit < 0:
+                        pnl.losing_legs += 1
+                    continue
+
+                link = links.get(str(pos.get('ticket')))
+                if link is None:
+                    continue
+                group_id = link[0]
+                if group_id is None:
+                    root = snapshot.get_by_ticket(link[1])
+                    number = triangle_number_from_magic(root.get('magic', 0)) if root else None
+                    group_id = triangle_group_id(number) if number is not None else None
+                if group_id is not None:
+                    pnl = groups.get(group_id) or groups.setdefault(group_id, GroupPnL(group_id))
+                    pnl.recovery_pnl += profit
+                    pnl.recovery_volume += volume
+                    pnl.recovery_legs += 1
+                    pnl.positions.append(pos)
+
+            table = GroupPnLTable(snapshot, groups, version)
+            self._table = table
+            self.stats['passes'] += 1
+            return table
+
+    def get_stats(self) -> Dict:
+        return dict(self.stats)
+
+    @staticmethod
+    def _tracker_version(order_tracker):
+        if order_tracker is None:
+            return None
+        return (id(order_tracker), getattr(order_tracker, 'version', None))
+
+    def _recovery_links(self, order_tracker, version) -> Dict[str, Tuple[Optional[str], str]]:
+        """recovery ticket -> (group id or None, root original ticket); rebuilt when the tracker changed"""
+        if order_tracker is None:
+            return {}
+        if version == self._links_version and version[1] is not None:
+            return self._links
+
+        orders = order_tracker.get_all_orders()
+        links = {}
+        for order in orders.values():
+            if order.get('type') != 'RECOVERY' or not order.get('ticket'):
+                continue
+            links[str(order['ticket'])] = self._resolve_group(order, orders)
+
+        self._links = links
+        self._links_version = version
+        self.stats['link_rebuilds'] += 1
+        return links
+
+    @staticmethod
+    def _resolve_group(order: Dict, orders: Dict[str, Dict]) -> Tuple[Optional[str], str]:
+        """(group id, ticket) of the original order at the root of a recovery chain"""
+        current = order
+        for _ in range(_MAX_CHAIN_DEPTH):
+            parent = orders.get(current.get('hedging_for') or '')
+            if parent is None:
+                break
+            current = parent
+            if current.get('type') == 'ORIGINAL':
+                break
+        group_id = normalize_group_id(current.get('group_id')) or normalize_group_id(order.get('group_id'))
+        return group_id, str(current.get('ticket', ''))
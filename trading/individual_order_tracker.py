@@ -42,6 +42,9 @@ class IndividualOrderTracker:
         # Key: f"{ticket}_{symbol}", Value: order_info
         self.order_tracking: Dict[str, Dict] = {}
         
+        # 🆕 เพิ่มทุกครั้งที่มีการเพิ่ม/ลบ order (ให้ผู้ใช้ cache ลิงก์ recovery -> group ได้)
+        self.version = 0
+        
         # 🆕 Smart Recovery Priority Queue
         # Priority based on loss amount and urgency
         self.recovery_priority_queue: List[Dict] = []
@@ -96,6 +99,7 @@ class IndividualOrderTracker:
                 "created_at": datetime.now(),
                 "last_sync": datetime.now()
             }
+            self.version += 1
             
             self.stats['original_orders_registered'] += 1
             self.logger.info(f"📝 Original order registered: {order_key}")
@@ -143,6 +147,7 @@ class IndividualOrderTracker:
                 "created_at": datetime.now(),
                 "last_sync": datetime.now()
             }
+            self.version += 1
             
             self.stats['recovery_orders_registered'] += 1
             self.stats['orders_hedged'] += 1
@@ -261,12 +266,15 @@ class IndividualOrderTracker:
                     needing_recovery.append(order_info)
             return needing_recovery
     
-    def sync_with_mt5(self) -> Dict:
+    def sync_with_mt5(self, snapshot=None) -> Dict:
         """
         Sync order status with actual MT5 positions.
         Remove orders that are no longer active in MT5.
         Auto-register existing positions that aren't tracked.
         
+        Args:
+            snapshot: Optional PositionSnapshot for this cycle (fetched from the broker if omitted)
+        
         Returns:
             Dict: Sync operation results
         """
@@ -280,18 +288,17 @@ class IndividualOrderTracker:
             }
             
             try:
-                # Get all positions from MT5
-                all_positions = self.broker.get_all_positions()
+                # Get all positions from the shared position snapshot
+                if snapshot is None:
+                    snapshot = self.broker.get_positions_snapshot()
+                all_positions = snapshot.positions
                 if not all_positions:
                     self.logger.warning("⚠️ No positions returned from MT5 during sync")
                     return sync_results
                 
-                # Create set of active tickets for quick lookup
-                active_tickets: Set[str] = set()
-                for pos in all_positions:
-                    ticket = str(pos.get('ticket', ''))
-                    if ticket:
-                        active_tickets.add(ticket)
+                # Snapshot is already indexed by ticket
+                active_tickets: Set[str] = set(snapshot.by_ticket.keys())
+                active_tickets.discard('')
                 
                 # 🆕 AUTO-REGISTER existing positions that aren't tracked
                 for pos in all_positions:
@@ -340,6 +347,7 @@ class IndividualOrderTracker:
                                     order_data["status"] = "ORPHANED"  # Recovery without original
                             
                             self.order_tracking[order_key] = order_data
+                            self.version += 1
                             
                             if is_recovery:
                                 self.stats['recovery_orders_registered'] += 1
@@ -408,6 +416,7 @@ class IndividualOrderTracker:
                 # Remove closed orders
                 for order_key in orders_to_remove:
                     del self.order_tracking[order_key]
+                    self.version += 1
                 
                 self.stats['sync_operations'] += 1
                 self.stats['last_sync'] = datetime.now()
@@ -496,6 +505,7 @@ class IndividualOrderTracker:
         with self._lock:
             order_count = len(self.order_tracking)
             self.order_tracking.clear()
+            self.version += 1
             
             # Reset statistics
             self.stats = {
@@ -805,6 +815,7 @@ class IndividualOrderTracker:
                             order_info['last_sync'] = datetime.now()
                     
                     self.order_tracking[key] = order_info
+                self.version += 1
             
             # Load stats
             if 'stats' in data:
@@ -0,0 +1,366 @@
+"""
+Mark-to-Market Engine
+=====================
+
+Position and group PnL computed locally from entry price, volume, direction
+and the tick snapshot, so PnL follows every tick without reading positions
+from MT5, reconciled against MT5's own profit at a slower cadence.
+
+Key Features:
+- profit = (close price - open price) x direction x volume x move value,
+  where move value is the TradingCalculations pip-value math per 1.0 price
+  change (contract size x quote->USD rate, RateTable.move_value); BUY
+  closes at bid, SELL at ask
+- One vectorized pass over all synced positions per tick snapshot, cached
+  per snapshot object - trailing stops, GUI and the tick listener share it
+- Group PnL split into arbitrage / recovery legs using the group membership
+  of the GroupPnLTable the positions were synced from
+- Reconciliation every reconcile_interval: local profit at MT5's
+  price_current vs MT5 profit -> drift per position (reported), then an
+  offset per position absorbs it (correct_drift)
+- Drift report: |drift| distribution (HDR histogram), per-symbol and
+  per-group drift, worst recent positions, positions beyond drift_alert
+"""
+
+import logging
+import threading
+import time
+from collections import deque
+from typing import Dict, Optional
+
+import numpy as np
+
+from trading.group_pnl import GroupPnL, GroupPnLTable, normalize_group_id
+from trading.tick_snapshot import TickSnapshot
+from trading.triangle_discovery import triangle_number_from_magic
+from utils.metrics import Histogram
+
+
+class MarkTable:
+    """Local PnL of the synced positions at one tick snapshot (read-only)."""
+
+    __slots__ = ('snapshot', 'version', 'marked_at', 'profit', '_tickets', '_group_index', '_group_ids',
+                 '_arbitrage', '_recovery', '_arbitrage_legs', '_recovery_legs', '_unpriced')
+
+    def __init__(self, snapshot: TickSnapshot, version: int, profit: np.ndarray, tickets: Dict[str, int],
+                 group_ids: tuple, arbitrage: np.ndarray, recovery: np.ndarray, arbitrage_legs: np.ndarray,
+                 recovery_legs: np.ndarray, unpriced: np.ndarray):
+        self.snapshot = snapshot
+        self.version = version
+        self.marked_at = time.monotonic()
+        self.profit = profit                    # per position, NaN if it could not be priced
+        self._tickets = tickets
+        self._group_ids = group_ids
+        self._group_index = {group_id: i for i, group_id in enumerate(group_ids)}
+        self._arbitrage = arbitrage
+        self._recovery = recovery
+        self._arbitrage_legs = arbitrage_legs
+        self._recovery_legs = recovery_legs
+        self._unpriced = unpriced               # legs per group without a price in this snapshot
+
+    def position(self, ticket) -> Optional[float]:
+        """Local profit of a position, or None if unknown / unpriced"""
+        i = self._tickets.get(str(ticket))
+        if i is None or not np.isfinite(self.profit[i]):
+            return None
+        return float(self.profit[i])
+
+    def get(self, group_id: str) -> Optional[GroupPnL]:
+        """Group PnL from local marks, or None if the group is unknown or a leg could not be priced"""
+        i = self._group_index.get(group_id)
+        if i is None:
+            i = self._group_index.get(normalize_group_id(group_id))
+        if i is None or self._unpriced[i]:
+            return None
+        pnl = GroupPnL(self._group_ids[i])
+        pnl.arbitrage_pnl = float(self._arbitrage[i])
+        pnl.recovery_pnl = float(self._recovery[i])
+        pnl.arbitrage_legs = int(self._arbitrage_legs[i])
+        pnl.recovery_legs = int(self._recovery_legs[i])
+        return pnl
+
+    def net(self, group_id: str) -> Optional[float]:
+        pnl = self.get(group_id)
+        return pnl.net_pnl if pnl is not None else None
+
+    def __len__(self) -> int:
+        return len(self.profit)
+
+
+class MarkToMarketEngine:
+    """
+    Local tick-level PnL for open positions.
+
+    Usage:
+        mtm = MarkToMarketEngine(broker, reconcile_interval=30.0)
+        mtm.sync(group_pnl_table)                  # each position snapshot (reconciles when due)
+        tick_watcher.subscribe(mtm.on_tick)        # marks every tick
+        mtm.mark(tick_snapshot).net('group_triangle_1_1')
+        mtm.get_drift_report()
+    """
+
+    def __init__(self, broker, reconcile_interval: float = 30.0, drift_alert: float = 5.0,
+                 correct_drift: bool = True, max_age: float = 0.05, history: int = 200):
+        """
+        Args:
+            broker: BrokerAPI (or ReplayBroker) providing get_rate_table()
+            reconcile_interval: Seconds between comparisons with MT5 profit
+            drift_alert: |drift| in USD per position that is logged and counted
+            correct_drift: Absorb the measured drift into a per-position offset
+            max_age: max_age for the broker's rate table reads
+            history: Drift records kept for the worst-positions report
+        """
+        self.broker = broker
+        self.reconcile_interval = reconcile_interval
+        self.drift_alert = drift_alert
+        self.correct_drift = correct_drift
+        self.max_age = max_age
+        self.logger = logging.getLogger(__name__)
+
+        self._lock = threading.Lock()
+        self._version = 0
+        self._tickets: Dict[str, int] = {}
+        self._symbols: tuple = ()
+        self._sign = np.empty(0)
+        self._volume = np.empty(0)
+        self._open = np.empty(0)
+        self._offset = np.empty(0)
+        self._group = np.empty(0, dtype=np.int64)       # group row, -1 = no group
+        self._recovery = np.empty(0, dtype=bool)
+        self._group_ids: tuple = ()
+        self._rows = (None, None)                      # (tick snapshot symbols, position rows) for this version
+        self._moves = (None, None)                     # (rate table, per-position move values) for this version
+        self._latest: Optional[MarkTable] = None
+        self._last_reconcile = -float('inf')
+
+        self._drift = Histogram('mtm.drift_abs', unit='usd')
+        self._drift_records = deque(maxlen=history)
+        self._symbol_drift: Dict[str, list] = {}       # symbol -> [samples, sum |drift|, max |drift|]
+        self._group_drift: Dict[str, float] = {}       # group -> summed drift at the last reconciliation
+        self._signed_drift = 0.0
+
+        self.stats = {'syncs': 0, 'marks': 0, 'hits': 0, 'unpriced': 0, 'reconciliations': 0,
+                      'compared': 0, 'drift_alerts': 0, 'errors': 0}
+
+    def configure(self, reconcile_interval: float = None, drift_alert: float = None, correct_drift: bool = None):
+        """Change reconciliation settings (config hot reload)"""
+        if reconcile_interval is not None:
+            self.reconcile_interval = reconcile_interval
+        if drift_alert is not None:
+            self.drift_alert = drift_alert
+        if correct_drift is not None:
+            self.correct_drift = correct_drift
+
+    # ------------------------------------------------------------------
+    # Positions
+    # ------------------------------------------------------------------
+    def sync(self, table: GroupPnLTable, force_reconcile: bool = False) -> bool:
+        """
+        Take the open positions (and their groups) from a position snapshot.
+
+        Offsets of known tickets are kept; new tickets start at pure local math.
+        Reconciles against the snapshot's MT5 profit when reconcile_interval passed.
+
+        Args:
+            table: GroupPnLTable of the latest position snapshot
+            force_reconcile: Reconcile now regardless of the interval
+
+        Returns:
+            True if this sync reconciled
+        """
+        try:
+            group_of = {}
+            group_ids = tuple(table.groups)
+            for i, pnl in enumerate(table.groups.values()):
+                for pos in pnl.positions:
+                    group_of[id(pos)] = i
+
+            positions = [pos for pos in table.snapshot if pos.get('volume') and pos.get('price')]
+            now = time.monotonic()
+            with self._lock:
+                previous = {ticket: self._offset[i] for ticket, i in self._tickets.items()}
+                self._tickets = {str(pos.get('ticket')): i for i, pos in enumerate(positions)}
+                self._symbols = tuple(pos.get('symbol', '') for pos in positions)
+                self._sign = np.array([1.0 if pos.get('type') == 'BUY' else -1.0 for pos in positions])
+                self._volume = np.array([float(pos['volume']) for pos in positions])
+                self._open = np.array([float(pos['price']) for pos in positions])
+                self._offset = np.array([previous.get(str(pos.get('ticket')), 0.0) for pos in positions])
+                self._group = np.array([group_of.get(id(pos), -1) for pos in positions], dtype=np.int64)
+                self._recovery = np.array([triangle_number_from_magic(pos.get('magic', 0)) is None
+                                           for pos in positions], dtype=bool)
+                self._group_ids = group_ids
+                self._version += 1
+                self._rows = (None, None)
+                self._moves = (None, None)
+                self.stats['syncs'] += 1
+
+                reconcile = force_reconcile or now - self._last_reconcile >= self.reconcile_interval
+                if reconcile and positions:
+                    self._reconcile(positions)
+                    self._last_reconcile = now
+                return reconcile and bool(positions)
+        except Exception as e:
+            self.stats['errors'] += 1
+            self.logger.error(f"Error syncing mark-to-market positions: {e}")
+            return False
+
+    def _reconcile(self, positions):
+        """Compare local profit at MT5's price_current with MT5 profit (caller holds the lock)"""
+        rates = self.broker.get_rate_table(max_age=self.max_age)
+        moves = self._move_values(rates)
+        current = np.array([pos.get('current_price') or np.nan for pos in positions], dtype=float)
+        mt5_profit = np.array([pos.get('profit', 0.0) or 0.0 for pos in positions], dtype=float)
+        local = (current - self._open) * self._sign * self._volume * moves
+        comparable = np.isfinite(local)
+        drift = mt5_profit - (local + self._offset)
+
+        group_drift = {}
+        for i in np.flatnonzero(comparable):
+            value = float(drift[i])
+            magnitude = abs(value)
+            symbol = self._symbols[i]
+            self._drift.record(magnitude)
+            self._signed_drift += value
+            entry = self._symbol_drift.setdefault(symbol, [0, 0.0, 0.0])
+            entry[0] += 1
+            entry[1] += magnitude
+            entry[2] = max(entry[2], magnitude)
+            if self._group[i] >= 0:
+                group_id = self._group_ids[self._group[i]]
+                group_drift[group_id] = group_drift.get(group_id, 0.0) + value
+            self._drift_records.append({
+                'ticket': positions[i].get('ticket'), 'symbol': symbol,
+                'local': float(local[i] + self._offset[i]), 'mt5': float(mt5_profit[i]), 'drift': value
+            })
+            if magnitude > self.drift_alert:
+                self.stats['drift_alerts'] += 1
+                self.logger.warning(f"⚠️ MTM drift {symbol} #{positions[i].get('ticket')}: local "
+                                    f"${local[i] + self._offset[i]:.2f} vs MT5 ${mt5_profit[i]:.2f} ({value:+.2f})")
+
+        if self.correct_drift:
+            self._offset = np.where(comparable, mt5_profit - local, self._offset)
+        self._group_drift = group_drift
+        self.stats['reconciliations'] += 1
+        self.stats['compared'] += int(comparable.sum())
+
+    # ------------------------------------------------------------------
+    # Marking
+    # ------------------------------------------------------------------
+    def mark(self, snapshot: TickSnapshot, rates=None) -> MarkTable:
+        """
+        Local PnL of every synced position at a tick snapshot (cached per snapshot object).
+
+        Args:
+            snapshot: Tick snapshot covering the position symbols
+            rates: RateTable for the quote->USD conversion (default: broker's current table)
+        """
+        latest = self._latest
+        if latest is not None and latest.snapshot is snapshot and latest.version == self._version:
+            self.stats['hits'] += 1
+            return latest
+
+        if rates is None:
+            rates = self.broker.get_rate_table(max_age=self.max_age)
+        with self._lock:
+            rows = self._rows_for(snapshot)
+            priced = rows >= 0
+            safe_rows = np.where(priced, rows, 0)
+            bid = np.where(priced, snapshot.bid[safe_rows] if len(snapshot) else np.nan, np.nan)
+            ask = np.where(priced, snapshot.ask[safe_rows] if len(snapshot) else np.nan, np.nan)
+            close = np.where(self._sign > 0, bid, ask)
+            profit = (close - self._open) * self._sign * self._volume * self._move_values(rates) + self._offset
+
+            groups = len(self._group_ids)
+            grouped = self._group >= 0
+            ok = np.isfinite(profit)
+            arbitrage = grouped & ~self._recovery
+            recovery = grouped & self._recovery
+            table = MarkTable(
+                snapshot, self._version, profit, self._tickets, self._group_ids,
+                np.bincount(self._group[arbitrage & ok], weights=profit[arbitrage & ok], minlength=groups),
+                np.bincount(self._group[recovery & ok], weights=profit[recovery & ok], minlength=groups),
+                np.bincount(self._group[arbitrage], minlength=groups),
+                np.bincount(self._group[recovery], minlength=groups),
+                np.bincount(self._group[grouped & ~ok], minlength=groups)
+            )
+            self._latest = table
+            self.stats['marks'] += 1
+            if not ok.all():
+                self.stats['unpriced'] += 1
+            return table
+
+    def on_tick(self, event):
+        """TickWatcher listener - marks the event's snapshot"""
+        if not self._tickets:
+            return
+        try:
+            self.mark(event.snapshot)
+        except Exception as e:
+            self.stats['errors'] += 1
+            self.logger.error(f"Error marking positions: {e}")
+
+    def latest(self) -> Optional[MarkTable]:
+        """Most recent mark of the current position set, or None"""
+        latest = self._latest
+        return latest if latest is not None and latest.version == self._version else None
+
+    def get_group_pnl(self, group_id: str) -> Optional[GroupPnL]:
+        """Group PnL from the latest tick, or None if not marked / not fully priced"""
+        latest = self.latest()
+        return latest.get(group_id) if latest is not None else None
+
+    def _rows_for(self, snapshot: TickSnapshot) -> np.ndarray:
+        """Snapshot row of every position (-1 if missing), cached per symbol layout and version"""
+        key, rows = self._rows
+        if rows is None or key != snapshot.symbols:
+            rows = np.array([-1 if row is None else row for row in map(snapshot.index_of, self._symbols)],
+                            dtype=np.int64)
+            self._rows = (snapshot.symbols, rows)
+        return rows
+
+    def _move_values(self, rates) -> np.ndarray:
+        """USD per 1.0 price change of each position's volume unit (NaN if unknown)"""
+        cached_rates, moves = self._moves
+        if moves is not None and cached_rates is rates:
+            return moves
+        per_symbol = {}
+        for symbol in set(self._symbols):
+            value = rates.move_value(symbol) if rates is not None else None
+            per_symbol[symbol] = value if value else np.nan
+        moves = np.array([per_symbol[symbol] for symbol in self._symbols], dtype=float)
+        self._moves = (rates, moves)
+        return moves
+
+    # ------------------------------------------------------------------
+    # Reporting
+    # ------------------------------------------------------------------
+    def get_drift_report(self) -> Dict:
+        """
+        Local vs MT5 profit drift.
+
+        Returns:
+            Dict: reconciliations, |drift| distribution (USD), mean signed drift,
+                  per-symbol / per-group drift and the worst recent positions
+        """
+        with self._lock:
+            compared = self.stats['compared']
+            report = {
+                'reconciliations': self.stats['reconciliations'],
+                'compared': compared,
+                'alerts': self.stats['drift_alerts'],
+                'last_reconcile_age_s': (time.monotonic() - self._last_reconcile
+                                         if self.stats['reconciliations'] else None),
+                'drift_abs_usd': self._drift.snapshot(),
+                'mean_drift_usd': self._signed_drift / compared if compared else 0.0,
+                'by_symbol': {symbol: {'samples': n, 'mean_abs_usd': total / n, 'max_abs_usd': worst}
+                              for symbol, (n, total, worst) in self._symbol_drift.items()},
+                'by_group': dict(self._group_drift),
+                'worst': sorted(self._drift_records, key=lambda r: abs(r['drift']), reverse=True)[:10]
+            }
+        return report
+
+    def get_stats(self) -> Dict:
+        stats = dict(self.stats)
+        stats['positions'] = len(self._tickets)
+        stats['groups'] = len(self._group_ids)
+        return stats
@@ -0,0 +1,217 @@
+"""
+MT5 Process Bridge
+==================
+
+Runs the MetaTrader5 package in a separate worker process and exposes it to
+the trading process as a drop-in replacement for the ``mt5`` module.
+
+Key Features:
+- Terminal calls execute in their own process, talking over a Pipe
+- Same attribute surface as the module (functions and constants)
+- Results converted to picklable namespaces (attribute access unchanged)
+- Stalled calls time out and the worker is restarted without touching
+  the strategy threads
+- A stalled order_send raises MT5OrderOutcomeUnknown: the terminal may
+  have executed it, so the caller must reconcile instead of assuming failure
+"""
+
+import functools
+import logging
+import multiprocessing
+import threading
+import time
+from types import SimpleNamespace
+from typing import Callable, Dict, Optional
+
+# Marker sent by the worker when an attribute is a function
+_CALLABLE = '__callable__'
+
+
+def _to_portable(value):
+    """Convert MT5 result objects (named tuples) into picklable namespaces"""
+    if hasattr(value, '_asdict'):
+        return SimpleNamespace(**{key: _to_portable(item) for key, item in value._asdict().items()})
+    if isinstance(value, tuple):
+        return tuple(_to_portable(item) for item in value)
+    if isinstance(value, list):
+        return [_to_portable(item) for item in value]
+    if isinstance(value, dict):
+        return {key: _to_portable(item) for key, item in value.items()}
+    return value
+
+
+def _bridge_worker(conn):
+    """Worker process main loop: execute ('call'|'getattr', name, args, kwargs) requests"""
+    try:
+        import MetaTrader5 as mt5
+    except ImportError as e:
+        conn.send(('error', f"MetaTrader5 not available in bridge process: {e}"))
+        return
+    conn.send(('ok', 'ready'))
+
+    while True:
+        try:
+            message = conn.recv()
+        except (EOFError, OSError):
+            break
+        if message is None:
+            break
+
+        op, name, args, kwargs = message
+        try:
+            if op == 'getattr':
+                if not hasattr(mt5, name):
+                    conn.send(('missing', name))
+                    continue
+                value = getattr(mt5, name)
+                conn.send(('ok', _CALLABLE if callable(value) else value))
+            else:
+                result = getattr(mt5, name)(*args, **kwargs)
+                conn.send(('ok', _to_portable(result)))
+        except Exception as e:
+            conn.send(('error', f"{name}: {e!r}"))
+
+    try:
+        mt5.shutdown()
+    except Exception:
+        pass
+
+
+class MT5BridgeError(RuntimeError):
+    """Raised when the bridge process reports an error or is unavailable."""
+
+
+class MT5OrderOutcomeUnknown(TimeoutError):
+    """Raised when order_send stalled - the order may or may not have been executed."""
+
+
+class MT5ProcessBridge:
+    """
+    ``mt5``-compatible proxy backed by a worker process.
+
+    Usage:
+        mt5_proxy = MT5ProcessBridge(call_timeout=30.0, on_restart=callback)
+        tick = mt5_proxy.symbol_info_tick('EURUSD')
+        mt5_proxy.ORDER_TYPE_BUY
+    """
+
+    def __init__(self, call_timeout: float = 30.0, start_timeout: float = 30.0,
+                 on_restart: Optional[Callable[[], None]] = None):
+        """
+        Args:
+            call_timeout: Seconds before a call is considered stalled and the worker restarted
+            start_timeout: Seconds to wait for a new worker to import MetaTrader5
+            on_restart: Called after a stalled worker has been replaced
+        """
+        self._call_timeout = call_timeout
+        self._start_timeout = start_timeout
+        self._on_restart = on_restart
+        self._logger = logging.getLogger(__name__)
+
+        self._lock = threading.RLock()
+        self._process: Optional[multiprocessing.Process] = None
+        self._conn = None
+        self._attributes: Dict[str, object] = {}
+        self.restarts = 0
+
+    def start(self):
+        """Start the worker process (idempotent)"""
+        with self._lock:
+            if self._process is not None and self._process.is_alive():
+                return
+            parent_conn, child_conn = multiprocessing.Pipe()
+            process = multiprocessing.Process(target=_bridge_worker, args=(child_conn,),
+                                              name="MT5Bridge", daemon=True)
+            process.start()
+            child_conn.close()
+            self._process = process
+            self._conn = parent_conn
+
+            if not parent_conn.poll(self._start_timeout):
+                self._kill()
+                raise MT5BridgeError("MT5 bridge process did not start")
+            status, payload = parent_conn.recv()
+            if status != 'ok':
+                self._kill()
+                raise MT5BridgeError(payload)
+            self._logger.info(f"🚀 MT5 bridge process started (pid {process.pid})")
+
+    def stop(self):
+        """Stop the worker process"""
+        with self._lock:
+            if self._conn is not None:
+                try:
+                    self._conn.send(None)
+                except (OSError, BrokenPipeError):
+                    pass
+            if self._process is not None:
+                self._process.join(timeout=5.0)
+            self._kill()
+
+    def restart(self):
+        """Kill the worker and start a fresh one"""
+        with self._lock:
+            self._logger.warning("🔄 Restarting MT5 bridge process")
+            self._kill()
+            self.restarts += 1
+            self.start()
+        if self._on_restart:
+            try:
+                self._on_restart()
+            except Exception as e:
+                self._logger.error(f"Error in MT5 bridge restart callback: {e}")
+
+    def is_alive(self) -> bool:
+        """True if the worker process is running"""
+        return self._process is not None and self._process.is_alive()
+
+    def __getattr__(self, name: str):
+        if name.startswith('_'):
+            raise AttributeError(name)
+        if name not in self._attributes:
+            status, payload = self._request('getattr', name)
+            if status == 'missing':
+                raise AttributeError(name)
+            self._attributes[name] = payload
+        value = self._attributes[name]
+        if value == _CALLABLE:
+            return functools.partial(self._call, name)
+        return value
+
+    def _call(self, name: str, *args, **kwargs):
+        status, payload = self._request('call', name, args, kwargs)
+        if status != 'ok':
+            raise MT5BridgeError(payload)
+        return payload
+
+    def _request(self, op: str, name: str, args: tuple = (), kwargs: dict = None):
+        with self._lock:
+            if not self.is_alive():
+                self.start()
+            started = time.perf_counter()
+            try:
+                self._conn.send((op, name, args, kwargs or {}))
+                if self._conn.poll(self._call_timeout):
+                    return self._conn.recv()
+            except (EOFError, OSError, BrokenPipeError) as e:
+                self._logger.error(f"❌ MT5 bridge pipe error during {name}: {e}")
+            else:
+                elapsed = time.perf_counter() - started
+                self._logger.error(f"❌ MT5 bridge call {name} stalled for {elapsed:.1f}s")
+        # Stalled or broken worker - replace it and fail this call
+        self.restart()
+        if op == 'call' and name == 'order_send':
+            raise MT5OrderOutcomeUnknown("MT5 bridge order_send did not complete - outcome unknown")
+        raise TimeoutError(f"MT5 bridge call {name} did not complete")
+
+    def _kill(self):
+        if self._process is not None and self._process.is_alive():
+            self._process.terminate()
+            self._process.join(timeout=2.0)
+        if self._conn is not None:
+            try:
+                self._conn.close()
+            except OSError:
+                pass
+        self._process = None
+        self._conn = None
@@ -0,0 +1,227 @@
+"""
+MT5 Gateway
+===========
+
+Single thread that owns every MetaTrader5 call, served from a priority queue
+so an order send never waits behind a chart refresh.
+
+Key Features:
+- Priorities: order send/close > ticks > positions/account > history
+- Coalescing of identical pending reads (one terminal call, many waiters)
+- Re-entrant: calls made from the gateway thread itself run inline
+- Per-priority queue depth, wait time and service time statistics
+- Order-priority callers wait for the outcome (no timeout): an order still
+  queued or running would otherwise be reported as failed and may fill
+"""
+
+import itertools
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Callable, Dict, Hashable, Optional
+
+# Request priorities (lower value = served first)
+PRIORITY_ORDER = 0       # order_send / close / cancel / connect
+PRIORITY_TICKS = 1       # symbol_info_tick
+PRIORITY_POSITIONS = 2   # positions_get / orders_get / account_info
+PRIORITY_HISTORY = 3     # copy_rates_* / symbols_get / symbol_info
+
+PRIORITY_NAMES = {
+    PRIORITY_ORDER: 'order',
+    PRIORITY_TICKS: 'ticks',
+    PRIORITY_POSITIONS: 'positions',
+    PRIORITY_HISTORY: 'history'
+}
+
+
+class _GatewayRequest:
+    """One queued call."""
+
+    __slots__ = ('priority', 'func', 'args', 'kwargs', 'coalesce_key', 'future', 'enqueued_at')
+
+    def __init__(self, priority: int, func: Callable, args: tuple, kwargs: dict, coalesce_key: Optional[Hashable]):
+        self.priority = priority
+        self.func = func
+        self.args = args
+        self.kwargs = kwargs
+        self.coalesce_key = coalesce_key
+        self.future = Future()
+        self.enqueued_at = time.perf_counter()
+
+
+class MT5Gateway:
+    """
+    Dedicated worker thread for terminal calls.
+
+    Usage:
+        gateway = MT5Gateway()
+        tick = gateway.call(PRIORITY_TICKS, mt5.symbol_info_tick, 'EURUSD',
+                            coalesce_key=('tick', 'EURUSD'))
+    """
+
+    def __init__(self, enabled: bool = True, call_timeout: float = 30.0):
+        """
+        Args:
+            enabled: False to execute calls directly on the caller's thread
+            call_timeout: Seconds a caller waits for a non-order result before TimeoutError
+        """
+        self.enabled = enabled
+        self.call_timeout = call_timeout
+        self.logger = logging.getLogger(__name__)
+
+        self._queue: "queue.PriorityQueue" = queue.PriorityQueue()
+        self._sequence = itertools.count()
+        self._pending: Dict[Hashable, _GatewayRequest] = {}
+        self._pending_lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._thread_ident: Optional[int] = None
+        self._running = False
+        self._start_lock = threading.Lock()
+
+        self._stats_lock = threading.Lock()
+        self.stats = {
+            name: {
+                'requests': 0,
+                'coalesced': 0,
+                'errors': 0,
+                'queue_depth': 0,
+                'max_queue_depth': 0,
+                'total_wait_ms': 0.0,
+                'max_wait_ms': 0.0,
+                'total_service_ms': 0.0,
+                'max_service_ms': 0.0
+            }
+            for name in PRIORITY_NAMES.values()
+        }
+
+    def start(self):
+        """Start the gateway thread (idempotent)"""
+        with self._start_lock:
+            if self._running:
+                return
+            self._running = True
+            self._thread = threading.Thread(target=self._run, name="MT5Gateway", daemon=True)
+            self._thread.start()
+            self.logger.info("🚀 MT5 gateway thread started")
+
+    def stop(self, timeout: float = 5.0):
+        """Stop the gateway thread after the queue drains"""
+        with self._start_lock:
+            if not self._running:
+                return
+            self._running = False
+            self._queue.put((float('inf'), next(self._sequence), None))
+        if self._thread:
+            self._thread.join(timeout=timeout)
+        self.logger.info("🛑 MT5 gateway thread stopped")
+
+    def call(self, priority: int, func: Callable, *args, coalesce_key: Optional[Hashable] = None,
+             timeout: float = None, **kwargs):
+        """
+        Run func(*args, **kwargs) on the gateway thread and return its result.
+
+        Args:
+            priority: One of the PRIORITY_* constants
+            func: Terminal function (or a function making several terminal calls)
+            coalesce_key: Identical keys share one pending call (never set for order sends)
+            timeout: Override for call_timeout (PRIORITY_ORDER calls default to no timeout)
+        """
+        if not self.enabled or threading.get_ident() == self._thread_ident:
+            return func(*args, **kwargs)
+
+        if not self._running:
+            self.start()
+
+        request = None
+        if coalesce_key is not None:
+            with self._pending_lock:
+                existing = self._pending.get(coalesce_key)
+                if existing is not None:
+                    self._record_coalesced(priority)
+                    request = existing
+                else:
+                    request = _GatewayRequest(priority, func, args, kwargs, coalesce_key)
+                    self._pending[coalesce_key] = request
+                    self._enqueue(request)
+        else:
+            request = _GatewayRequest(priority, func, args, kwargs, None)
+            self._enqueue(request)
+
+        if timeout is None and priority != PRIORITY_ORDER:
+            timeout = self.call_timeout
+        return request.future.result(timeout=timeout)
+
+    def get_stats(self) -> Dict:
+        """Per-priority queue depth, wait and service times (ms)"""
+        with self._stats_lock:
+            result = {}
+            for name, data in self.stats.items():
+                served = data['requests'] or 1
+                result[name] = {
+                    'requests': data['requests'],
+                    'coalesced': data['coalesced'],
+                    'errors': data['errors'],
+                    'queue_depth': data['queue_depth'],
+                    'max_queue_depth': data['max_queue_depth'],
+                    'avg_wait_ms': data['total_wait_ms'] / served,
+                    'max_wait_ms': data['max_wait_ms'],
+                    'avg_service_ms': data['total_service_ms'] / served,
+                    'max_service_ms': data['max_service_ms']
+                }
+            return result
+
+    def _enqueue(self, request: _GatewayRequest):
+        with self._stats_lock:
+            data = self.stats[PRIORITY_NAMES[request.priority]]
+            data['queue_depth'] += 1
+            data['max_queue_depth'] = max(data['max_queue_depth'], data['queue_depth'])
+        self._queue.put((request.priority, next(self._sequence), request))
+
+    def _record_coalesced(self, priority: int):
+        with self._stats_lock:
+            self.stats[PRIORITY_NAMES[priority]]['coalesced'] += 1
+
+    def _run(self):
+        """Gateway loop - the only place terminal calls are executed"""
+        self._thread_ident = threading.get_ident()
+        while True:
+            _, _, request = self._queue.get()
+            if request is None:
+                if not self._running:
+                    break
+                continue
+
+            started = time.perf_counter()
+            error = None
+            try:
+                result = request.func(*request.args, **request.kwargs)
+            except BaseException as e:  # propagate everything to the caller
+                error = e
+            finished = time.perf_counter()
+
+            if request.coalesce_key is not None:
+                with self._pending_lock:
+                    if self._pending.get(request.coalesce_key) is request:
+                        del self._pending[request.coalesce_key]
+
+            if error is not None:
+                request.future.set_exception(error)
+            else:
+                request.future.set_result(result)
+
+            wait_ms = (started - request.enqueued_at) * 1000
+            service_ms = (finished - started) * 1000
+            with self._stats_lock:
+                data = self.stats[PRIORITY_NAMES[request.priority]]
+                data['queue_depth'] -= 1
+                data['requests'] += 1
+                data['total_wait_ms'] += wait_ms
+                data['max_wait_ms'] = max(data['max_wait_ms'], wait_ms)
+                data['total_service_ms'] += service_ms
+                data['max_service_ms'] = max(data['max_service_ms'], service_ms)
+                if error is not None:
+                    data['errors'] += 1
+
+        self._thread_ident = None
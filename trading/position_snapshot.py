@@ -0,0 +1,142 @@
+"""
+Position Snapshot
+=================
+
+One immutable view of the open MT5 positions, taken once per trading cycle
+and shared by every component that needs position data.
+
+Key Features:
+- Single positions_get() per cycle instead of one per consumer / per leg
+- Pre-built indexes by ticket, magic number and comment type
+- Immutable: positions are stored as a tuple and indexes as read-only mappings
+- Age tracking so callers can decide whether a snapshot is still usable
+"""
+
+import time
+from types import MappingProxyType
+from typing import Dict, Iterable, List, Optional, Tuple
+
+# Comment types used by the by_comment_type index
+COMMENT_TYPE_ARBITRAGE = 'ARBITRAGE'
+COMMENT_TYPE_RECOVERY = 'RECOVERY'
+
+
+def classify_comment(comment: str) -> str:
+    """
+    Classify a position comment as arbitrage or recovery.
+
+    Uses the same rules as IndividualOrderTracker._is_recovery_comment:
+    'RECOVERY_...', 'R...' or anything containing 'RECOVERY'.
+
+    Args:
+        comment: MT5 position comment
+
+    Returns:
+        str: COMMENT_TYPE_RECOVERY or COMMENT_TYPE_ARBITRAGE
+    """
+    if comment and (comment.startswith('R') or 'RECOVERY' in comment.upper()):
+        return COMMENT_TYPE_RECOVERY
+    return COMMENT_TYPE_ARBITRAGE
+
+
+class PositionSnapshot:
+    """
+    Immutable snapshot of open positions with lookup indexes.
+
+    Positions are the same dicts produced by BrokerAPI.get_all_positions().
+    Consumers must treat them as read-only; use to_list() to get copies.
+    """
+
+    __slots__ = ('positions', 'taken_at', 'taken_at_wall', '_by_ticket', '_by_magic', '_by_comment_type')
+
+    def __init__(self, positions: Iterable[Dict], taken_at: float = None):
+        """
+        Build the snapshot and its indexes.
+
+        Args:
+            positions: Position dicts (ticket, symbol, type, volume, profit, magic, comment, ...)
+            taken_at: time.monotonic() timestamp of the read (defaults to now)
+        """
+        self.positions: Tuple[Dict, ...] = tuple(positions or ())
+        self.taken_at = taken_at if taken_at is not None else time.monotonic()
+        self.taken_at_wall = time.time()
+
+        by_ticket: Dict[str, Dict] = {}
+        by_magic: Dict[int, List[Dict]] = {}
+        by_comment_type: Dict[str, List[Dict]] = {
+            COMMENT_TYPE_ARBITRAGE: [],
+            COMMENT_TYPE_RECOVERY: []
+        }
+        for pos in self.positions:
+            by_ticket[str(pos.get('ticket', ''))] = pos
+            by_magic.setdefault(pos.get('magic', 0), []).append(pos)
+            by_comment_type[classify_comment(pos.get('comment', ''))].append(pos)
+
+        self._by_ticket = MappingProxyType(by_ticket)
+        self._by_magic = MappingProxyType({k: tuple(v) for k, v in by_magic.items()})
+        self._by_comment_type = MappingProxyType({k: tuple(v) for k, v in by_comment_type.items()})
+
+    @classmethod
+    def empty(cls) -> 'PositionSnapshot':
+        """Snapshot with no positions (used when the broker is disconnected)"""
+        return cls(())
+
+    @property
+    def by_ticket(self) -> MappingProxyType:
+        """Read-only mapping: str(ticket) -> position"""
+        return self._by_ticket
+
+    @property
+    def by_magic(self) -> MappingProxyType:
+        """Read-only mapping: magic -> tuple of positions"""
+        return self._by_magic
+
+    @property
+    def by_comment_type(self) -> MappingProxyType:
+        """Read-only mapping: ARBITRAGE/RECOVERY -> tuple of positions"""
+        return self._by_comment_type
+
+    def get_by_ticket(self, ticket) -> Optional[Dict]:
+        """Return the position for a ticket (int or str), or None"""
+        return self._by_ticket.get(str(ticket))
+
+    def has_ticket(self, ticket) -> bool:
+        """True if the ticket is still open in this snapshot"""
+        return str(ticket) in self._by_ticket
+
+    def get_by_magic(self, magic: int) -> Tuple[Dict, ...]:
+        """Return all positions opened with a magic number"""
+        return self._by_magic.get(magic, ())
+
+    def get_recovery_positions(self) -> Tuple[Dict, ...]:
+        """Return all recovery positions (comment R... / RECOVERY_...)"""
+        return self._by_comment_type[COMMENT_TYPE_RECOVERY]
+
+    def get_arbitrage_positions(self) -> Tuple[Dict, ...]:
+        """Return all non-recovery positions"""
+        return self._by_comment_type[COMMENT_TYPE_ARBITRAGE]
+
+    def active_magics(self) -> frozenset:
+        """Set of magic numbers that currently have open positions"""
+        return frozenset(self._by_magic.keys())
+
+    def age(self) -> float:
+        """Seconds since this snapshot was taken"""
+        return time.monotonic() - self.taken_at
+
+    def is_fresh(self, max_age: float) -> bool:
+        """True if the snapshot is not older than max_age seconds"""
+        return self.age() <= max_age
+
+    def to_list(self) -> List[Dict]:
+        """Return mutable copies of the positions (get_all_positions() format)"""
+        return [dict(pos) for pos in self.positions]
+
+    def __len__(self) -> int:
+        return len(self.positions)
+
+    def __iter__(self):
+        return iter(self.positions)
+
+    def __bool__(self) -> bool:
+        return bool(self.positions)
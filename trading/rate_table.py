@@ -0,0 +1,195 @@
+"""
+Rate Table
+==========
+
+Cross-rate matrix and per-lot pip values derived from one TickSnapshot, so
+lot and hedge sizing are array lookups instead of price reads per symbol.
+
+Key Features:
+- USD value of the eight major currencies from the seven USD majors
+  (EURUSD, GBPUSD, AUDUSD, NZDUSD, USDJPY, USDCHF, USDCAD)
+- Cross-rate matrix: rate(a, b) = units of b per unit of a
+- Per-lot pip value (USD) for every symbol in the snapshot:
+  contract_size x pip_size x USD value of the quote currency
+- Per-lot move value (USD per 1.0 price change) for local mark-to-market
+- Symbol layout (currencies, contract x pip size) cached per symbol set;
+  a new snapshot only recomputes the USD values (8 divisions)
+- Majors missing from the snapshot fall back to TradingCalculations.FALLBACK_RATES
+"""
+
+import logging
+import threading
+from typing import Callable, Dict, Iterable, Optional, Tuple
+
+import numpy as np
+
+from trading.symbol_registry import SymbolMetadata
+from trading.tick_snapshot import TickSnapshot
+from utils.calculations import TradingCalculations
+
+CURRENCIES = ('USD', 'EUR', 'GBP', 'AUD', 'NZD', 'JPY', 'CHF', 'CAD')
+USD_MAJORS = ('EURUSD', 'GBPUSD', 'AUDUSD', 'NZDUSD', 'USDJPY', 'USDCHF', 'USDCAD')
+
+_CURRENCY_INDEX = {currency: i for i, currency in enumerate(CURRENCIES)}
+# (major, currency row, True if USD is the base - currency value = 1 / bid)
+_MAJOR_ROWS = tuple((major, _CURRENCY_INDEX[major[:3]] if major[3:] == 'USD' else _CURRENCY_INDEX[major[3:]],
+                     major[:3] == 'USD') for major in USD_MAJORS)
+
+
+class _SymbolLayout:
+    """Static per-row data for one snapshot symbol set (reused while the set is unchanged)."""
+
+    __slots__ = ('symbols', 'base', 'quote', 'pip_unit', 'contract')
+
+    def __init__(self, symbols: Tuple[str, ...], metadata: Callable[[str], Optional[SymbolMetadata]]):
+        count = len(symbols)
+        self.symbols = symbols
+        self.base = np.full(count, -1, dtype=np.int64)
+        self.quote = np.full(count, -1, dtype=np.int64)
+        self.pip_unit = np.full(count, np.nan)        # contract_size x pip_size of 1 lot
+        self.contract = np.full(count, 100000.0)      # contract_size of 1 lot
+        for i, symbol in enumerate(symbols):
+            meta = metadata(symbol) if metadata else None
+            name = symbol.upper()
+            base = (meta.currency_base if meta is not None and meta.currency_base else name[:3]).upper()
+            quote = (meta.currency_profit if meta is not None and meta.currency_profit else name[3:6]).upper()
+            self.base[i] = _CURRENCY_INDEX.get(base, -1)
+            self.quote[i] = _CURRENCY_INDEX.get(quote, -1)
+            if meta is not None:
+                self.pip_unit[i] = meta.contract_size * meta.pip_size
+                self.contract[i] = meta.contract_size
+            elif len(name) >= 6:
+                self.pip_unit[i] = 100000 * (0.01 if quote == 'JPY' else 0.0001)
+
+
+class RateTable:
+    """
+    Immutable cross rates and pip values for one TickSnapshot.
+
+    Usage:
+        rates = broker.get_rate_table()
+        rates.rate('EUR', 'JPY')
+        rates.pip_value('EURGBP', lot_size=0.1)
+    """
+
+    __slots__ = ('snapshot', 'usd_value', 'cross', 'pip_values', 'move_values', 'fallback_currencies')
+
+    def __init__(self, snapshot: TickSnapshot, layout: _SymbolLayout):
+        self.snapshot = snapshot
+
+        usd_value = np.ones(len(CURRENCIES))
+        fallback = []
+        for major, row, usd_base in _MAJOR_ROWS:
+            i = snapshot.index_of(major)
+            bid = snapshot.bid[i] if i is not None else np.nan
+            if not bid > 0:
+                bid = TradingCalculations.FALLBACK_RATES[major]
+                fallback.append(CURRENCIES[row])
+            usd_value[row] = 1.0 / bid if usd_base else bid
+        usd_value.flags.writeable = False
+        self.usd_value = usd_value
+        self.fallback_currencies = tuple(fallback)
+
+        # cross[a, b] = units of b per unit of a
+        self.cross = usd_value[:, None] / usd_value[None, :]
+        self.cross.flags.writeable = False
+
+        quote = layout.quote
+        pip_values = np.full(len(quote), np.nan)
+        known = quote >= 0
+        pip_values[known] = layout.pip_unit[known] * usd_value[quote[known]]
+        pip_values.flags.writeable = False
+        self.pip_values = pip_values
+
+        # USD per 1.0 price change of 1 lot
+        move_values = np.full(len(quote), np.nan)
+        move_values[known] = layout.contract[known] * usd_value[quote[known]]
+        move_values.flags.writeable = False
+        self.move_values = move_values
+
+    @property
+    def complete(self) -> bool:
+        """True if every USD major came from the snapshot (no fallback rate)"""
+        return not self.fallback_currencies
+
+    def rate(self, from_currency: str, to_currency: str) -> Optional[float]:
+        """Units of to_currency per unit of from_currency, or None for unknown currencies"""
+        a = _CURRENCY_INDEX.get(from_currency.upper())
+        b = _CURRENCY_INDEX.get(to_currency.upper())
+        if a is None or b is None:
+            return None
+        return float(self.cross[a, b])
+
+    def to_usd(self, currency: str) -> Optional[float]:
+        """USD value of one unit of currency, or None"""
+        i = _CURRENCY_INDEX.get(currency.upper())
+        return float(self.usd_value[i]) if i is not None else None
+
+    def pip_value(self, symbol: str, lot_size: float = 1.0) -> Optional[float]:
+        """Pip value in USD for lot_size lots, or None if the symbol is not in the table"""
+        i = self.snapshot.index_of(symbol)
+        if i is None:
+            return None
+        value = self.pip_values[i]
+        return float(value) * lot_size if value > 0 else None
+
+    def move_value(self, symbol: str, lot_size: float = 1.0) -> Optional[float]:
+        """USD profit of a 1.0 price change for lot_size lots, or None if the symbol is not in the table"""
+        i = self.snapshot.index_of(symbol)
+        if i is None:
+            return None
+        value = self.move_values[i]
+        return float(value) * lot_size if value > 0 else None
+
+    def pip_values_for(self, symbols: Iterable[str]) -> np.ndarray:
+        """Per-lot pip values for several symbols (NaN where unknown)"""
+        rows = [self.snapshot.index_of(symbol) for symbol in symbols]
+        return np.array([self.pip_values[i] if i is not None else np.nan for i in rows])
+
+
+class RateTableCache:
+    """
+    Builds one RateTable per TickSnapshot and keeps the symbol layout between snapshots.
+
+    Brokers own one cache; get_rate_table() passes in their current snapshot.
+    """
+
+    def __init__(self, metadata: Callable[[str], Optional[SymbolMetadata]] = None):
+        """
+        Args:
+            metadata: Lookup returning SymbolMetadata for a snapshot symbol (no I/O), or None
+        """
+        self.metadata = metadata
+        self.logger = logging.getLogger(__name__)
+        self._layout: Optional[_SymbolLayout] = None
+        self._table: Optional[RateTable] = None
+        self._lock = threading.Lock()
+        self.stats = {'builds': 0, 'hits': 0}
+
+    def get(self, snapshot: TickSnapshot) -> RateTable:
+        """RateTable for this snapshot (built once per snapshot object)"""
+        table = self._table
+        if table is not None and table.snapshot is snapshot:
+            self.stats['hits'] += 1
+            return table
+
+        with self._lock:
+            layout = self._layout
+            if layout is None or layout.symbols != snapshot.symbols:
+                layout = _SymbolLayout(snapshot.symbols, self.metadata)
+                self._layout = layout
+            table = RateTable(snapshot, layout)
+            if table.fallback_currencies and (self._table is None or self._table.complete):
+                self.logger.warning(f"⚠️ Using fallback rates for {', '.join(table.fallback_currencies)}")
+            self._table = table
+            self.stats['builds'] += 1
+            return table
+
+    def invalidate(self):
+        """Drop the layout (symbol metadata changed)"""
+        with self._lock:
+            self._layout = None
+            self._table = None
+
+    def get_stats(self) -> Dict:
+        return dict(self.stats)
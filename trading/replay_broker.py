@@ -0,0 +1,537 @@
+"""
+Replay Broker
+=============
+
+Deterministic, terminal-free implementation of the BrokerAPI surface used by
+TriangleArbitrageDetector, CorrelationManager, IndividualOrderTracker and
+PositionManager, driven from recorded ticks (and optional bar files).
+
+Key Features:
+- Replay clock advanced explicitly (step / advance_to / run) - no wall-clock waits
+- Incremental quote updates: one O(1) update per tick event
+- Simulated fills: market orders at ask/bid with slippage, latency and commission
+- Mark-to-market PnL converted to USD, balance/equity/margin bookkeeping
+- Bars served from bar files or aggregated from the replayed ticks
+- Clock, fills and positions guarded by one lock (detector threads share the broker)
+"""
+
+import csv
+import logging
+import threading
+from datetime import datetime
+from typing import Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from trading.position_snapshot import PositionSnapshot
+from trading.tick_snapshot import TickSnapshot
+from trading.symbol_registry import SymbolMetadata
+from trading.rate_table import RateTable, RateTableCache
+from trading.account_state import AccountState
+
+# Timeframe name -> seconds (same names as BrokerAPI.get_historical_data)
+TIMEFRAME_SECONDS = {
+    'M1': 60,
+    'M5': 300,
+    'M15': 900,
+    'M30': 1800,
+    'H1': 3600,
+    'H4': 14400,
+    'D1': 86400
+}
+
+
+def load_ticks_csv(path: str) -> Dict[str, Tuple[np.ndarray, np.ndarray, np.ndarray]]:
+    """
+    Load ticks from a CSV file with columns symbol,time_msc,bid,ask.
+
+    Returns:
+        Dict: symbol -> (time_msc int64, bid float64, ask float64), sorted by time
+    """
+    columns: Dict[str, List[Tuple[int, float, float]]] = {}
+    with open(path, 'r', encoding='utf-8', newline='') as f:
+        for row in csv.DictReader(f):
+            columns.setdefault(row['symbol'], []).append(
+                (int(row['time_msc']), float(row['bid']), float(row['ask']))
+            )
+
+    ticks = {}
+    for symbol, rows in columns.items():
+        data = np.array(rows, dtype=[('time_msc', np.int64), ('bid', np.float64), ('ask', np.float64)])
+        data.sort(order='time_msc', kind='stable')
+        ticks[symbol] = (data['time_msc'].copy(), data['bid'].copy(), data['ask'].copy())
+    return ticks
+
+
+def load_bars_csv(path: str) -> pd.DataFrame:
+    """Load bars from a CSV with columns time,open,high,low,close[,tick_volume] (time in epoch seconds)"""
+    df = pd.read_csv(path)
+    df['time'] = pd.to_datetime(df['time'], unit='s')
+    df.set_index('time', inplace=True)
+    return df
+
+
+class ReplayBroker:
+    """
+    Drop-in broker for offline profiling and load tests.
+
+    Usage:
+        broker = ReplayBroker(load_ticks_csv('data/ticks_2024-01-02.csv'), initial_balance=10000)
+        detector = TriangleArbitrageDetector(broker)
+        broker.run(lambda b: detector.calculate_arbitrage_direction(('EURUSD', 'GBPUSD', 'EURGBP')))
+    """
+
+    def __init__(self, ticks: Dict[str, Tuple[np.ndarray, np.ndarray, np.ndarray]],
+                 bars: Dict[Tuple[str, str], pd.DataFrame] = None,
+                 initial_balance: float = 10000.0, leverage: int = 100, currency: str = 'USD',
+                 slippage_points: float = 0.0, latency_ms: int = 0, commission_per_lot: float = 0.0):
+        """
+        Args:
+            ticks: symbol -> (time_msc, bid, ask) arrays sorted by time
+            bars: Optional (symbol, timeframe) -> DataFrame of recorded bars
+            initial_balance: Starting balance in account currency
+            leverage: Account leverage used for margin
+            currency: Account currency (PnL conversion assumes USD)
+            slippage_points: Adverse slippage applied to every fill, in points
+            latency_ms: Fill at the quote this many ms after the request
+            commission_per_lot: Commission charged per lot on open and on close
+        """
+        self.broker_type = "Replay"
+        self.logger = logging.getLogger(__name__)
+        self.symbol_mapper = None
+        self._connected = False
+        self.account_info = None
+
+        self.initial_balance = float(initial_balance)
+        self.balance = float(initial_balance)
+        self.leverage = leverage
+        self.currency = currency
+        self.slippage_points = slippage_points
+        self.latency_ms = latency_ms
+        self.commission_per_lot = commission_per_lot
+
+        # Per-symbol tick arrays
+        self.symbols: List[str] = sorted(ticks.keys())
+        self._symbol_index = {symbol: i for i, symbol in enumerate(self.symbols)}
+        self._tick_time = [np.asarray(ticks[s][0], dtype=np.int64) for s in self.symbols]
+        self._tick_bid = [np.asarray(ticks[s][1], dtype=np.float64) for s in self.symbols]
+        self._tick_ask = [np.asarray(ticks[s][2], dtype=np.float64) for s in self.symbols]
+        self.bars = bars or {}
+
+        # Merged event timeline (time, symbol id, tick index)
+        if self.symbols:
+            ev_time = np.concatenate(self._tick_time)
+            ev_sym = np.concatenate([np.full(len(t), i, dtype=np.int32) for i, t in enumerate(self._tick_time)])
+            ev_idx = np.concatenate([np.arange(len(t), dtype=np.int64) for t in self._tick_time])
+            order = np.argsort(ev_time, kind='stable')
+            self._ev_time, self._ev_sym, self._ev_idx = ev_time[order], ev_sym[order], ev_idx[order]
+        else:
+            self._ev_time = np.empty(0, dtype=np.int64)
+            self._ev_sym = np.empty(0, dtype=np.int32)
+            self._ev_idx = np.empty(0, dtype=np.int64)
+        self._ev_ptr = 0
+
+        # Current quotes per symbol
+        count = len(self.symbols)
+        self._cur_index = np.full(count, -1, dtype=np.int64)
+        self._bid = np.full(count, np.nan)
+        self._ask = np.full(count, np.nan)
+        self._time_msc = np.zeros(count, dtype=np.int64)
+        self.now_msc = int(self._ev_time[0]) if len(self._ev_time) else 0
+
+        # Orders / positions
+        self._next_ticket = 1000001
+        self.positions: Dict[int, Dict] = {}
+        self.deals: List[Dict] = []
+
+        self._metadata = {symbol: self._default_metadata(symbol) for symbol in self.symbols}
+        self._lock = threading.RLock()      # clock, quotes, positions, deals, balance
+        self._rate_tables = RateTableCache(self._metadata.get)
+
+    # ------------------------------------------------------------------
+    # Replay clock
+    # ------------------------------------------------------------------
+    def step(self) -> bool:
+        """Apply the next tick event; False when the replay is exhausted"""
+        with self._lock:
+            if self._ev_ptr >= len(self._ev_time):
+                return False
+            self._apply_event(self._ev_ptr)
+            self._ev_ptr += 1
+            self.now_msc = int(self._ev_time[self._ev_ptr - 1])
+            return True
+
+    def advance_to(self, time_msc: int):
+        """Apply every tick with time <= time_msc and move the clock there"""
+        with self._lock:
+            end = int(np.searchsorted(self._ev_time, time_msc, side='right'))
+            if end - self._ev_ptr <= 64:
+                for ptr in range(self._ev_ptr, end):
+                    self._apply_event(ptr)
+            else:
+                for i, times in enumerate(self._tick_time):
+                    idx = int(np.searchsorted(times, time_msc, side='right')) - 1
+                    if idx >= 0:
+                        self._cur_index[i] = idx
+                        self._bid[i] = self._tick_bid[i][idx]
+                        self._ask[i] = self._tick_ask[i][idx]
+                        self._time_msc[i] = times[idx]
+            self._ev_ptr = max(self._ev_ptr, end)
+            self.now_msc = max(self.now_msc, int(time_msc))
+
+    def run(self, on_tick: Callable[['ReplayBroker'], None] = None, interval_ms: int = None) -> int:
+        """
+        Replay to the end of the data.
+
+        Args:
+            on_tick: Called after every tick event (or every interval)
+            interval_ms: If set, advance in fixed clock steps instead of per tick
+
+        Returns:
+            int: Number of callback invocations
+        """
+        calls = 0
+        if interval_ms:
+            if not len(self._ev_time):
+                return 0
+            end_time = int(self._ev_time[-1])
+            t = self.now_msc
+            while t <= end_time:
+                self.advance_to(t)
+                if on_tick:
+                    on_tick(self)
+                calls += 1
+                t += interval_ms
+        else:
+            while self.step():
+                if on_tick:
+                    on_tick(self)
+                calls += 1
+        return calls
+
+    def reset(self):
+        """Rewind the clock and clear all positions and deals"""
+        with self._lock:
+            self._ev_ptr = 0
+            self._cur_index[:] = -1
+            self._bid[:] = np.nan
+            self._ask[:] = np.nan
+            self._time_msc[:] = 0
+            self.now_msc = int(self._ev_time[0]) if len(self._ev_time) else 0
+            self.balance = self.initial_balance
+            self.positions = {}
+            self.deals = []
+
+    def now(self) -> datetime:
+        """Replay clock as datetime"""
+        return datetime.fromtimestamp(self.now_msc / 1000.0)
+
+    def _apply_event(self, ptr: int):
+        i = self._ev_sym[ptr]
+        idx = self._ev_idx[ptr]
+        self._cur_index[i] = idx
+        self._bid[i] = self._tick_bid[i][idx]
+        self._ask[i] = self._tick_ask[i][idx]
+        self._time_msc[i] = self._tick_time[i][idx]
+
+    def _quote_at(self, symbol: str, time_msc: int) -> Tuple[Optional[float], Optional[float]]:
+        """Quote in force at an arbitrary time (used for fill latency)"""
+        i = self._symbol_index.get(symbol)
+        if i is None:
+            return None, None
+        idx = int(np.searchsorted(self._tick_time[i], time_msc, side='right')) - 1
+        if idx < 0:
+            return None, None
+        return float(self._tick_bid[i][idx]), float(self._tick_ask[i][idx])
+
+    # ------------------------------------------------------------------
+    # Connection
+    # ------------------------------------------------------------------
+    def connect(self, login: int = None, password: str = None, server: str = None) -> bool:
+        self._connected = True
+        self.account_info = self.get_account_state()
+        return True
+
+    def disconnect(self):
+        self._connected = False
+
+    def is_connected(self) -> bool:
+        return self._connected
+
+    def check_mt5_status(self) -> dict:
+        return {'connected': self._connected, 'mt5_available': False, 'terminal_running': False,
+                'account_connected': self._connected, 'config_valid': True, 'issues': [], 'recommendations': []}
+
+    # ------------------------------------------------------------------
+    # Prices / symbols
+    # ------------------------------------------------------------------
+    def get_available_pairs(self) -> List[str]:
+        return list(self.symbols)
+
+    def get_ticks(self, symbols: List[str], max_age: float = None) -> TickSnapshot:
+        with self._lock:
+            rows = [self._symbol_index[s] for s in dict.fromkeys(symbols) if s in self._symbol_index]
+            names = [self.symbols[i] for i in rows]
+            return TickSnapshot(names, self._bid[rows].copy(), self._ask[rows].copy(), self._time_msc[rows].copy())
+
+    def get_rate_table(self, max_age: float = None) -> RateTable:
+        return self._rate_tables.get(self.get_ticks(self.symbols))
+
+    def get_current_price(self, symbol: str) -> Optional[float]:
+        bid, _ = self._current_quote(symbol)
+        return bid
+
+    def get_spread(self, symbol: str) -> Optional[float]:
+        bid, ask = self._current_quote(symbol)
+        if bid is None:
+            return None
+        return round((ask - bid) * 10000, 2)
+
+    def get_tick_data(self) -> Dict:
+        data = {}
+        for symbol in self.symbols[:10]:
+            bid, ask = self._current_quote(symbol)
+            if bid is not None:
+                time_msc = int(self._time_msc[self._symbol_index[symbol]])
+                data[symbol] = {'bid': bid, 'ask': ask, 'time_msc': time_msc, 'time': time_msc // 1000}
+        return data
+
+    def get_symbol_metadata(self, symbol: str) -> Optional[SymbolMetadata]:
+        return self._metadata.get(symbol)
+
+    def refresh_symbol_metadata(self, symbols: List[str] = None) -> int:
+        return len(self._metadata)
+
+    def get_historical_data(self, symbol: str, timeframe: str, count: int) -> Optional[pd.DataFrame]:
+        """Recorded bars up to the replay clock, or bars aggregated from replayed ticks"""
+        try:
+            now = pd.Timestamp(self.now_msc, unit='ms')
+            recorded = self.bars.get((symbol, timeframe))
+            if recorded is not None:
+                df = recorded[recorded.index <= now]
+                return df.tail(count) if len(df) else None
+
+            i = self._symbol_index.get(symbol)
+            if i is None or self._cur_index[i] < 0:
+                return None
+            end = int(self._cur_index[i]) + 1
+            seconds = TIMEFRAME_SECONDS.get(timeframe, 60)
+            times = self._tick_time[i][:end] // 1000
+            mid = (self._tick_bid[i][:end] + self._tick_ask[i][:end]) / 2
+            spread = self._tick_ask[i][:end] - self._tick_bid[i][:end]
+
+            buckets = times // seconds
+            starts = np.flatnonzero(np.r_[True, buckets[1:] != buckets[:-1]])
+            starts = starts[-count:]
+            first = starts[0]
+            rel_starts = starts - first
+            mid, spread, buckets = mid[first:], spread[first:], buckets[first:]
+            ends = np.r_[rel_starts[1:], len(mid)]
+
+            df = pd.DataFrame({
+                'time': pd.to_datetime(buckets[rel_starts] * seconds, unit='s'),
+                'open': mid[rel_starts],
+                'high': np.maximum.reduceat(mid, rel_starts),
+                'low': np.minimum.reduceat(mid, rel_starts),
+                'close': mid[ends - 1],
+                'tick_volume': ends - rel_starts,
+                'spread': np.round(np.maximum.reduceat(spread, rel_starts) / self._metadata[symbol].point).astype(int),
+                'real_volume': 0
+            })
+            df.set_index('time', inplace=True)
+            return df
+
+        except Exception as e:
+            self.logger.error(f"Error building replay bars for {symbol}: {e}")
+            return None
+
+    def _current_quote(self, symbol: str) -> Tuple[Optional[float], Optional[float]]:
+        i = self._symbol_index.get(symbol)
+        if i is None or self._cur_index[i] < 0:
+            return None, None
+        return float(self._bid[i]), float(self._ask[i])
+
+    @staticmethod
+    def _default_metadata(symbol: str) -> SymbolMetadata:
+        jpy = symbol[3:6] == 'JPY'
+        return SymbolMetadata(
+            name=symbol,
+            point=0.001 if jpy else 0.00001,
+            digits=3 if jpy else 5,
+            currency_base=symbol[:3],
+            currency_profit=symbol[3:6]
+        )
+
+    # ------------------------------------------------------------------
+    # Orders
+    # ------------------------------------------------------------------
+    def place_order(self, symbol: str, order_type: str, volume: float,
+                    price: float = None, sl: float = None, tp: float = None,
+                    comment: str = None, magic: int = None) -> Optional[Dict]:
+        """Market order filled at ask (BUY) / bid (SELL) plus slippage and latency"""
+        with self._lock:
+            side = order_type.upper()
+            if side not in ('BUY', 'SELL'):
+                return {'success': False, 'error': f'Invalid order type: {order_type}', 'symbol': symbol,
+                        'type': order_type}
+
+            fill = self._fill_price(symbol, side)
+            if fill is None:
+                return {'success': False, 'error': f'Cannot get price for {symbol}', 'symbol': symbol,
+                        'type': order_type}
+
+            ticket = self._next_ticket
+            self._next_ticket += 1
+            commission = self.commission_per_lot * volume
+            self.balance -= commission
+            self.positions[ticket] = {
+                'ticket': ticket,
+                'symbol': symbol,
+                'type': side,
+                'volume': volume,
+                'price': fill,
+                'current_price': fill,
+                'sl': sl or 0.0,
+                'tp': tp or 0.0,
+                'profit': 0.0,
+                'swap': 0.0,
+                'time': self.now_msc // 1000,
+                'magic': magic if magic is not None else 234000,
+                'comment': comment if comment else "Trade"
+            }
+            self.deals.append({'ticket': ticket, 'symbol': symbol, 'type': side, 'volume': volume, 'price': fill,
+                               'entry': 'IN', 'time_msc': self.now_msc, 'commission': commission, 'profit': 0.0})
+            return {'success': True, 'symbol': symbol, 'type': order_type, 'volume': volume,
+                    'ticket': ticket, 'order_id': ticket, 'price': fill}
+
+    def close_order(self, order_id: int):
+        """Close a position at bid (BUY) / ask (SELL)"""
+        with self._lock:
+            position = self.positions.get(int(order_id)) if str(order_id).isdigit() else None
+            if position is None:
+                self.logger.warning(f"Position {order_id} not found")
+                return False
+
+            close_side = 'SELL' if position['type'] == 'BUY' else 'BUY'
+            close_price = self._fill_price(position['symbol'], close_side)
+            if close_price is None:
+                return {'success': False, 'error': f"Cannot get price for {position['symbol']}"}
+
+            pnl = self._position_profit(position, close_price)
+            commission = self.commission_per_lot * position['volume']
+            self.balance += pnl - commission
+            del self.positions[position['ticket']]
+            self.deals.append({'ticket': position['ticket'], 'symbol': position['symbol'], 'type': close_side,
+                               'volume': position['volume'], 'price': close_price, 'entry': 'OUT',
+                               'time_msc': self.now_msc, 'commission': commission, 'profit': pnl})
+            return {'success': True, 'order_id': position['ticket'], 'deal_id': len(self.deals), 'pnl': pnl,
+                    'symbol': position['symbol'], 'volume': position['volume']}
+
+    def close_position(self, position_id: int):
+        return self.close_order(position_id)
+
+    def cancel_order(self, order_id: int) -> bool:
+        return False  # Replay only simulates market orders
+
+    def _fill_price(self, symbol: str, side: str) -> Optional[float]:
+        if self.latency_ms:
+            bid, ask = self._quote_at(symbol, self.now_msc + self.latency_ms)
+        else:
+            bid, ask = self._current_quote(symbol)
+        if bid is None:
+            return None
+        slippage = self.slippage_points * self._metadata[symbol].point
+        return ask + slippage if side == 'BUY' else bid - slippage
+
+    # ------------------------------------------------------------------
+    # Positions / PnL
+    # ------------------------------------------------------------------
+    def get_all_positions(self) -> List[Dict]:
+        return self.get_positions_snapshot().to_list()
+
+    def get_positions_snapshot(self, max_age: float = None) -> PositionSnapshot:
+        with self._lock:
+            return PositionSnapshot([self._marked(position) for position in self.positions.values()])
+
+    def invalidate_positions_snapshot(self):
+        pass  # snapshots are rebuilt on every call
+
+    def get_stuck_positions(self, min_age_hours: int = 1) -> List[Dict]:
+        cutoff = (self.now_msc // 1000) - min_age_hours * 3600
+        return [p for p in self.get_all_positions() if p['time'] < cutoff and p['profit'] < 0]
+
+    def _marked(self, position: Dict) -> Dict:
+        """Position with current_price/profit at the replay clock"""
+        bid, ask = self._current_quote(position['symbol'])
+        if bid is None:
+            return dict(position)
+        mark = bid if position['type'] == 'BUY' else ask
+        marked = dict(position)
+        marked['current_price'] = mark
+        marked['profit'] = self._position_profit(position, mark)
+        return marked
+
+    def _position_profit(self, position: Dict, close_price: float) -> float:
+        meta = self._metadata.get(position['symbol'])
+        contract_size = meta.contract_size if meta else 100000.0
+        direction = 1.0 if position['type'] == 'BUY' else -1.0
+        profit_quote = (close_price - position['price']) * direction * position['volume'] * contract_size
+        return round(profit_quote * self._quote_to_usd(position['symbol'][3:6]), 2)
+
+    def _quote_to_usd(self, quote: str) -> float:
+        """USD per unit of the quote currency at the mid of its USD pair"""
+        if quote == 'USD':
+            return 1.0
+        bid, ask = self._current_quote(f"{quote}USD")
+        if bid:
+            return (bid + ask) / 2
+        bid, ask = self._current_quote(f"USD{quote}")
+        if bid:
+            return 2.0 / (bid + ask)
+        return 1.0
+
+    # ------------------------------------------------------------------
+    # Account
+    # ------------------------------------------------------------------
+    def get_account_state(self, max_age: float = None) -> Optional[AccountState]:
+        with self._lock:
+            marked = [self._marked(p) for p in self.positions.values()]
+            floating = sum(p['profit'] for p in marked)
+            margin = 0.0
+            for p in marked:
+                meta = self._metadata.get(p['symbol'])
+                notional = p['volume'] * (meta.contract_size if meta else 100000.0)
+                base = p['symbol'][:3]
+                if base == 'USD':
+                    notional_usd = notional
+                else:
+                    notional_usd = notional * p['current_price'] * self._quote_to_usd(p['symbol'][3:6])
+                margin += notional_usd / self.leverage
+            equity = self.balance + floating
+            return AccountState(
+                balance=round(self.balance, 2),
+                equity=round(equity, 2),
+                margin=round(margin, 2),
+                free_margin=round(equity - margin, 2),
+                margin_level=round(equity / margin * 100, 2) if margin > 0 else 0.0,
+                login=0,
+                currency=self.currency,
+                leverage=self.leverage,
+                server='Replay'
+            )
+
+    def invalidate_account_state(self):
+        pass  # account state is computed on every call
+
+    def get_account_info(self) -> Optional[Dict]:
+        return self.get_account_state().to_dict()
+
+    def get_account_balance(self) -> Optional[float]:
+        return self.get_account_state().balance
+
+    def get_account_equity(self) -> Optional[float]:
+        return self.get_account_state().equity
+
+    def get_free_margin(self) -> Optional[float]:
+        return self.get_account_state().free_margin
@@ -24,9 +24,13 @@ from typing import Dict, List, Optional
 import json
 import os
 
+from utils.config_service import get_config_service
+
 class RiskManager:
     def __init__(self, config_file: str = "config/settings.json"):
         self.logger = logging.getLogger(__name__)
+        self.config_service = get_config_service()
+        self.config_name = self.config_service.add_file(config_file)
         self.config = self._load_config(config_file)
         self.daily_pnl = 0.0
         self.daily_trades = 0
@@ -49,22 +53,28 @@ class RiskManager:
         self.error_count = 0
         self.total_operations = 0
         self.cooldown_minutes = self.risk_limits.get('cooldown_minutes', 30)
+        self.config_service.subscribe(self._apply_config)
         
     def _load_config(self, config_file: str) -> Dict:
         """Load configuration from JSON file"""
         try:
-            # ใช้ไฟล์ config โดยตรง
-            cfg_path = config_file
-            with open(cfg_path, 'r') as f:
-                return json.load(f)
+            # 🆕 อ่านจาก config snapshot ในหน่วยความจำ (ConfigService)
+            return self.config_service.snapshot.section(self.config_name)
         except Exception as e:
             self.logger.error(f"Error loading config: {e}")
             return {}
     
     def reload_config(self):
-        """Reload configuration from settings.json"""
+        """Reload configuration from settings.json (applied via _apply_config when the file changed)"""
+        try:
+            self.config_service.refresh()
+        except Exception as e:
+            self.logger.error(f"❌ Error reloading risk manager config: {e}")
+    
+    def _apply_config(self, snapshot):
+        """Apply a new config snapshot (called by ConfigService after a reload)"""
         try:
-            self.config = self._load_config("config/settings.json")
+            self.config = snapshot.section(self.config_name)
             self.risk_limits = self.config.get('risk_management', {})
             self.cooldown_minutes = self.risk_limits.get('cooldown_minutes', 30)
             self.logger.info("✅ Risk Manager config reloaded successfully")
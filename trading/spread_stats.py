@@ -0,0 +1,367 @@
+"""
+Spread Statistics
+=================
+
+Rolling spread statistics (pips) per symbol and per hour-of-week, fed from
+the tick stream and kept in fixed-size numpy ring buffers, so cost and
+scoring code read an expected spread with one array lookup.
+
+Key Features:
+- observe(snapshot): vectorized spread of every symbol in a TickSnapshot
+  (ask - bid) / pip_size, sampled at most once per sample_interval
+- Recent window: last `window` samples per symbol
+- Hour-of-week buckets (168 per symbol, UTC): last `bucket_samples`
+  samples of that hour, sampled once per bucket_interval
+- mean / p95 / max recomputed only for the rows a sample touched; lookups
+  never scan samples (and take the lock, since observe() may grow the rings)
+- expected_spread(): current hour-of-week mean once the bucket has
+  min_samples, else the recent mean
+- Persisted as one compressed .npz (float32 rings + counters), written
+  atomically by a background saver every save_interval and on stop - never
+  from observe(), which runs on the tick thread
+"""
+
+import logging
+import os
+import threading
+import time
+from typing import Callable, Dict, Optional, Tuple
+
+import numpy as np
+
+from trading.tick_snapshot import TickSnapshot
+
+HOURS_PER_WEEK = 168
+STAT_MEAN, STAT_P95, STAT_MAX = 0, 1, 2
+
+
+def hour_of_week(timestamp: float = None) -> int:
+    """UTC hour-of-week 0..167 (Monday 00:00 = 0)"""
+    tm = time.gmtime(timestamp)
+    return tm.tm_wday * 24 + tm.tm_hour
+
+
+def default_pip_size(symbol: str) -> float:
+    """Pip size by quote currency when no symbol metadata is available"""
+    return 0.01 if symbol.upper()[3:6] == 'JPY' else 0.0001
+
+
+def _ring_stats(samples: np.ndarray) -> np.ndarray:
+    """(rows, n) ring buffers with NaN for empty slots -> (rows, 3) mean/p95/max"""
+    stats = np.empty(samples.shape[:-1] + (3,))
+    stats[..., STAT_MEAN] = np.nanmean(samples, axis=-1)
+    stats[..., STAT_P95] = np.nanpercentile(samples, 95, axis=-1)
+    stats[..., STAT_MAX] = np.nanmax(samples, axis=-1)
+    return stats
+
+
+class SpreadStats:
+    """
+    Spread statistics store.
+
+    Usage:
+        stats = SpreadStats(pip_size=lambda s: broker.get_symbol_metadata(s).pip_size)
+        tick_watcher.subscribe(lambda event: stats.observe(event.snapshot))
+        stats.start()                            # periodic saves
+        stats.expected_spread('EURUSD')          # pips, or None without samples
+        stats.get('EURUSD', hour_of_week())      # (mean, p95, max) of this hour
+        stats.stop()                             # final save
+    """
+
+    def __init__(self, path: str = "data/spread_stats.npz", window: int = 300, bucket_samples: int = 120,
+                 sample_interval: float = 1.0, bucket_interval: float = 30.0, min_samples: int = 10,
+                 save_interval: float = 60.0, pip_size: Callable[[str], Optional[float]] = None):
+        """
+        Args:
+            path: .npz file ('' = no persistence)
+            window: Recent samples per symbol
+            bucket_samples: Samples per symbol and hour-of-week
+            sample_interval: Min seconds between recent samples of a symbol
+            bucket_interval: Min seconds between hour-of-week samples of a symbol
+            min_samples: Samples an hour bucket needs before expected_spread() uses it
+            save_interval: Seconds between background saves
+            pip_size: Lookup of the pip size of a symbol (None = by quote currency)
+        """
+        self.path = path
+        self.window = window
+        self.bucket_samples = bucket_samples
+        self.sample_interval = sample_interval
+        self.bucket_interval = bucket_interval
+        self.min_samples = min_samples
+        self.save_interval = save_interval
+        self.pip_size = pip_size
+        self.logger = logging.getLogger(__name__)
+
+        self._lock = threading.Lock()
+        self._index: Dict[str, int] = {}        # snapshot (broker) symbol -> row, in row order
+        self._aliases: Dict[str, int] = {}      # base names of the snapshot symbols -> row
+        self._layout: Tuple[Tuple[str, ...], np.ndarray, np.ndarray] = None   # snapshot symbols, rows, pip sizes
+        self._allocate(0)
+        self._saver: Optional[threading.Thread] = None
+        self._stop_event = threading.Event()
+
+        self.stats_counters = {'observed': 0, 'samples': 0, 'bucket_samples': 0, 'saves': 0, 'errors': 0}
+        if self.path:
+            self.load()
+
+    # ------------------------------------------------------------------
+    # Storage
+    # ------------------------------------------------------------------
+    def _allocate(self, rows: int):
+        self._recent = np.full((rows, self.window), np.nan, dtype=np.float32)
+        self._recent_pos = np.zeros(rows, dtype=np.int64)
+        self._recent_count = np.zeros(rows, dtype=np.int64)
+        self._buckets = np.full((rows, HOURS_PER_WEEK, self.bucket_samples), np.nan, dtype=np.float32)
+        self._bucket_pos = np.zeros((rows, HOURS_PER_WEEK), dtype=np.int64)
+        self._bucket_count = np.zeros((rows, HOURS_PER_WEEK), dtype=np.int64)
+        self._recent_stats = np.full((rows, 3), np.nan)
+        self._bucket_stats = np.full((rows, HOURS_PER_WEEK, 3), np.nan)
+        self._last_sample = np.full(rows, -np.inf)
+        self._last_bucket_sample = np.full(rows, -np.inf)
+
+    def _grow(self, rows: int):
+        """Add rows for new symbols (rare - the watched symbol set is stable)"""
+        extra = rows - len(self._recent)
+        if extra <= 0:
+            return
+        pad = lambda array, fill: np.concatenate([array, np.full((extra,) + array.shape[1:], fill, dtype=array.dtype)])
+        self._recent = pad(self._recent, np.nan)
+        self._recent_pos = pad(self._recent_pos, 0)
+        self._recent_count = pad(self._recent_count, 0)
+        self._buckets = pad(self._buckets, np.nan)
+        self._bucket_pos = pad(self._bucket_pos, 0)
+        self._bucket_count = pad(self._bucket_count, 0)
+        self._recent_stats = pad(self._recent_stats, np.nan)
+        self._bucket_stats = pad(self._bucket_stats, np.nan)
+        self._last_sample = pad(self._last_sample, -np.inf)
+        self._last_bucket_sample = pad(self._last_bucket_sample, -np.inf)
+
+    def _rows_for(self, snapshot: TickSnapshot) -> Tuple[np.ndarray, np.ndarray]:
+        """Store rows and pip sizes of a snapshot's symbols (cached per symbol tuple)"""
+        symbols = snapshot.symbols
+        layout = self._layout
+        if layout is not None and layout[0] == symbols:
+            return layout[1], layout[2]
+
+        for symbol in symbols:
+            if symbol not in self._index:
+                self._index[symbol] = len(self._index)
+        self._grow(len(self._index))
+
+        rows = np.array([self._index[symbol] for symbol in symbols], dtype=np.int64)
+        for name, i in snapshot.names().items():
+            if name not in self._index:
+                self._aliases[name] = int(rows[i])
+        pip_sizes = np.array([self._lookup_pip_size(symbol) for symbol in symbols])
+        self._layout = (symbols, rows, pip_sizes)
+        return rows, pip_sizes
+
+    def _lookup_pip_size(self, symbol: str) -> float:
+        try:
+            size = self.pip_size(symbol) if self.pip_size else None
+        except Exception:
+            size = None
+        return size if size and size > 0 else default_pip_size(symbol)
+
+    # ------------------------------------------------------------------
+    # Feed
+    # ------------------------------------------------------------------
+    def observe(self, snapshot: TickSnapshot, now: float = None, timestamp: float = None):
+        """
+        Sample the spreads of a tick snapshot.
+
+        Args:
+            snapshot: Current ticks
+            now: time.monotonic() of the sample (throttling)
+            timestamp: Wall-clock time for the hour-of-week bucket (default: now)
+        """
+        if not len(snapshot):
+            return
+        now = time.monotonic() if now is None else now
+        try:
+            with self._lock:
+                self.stats_counters['observed'] += 1
+                rows, pip_sizes = self._rows_for(snapshot)
+                spreads = (snapshot.ask - snapshot.bid) / pip_sizes
+                valid = np.isfinite(spreads) & (spreads >= 0)
+
+                due = valid & (now - self._last_sample[rows] >= self.sample_interval)
+                if due.any():
+                    self._push_recent(rows[due], spreads[due].astype(np.float32), now)
+
+                bucket_due = valid & (now - self._last_bucket_sample[rows] >= self.bucket_interval)
+                if bucket_due.any():
+                    self._push_bucket(rows[bucket_due], spreads[bucket_due].astype(np.float32),
+                                      hour_of_week(timestamp), now)
+        except Exception as e:
+            self.stats_counters['errors'] += 1
+            self.logger.error(f"Error updating spread statistics: {e}")
+
+    def _push_recent(self, rows: np.ndarray, spreads: np.ndarray, now: float):
+        positions = self._recent_pos[rows]
+        self._recent[rows, positions] = spreads
+        self._recent_pos[rows] = (positions + 1) % self.window
+        self._recent_count[rows] = np.minimum(self._recent_count[rows] + 1, self.window)
+        self._last_sample[rows] = now
+        self._recent_stats[rows] = _ring_stats(self._recent[rows])
+        self.stats_counters['samples'] += len(rows)
+
+    def _push_bucket(self, rows: np.ndarray, spreads: np.ndarray, hour: int, now: float):
+        positions = self._bucket_pos[rows, hour]
+        self._buckets[rows, hour, positions] = spreads
+        self._bucket_pos[rows, hour] = (positions + 1) % self.bucket_samples
+        self._bucket_count[rows, hour] = np.minimum(self._bucket_count[rows, hour] + 1, self.bucket_samples)
+        self._last_bucket_sample[rows] = now
+        self._bucket_stats[rows, hour] = _ring_stats(self._buckets[rows, hour])
+        self.stats_counters['bucket_samples'] += len(rows)
+
+    # ------------------------------------------------------------------
+    # Queries (O(1))
+    # ------------------------------------------------------------------
+    def get(self, symbol: str, hour: int = None) -> Optional[Tuple[float, float, float]]:
+        """
+        (mean, p95, max) spread in pips.
+
+        Args:
+            symbol: Broker or base symbol
+            hour: Hour-of-week bucket (None = recent window)
+
+        Returns:
+            Tuple or None if there are no samples
+        """
+        with self._lock:
+            row = self._row_of(symbol)
+            if row is None:
+                return None
+            if hour is None:
+                if not self._recent_count[row]:
+                    return None
+                stats = self._recent_stats[row]
+            else:
+                if not self._bucket_count[row, hour]:
+                    return None
+                stats = self._bucket_stats[row, hour]
+            return float(stats[STAT_MEAN]), float(stats[STAT_P95]), float(stats[STAT_MAX])
+
+    def expected_spread(self, symbol: str, stat: int = STAT_MEAN, hour: int = None) -> Optional[float]:
+        """
+        Expected spread in pips: this hour-of-week when it has min_samples, else the recent window.
+
+        Args:
+            symbol: Broker or base symbol
+            stat: STAT_MEAN / STAT_P95 / STAT_MAX
+            hour: Hour-of-week (None = current UTC hour)
+        """
+        hour = hour_of_week() if hour is None else hour
+        with self._lock:
+            row = self._row_of(symbol)
+            if row is None:
+                return None
+            if self._bucket_count[row, hour] >= self.min_samples:
+                return float(self._bucket_stats[row, hour, stat])
+            if self._recent_count[row]:
+                return float(self._recent_stats[row, stat])
+            return None
+
+    def _row_of(self, symbol: str) -> Optional[int]:
+        row = self._index.get(symbol)
+        if row is None:
+            row = self._aliases.get(symbol)
+        return row if row is not None and row < len(self._recent_count) else None
+
+    def symbols(self) -> Tuple[str, ...]:
+        with self._lock:
+            return tuple(self._index)
+
+    def get_stats(self) -> Dict:
+        with self._lock:
+            stats = dict(self.stats_counters)
+            stats['symbols'] = len(self._index)
+            stats['filled_buckets'] = int(np.count_nonzero(self._bucket_count))
+        return stats
+
+    # ------------------------------------------------------------------
+    # Persistence
+    # ------------------------------------------------------------------
+    def start(self):
+        """Start the background saver (idempotent, no-op without a path)"""
+        if not self.path or (self._saver is not None and self._saver.is_alive()):
+            return
+        self._stop_event.clear()
+        self._saver = threading.Thread(target=self._save_loop, name="SpreadStatsSaver", daemon=True)
+        self._saver.start()
+
+    def stop(self, timeout: float = 5.0):
+        """Stop the background saver and save once more"""
+        self._stop_event.set()
+        if self._saver is not None:
+            self._saver.join(timeout=timeout)
+            self._saver = None
+        self.save()
+
+    def _save_loop(self):
+        while not self._stop_event.wait(self.save_interval):
+            self.save()
+
+    def save(self):
+        """Write the rings to the .npz file (temp file + atomic replace)"""
+        if not self.path:
+            return
+        with self._lock:
+            # copies - observe() keeps updating the rings in place while the file is written
+            data = {
+                'symbols': np.array(list(self._index), dtype=str),
+                'recent': self._recent.copy(), 'recent_pos': self._recent_pos.copy(),
+                'recent_count': self._recent_count.copy(), 'buckets': self._buckets.copy(),
+                'bucket_pos': self._bucket_pos.copy(), 'bucket_count': self._bucket_count.copy(),
+            }
+        try:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            temp_path = f"{self.path}.tmp"
+            with open(temp_path, 'wb') as f:
+                np.savez_compressed(f, **data)
+            os.replace(temp_path, self.path)
+            self.stats_counters['saves'] += 1
+        except Exception as e:
+            self.stats_counters['errors'] += 1
+            self.logger.error(f"Error saving spread statistics: {e}")
+
+    def load(self) -> bool:
+        """Restore the rings from the .npz file (ignored if the ring sizes changed)"""
+        if not self.path or not os.path.exists(self.path):
+            return False
+        try:
+            with np.load(self.path) as data:
+                symbols = [str(symbol) for symbol in data['symbols']]
+                if data['recent'].shape[1:] != (self.window,) or \
+                        data['buckets'].shape[1:] != (HOURS_PER_WEEK, self.bucket_samples):
+                    self.logger.warning("⚠️ Spread statistics file has different ring sizes - starting fresh")
+                    return False
+                with self._lock:
+                    self._index = {symbol: i for i, symbol in enumerate(symbols)}
+                    self._aliases = {}
+                    self._layout = None
+                    self._allocate(len(symbols))
+                    self._recent[:] = data['recent']
+                    self._recent_pos[:] = data['recent_pos']
+                    self._recent_count[:] = data['recent_count']
+                    self._buckets[:] = data['buckets']
+                    self._bucket_pos[:] = data['bucket_pos']
+                    self._bucket_count[:] = data['bucket_count']
+                    self._rebuild_stats()
+            self.logger.info(f"📂 Loaded spread statistics for {len(symbols)} symbols")
+            return True
+        except Exception as e:
+            self.stats_counters['errors'] += 1
+            self.logger.error(f"Error loading spread statistics: {e}")
+            return False
+
+    def _rebuild_stats(self):
+        filled = self._recent_count > 0
+        if filled.any():
+            self._recent_stats[filled] = _ring_stats(self._recent[filled])
+        rows, hours = np.nonzero(self._bucket_count)
+        if len(rows):
+            self._bucket_stats[rows, hours] = _ring_stats(self._buckets[rows, hours])
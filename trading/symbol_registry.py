@@ -0,0 +1,120 @@
+"""
+Symbol Metadata Registry
+========================
+
+Static per-symbol contract data (contract size, point, digits, volume limits,
+filling modes, trade mode) loaded once when the broker connects.
+
+Key Features:
+- One symbol_select/symbol_info per symbol per session instead of per order
+- Lookups by base symbol (EURUSD) or broker symbol (EURUSD.v)
+- Explicit refresh that swaps the whole table atomically
+"""
+
+import threading
+import time
+from typing import Dict, List, Optional
+
+
+class SymbolMetadata:
+    """Read-only contract data for one broker symbol."""
+
+    __slots__ = ('name', 'contract_size', 'point', 'digits', 'volume_min', 'volume_max',
+                 'volume_step', 'filling_mode', 'trade_mode', 'currency_base', 'currency_profit')
+
+    def __init__(self, name: str, contract_size: float = 100000.0, point: float = 0.00001,
+                 digits: int = 5, volume_min: float = 0.01, volume_max: float = 100.0,
+                 volume_step: float = 0.01, filling_mode: int = 0, trade_mode: int = 4,
+                 currency_base: str = '', currency_profit: str = ''):
+        self.name = name
+        self.contract_size = contract_size
+        self.point = point
+        self.digits = digits
+        self.volume_min = volume_min
+        self.volume_max = volume_max
+        self.volume_step = volume_step
+        self.filling_mode = filling_mode
+        self.trade_mode = trade_mode
+        self.currency_base = currency_base
+        self.currency_profit = currency_profit
+
+    @classmethod
+    def from_mt5(cls, info) -> 'SymbolMetadata':
+        """Build from an mt5.symbol_info() result"""
+        return cls(
+            name=info.name,
+            contract_size=float(getattr(info, 'trade_contract_size', 100000.0) or 100000.0),
+            point=float(info.point),
+            digits=int(info.digits),
+            volume_min=float(getattr(info, 'volume_min', 0.01)),
+            volume_max=float(getattr(info, 'volume_max', 100.0)),
+            volume_step=float(getattr(info, 'volume_step', 0.01)),
+            filling_mode=int(getattr(info, 'filling_mode', 0)),
+            trade_mode=int(getattr(info, 'trade_mode', 0)),
+            currency_base=getattr(info, 'currency_base', ''),
+            currency_profit=getattr(info, 'currency_profit', '')
+        )
+
+    @property
+    def pip_size(self) -> float:
+        """Price size of one pip (10 points on 3/5-digit quotes)"""
+        return self.point * 10 if self.digits in (3, 5) else self.point
+
+    def to_dict(self) -> Dict:
+        """Plain dict view (for logging / GUI)"""
+        return {field: getattr(self, field) for field in self.__slots__}
+
+    def __repr__(self) -> str:
+        return f"SymbolMetadata({self.name}, digits={self.digits}, contract={self.contract_size})"
+
+
+class SymbolRegistry:
+    """
+    Session-wide table of SymbolMetadata.
+
+    Readers never lock; load() builds a new table and swaps it in one assignment.
+    """
+
+    def __init__(self):
+        self._symbols: Dict[str, SymbolMetadata] = {}
+        self._lock = threading.Lock()
+        self.loaded_at: Optional[float] = None
+
+    def load(self, entries: List[SymbolMetadata], aliases: Dict[str, str] = None, replace: bool = True):
+        """
+        Install metadata entries.
+
+        Args:
+            entries: Metadata for broker symbols
+            aliases: Optional mapping of base name -> broker symbol
+            replace: True to replace the table, False to merge into it
+        """
+        with self._lock:
+            table = {} if replace else dict(self._symbols)
+            for meta in entries:
+                table[meta.name] = meta
+            for name, real_symbol in (aliases or {}).items():
+                if real_symbol in table:
+                    table[name] = table[real_symbol]
+            self._symbols = table
+            self.loaded_at = time.time()
+
+    def get(self, symbol: str) -> Optional[SymbolMetadata]:
+        """Metadata for a base or broker symbol, or None if not loaded"""
+        return self._symbols.get(symbol)
+
+    def symbols(self) -> List[str]:
+        """Broker symbols currently loaded"""
+        return sorted({meta.name for meta in self._symbols.values()})
+
+    def clear(self):
+        """Drop all metadata"""
+        with self._lock:
+            self._symbols = {}
+            self.loaded_at = None
+
+    def __contains__(self, symbol: str) -> bool:
+        return symbol in self._symbols
+
+    def __len__(self) -> int:
+        return len(self.symbols())
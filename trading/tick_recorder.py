@@ -0,0 +1,344 @@
+"""
+Tick Recorder
+=============
+
+Appends every observed bid/ask/time_msc tick of the traded symbols to compact
+per-symbol binary files, so live sessions can be replayed and analysed later.
+
+Key Features:
+- Hot path only enqueues the TickSnapshot (no I/O, no per-symbol work)
+- Writer thread de-duplicates by time_msc and appends fixed-size records
+- One file per symbol per day (<root>/<YYYYMMDD>/<SYMBOL>.ticks) plus index.json
+  with row counts and chunk boundaries (row offset, first/last time_msc)
+- Readers memory-map a whole day without parsing (np.memmap on TICK_DTYPE)
+- Index is written after the data, so a crash never exposes a partial record
+- A day file without an index entry (index lost in a crash) is re-indexed
+  from its records instead of being overwritten
+- retention_days: day folders older than that are deleted (0 = keep all)
+"""
+
+import json
+import logging
+import os
+import queue
+import shutil
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from trading.tick_snapshot import TickSnapshot
+
+# On-disk record layout (little-endian, 24 bytes per tick)
+TICK_DTYPE = np.dtype([('time_msc', '<i8'), ('bid', '<f8'), ('ask', '<f8')])
+
+INDEX_FILE = 'index.json'
+TICK_FILE_SUFFIX = '.ticks'
+DEFAULT_TICK_DIRECTORY = 'data/ticks'
+
+_MS_PER_DAY = 86400000
+
+
+def _day_name(day_number: int) -> str:
+    """Day number (time_msc // ms per day) -> 'YYYYMMDD'"""
+    return datetime.fromtimestamp(day_number * 86400, tz=timezone.utc).strftime('%Y%m%d')
+
+
+def _read_index(day_dir: str) -> Dict:
+    path = os.path.join(day_dir, INDEX_FILE)
+    if not os.path.exists(path):
+        return {'dtype': TICK_DTYPE.descr, 'symbols': {}}
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def _write_index(day_dir: str, index: Dict):
+    """Write index.json atomically (tmp file + rename)"""
+    path = os.path.join(day_dir, INDEX_FILE)
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(index, f, indent=1)
+    os.replace(tmp_path, path)
+
+
+class TickRecorder:
+    """
+    Off-thread tick writer fed from BrokerAPI.get_ticks().
+
+    Usage:
+        recorder = TickRecorder('data/ticks')
+        recorder.record(snapshot)   # from the price path, microseconds
+        recorder.stop()             # flushes pending ticks
+    """
+
+    def __init__(self, directory: str = DEFAULT_TICK_DIRECTORY, flush_interval: float = 1.0,
+                 chunk_rows: int = 65536, max_queue: int = 10000, retention_days: int = 7):
+        """
+        Args:
+            directory: Root directory for day folders
+            flush_interval: Seconds between writes to disk
+            chunk_rows: Rows per index chunk (seek granularity for readers)
+            max_queue: Snapshots buffered before new ones are dropped
+            retention_days: Recorded days kept on disk (0 = keep all)
+        """
+        self.directory = directory
+        self.flush_interval = flush_interval
+        self.chunk_rows = chunk_rows
+        self.retention_days = retention_days
+        self.logger = logging.getLogger(__name__)
+
+        self._queue: "queue.Queue" = queue.Queue(maxsize=max_queue)
+        self._thread: Optional[threading.Thread] = None
+        self._running = False
+        self._start_lock = threading.Lock()
+
+        # Writer-thread state
+        self._last_time_msc: Dict[str, int] = {}
+        self._pending: Dict[Tuple[int, str], List[Tuple[int, float, float]]] = {}
+        self._indexes: Dict[int, Dict] = {}
+
+        self.stats = {'snapshots': 0, 'ticks': 0, 'dropped': 0, 'flushes': 0, 'bytes': 0, 'reindexed': 0,
+                      'purged_days': 0, 'errors': 0}
+
+    def start(self):
+        """Start the writer thread (idempotent)"""
+        with self._start_lock:
+            if self._running:
+                return
+            self._running = True
+            self._thread = threading.Thread(target=self._run, name="TickRecorder", daemon=True)
+            self._thread.start()
+            self.logger.info(f"🎞️ Tick recorder writing to {self.directory}")
+
+    def stop(self, timeout: float = 5.0):
+        """Stop the writer thread after flushing everything queued"""
+        with self._start_lock:
+            if not self._running:
+                return
+            self._running = False
+            try:
+                self._queue.put(None, timeout=timeout)
+            except queue.Full:
+                pass
+        if self._thread:
+            self._thread.join(timeout=timeout)
+        self.logger.info(f"🛑 Tick recorder stopped ({self.stats['ticks']} ticks written)")
+
+    def record(self, snapshot: TickSnapshot):
+        """Queue a snapshot for writing (hot path - never blocks)"""
+        if not self._running:
+            self.start()
+        try:
+            self._queue.put_nowait(snapshot)
+        except queue.Full:
+            self.stats['dropped'] += 1
+
+    def get_stats(self) -> Dict:
+        """Counters plus current queue depth"""
+        stats = dict(self.stats)
+        stats['queue_depth'] = self._queue.qsize()
+        return stats
+
+    def _run(self):
+        """Writer loop: collect new ticks, flush every flush_interval"""
+        next_flush = time.monotonic() + self.flush_interval
+        while True:
+            timeout = max(0.0, next_flush - time.monotonic())
+            try:
+                snapshot = self._queue.get(timeout=timeout)
+            except queue.Empty:
+                snapshot = False
+
+            if snapshot is None:
+                break
+            if snapshot is not False:
+                self._collect(snapshot)
+
+            if time.monotonic() >= next_flush:
+                self._flush()
+                next_flush = time.monotonic() + self.flush_interval
+
+        # Drain whatever arrived before the stop marker
+        while True:
+            try:
+                snapshot = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if snapshot is not None:
+                self._collect(snapshot)
+        self._flush()
+
+    def _collect(self, snapshot: TickSnapshot):
+        """Buffer ticks newer than the last one seen for each symbol"""
+        self.stats['snapshots'] += 1
+        time_msc = snapshot.time_msc
+        bid = snapshot.bid
+        ask = snapshot.ask
+        for i, symbol in enumerate(snapshot.symbols):
+            tick_time = int(time_msc[i])
+            if tick_time <= self._last_time_msc.get(symbol, 0):
+                continue
+            if np.isnan(bid[i]) or np.isnan(ask[i]):
+                continue
+            self._last_time_msc[symbol] = tick_time
+            key = (tick_time // _MS_PER_DAY, symbol)
+            self._pending.setdefault(key, []).append((tick_time, float(bid[i]), float(ask[i])))
+
+    def _flush(self):
+        """Append buffered ticks to their day/symbol files, then update the indexes"""
+        if not self._pending:
+            return
+        pending, self._pending = self._pending, {}
+        touched_days = set()
+        for (day_number, symbol), rows in pending.items():
+            try:
+                self._append(day_number, symbol, np.array(rows, dtype=TICK_DTYPE))
+                touched_days.add(day_number)
+            except Exception as e:
+                self.stats['errors'] += 1
+                self.logger.error(f"Error writing ticks for {symbol}: {e}")
+
+        for day_number in touched_days:
+            try:
+                _write_index(self._day_dir(day_number), self._indexes[day_number])
+            except Exception as e:
+                self.stats['errors'] += 1
+                self.logger.error(f"Error writing tick index for {_day_name(day_number)}: {e}")
+
+        # Only keep indexes for days that can still receive ticks
+        latest_day = max(self._indexes, default=0)
+        for old_day in [d for d in self._indexes if d < latest_day - 1]:
+            del self._indexes[old_day]
+        self.stats['flushes'] += 1
+
+    def _append(self, day_number: int, symbol: str, records: np.ndarray):
+        day_dir = self._day_dir(day_number)
+        index = self._indexes.get(day_number)
+        if index is None:
+            os.makedirs(day_dir, exist_ok=True)
+            index = _read_index(day_dir)
+            self._indexes[day_number] = index
+            self._purge_old_days(day_number)
+
+        entry = index['symbols'].get(symbol)
+        file_name = symbol + TICK_FILE_SUFFIX
+        path = os.path.join(day_dir, file_name)
+        if entry is None:
+            if os.path.exists(path) and os.path.getsize(path) >= TICK_DTYPE.itemsize:
+                entry = self._rebuild_entry(path, file_name)
+            else:
+                entry = {'file': file_name, 'count': 0, 'first_msc': int(records['time_msc'][0]),
+                         'last_msc': 0, 'chunks': []}
+            index['symbols'][symbol] = entry
+
+        # Never go back in time within a file (restart after a crash re-reads ticks already on disk)
+        records = records[records['time_msc'] > entry['last_msc']]
+        if not len(records):
+            return
+
+        # Drop bytes written after the last indexed row (crash between data and index write)
+        indexed_bytes = entry['count'] * TICK_DTYPE.itemsize
+        if os.path.exists(path) and os.path.getsize(path) != indexed_bytes:
+            with open(path, 'r+b') as f:
+                f.truncate(indexed_bytes)
+
+        with open(path, 'ab') as f:
+            f.write(records.tobytes())
+
+        # Record chunk boundaries so readers can seek by time without scanning
+        chunks = entry['chunks']
+        offset = 0
+        while offset < len(records):
+            if not chunks or chunks[-1][1] >= self.chunk_rows:
+                chunks.append([entry['count'] + offset, 0, int(records['time_msc'][offset]), 0])
+            take = min(self.chunk_rows - chunks[-1][1], len(records) - offset)
+            chunks[-1][1] += take
+            chunks[-1][3] = int(records['time_msc'][offset + take - 1])
+            offset += take
+
+        entry['count'] += len(records)
+        entry['last_msc'] = int(records['time_msc'][-1])
+        self.stats['ticks'] += len(records)
+        self.stats['bytes'] += records.nbytes
+
+    def _rebuild_entry(self, path: str, file_name: str) -> Dict:
+        """Index entry of a day file whose entry was lost (whole records only)"""
+        count = os.path.getsize(path) // TICK_DTYPE.itemsize
+        times = np.memmap(path, dtype=TICK_DTYPE, mode='r', shape=(count,))['time_msc']
+        chunks = [[start, min(self.chunk_rows, count - start), int(times[start]),
+                   int(times[min(start + self.chunk_rows, count) - 1])]
+                  for start in range(0, count, self.chunk_rows)]
+        entry = {'file': file_name, 'count': int(count), 'first_msc': int(times[0]),
+                 'last_msc': int(times[-1]), 'chunks': chunks}
+        del times
+        self.stats['reindexed'] += 1
+        self.logger.warning(f"⚠️ Rebuilt tick index entry for {path} ({count} ticks)")
+        return entry
+
+    def _purge_old_days(self, day_number: int):
+        """Delete day folders older than retention_days"""
+        if self.retention_days <= 0:
+            return
+        cutoff = _day_name(day_number - self.retention_days + 1)
+        for day in list_tick_days(self.directory):
+            if day < cutoff:
+                try:
+                    shutil.rmtree(os.path.join(self.directory, day))
+                    self.stats['purged_days'] += 1
+                    self.logger.info(f"🗑️ Removed recorded ticks of {day} (retention {self.retention_days} days)")
+                except OSError as e:
+                    self.stats['errors'] += 1
+                    self.logger.error(f"Error removing recorded ticks of {day}: {e}")
+
+    def _day_dir(self, day_number: int) -> str:
+        return os.path.join(self.directory, _day_name(day_number))
+
+
+def list_tick_days(directory: str = DEFAULT_TICK_DIRECTORY) -> List[str]:
+    """Recorded days ('YYYYMMDD'), oldest first"""
+    if not os.path.isdir(directory):
+        return []
+    return sorted(name for name in os.listdir(directory)
+                  if os.path.exists(os.path.join(directory, name, INDEX_FILE)))
+
+
+def read_tick_index(day: str, directory: str = DEFAULT_TICK_DIRECTORY) -> Dict:
+    """index.json of one recorded day"""
+    return _read_index(os.path.join(directory, day))
+
+
+def open_tick_file(day: str, symbol: str, directory: str = DEFAULT_TICK_DIRECTORY) -> np.ndarray:
+    """
+    Memory-map one symbol's ticks for a day (read-only, no parsing).
+
+    Returns:
+        Structured array with fields time_msc, bid, ask (empty if not recorded)
+    """
+    day_dir = os.path.join(directory, day)
+    entry = _read_index(day_dir)['symbols'].get(symbol)
+    if not entry or entry['count'] == 0:
+        return np.empty(0, dtype=TICK_DTYPE)
+    return np.memmap(os.path.join(day_dir, entry['file']), dtype=TICK_DTYPE, mode='r',
+                     shape=(entry['count'],))
+
+
+def load_tick_day(day: str, directory: str = DEFAULT_TICK_DIRECTORY,
+                  symbols: List[str] = None) -> Dict[str, Tuple[np.ndarray, np.ndarray, np.ndarray]]:
+    """
+    Memory-map a recorded day in the ReplayBroker tick format.
+
+    Usage:
+        broker = ReplayBroker(load_tick_day('20240102'))
+
+    Returns:
+        Dict: symbol -> (time_msc, bid, ask) views onto the mapped files
+    """
+    index = read_tick_index(day, directory)
+    ticks = {}
+    for symbol in (symbols if symbols is not None else sorted(index['symbols'])):
+        data = open_tick_file(day, symbol, directory)
+        if len(data):
+            ticks[symbol] = (data['time_msc'], data['bid'], data['ask'])
+    return ticks
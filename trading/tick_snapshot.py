@@ -0,0 +1,147 @@
+"""
+Tick Snapshot
+=============
+
+Compact, array-backed view of bid/ask/time_msc for a whole symbol set,
+read from the broker in one pass and shared by every price consumer.
+
+Key Features:
+- numpy arrays (bid, ask, time_msc) with a symbol -> row index
+- Lookups by base symbol (EURUSD) or broker symbol (EURUSD.v)
+- Read-only arrays so a snapshot can be shared between threads
+- Age tracking so callers within one tick reuse the same read
+"""
+
+import time
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+
+class TickSnapshot:
+    """
+    Immutable bid/ask/time_msc snapshot for a set of symbols.
+
+    Missing symbols (no tick from the terminal) are stored as NaN bid/ask
+    and time_msc 0, and are reported as None by the scalar getters.
+    """
+
+    __slots__ = ('symbols', 'bid', 'ask', 'time_msc', 'taken_at', '_index')
+
+    def __init__(self, symbols: List[str], bid: np.ndarray, ask: np.ndarray,
+                 time_msc: np.ndarray, aliases: Dict[str, str] = None, taken_at: float = None):
+        """
+        Build a snapshot from parallel arrays.
+
+        Args:
+            symbols: Broker (real) symbols, one per array row
+            bid: float64 bid prices
+            ask: float64 ask prices
+            time_msc: int64 tick times in milliseconds
+            aliases: Optional mapping of requested name -> real symbol
+            taken_at: time.monotonic() timestamp of the read (defaults to now)
+        """
+        self.symbols: Tuple[str, ...] = tuple(symbols)
+        self.bid = bid
+        self.ask = ask
+        self.time_msc = time_msc
+        for array in (self.bid, self.ask, self.time_msc):
+            array.flags.writeable = False
+        self.taken_at = taken_at if taken_at is not None else time.monotonic()
+
+        index = {symbol: i for i, symbol in enumerate(self.symbols)}
+        for name, real_symbol in (aliases or {}).items():
+            if real_symbol in index:
+                index.setdefault(name, index[real_symbol])
+        self._index = index
+
+    @classmethod
+    def empty(cls) -> 'TickSnapshot':
+        """Snapshot with no symbols"""
+        return cls([], np.empty(0), np.empty(0), np.empty(0, dtype=np.int64))
+
+    @classmethod
+    def from_ticks(cls, symbols: List[str], ticks: Iterable, aliases: Dict[str, str] = None) -> 'TickSnapshot':
+        """
+        Build a snapshot from MT5-style tick objects (bid, ask, time_msc attributes).
+
+        Args:
+            symbols: Broker symbols, one per tick
+            ticks: Tick objects or None for symbols without a tick
+            aliases: Optional mapping of requested name -> real symbol
+        """
+        count = len(symbols)
+        bid = np.full(count, np.nan)
+        ask = np.full(count, np.nan)
+        time_msc = np.zeros(count, dtype=np.int64)
+        for i, tick in enumerate(ticks):
+            if tick is None:
+                continue
+            bid[i] = tick.bid
+            ask[i] = tick.ask
+            time_msc[i] = getattr(tick, 'time_msc', 0) or int(getattr(tick, 'time', 0)) * 1000
+        return cls(symbols, bid, ask, time_msc, aliases)
+
+    def index_of(self, symbol: str) -> Optional[int]:
+        """Row index for a symbol (base or real name), or None"""
+        return self._index.get(symbol)
+
+    def names(self) -> Dict[str, int]:
+        """Every lookup name (broker symbols and base aliases) -> row index"""
+        return dict(self._index)
+
+    def covers(self, symbols: Iterable[str]) -> bool:
+        """True if every symbol has a row in this snapshot"""
+        return all(symbol in self._index for symbol in symbols)
+
+    def has_price(self, symbol: str) -> bool:
+        """True if the symbol has a valid bid and ask"""
+        i = self._index.get(symbol)
+        return i is not None and not (np.isnan(self.bid[i]) or np.isnan(self.ask[i]))
+
+    def get_bid_ask(self, symbol: str) -> Tuple[Optional[float], Optional[float]]:
+        """Return (bid, ask) or (None, None) if unavailable"""
+        i = self._index.get(symbol)
+        if i is None:
+            return None, None
+        bid = self.bid[i]
+        ask = self.ask[i]
+        if np.isnan(bid) or np.isnan(ask):
+            return None, None
+        return float(bid), float(ask)
+
+    def get_bid(self, symbol: str) -> Optional[float]:
+        """Return bid price or None"""
+        return self.get_bid_ask(symbol)[0]
+
+    def get_ask(self, symbol: str) -> Optional[float]:
+        """Return ask price or None"""
+        return self.get_bid_ask(symbol)[1]
+
+    def get_mid(self, symbol: str) -> Optional[float]:
+        """Return (bid + ask) / 2 or None"""
+        bid, ask = self.get_bid_ask(symbol)
+        if bid is None:
+            return None
+        return (bid + ask) / 2
+
+    def get_time_msc(self, symbol: str) -> Optional[int]:
+        """Return the tick time in milliseconds or None"""
+        i = self._index.get(symbol)
+        if i is None or self.time_msc[i] == 0:
+            return None
+        return int(self.time_msc[i])
+
+    def age(self) -> float:
+        """Seconds since this snapshot was taken"""
+        return time.monotonic() - self.taken_at
+
+    def is_fresh(self, max_age: float) -> bool:
+        """True if the snapshot is not older than max_age seconds"""
+        return self.age() <= max_age
+
+    def __len__(self) -> int:
+        return len(self.symbols)
+
+    def __contains__(self, symbol: str) -> bool:
+        return symbol in self._index
@@ -0,0 +1,167 @@
+"""
+Tick Watcher
+============
+
+Turns the broker's tick snapshots into price-change events, so loops can
+block until a relevant symbol actually ticks instead of sleeping a fixed
+interval.
+
+Key Features:
+- One polling thread reads the watched symbols through broker.get_ticks()
+  (shared TickSnapshot - other readers within poll_interval reuse it)
+- A symbol changed when its time_msc moved; only then waiters are woken
+- wait(sequence, timeout) returns the next TickEvent or None on timeout,
+  so callers keep a heartbeat for housekeeping
+- TickEvent carries the perf_counter time the change was detected, for
+  wake-to-decision latency measurement
+- subscribe(callback): callbacks run on the watcher thread for every event
+  (must be cheap - e.g. statistics updates)
+"""
+
+import logging
+import threading
+import time
+from typing import Callable, Dict, Iterable, Optional, Tuple
+
+from trading.tick_snapshot import TickSnapshot
+
+
+class TickEvent:
+    """One detected price change across the watched symbols."""
+
+    __slots__ = ('sequence', 'snapshot', 'changed', 'detected_at')
+
+    def __init__(self, sequence: int, snapshot: TickSnapshot, changed: Tuple[str, ...], detected_at: float):
+        self.sequence = sequence
+        self.snapshot = snapshot
+        self.changed = changed              # watched symbols with a new time_msc
+        self.detected_at = detected_at      # time.perf_counter() when the change was seen
+
+
+class TickWatcher:
+    """
+    Price-change event source over broker.get_ticks().
+
+    Usage:
+        watcher = TickWatcher(broker, poll_interval=0.05)
+        watcher.watch(['EURUSD', 'GBPUSD', 'EURGBP'])
+        watcher.subscribe(on_event)                         # optional, called with each TickEvent
+        watcher.start()
+        event = watcher.wait(last_sequence, timeout=1.0)   # None = heartbeat
+    """
+
+    def __init__(self, broker, poll_interval: float = 0.05):
+        """
+        Args:
+            broker: BrokerAPI (or ReplayBroker) providing get_ticks()
+            poll_interval: Seconds between tick reads
+        """
+        self.broker = broker
+        self.poll_interval = poll_interval
+        self.logger = logging.getLogger(__name__)
+
+        self._symbols: Tuple[str, ...] = ()
+        self._last_times: Dict[str, int] = {}
+        self._condition = threading.Condition()
+        self._event: Optional[TickEvent] = None
+        self._sequence = 0
+        self._thread: Optional[threading.Thread] = None
+        self._running = False
+        self._listeners: Tuple[Callable[[TickEvent], None], ...] = ()
+
+        self.stats = {'polls': 0, 'events': 0, 'errors': 0}
+
+    def watch(self, symbols: Iterable[str]):
+        """Add symbols to the watched set"""
+        with self._condition:
+            self._symbols = tuple(dict.fromkeys(self._symbols + tuple(symbols)))
+
+    def subscribe(self, callback: Callable[[TickEvent], None]):
+        """Call callback(event) on the watcher thread for every price change"""
+        with self._condition:
+            self._listeners = self._listeners + (callback,)
+
+    def start(self):
+        """Start the polling thread (idempotent)"""
+        if self._running:
+            return
+        self._running = True
+        self._thread = threading.Thread(target=self._run, name="TickWatcher", daemon=True)
+        self._thread.start()
+        self.logger.info(f"👀 Tick watcher polling {len(self._symbols)} symbols every {self.poll_interval * 1000:.0f} ms")
+
+    def stop(self, timeout: float = 2.0):
+        """Stop polling and release any waiter"""
+        self._running = False
+        with self._condition:
+            self._condition.notify_all()
+        if self._thread:
+            self._thread.join(timeout=timeout)
+
+    @property
+    def sequence(self) -> int:
+        """Sequence number of the latest event (0 = none yet)"""
+        return self._sequence
+
+    def wait(self, sequence: int, timeout: float) -> Optional[TickEvent]:
+        """
+        Block until an event newer than `sequence` or until timeout.
+
+        Returns:
+            The latest TickEvent (intermediate events are coalesced), or None on timeout/stop
+        """
+        deadline = time.monotonic() + timeout
+        with self._condition:
+            while self._running and self._sequence <= sequence:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return None
+                self._condition.wait(remaining)
+            return self._event if self._sequence > sequence else None
+
+    def get_stats(self) -> Dict:
+        stats = dict(self.stats)
+        stats['symbols'] = len(self._symbols)
+        stats['sequence'] = self._sequence
+        return stats
+
+    def _run(self):
+        while self._running:
+            started = time.monotonic()
+            try:
+                self._poll()
+            except Exception as e:
+                self.stats['errors'] += 1
+                self.logger.error(f"Error polling ticks: {e}")
+            time.sleep(max(0.0, self.poll_interval - (time.monotonic() - started)))
+
+    def _poll(self):
+        symbols = self._symbols
+        if not symbols:
+            return
+        snapshot = self.broker.get_ticks(list(symbols), max_age=self.poll_interval)
+        self.stats['polls'] += 1
+
+        changed = []
+        for symbol in symbols:
+            tick_time = snapshot.get_time_msc(symbol)
+            if tick_time is not None and tick_time != self._last_times.get(symbol):
+                self._last_times[symbol] = tick_time
+                changed.append(symbol)
+        if not changed:
+            return
+
+        detected_at = time.perf_counter()
+        with self._condition:
+            self._sequence += 1
+            event = TickEvent(self._sequence, snapshot, tuple(changed), detected_at)
+            self._event = event
+            self.stats['events'] += 1
+            self._condition.notify_all()
+
+        for listener in self._listeners:
+            try:
+                listener(event)
+            except Exception as e:
+                self.stats['errors'] += 1
+                self.logger.error(f"Error in tick listener: {e}")
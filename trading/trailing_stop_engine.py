@@ -0,0 +1,400 @@
+"""
+Trailing Stop Engine
+====================
+
+Group trailing stop (peak / lock-profit stop) evaluated on every tick from
+locally marked PnL, instead of once per detector loop from a fresh MT5 read.
+
+Key Features:
+- Per-group peak/stop state kept in memory (single owner - the detector loop
+  and the tick thread update the same state)
+- Group PnL per tick from the MarkToMarketEngine (local position marks,
+  reconciled against MT5 profit there)
+- Only groups with a leg in the ticked symbols are evaluated
+- Stop fires the moment net PnL crosses below the stop while still positive
+  (Never Cut Loss - a negative crossing cancels the trailing instead)
+- Drawdown report: peak-to-exit giveback split into the part the trailing
+  rule allows (peak - stop) and the part lost to decision latency
+  (stop - exit = detection overshoot + execution slippage)
+"""
+
+import logging
+import threading
+import time
+from collections import deque
+from typing import Callable, Dict, Iterable, List, Optional
+
+import numpy as np
+
+from trading.group_pnl import GroupPnLTable
+from trading.mark_to_market import MarkToMarketEngine
+from trading.tick_snapshot import TickSnapshot
+
+SOURCE_TICK = 'tick'
+SOURCE_LOOP = 'loop'
+
+
+class GroupStop:
+    """Trailing state of one group."""
+
+    __slots__ = ('group_id', 'peak', 'stop', 'active', 'closing', 'symbols', 'last_pnl',
+                 'decision_pnl', 'decided_at', 'detected_at', 'source')
+
+    def __init__(self, group_id: str):
+        self.group_id = group_id
+        self.peak = 0.0
+        self.stop = 0.0
+        self.active = False
+        self.closing = False          # stop fired, close in progress
+        self.symbols = frozenset()
+        self.last_pnl = None
+        self.decision_pnl = 0.0
+        self.decided_at = 0.0         # perf_counter when the stop fired
+        self.detected_at = None       # perf_counter of the tick that fired it (tick source)
+        self.source = None
+
+    def reset(self):
+        self.peak = 0.0
+        self.stop = 0.0
+        self.active = False
+        self.closing = False
+
+    def to_dict(self) -> Dict:
+        return {'peak': self.peak, 'stop': self.stop, 'active': self.active}
+
+
+class StopExit:
+    """Outcome of one fired trailing stop."""
+
+    __slots__ = ('group_id', 'source', 'peak', 'stop', 'decision_pnl', 'exit_pnl',
+                 'tick_to_decision_ms', 'decision_to_exit_ms')
+
+    def __init__(self, state: GroupStop, exit_pnl: float, exited_at: float):
+        self.group_id = state.group_id
+        self.source = state.source
+        self.peak = state.peak
+        self.stop = state.stop
+        self.decision_pnl = state.decision_pnl
+        self.exit_pnl = exit_pnl
+        self.tick_to_decision_ms = ((state.decided_at - state.detected_at) * 1000
+                                    if state.detected_at is not None else None)
+        self.decision_to_exit_ms = (exited_at - state.decided_at) * 1000
+
+    @property
+    def giveback(self) -> float:
+        """Peak-to-exit drawdown"""
+        return self.peak - self.exit_pnl
+
+    @property
+    def rule_giveback(self) -> float:
+        """Drawdown the trailing rule allows (peak - stop)"""
+        return self.peak - self.stop
+
+    @property
+    def detection_overshoot(self) -> float:
+        """Stop crossed -> first evaluation below it"""
+        return self.stop - self.decision_pnl
+
+    @property
+    def execution_slippage(self) -> float:
+        """Decision -> realized close"""
+        return self.decision_pnl - self.exit_pnl
+
+    @property
+    def latency_giveback(self) -> float:
+        """Drawdown beyond the stop (detection overshoot + execution slippage)"""
+        return self.stop - self.exit_pnl
+
+    def to_dict(self) -> Dict:
+        return {
+            'group_id': self.group_id,
+            'source': self.source,
+            'peak': self.peak,
+            'stop': self.stop,
+            'decision_pnl': self.decision_pnl,
+            'exit_pnl': self.exit_pnl,
+            'giveback': self.giveback,
+            'rule_giveback': self.rule_giveback,
+            'latency_giveback': self.latency_giveback,
+            'tick_to_decision_ms': self.tick_to_decision_ms,
+            'decision_to_exit_ms': self.decision_to_exit_ms
+        }
+
+
+class TrailingStopEngine:
+    """
+    Tick-driven group trailing stop.
+
+    Usage:
+        engine = TrailingStopEngine(mark_to_market, tick_watcher, on_stop=detector_close_callback)
+        engine.configure(True, min_profit=1.0, lock_percentage=0.5, distance=10.0)
+        engine.sync(group_pnl_table, active_group_ids)    # once per position snapshot
+        engine.start()                                     # on_stop(group_id) fires from the tick thread
+        engine.record_exit(group_id, realized_pnl)         # after the close
+    """
+
+    def __init__(self, marker: MarkToMarketEngine, tick_watcher, on_stop: Callable[[str], None] = None,
+                 heartbeat: float = 1.0, history: int = 500):
+        """
+        Args:
+            marker: MarkToMarketEngine holding the synced positions
+            tick_watcher: TickWatcher delivering price-change events
+            on_stop: Called with the group_id when the stop fires on a tick (engine thread)
+            heartbeat: Max seconds between wake-ups without ticks
+            history: Number of exits kept for the drawdown report
+        """
+        self.marker = marker
+        self.tick_watcher = tick_watcher
+        self.on_stop = on_stop
+        self.heartbeat = heartbeat
+        self.logger = logging.getLogger(__name__)
+
+        self.enabled = True
+        self.min_profit = 1.0
+        self.lock_percentage = 0.5
+        self.distance = 10.0
+
+        self._groups: Dict[str, GroupStop] = {}
+        self._lock = threading.Lock()
+        self._exits = deque(maxlen=history)
+        self._thread: Optional[threading.Thread] = None
+        self._running = False
+
+        self.stats = {'ticks': 0, 'marks': 0, 'unmarked': 0, 'fired_tick': 0, 'fired_loop': 0,
+                      'cancelled': 0, 'errors': 0}
+
+    def configure(self, enabled: bool, min_profit: float, lock_percentage: float, distance: float):
+        """Trailing parameters (closing section of adaptive_params)"""
+        self.enabled = enabled
+        self.min_profit = min_profit
+        self.lock_percentage = lock_percentage
+        self.distance = distance
+
+    # ------------------------------------------------------------------
+    # State
+    # ------------------------------------------------------------------
+    def sync(self, table: GroupPnLTable, group_ids: Iterable[str]):
+        """
+        Track the active groups of a position snapshot (positions are marked by the marker).
+
+        Args:
+            table: GroupPnLTable of the latest position snapshot
+            group_ids: Active group ids (state of other groups is dropped)
+        """
+        group_ids = list(group_ids)
+        symbols = set()
+        with self._lock:
+            for group_id in list(self._groups):
+                if group_id not in group_ids:
+                    del self._groups[group_id]
+            for group_id in group_ids:
+                state = self._groups.get(group_id) or self._groups.setdefault(group_id, GroupStop(group_id))
+                state.symbols = frozenset(pos.get('symbol', '') for pos in table.get(group_id).positions)
+                symbols.update(state.symbols)
+        if symbols:
+            self.tick_watcher.watch(sorted(symbols))
+
+    def evaluate(self, group_id: str, net_pnl: float, detected_at: float = None,
+                 source: str = SOURCE_LOOP) -> bool:
+        """
+        Update peak/stop with the group's net PnL.
+
+        Args:
+            group_id: Group to update
+            net_pnl: Net PnL (arbitrage + recovery) in USD
+            detected_at: perf_counter of the tick this PnL was marked from (latency report)
+            source: SOURCE_TICK or SOURCE_LOOP
+
+        Returns:
+            True if the group should be closed now (fires once per activation)
+        """
+        with self._lock:
+            state = self._groups.get(group_id) or self._groups.setdefault(group_id, GroupStop(group_id))
+            state.last_pnl = net_pnl
+            if state.closing:
+                return False
+
+            if not self.enabled:
+                # Trailing Stop ปิดอยู่ — ใช้ Min Profit เพียงอย่างเดียว
+                if net_pnl >= self.min_profit:
+                    self.logger.info(f"✅ {group_id} Min Profit Reached: ${net_pnl:.2f} >= ${self.min_profit:.2f} "
+                                     f"(Trailing Stop DISABLED)")
+                    return self._fire(state, net_pnl, detected_at, source)
+                return False
+
+            if not state.active:
+                if net_pnl >= self.min_profit:
+                    state.active = True
+                    state.peak = net_pnl
+                    state.stop = self._stop_for(net_pnl)
+                    self.logger.info(f"🎯 {group_id} Trailing Stop ACTIVATED: Peak=${net_pnl:.2f}, Stop=${state.stop:.2f} "
+                                     f"(Lock {self.lock_percentage * 100:.0f}%)")
+                return False
+
+            if net_pnl > state.peak:
+                state.peak = net_pnl
+                state.stop = self._stop_for(net_pnl)
+                self.logger.debug(f"📈 {group_id} Peak Updated: ${net_pnl:.2f}, Stop=${state.stop:.2f}")
+                return False
+
+            if net_pnl < state.stop:
+                if net_pnl > 0:
+                    self.logger.info(f"🚨 {group_id} TRAILING STOP HIT ({source}): Peak=${state.peak:.2f}, "
+                                     f"Stop=${state.stop:.2f}, Net=${net_pnl:.2f}")
+                    return self._fire(state, net_pnl, detected_at, source)
+                # hit stop แต่ติดลบ → ยกเลิก trailing, รอ recovery (Never Cut Loss)
+                self.logger.warning(f"⚠️ {group_id} Hit stop but negative (${net_pnl:.2f}) - Canceling trailing, waiting for recovery")
+                state.reset()
+                self.stats['cancelled'] += 1
+            return False
+
+    def cancel(self, group_id: str):
+        """Drop the trailing of a group (close blocked - start over when profitable again)"""
+        with self._lock:
+            state = self._groups.get(group_id)
+            if state is not None:
+                state.reset()
+                self.stats['cancelled'] += 1
+
+    def remove(self, group_id: str):
+        with self._lock:
+            self._groups.pop(group_id, None)
+
+    def record_exit(self, group_id: str, exit_pnl: float):
+        """Realized PnL of a group closed by its stop (feeds the drawdown report)"""
+        exited_at = time.perf_counter()
+        with self._lock:
+            state = self._groups.pop(group_id, None)
+        if state is None or not state.closing:
+            return
+        record = StopExit(state, exit_pnl, exited_at)
+        self._exits.append(record)
+        self.logger.info(f"📉 {group_id} exit ${exit_pnl:.2f}: peak ${record.peak:.2f}, giveback ${record.giveback:.2f} "
+                         f"(rule ${record.rule_giveback:.2f}, latency ${record.latency_giveback:.2f})")
+
+    def get_state(self, group_id: str) -> Dict:
+        """{'peak', 'stop', 'active'} of a group (GUI)"""
+        state = self._groups.get(group_id)
+        return state.to_dict() if state is not None else {'peak': 0.0, 'stop': 0.0, 'active': False}
+
+    def _stop_for(self, peak: float) -> float:
+        # 🔒 Lock % of Peak: Stop = max(Peak × lock, Peak - Distance)
+        return max(peak * self.lock_percentage, peak - self.distance)
+
+    def _fire(self, state: GroupStop, net_pnl: float, detected_at: Optional[float], source: str) -> bool:
+        state.closing = True
+        state.decision_pnl = net_pnl
+        state.decided_at = time.perf_counter()
+        state.detected_at = detected_at
+        state.source = source
+        self.stats['fired_tick' if source == SOURCE_TICK else 'fired_loop'] += 1
+        return True
+
+    # ------------------------------------------------------------------
+    # Tick thread
+    # ------------------------------------------------------------------
+    def start(self):
+        """Start the tick thread (idempotent)"""
+        if self._running:
+            return
+        self._running = True
+        self._thread = threading.Thread(target=self._run, name="TrailingStop", daemon=True)
+        self._thread.start()
+        self.logger.info("🎯 Trailing stop engine running on ticks")
+
+    def stop(self, timeout: float = 2.0):
+        self._running = False
+        if self._thread:
+            self._thread.join(timeout=timeout)
+
+    def _run(self):
+        sequence = self.tick_watcher.sequence
+        while self._running:
+            event = self.tick_watcher.wait(sequence, self.heartbeat)
+            if event is None:
+                continue
+            sequence = event.sequence
+            try:
+                self.on_tick(event.snapshot, event.changed, event.detected_at)
+            except Exception as e:
+                self.stats['errors'] += 1
+                self.logger.error(f"Error evaluating trailing stops: {e}")
+
+    def on_tick(self, snapshot: TickSnapshot, changed: Iterable[str], detected_at: float = None) -> List[str]:
+        """
+        Mark groups touched by the changed symbols and fire their stops.
+
+        Returns:
+            Group ids whose stop fired
+        """
+        self.stats['ticks'] += 1
+        changed = set(changed)
+        with self._lock:
+            touched = [state for state in self._groups.values()
+                       if state.symbols and not state.closing and not state.symbols.isdisjoint(changed)]
+        if not touched:
+            return []
+
+        marks = self.marker.mark(snapshot)
+        fired = []
+        for state in touched:
+            net_pnl = marks.net(state.group_id)
+            if net_pnl is None:
+                self.stats['unmarked'] += 1
+                continue
+            self.stats['marks'] += 1
+            if self.evaluate(state.group_id, net_pnl, detected_at, SOURCE_TICK):
+                fired.append(state.group_id)
+
+        for group_id in fired:
+            if self.on_stop is not None:
+                try:
+                    self.on_stop(group_id)
+                except Exception as e:
+                    self.stats['errors'] += 1
+                    self.logger.error(f"Error closing {group_id} on trailing stop: {e}")
+        return fired
+
+    # ------------------------------------------------------------------
+    # Reporting
+    # ------------------------------------------------------------------
+    def get_drawdown_report(self) -> Dict:
+        """
+        Peak-to-exit drawdown of closed groups and how much of it came from decision latency.
+
+        Returns:
+            Dict: exits, giveback totals (rule / detection / execution), latency share
+                  of the giveback and tick->decision / decision->exit timings (ms)
+        """
+        exits = list(self._exits)
+        report = {'exits': len(exits), 'by_source': {SOURCE_TICK: 0, SOURCE_LOOP: 0}}
+        for record in exits:
+            report['by_source'][record.source] = report['by_source'].get(record.source, 0) + 1
+
+        giveback = sum(record.giveback for record in exits)
+        latency = sum(record.latency_giveback for record in exits)
+        report['giveback_usd'] = giveback
+        report['rule_giveback_usd'] = sum(record.rule_giveback for record in exits)
+        report['latency_giveback_usd'] = latency
+        report['detection_overshoot_usd'] = sum(record.detection_overshoot for record in exits)
+        report['execution_slippage_usd'] = sum(record.execution_slippage for record in exits)
+        report['latency_share_pct'] = (latency / giveback * 100) if giveback > 0 else 0.0
+
+        for name, values in (('tick_to_decision_ms', [r.tick_to_decision_ms for r in exits
+                                                      if r.tick_to_decision_ms is not None]),
+                             ('decision_to_exit_ms', [r.decision_to_exit_ms for r in exits])):
+            samples = np.asarray(values, dtype=np.float64)
+            if len(samples):
+                p50, p95 = np.percentile(samples, [50, 95])
+                report[name] = {'samples': len(samples), 'p50_ms': float(p50), 'p95_ms': float(p95),
+                                'max_ms': float(samples.max())}
+            else:
+                report[name] = {'samples': 0, 'p50_ms': 0.0, 'p95_ms': 0.0, 'max_ms': 0.0}
+        report['recent'] = [record.to_dict() for record in exits[-10:]]
+        return report
+
+    def get_stats(self) -> Dict:
+        stats = dict(self.stats)
+        stats['groups'] = len(self._groups)
+        stats['active'] = sum(1 for state in self._groups.values() if state.active)
+        return stats
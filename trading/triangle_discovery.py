@@ -0,0 +1,217 @@
+"""
+Triangle Discovery
+==================
+
+Builds a currency graph from the mapped broker symbols and enumerates every
+triangle (three currencies whose three pairs are all tradeable), with the leg
+orientation and the magic number / comment prefix of each triangle. Longer
+cycles (4 and 5 legs) can be enumerated the same way for multi-leg arbitrage.
+
+Key Features:
+- Currency graph from 6-letter symbols (EURUSD -> EUR/USD)
+- Leg orientation table per triangle: converting currency X -> Y over pair X/Y
+  is a SELL (x * bid); over pair Y/X the leg is inverted and is a BUY (x / ask)
+- Preferred triangles keep their numbers (triangle_1..6 -> magic 234001..234006);
+  discovered ones are numbered after them, then 4/5-leg cycles if requested
+- Numbers whose magic is reserved for recovery orders (234100-234103) are skipped
+- Helpers mapping triangle number <-> magic <-> group id used across the system
+"""
+
+import itertools
+import re
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+TRIANGLE_MAGIC_BASE = 234000   # default / recovery magic; triangle N uses BASE + N
+MAX_TRIANGLES = 999
+RESERVED_MAGICS = frozenset(range(234100, 234104))   # recovery magics (CorrelationManager._is_recovery_comment)
+
+_TRIANGLE_NUMBER_RE = re.compile(r'triangle_(\d+)')
+
+
+def triangle_magic(number: int) -> int:
+    """Magic number of triangle N"""
+    return TRIANGLE_MAGIC_BASE + number
+
+
+def is_triangle_magic(magic: int) -> bool:
+    """True for arbitrage group magic numbers (not the default 234000 or recovery magics)"""
+    return (TRIANGLE_MAGIC_BASE < (magic or 0) <= TRIANGLE_MAGIC_BASE + MAX_TRIANGLES
+            and magic not in RESERVED_MAGICS)
+
+
+def triangle_number_from_magic(magic: int) -> Optional[int]:
+    """Triangle number of a group magic, or None"""
+    return magic - TRIANGLE_MAGIC_BASE if is_triangle_magic(magic) else None
+
+
+def triangle_number_from_name(name: str) -> Optional[int]:
+    """Triangle number from 'triangle_12' or 'group_triangle_12_1', or None"""
+    match = _TRIANGLE_NUMBER_RE.search(name or '')
+    return int(match.group(1)) if match else None
+
+
+def triangle_group_id(number: int) -> str:
+    """Group id used for triangle N (group_triangle_N_1)"""
+    return f"group_triangle_{number}_1"
+
+
+def split_symbol(symbol: str) -> Optional[Tuple[str, str]]:
+    """'EURUSD' -> ('EUR', 'USD'); None if the name is not a 6-letter currency pair"""
+    if len(symbol) < 6 or not symbol[:6].isalpha():
+        return None
+    return symbol[:3].upper(), symbol[3:6].upper()
+
+
+class TriangleSpec:
+    """One tradeable triangle (or longer cycle) with its precomputed leg orientation."""
+
+    __slots__ = ('number', 'name', 'magic', 'symbols', 'currencies', 'inverted', 'forward_sides')
+
+    def __init__(self, number: int, symbols: Tuple[str, ...], currencies: Tuple[str, ...],
+                 inverted: Tuple[bool, ...]):
+        self.number = number
+        self.name = f"triangle_{number}"
+        self.magic = triangle_magic(number)
+        self.symbols = symbols
+        self.currencies = currencies            # start currency of each leg on the forward cycle
+        self.inverted = inverted                # leg quoted against the travel direction (BUY)
+        self.forward_sides = tuple('BUY' if flag else 'SELL' for flag in inverted)
+
+    @property
+    def group_id(self) -> str:
+        return triangle_group_id(self.number)
+
+    @property
+    def legs(self) -> int:
+        return len(self.symbols)
+
+    def comment(self, symbol: str, direction: str) -> str:
+        """Order comment for one leg (G12_EURUSD_B)"""
+        return f"G{self.number}_{symbol}_{direction[:1].upper()}"
+
+    def __repr__(self) -> str:
+        path = ' -> '.join(self.currencies + (self.currencies[0],))
+        return f"TriangleSpec({self.name}, {self.symbols}, {path})"
+
+
+class CurrencyGraph:
+    """Undirected graph: currencies are nodes, tradeable pairs are edges."""
+
+    def __init__(self, symbols: Iterable[str]):
+        self.pairs: Dict[frozenset, str] = {}
+        self.currencies: List[str] = []
+        seen = set()
+        for symbol in symbols:
+            parts = split_symbol(symbol)
+            if parts is None or parts[0] == parts[1]:
+                continue
+            key = frozenset(parts)
+            self.pairs.setdefault(key, symbol)
+            for currency in parts:
+                if currency not in seen:
+                    seen.add(currency)
+                    self.currencies.append(currency)
+
+    def pair(self, a: str, b: str) -> Optional[str]:
+        """Symbol trading a against b (either quotation), or None"""
+        return self.pairs.get(frozenset((a, b)))
+
+    def triangles(self) -> List[Tuple[str, str, str]]:
+        """Every currency triple with all three pairs available (symbol tuples)"""
+        return self.cycles(3)
+
+    def cycles(self, legs: int) -> List[Tuple[str, ...]]:
+        """
+        Every simple cycle through `legs` distinct currencies (symbol tuples).
+
+        Each cycle is listed once: it starts at its smallest currency and the
+        reverse traversal is not repeated (the engine evaluates both directions).
+        """
+        found = []
+        for group in itertools.combinations(sorted(self.currencies), legs):
+            first, rest = group[0], group[1:]
+            for order in itertools.permutations(rest):
+                if order[0] > order[-1]:
+                    continue
+                path = (first,) + order
+                symbols = tuple(self.pair(path[i], path[(i + 1) % legs]) for i in range(legs))
+                if all(symbols):
+                    found.append(symbols)
+        return found
+
+
+def orient(symbols: Sequence[str]) -> Optional[Tuple[Tuple[str, ...], Tuple[bool, ...]]]:
+    """
+    Leg orientation for a triangle (or longer cycle) in the given leg order.
+
+    The forward cycle walks leg 1 -> leg 2 -> ... -> leg 1: it starts in the
+    currency of leg 1 that leg 2 does not share, and each leg converts into
+    the currency it shares with the next leg.
+
+    Returns:
+        (start currency of each leg, inverted flag of each leg) or None if the
+        symbols do not form a cycle
+    """
+    parts = [split_symbol(symbol) for symbol in symbols]
+    legs = len(parts)
+    if legs < 3 or any(p is None for p in parts):
+        return None
+
+    currencies = []
+    inverted = []
+    start = None
+    for leg in range(legs):
+        current, following = set(parts[leg]), set(parts[(leg + 1) % legs])
+        shared = current & following
+        if len(shared) != 1:
+            return None
+        target = shared.pop()
+        source = (current - {target}).pop()
+        if start is not None and source != start:
+            return None
+        currencies.append(source)
+        # Pair quoted target/source: getting target means buying the base
+        inverted.append(parts[leg][0] == target)
+        start = target
+    if start != currencies[0] or len(set(currencies)) != legs:
+        return None
+    return tuple(currencies), tuple(inverted)
+
+
+def discover_triangles(symbols: Iterable[str], preferred: Sequence[Tuple[str, ...]] = (),
+                       max_legs: int = 3) -> List[TriangleSpec]:
+    """
+    Enumerate all triangles (and optionally longer cycles) available in a symbol set.
+
+    Args:
+        symbols: Base symbol names (EURUSD, ...)
+        preferred: Triangles that keep numbers 1..len(preferred) and their leg order
+        max_legs: Also enumerate cycles of 4..max_legs legs (3 = triangles only)
+
+    Returns:
+        TriangleSpec list, preferred triangles first (numbers 1..len(preferred)),
+        discovered triangles numbered after them, then longer cycles by leg count
+    """
+    graph = CurrencyGraph(symbols)
+    specs: List[TriangleSpec] = []
+    taken = set(frozenset(triangle) for triangle in preferred)
+
+    # Preferred triangles keep their number even if some are unavailable (magic numbers stay stable)
+    candidates = [(number, tuple(triangle)) for number, triangle in enumerate(preferred, 1)]
+    next_number = len(preferred) + 1
+    for legs in range(3, max_legs + 1):
+        for cycle in graph.cycles(legs):
+            while triangle_magic(next_number) in RESERVED_MAGICS:
+                next_number += 1
+            if frozenset(cycle) in taken or next_number > MAX_TRIANGLES:
+                continue
+            taken.add(frozenset(cycle))
+            candidates.append((next_number, cycle))
+            next_number += 1
+
+    for number, triangle in candidates:
+        oriented = orient(triangle)
+        if oriented is None or not all(graph.pair(*split_symbol(symbol)) == symbol for symbol in triangle):
+            continue
+        specs.append(TriangleSpec(number, triangle, *oriented))
+    return specs
@@ -0,0 +1,405 @@
+"""
+Triangle Evaluation Engine
+==========================
+
+Evaluates every tracked triangle in one vectorized numpy pass per tick
+snapshot and returns the opportunities ranked by net profit. After the first
+pass only triangles touching a symbol with a new tick are re-scored.
+
+Key Features:
+- Leg table built once: symbol rows (n, legs) and BUY/SELL side per leg on the
+  forward path (the reverse path takes the opposite side on every leg)
+- Triangles and longer cycles share one table: shorter rows are padded with a
+  unit leg (bid = ask = 1, no cost) so 3-, 4- and 5-leg cycles rank together
+- Same math as the scalar calculate_arbitrage_direction():
+  path result = product of (1 / ask) for BUY legs and (bid) for SELL legs,
+  cost = leg spreads % + commission % + slippage % per leg
+- Optional per-symbol spread floor (price units): a leg is charged
+  max(live spread, floor), e.g. the rolling spread of this hour-of-week
+- One evaluation per TickSnapshot (memoized), so every consumer in a tick shares it
+- Incremental: symbol -> triangles reverse index; a symbol is dirty when its
+  time_msc changes, and only the triangles of dirty symbols are recomputed
+- Top-k opportunities maintained incrementally: dirty rows are merged into
+  the current top-k, full scan only when a top-k row worsens
+- Ranked structured array of opportunities; adding triangles costs one more row
+- Evaluations are views of the engine state (no per-pass copy);
+  direction_info(), top() and rank() read them under the engine lock, so a
+  row never mixes prices and costs of two passes
+"""
+
+import threading
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from trading.tick_snapshot import TickSnapshot
+
+DIRECTION_FORWARD = 0
+DIRECTION_REVERSE = 1
+
+DIRECTION_NAMES = {DIRECTION_FORWARD: 'forward', DIRECTION_REVERSE: 'reverse'}
+
+# Leg sides of the original six hand-written triangles (BUY pair1, BUY pair2, SELL pair3)
+LEGACY_FORWARD_SIDES = ('BUY', 'BUY', 'SELL')
+
+OPPORTUNITY_DTYPE = np.dtype([
+    ('triangle', np.int32),
+    ('direction', np.int8),
+    ('profit_percent', np.float64),
+    ('raw_profit', np.float64),
+    ('cost_percent', np.float64)
+])
+
+
+class TriangleEvaluation:
+    """
+    Per-triangle results of an engine pass (all arrays have one row per triangle).
+
+    The arrays are views of the engine state, re-scored in place by later
+    passes - read rows through TriangleEngine (direction_info / top / rank),
+    which holds the engine lock, to get prices and costs of one pass.
+    """
+
+    __slots__ = ('ticks', 'bid', 'ask', 'valid', 'forward_raw', 'reverse_raw',
+                 'cost', 'forward_net', 'reverse_net', 'net', 'direction', 'dirty')
+
+    def __init__(self, ticks: TickSnapshot, bid: np.ndarray, ask: np.ndarray, valid: np.ndarray,
+                 forward_raw: np.ndarray, reverse_raw: np.ndarray, cost: np.ndarray,
+                 forward_net: np.ndarray, reverse_net: np.ndarray, net: np.ndarray,
+                 direction: np.ndarray, dirty: np.ndarray):
+        self.ticks = ticks
+        self.bid = bid                    # (n, legs) evaluated bids
+        self.ask = ask                    # (n, legs) evaluated asks
+        self.valid = valid                # (n,) all legs priced
+        self.forward_raw = forward_raw    # (n,) % before costs
+        self.reverse_raw = reverse_raw
+        self.cost = cost                  # (n,) total cost %
+        self.forward_net = forward_net
+        self.reverse_net = reverse_net
+        self.net = net                    # (n,) best net % (NaN when not priced)
+        self.direction = direction        # (n,) DIRECTION_* of net
+        self.dirty = dirty                # rows re-scored by this pass
+
+    def best_direction(self) -> np.ndarray:
+        """DIRECTION_FORWARD / DIRECTION_REVERSE per triangle (forward wins ties)"""
+        return self.direction
+
+    def best_net(self) -> np.ndarray:
+        """Best net profit % per triangle (NaN when not priced)"""
+        return self.net
+
+
+class TriangleEngine:
+    """
+    Vectorized evaluator for a fixed set of triangles.
+
+    Usage:
+        engine = TriangleEngine(triangles, commission_rate=0.00001, max_slippage=0.0001)
+        top = engine.top(broker.get_ticks(engine.symbols))
+        info = engine.direction_info(int(top[0]['triangle']), int(top[0]['direction']))
+    """
+
+    def __init__(self, triangles: Sequence[Tuple[str, ...]], forward_sides: Sequence[Tuple[str, ...]] = None,
+                 commission_rate: float = 0.0001, max_slippage: float = 0.0005, top_k: int = 16):
+        """
+        Args:
+            triangles: Symbol tuples, one per triangle or cycle (any length >= 3)
+            forward_sides: 'BUY'/'SELL' per leg on the forward path (default: LEGACY_FORWARD_SIDES)
+            commission_rate: Commission per leg as a fraction (config execution.commission_rate)
+            max_slippage: Slippage per leg as a fraction (config execution.max_slippage)
+            top_k: Opportunities kept ranked incrementally (top())
+        """
+        self.triangles: List[Tuple[str, ...]] = [tuple(triangle) for triangle in triangles]
+        if forward_sides is None:
+            forward_sides = [LEGACY_FORWARD_SIDES] * len(self.triangles)
+        self.forward_sides: List[Tuple[str, ...]] = [tuple(side.upper() for side in sides) for sides in forward_sides]
+        self.set_costs(commission_rate, max_slippage)
+
+        self.symbols: Tuple[str, ...] = tuple(dict.fromkeys(s for triangle in self.triangles for s in triangle))
+        symbol_index = {symbol: i for i, symbol in enumerate(self.symbols)}
+        self.leg_count = np.array([len(triangle) for triangle in self.triangles], dtype=np.intp)
+        legs = int(self.leg_count.max()) if len(self.triangles) else 3
+        pad = len(self.symbols)   # unit leg row for cycles shorter than `legs`
+        self.leg_rows = np.array([[symbol_index[s] for s in triangle] + [pad] * (legs - len(triangle))
+                                  for triangle in self.triangles], dtype=np.intp).reshape(len(self.triangles), legs)
+        self.forward_buy = np.array([[side == 'BUY' for side in sides] + [False] * (legs - len(sides))
+                                     for sides in self.forward_sides], dtype=bool).reshape(self.leg_rows.shape)
+        self._triangle_index = {triangle: i for i, triangle in enumerate(self.triangles)}
+
+        # Reverse index: symbol row -> triangle rows using it
+        self.symbol_triangles: List[np.ndarray] = [
+            np.flatnonzero((self.leg_rows == row).any(axis=1)) for row in range(len(self.symbols))
+        ]
+
+        # Incremental state (updated in place for dirty rows only)
+        n, legs = self.leg_rows.shape
+        self._symbol_time = np.full(len(self.symbols), -1, dtype=np.int64)
+        self._symbol_bid = np.append(np.full(len(self.symbols), np.nan), 1.0)
+        self._symbol_ask = np.append(np.full(len(self.symbols), np.nan), 1.0)
+        self._spread_floor = np.zeros(len(self.symbols) + 1)       # price units, 0 = live spread only
+        self._floor_changed = np.empty(0, dtype=np.intp)            # symbol rows re-scored on the next pass
+        self._bid = np.full((n, legs), np.nan)
+        self._ask = np.full((n, legs), np.nan)
+        self._valid = np.zeros(n, dtype=bool)
+        self._forward_raw = np.full(n, np.nan)
+        self._reverse_raw = np.full(n, np.nan)
+        self._cost = np.full(n, np.nan)
+        self._forward_net = np.full(n, np.nan)
+        self._reverse_net = np.full(n, np.nan)
+        self._net = np.full(n, np.nan)
+        self._direction = np.zeros(n, dtype=np.int8)
+        self._scored_at = np.zeros(n, dtype=np.int64)   # pass number of the last re-score per row
+        self.top_k = max(1, int(top_k))
+        self._top_rows = np.empty(0, dtype=np.intp)     # best rows, descending net
+        self._top_net = np.empty(0)                      # their net when they entered / were re-scored
+        self._passes = 0
+        self.stats = {'passes': 0, 'rescored': 0, 'full_passes': 0, 'top_scans': 0}
+        self._lock = threading.Lock()
+
+        self._rows: Tuple[Optional[Tuple[str, ...]], Optional[np.ndarray]] = (None, None)
+        self._last: Tuple[Optional[TickSnapshot], Optional[TriangleEvaluation]] = (None, None)
+
+    def __len__(self) -> int:
+        return len(self.triangles)
+
+    def set_costs(self, commission_rate: float, max_slippage: float):
+        """Update per-leg commission and slippage (fractions)"""
+        self.commission_rate = float(commission_rate)
+        self.max_slippage = float(max_slippage)
+        self._last = (None, None)
+        self._full = True   # costs touch every triangle
+
+    def set_spread_floors(self, floors: Dict[str, float]) -> int:
+        """
+        Minimum spread charged per leg (price units); symbols not given get no floor.
+
+        Only triangles of symbols whose floor changed are re-scored on the next pass.
+
+        Returns:
+            Number of symbols whose floor changed
+        """
+        values = np.array([floors.get(symbol) or 0.0 for symbol in self.symbols] + [0.0])
+        with self._lock:
+            changed = np.flatnonzero(values != self._spread_floor)
+            if len(changed):
+                self._spread_floor = values
+                self._floor_changed = np.union1d(self._floor_changed, changed)
+                self._last = (None, None)
+        return len(changed)
+
+    def index_of(self, triangle: Tuple[str, ...]) -> Optional[int]:
+        """Row of a triangle, or None if the engine does not track it"""
+        return self._triangle_index.get(tuple(triangle))
+
+    def evaluate(self, ticks: TickSnapshot) -> TriangleEvaluation:
+        """Evaluate against a snapshot, re-scoring only triangles with a changed symbol (cached per snapshot)"""
+        last_ticks, last_evaluation = self._last
+        if ticks is last_ticks and last_evaluation is not None:
+            return last_evaluation
+
+        with self._lock:
+            last_ticks, last_evaluation = self._last
+            if ticks is last_ticks and last_evaluation is not None:
+                return last_evaluation
+
+            # Dirty symbols: time_msc differs from the last pass (a missing symbol reads as -1)
+            rows = self._snapshot_rows(ticks)
+            has_row = rows >= 0
+            symbol_time = np.full(len(self.symbols), -1, dtype=np.int64)
+            symbol_time[has_row] = ticks.time_msc[rows[has_row]]
+            changed = np.flatnonzero(symbol_time != self._symbol_time)
+            if len(changed):
+                changed_rows = rows[changed]
+                present = changed_rows >= 0
+                self._symbol_time[changed] = symbol_time[changed]
+                self._symbol_bid[changed] = np.where(present, ticks.bid[changed_rows], np.nan)
+                self._symbol_ask[changed] = np.where(present, ticks.ask[changed_rows], np.nan)
+            if len(self._floor_changed):
+                changed = np.union1d(changed, self._floor_changed)
+                self._floor_changed = np.empty(0, dtype=np.intp)
+
+            self._passes += 1
+            if self._full:
+                dirty = np.arange(len(self.triangles))
+                self._full = False
+                self.stats['full_passes'] += 1
+            elif len(changed) == 1:
+                dirty = self.symbol_triangles[changed[0]]
+            elif len(changed):
+                dirty = np.unique(np.concatenate([self.symbol_triangles[i] for i in changed]))
+            else:
+                dirty = np.empty(0, dtype=np.intp)
+
+            if len(dirty):
+                self._rescore(dirty)
+            self.stats['passes'] += 1
+            self.stats['rescored'] += len(dirty)
+
+            evaluation = TriangleEvaluation(ticks, self._bid, self._ask, self._valid,
+                                            self._forward_raw, self._reverse_raw, self._cost,
+                                            self._forward_net, self._reverse_net, self._net,
+                                            self._direction, dirty)
+            self._last = (ticks, evaluation)
+            return evaluation
+
+    def best(self, ticks: TickSnapshot = None) -> Optional[Tuple[int, int, float]]:
+        """
+        Current best opportunity, maintained incrementally.
+
+        Args:
+            ticks: Snapshot to evaluate first (default: state of the last pass)
+
+        Returns:
+            (triangle row, DIRECTION_*, net profit %) or None if nothing is priced
+        """
+        if ticks is not None:
+            self.evaluate(ticks)
+        with self._lock:
+            if not len(self._top_rows):
+                return None
+            top = int(self._top_rows[0])
+            return top, int(self._direction[top]), float(self._net[top])
+
+    def top(self, ticks: TickSnapshot = None, min_profit: float = None) -> np.ndarray:
+        """
+        Best top_k opportunities, maintained incrementally (cost follows the dirty rows).
+
+        Args:
+            ticks: Snapshot to evaluate first (default: state of the last pass)
+            min_profit: Optional minimum net profit % to include
+
+        Returns:
+            Structured array with OPPORTUNITY_DTYPE fields, best first
+        """
+        if ticks is not None:
+            self.evaluate(ticks)
+        with self._lock:
+            rows = self._top_rows
+            if min_profit is not None:
+                rows = rows[self._net[rows] >= min_profit]
+            return self._opportunities(rows)
+
+    def scored_at(self, index: int) -> int:
+        """Pass number at which a triangle was last re-scored (unchanged = same prices)"""
+        return int(self._scored_at[index])
+
+    def _rescore(self, dirty: np.ndarray):
+        """Recompute the rows of dirty triangles and update the leader"""
+        leg_rows = self.leg_rows[dirty]
+        forward_buy = self.forward_buy[dirty]
+        bid = self._symbol_bid[leg_rows]
+        ask = self._symbol_ask[leg_rows]
+        priced = np.isfinite(bid) & np.isfinite(ask) & (bid > 0) & (ask > 0)
+        valid = priced.all(axis=1)
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            inverse_ask = 1.0 / ask
+            forward_raw = (np.where(forward_buy, inverse_ask, bid).prod(axis=1) - 1.0) * 100
+            reverse_raw = (np.where(forward_buy, bid, inverse_ask).prod(axis=1) - 1.0) * 100
+            spread = np.maximum(ask - bid, self._spread_floor[leg_rows])
+            spread_cost = (spread / bid * 100).sum(axis=1)
+        cost = spread_cost + (self.commission_rate + self.max_slippage) * self.leg_count[dirty] * 100
+        forward_net = forward_raw - cost
+        reverse_net = reverse_raw - cost
+
+        self._bid[dirty] = bid
+        self._ask[dirty] = ask
+        self._valid[dirty] = valid
+        self._forward_raw[dirty] = forward_raw
+        self._reverse_raw[dirty] = reverse_raw
+        self._cost[dirty] = cost
+        self._forward_net[dirty] = forward_net
+        self._reverse_net[dirty] = reverse_net
+        self._net[dirty] = np.where(valid, np.maximum(forward_net, reverse_net), np.nan)
+        self._direction[dirty] = np.where(forward_net >= reverse_net, DIRECTION_FORWARD, DIRECTION_REVERSE)
+        self._scored_at[dirty] = self._passes
+
+        # Top-k: untouched rows cannot have improved, so merging the dirty rows into the
+        # current top-k is exact unless a top-k row worsened (then a row outside may now rank)
+        top_rows = self._top_rows
+        if not (self._net[top_rows] >= self._top_net).all():
+            self.stats['top_scans'] += 1
+            candidates = np.flatnonzero(np.isfinite(self._net))
+        else:
+            candidates = np.union1d(top_rows, dirty)
+            candidates = candidates[np.isfinite(self._net[candidates])]
+        if len(candidates) > self.top_k:
+            candidates = candidates[np.argpartition(-self._net[candidates], self.top_k - 1)[:self.top_k]]
+        top_rows = candidates[np.lexsort((candidates, -self._net[candidates]))]
+        self._top_rows = top_rows
+        self._top_net = self._net[top_rows]
+
+    def rank(self, ticks: TickSnapshot, min_profit: float = None) -> np.ndarray:
+        """
+        All priced triangles ranked by best net profit (descending) - a full sort,
+        use top() on the per-tick path.
+
+        Args:
+            ticks: Snapshot covering self.symbols
+            min_profit: Optional minimum net profit % to include
+
+        Returns:
+            Structured array with OPPORTUNITY_DTYPE fields
+        """
+        self.evaluate(ticks)
+        with self._lock:
+            keep = self._valid if min_profit is None else self._valid & (self._net >= min_profit)
+            order = np.flatnonzero(keep)
+            return self._opportunities(order[np.argsort(-self._net[order], kind='stable')])
+
+    def _opportunities(self, rows: np.ndarray) -> np.ndarray:
+        """OPPORTUNITY_DTYPE rows for triangle rows (caller holds the lock)"""
+        direction = self._direction[rows]
+        ranked = np.empty(len(rows), dtype=OPPORTUNITY_DTYPE)
+        ranked['triangle'] = rows
+        ranked['direction'] = direction
+        ranked['profit_percent'] = self._net[rows]
+        ranked['raw_profit'] = np.where(direction == DIRECTION_FORWARD,
+                                        self._forward_raw[rows], self._reverse_raw[rows])
+        ranked['cost_percent'] = self._cost[rows]
+        return ranked
+
+    def direction_info(self, index: int, direction: int = None,
+                       evaluation: TriangleEvaluation = None) -> Optional[Dict]:
+        """
+        calculate_arbitrage_direction()-compatible dict for one triangle.
+
+        Args:
+            index: Triangle row
+            direction: DIRECTION_* to report (default: the better one)
+            evaluation: Evaluation to read (default: the last one)
+        """
+        evaluation = evaluation or self._last[1]
+        if evaluation is None:
+            return None
+        with self._lock:
+            if not evaluation.valid[index]:
+                return None
+            if direction is None:
+                direction = int(evaluation.best_direction()[index])
+
+            triangle = self.triangles[index]
+            forward = direction == DIRECTION_FORWARD
+            raw = evaluation.forward_raw[index] if forward else evaluation.reverse_raw[index]
+            orders = {}
+            for symbol, buy in zip(triangle, self.forward_buy[index]):
+                orders[symbol] = 'BUY' if buy == forward else 'SELL'
+
+            return {
+                'direction': DIRECTION_NAMES[direction],
+                'profit_percent': float(raw - evaluation.cost[index]),
+                'prices': {symbol: (float(evaluation.bid[index, leg]), float(evaluation.ask[index, leg]))
+                           for leg, symbol in enumerate(triangle)},
+                'raw_profit': float(raw),
+                'cost_percent': float(evaluation.cost[index]),
+                'orders': orders
+            }
+
+    def _snapshot_rows(self, ticks: TickSnapshot) -> np.ndarray:
+        """Engine symbol -> snapshot row (-1 if missing), rebuilt only when the snapshot layout changes"""
+        key, rows = self._rows
+        if rows is None or key != ticks.symbols:
+            rows = np.array([-1 if row is None else row for row in map(ticks.index_of, self.symbols)],
+                            dtype=np.intp)
+            self._rows = (ticks.symbols, rows)
+        return rows
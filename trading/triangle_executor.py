@@ -0,0 +1,311 @@
+"""
+Triangle Executor
+=================
+
+Sends the legs of an arbitrage triangle (or 4/5-leg cycle) as one unit:
+every leg is validated up front, then all legs are dispatched together (or
+one by one in liquidity order), and already-filled legs are rolled back if
+any leg fails.
+
+Key Features:
+- Pre-validation from the symbol registry (symbol, trade mode, volume limits/step)
+  so nothing is looked up between the first and the last send
+- Dispatch modes: 'concurrent' (all legs at once) or 'sequential'
+- Leg order: 'as_evaluated' or 'liquidity' (tightest spread first)
+- Rollback of filled legs when any leg fails (each close retried; legs that
+  stay open are reported as rollback_failed)
+- Per-leg send-to-fill latency and fill deviation from the evaluated bid/ask
+"""
+
+import logging
+import math
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+DISPATCH_CONCURRENT = 'concurrent'
+DISPATCH_SEQUENTIAL = 'sequential'
+
+LEG_ORDER_AS_EVALUATED = 'as_evaluated'
+LEG_ORDER_LIQUIDITY = 'liquidity'
+
+
+class TriangleLeg:
+    """One order of a triangle, resolved and validated before dispatch."""
+
+    __slots__ = ('symbol', 'real_symbol', 'direction', 'volume', 'comment', 'magic',
+                 'bid', 'ask', 'pip_size', 'ticket', 'fill_price', 'latency_ms',
+                 'deviation_pips', 'error')
+
+    def __init__(self, symbol: str, direction: str, volume: float, comment: str, magic: int,
+                 bid: float = None, ask: float = None):
+        self.symbol = symbol
+        self.real_symbol = symbol
+        self.direction = direction.upper()
+        self.volume = volume
+        self.comment = comment
+        self.magic = magic
+        self.bid = bid
+        self.ask = ask
+        self.pip_size = 0.0001
+        self.ticket = None
+        self.fill_price = None
+        self.latency_ms = None
+        self.deviation_pips = None
+        self.error = None
+
+    @property
+    def expected_price(self) -> Optional[float]:
+        """Evaluated price of this leg (ask for BUY, bid for SELL)"""
+        return self.ask if self.direction == 'BUY' else self.bid
+
+    @property
+    def spread_pips(self) -> float:
+        """Evaluated spread in pips (inf when unknown)"""
+        if self.bid is None or self.ask is None or not self.pip_size:
+            return math.inf
+        return (self.ask - self.bid) / self.pip_size
+
+    def to_dict(self) -> Dict:
+        return {
+            'symbol': self.symbol,
+            'direction': self.direction,
+            'lot_size': self.volume,
+            'ticket': self.ticket,
+            'expected_price': self.expected_price,
+            'fill_price': self.fill_price,
+            'latency_ms': self.latency_ms,
+            'deviation_pips': self.deviation_pips,
+            'error': self.error
+        }
+
+
+class TriangleExecutor:
+    """
+    Dispatches triangle legs through the broker and keeps leg statistics.
+
+    Usage:
+        executor = TriangleExecutor(broker, dispatch_mode='concurrent')
+        legs = [TriangleLeg('EURUSD', 'BUY', 0.1, 'G1_EURUSD_B', 234001, bid, ask), ...]
+        result = executor.execute(legs)
+    """
+
+    def __init__(self, broker, dispatch_mode: str = DISPATCH_CONCURRENT,
+                 leg_order: str = LEG_ORDER_AS_EVALUATED, history_size: int = 500, max_legs: int = 5,
+                 rollback_attempts: int = 3, rollback_retry_delay: float = 0.2):
+        """
+        Args:
+            broker: BrokerAPI (or ReplayBroker) used for place_order/close_position
+            dispatch_mode: 'concurrent' or 'sequential'
+            leg_order: 'as_evaluated' or 'liquidity' (tightest spread sent first)
+            history_size: Samples kept per symbol for latency/deviation statistics
+            max_legs: Longest cycle sent (dispatch threads, so every leg goes out at once)
+            rollback_attempts: close_position tries per filled leg on rollback
+            rollback_retry_delay: Seconds between rollback tries
+        """
+        self.broker = broker
+        self.dispatch_mode = dispatch_mode
+        self.leg_order = leg_order
+        self.rollback_attempts = max(1, rollback_attempts)
+        self.rollback_retry_delay = rollback_retry_delay
+        self.logger = logging.getLogger(__name__)
+
+        self._pool = ThreadPoolExecutor(max_workers=max_legs, thread_name_prefix="TriangleLeg")
+        self._history_size = history_size
+        self._latency: Dict[str, deque] = {}
+        self._deviation: Dict[str, deque] = {}
+        self._stats_lock = threading.Lock()
+        self.stats = {'triangles': 0, 'filled': 0, 'rejected': 0, 'failed': 0, 'rolled_back_legs': 0,
+                      'rollback_failed_legs': 0}
+
+    def validate(self, legs: List[TriangleLeg]) -> Optional[str]:
+        """
+        Resolve broker symbols and check every leg before anything is sent.
+
+        Volumes are normalised to the symbol's volume step in place.
+
+        Returns:
+            None if all legs can be sent, otherwise the reason
+        """
+        for leg in legs:
+            if leg.direction not in ('BUY', 'SELL'):
+                return f"{leg.symbol}: invalid direction {leg.direction}"
+
+            metadata = self.broker.get_symbol_metadata(leg.symbol)
+            if metadata is None:
+                return f"{leg.symbol}: symbol not available"
+            if not metadata.trade_mode:
+                return f"{leg.symbol}: symbol not tradeable"
+            leg.real_symbol = metadata.name
+            leg.pip_size = metadata.pip_size
+
+            step = metadata.volume_step or 0.01
+            volume = round(round(leg.volume / step) * step, 8)
+            if volume < metadata.volume_min or volume > metadata.volume_max:
+                return (f"{leg.symbol}: volume {leg.volume} outside "
+                        f"{metadata.volume_min}-{metadata.volume_max}")
+            leg.volume = volume
+
+            if leg.expected_price is None:
+                return f"{leg.symbol}: no evaluated price"
+        return None
+
+    def execute(self, legs: List[TriangleLeg]) -> Dict:
+        """
+        Validate, dispatch and (on failure) roll back a triangle.
+
+        Returns:
+            Dict with success, error, legs (per-leg dicts), rolled_back (tickets closed),
+            rollback_failed (tickets still open after the rollback) and total_ms
+            (first send to last fill)
+        """
+        self._count('triangles')
+        error = self.validate(legs)
+        if error:
+            self._count('rejected')
+            return {'success': False, 'error': error, 'legs': [leg.to_dict() for leg in legs],
+                    'rolled_back': [], 'rollback_failed': [], 'total_ms': 0.0}
+
+        ordered = self._order_legs(legs)
+        started = time.perf_counter()
+        if self.dispatch_mode == DISPATCH_CONCURRENT:
+            list(self._pool.map(self._send_leg, ordered))
+        else:
+            for leg in ordered:
+                if not self._send_leg(leg):
+                    break
+        total_ms = (time.perf_counter() - started) * 1000
+
+        failed = [leg for leg in legs if leg.ticket is None]
+        rolled_back, rollback_failed = [], []
+        if failed:
+            self._count('failed')
+            rolled_back, rollback_failed = self._rollback([leg for leg in legs if leg.ticket is not None])
+            error = '; '.join(f"{leg.symbol}: {leg.error or 'not sent'}" for leg in failed)
+        else:
+            self._count('filled')
+
+        return {
+            'success': not failed,
+            'error': error,
+            'legs': [leg.to_dict() for leg in legs],
+            'rolled_back': rolled_back,
+            'rollback_failed': rollback_failed,
+            'total_ms': total_ms
+        }
+
+    def get_stats(self) -> Dict:
+        """Triangle and rollback counters"""
+        with self._stats_lock:
+            return dict(self.stats)
+
+    def get_leg_stats(self) -> Dict[str, Dict]:
+        """Per-symbol send-to-fill latency (ms) and adverse fill deviation (pips)"""
+        with self._stats_lock:
+            result = {}
+            for symbol, samples in self._latency.items():
+                latency = np.fromiter(samples, dtype=np.float64)
+                deviation = np.fromiter(self._deviation.get(symbol, ()), dtype=np.float64)
+                result[symbol] = {
+                    'fills': len(latency),
+                    'latency_avg_ms': float(latency.mean()) if len(latency) else 0.0,
+                    'latency_p95_ms': float(np.percentile(latency, 95)) if len(latency) else 0.0,
+                    'latency_max_ms': float(latency.max()) if len(latency) else 0.0,
+                    'deviation_avg_pips': float(deviation.mean()) if len(deviation) else 0.0,
+                    'deviation_max_pips': float(deviation.max()) if len(deviation) else 0.0
+                }
+            return result
+
+    def shutdown(self):
+        """Stop the dispatch threads"""
+        self._pool.shutdown(wait=False)
+
+    def _order_legs(self, legs: List[TriangleLeg]) -> List[TriangleLeg]:
+        if self.leg_order == LEG_ORDER_LIQUIDITY:
+            return sorted(legs, key=lambda leg: leg.spread_pips)
+        return list(legs)
+
+    def _send_leg(self, leg: TriangleLeg) -> bool:
+        """place_order for one leg, recording latency and fill deviation"""
+        try:
+            sent = time.perf_counter()
+            result = self.broker.place_order(
+                symbol=leg.real_symbol,
+                order_type=leg.direction,
+                volume=leg.volume,
+                comment=leg.comment,
+                magic=leg.magic
+            )
+            leg.latency_ms = (time.perf_counter() - sent) * 1000
+
+            if not result or not result.get('success', False):
+                leg.error = result.get('error', 'Unknown error') if result else 'No result'
+                return False
+
+            leg.ticket = result.get('ticket')
+            leg.fill_price = result.get('price')
+            if leg.ticket is None:
+                leg.error = 'No ticket returned'
+                return False
+
+            if leg.fill_price:
+                # Positive = filled worse than the evaluated quote
+                move = leg.fill_price - leg.expected_price
+                leg.deviation_pips = (move if leg.direction == 'BUY' else -move) / leg.pip_size
+            self._record(leg)
+            return True
+        except Exception as e:
+            leg.error = str(e)
+            self.logger.error(f"Error sending {leg.symbol} {leg.direction}: {e}")
+            return False
+
+    def _rollback(self, filled: List[TriangleLeg]) -> Tuple[List, List]:
+        """
+        Close legs that filled before another leg failed.
+
+        Returns:
+            (closed tickets, tickets that could not be closed)
+        """
+        closed, still_open = [], []
+        for leg in filled:
+            if self._close_leg(leg):
+                closed.append(leg.ticket)
+                self._count('rolled_back_legs')
+                self.logger.info(f"🔄 Cancelled {leg.symbol} (Ticket: {leg.ticket})")
+            else:
+                still_open.append(leg.ticket)
+                self._count('rollback_failed_legs')
+                self.logger.error(f"🚨 Rollback failed - {leg.symbol} (Ticket: {leg.ticket}) is still open and unhedged")
+        return closed, still_open
+
+    def _close_leg(self, leg: TriangleLeg) -> bool:
+        """close_position with retries (close_order returns False or {'success': False} on failure)"""
+        for attempt in range(1, self.rollback_attempts + 1):
+            try:
+                result = self.broker.close_position(leg.ticket)
+                if result and (not isinstance(result, dict) or result.get('success', False)):
+                    return True
+                error = result.get('error', 'Unknown error') if isinstance(result, dict) else 'close failed'
+                self.logger.warning(f"⚠️ Cancel {leg.symbol} (Ticket: {leg.ticket}) attempt {attempt}: {error}")
+            except Exception as e:
+                self.logger.error(f"Error cancelling order {leg.ticket} (attempt {attempt}): {e}")
+            if attempt < self.rollback_attempts:
+                time.sleep(self.rollback_retry_delay)
+        return False
+
+    def _count(self, key: str):
+        with self._stats_lock:
+            self.stats[key] += 1
+
+    def _record(self, leg: TriangleLeg):
+        with self._stats_lock:
+            if leg.symbol not in self._latency:
+                self._latency[leg.symbol] = deque(maxlen=self._history_size)
+                self._deviation[leg.symbol] = deque(maxlen=self._history_size)
+            self._latency[leg.symbol].append(leg.latency_ms)
+            if leg.deviation_pips is not None:
+                self._deviation[leg.symbol].append(leg.deviation_pips)
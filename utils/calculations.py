@@ -26,6 +26,23 @@ import logging
 class TradingCalculations:
     """Utility class for trading calculations"""
     
+    # ⭐ Fallback ที่ฉลาด - ใช้ค่าใกล้เคียงกับความเป็นจริง (เฉพาะเมื่อไม่มีราคาจาก broker)
+    FALLBACK_RATES = {
+        'EURUSD': 1.10,
+        'GBPUSD': 1.27, 
+        'AUDUSD': 0.67,
+        'NZDUSD': 0.62,
+        'USDJPY': 149.50,
+        'USDCAD': 1.35,
+        'USDCHF': 0.92,
+        'EURGBP': 0.87,  # เพิ่ม cross pairs
+        'EURCHF': 1.01,
+        'GBPJPY': 190.0,
+        'AUDCAD': 0.90,
+        'NZDCHF': 0.57,
+        'AUDNZD': 1.08
+    }
+    
     @staticmethod
     def calculate_arbitrage_percentage(pair1_price: float, pair2_price: float, 
                                      pair3_price: float, spread1: float = 0, 
@@ -378,17 +395,29 @@ class TradingCalculations:
                 logging.getLogger(__name__).warning(f"Invalid lot size: {lot_size}, using 0.01")
                 lot_size = 0.01
             
+            # 🆕 ตาราง pip value ต่อ tick snapshot (คำนวณครั้งเดียวต่อ snapshot - ไม่อ่านราคาซ้ำ)
+            if broker_api and hasattr(broker_api, 'get_rate_table'):
+                pip_value = broker_api.get_rate_table().pip_value(symbol, lot_size)
+                if pip_value:
+                    return pip_value
+            
             if len(clean_symbol) != 6:
                 return 10.0  # fallback
             
             base_currency = clean_symbol[:3]
             quote_currency = clean_symbol[3:]
             
-            # Contract size
-            contract_size = 100000 * lot_size
+            # Contract size / pip size - ใช้ symbol metadata จาก broker ถ้ามี (โหลดครั้งเดียวตอน connect)
+            symbol_meta = None
+            if broker_api and hasattr(broker_api, 'get_symbol_metadata'):
+                symbol_meta = broker_api.get_symbol_metadata(symbol)
             
-            # Determine pip size
-            pip_size = 0.01 if quote_currency == 'JPY' else 0.0001
+            if symbol_meta is not None:
+                contract_size = symbol_meta.contract_size * lot_size
+                pip_size = symbol_meta.pip_size
+            else:
+                contract_size = 100000 * lot_size
+                pip_size = 0.01 if quote_currency == 'JPY' else 0.0001
             
             # Case 1: Quote currency is USD (EURUSD, GBPUSD, etc.)
             if quote_currency == 'USD':
@@ -428,33 +457,31 @@ class TradingCalculations:
                 return pip_value_1lot * lot_size
     
     
+    @staticmethod
+    def get_pip_values(symbols: List[str], broker_api=None) -> Dict[str, float]:
+        """🆕 Pip value ต่อ 1 lot ของหลาย symbol จาก rate table เดียว (fallback: calculate_pip_value ทีละตัว)"""
+        rates = broker_api.get_rate_table() if broker_api and hasattr(broker_api, 'get_rate_table') else None
+        pip_values = {}
+        for symbol in symbols:
+            pip_value = rates.pip_value(symbol) if rates is not None else None
+            pip_values[symbol] = pip_value or TradingCalculations.calculate_pip_value(symbol, 1.0, broker_api)
+        return pip_values
+    
     @staticmethod
     def get_exchange_rate(symbol: str, broker_api) -> float:
         """ดึงอัตราแลกเปลี่ยนจาก broker - ใช้ fallback ที่ฉลาด"""
         try:
-            if broker_api and hasattr(broker_api, 'get_current_price'):
+            if broker_api and hasattr(broker_api, 'get_ticks'):
+                # 🆕 อ่านจาก tick snapshot ที่ใช้ร่วมกัน (ไม่มี IPC ซ้ำภายใน tick เดียวกัน)
+                price_data = broker_api.get_ticks([symbol]).get_bid(symbol)
+                if price_data and price_data > 0:
+                    return float(price_data)
+            elif broker_api and hasattr(broker_api, 'get_current_price'):
                 price_data = broker_api.get_current_price(symbol)
                 if price_data and isinstance(price_data, (int, float)) and price_data > 0:
                     return float(price_data)
             
-            # ⭐ Fallback ที่ฉลาด - ใช้ค่าใกล้เคียงกับความเป็นจริง
-            fallback_rates = {
-                'EURUSD': 1.10,
-                'GBPUSD': 1.27, 
-                'AUDUSD': 0.67,
-                'NZDUSD': 0.62,
-                'USDJPY': 149.50,
-                'USDCAD': 1.35,
-                'USDCHF': 0.92,
-                'EURGBP': 0.87,  # เพิ่ม cross pairs
-                'EURCHF': 1.01,
-                'GBPJPY': 190.0,
-                'AUDCAD': 0.90,
-                'NZDCHF': 0.57,
-                'AUDNZD': 1.08
-            }
-            
-            rate = fallback_rates.get(symbol.upper(), 1.0)
+            rate = TradingCalculations.FALLBACK_RATES.get(symbol.upper(), 1.0)
             logging.getLogger(__name__).warning(f"⚠️ Using fallback rate for {symbol}: {rate}")
             return rate
             
@@ -608,11 +635,12 @@ class TradingCalculations:
                 max_loss_pips = 100.0  # ใช้ค่าจาก GUI
                 
                 lot_sizes = {}
+                pip_values = TradingCalculations.get_pip_values(triangle_symbols, broker_api)
                 
                 for symbol in triangle_symbols:
                     # 🎯 สูตร Risk Management ที่ถูกต้อง
                     # Lot Size = Risk Amount ÷ (Pip Value × Max Loss Pips)
-                    pip_value_per_1lot = TradingCalculations.calculate_pip_value(symbol, 1.0, broker_api)
+                    pip_value_per_1lot = pip_values[symbol]
                     max_loss_pips = 100  # Default 100 pips risk
                     
                     if pip_value_per_1lot > 0:
@@ -642,9 +670,10 @@ class TradingCalculations:
             max_loss_pips = 100.0
             
             lot_sizes = {}
+            pip_values = TradingCalculations.get_pip_values(triangle_symbols, broker_api)
             
             for symbol in triangle_symbols:
-                pip_value_per_1lot = TradingCalculations.calculate_pip_value(symbol, 1.0, broker_api)
+                pip_value_per_1lot = pip_values[symbol]
                 
                 if pip_value_per_1lot > 0:
                     pip_value_for_risk = pip_value_per_1lot * max_loss_pips
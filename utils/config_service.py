@@ -0,0 +1,296 @@
+"""
+Config Service
+==============
+
+Loads the JSON config files once into an immutable, pre-flattened snapshot
+and hot-reloads them when a file changes on disk, so trading hot paths read
+settings from memory only.
+
+Key Features:
+- ConfigSnapshot: read-only map 'file.section.key' -> value (every nesting
+  level is flattened up front - a lookup is one dict access, no splitting)
+- Typed accessors: get_float / get_int / get_bool / get_str / section
+- Nested dicts and lists are frozen (MappingProxyType / tuple), so no
+  component can mutate the shared config
+- mtime watcher thread builds a new snapshot and swaps it in atomically
+  (single attribute assignment - readers see the old or the new one, never a mix)
+- Subscribers (component reload hooks) are called after every swap
+- A file that fails to parse keeps its previous contents
+- get_config_service(): process-wide shared instance
+"""
+
+import json
+import logging
+import os
+import threading
+import time
+from types import MappingProxyType
+from typing import Any, Callable, Dict, List, Mapping, Optional
+
+ADAPTIVE_PARAMS = 'adaptive_params'
+SETTINGS = 'settings'
+
+DEFAULT_FILES = {
+    ADAPTIVE_PARAMS: os.path.join('config', 'adaptive_params.json'),
+    SETTINGS: os.path.join('config', 'settings.json'),
+}
+
+_ENCODINGS = ('utf-8', 'cp1252', 'latin-1')
+_EMPTY = MappingProxyType({})
+
+
+def _freeze(value):
+    """Read-only copy of parsed JSON (dict -> MappingProxyType, list -> tuple)"""
+    if isinstance(value, dict):
+        return MappingProxyType({key: _freeze(item) for key, item in value.items()})
+    if isinstance(value, list):
+        return tuple(_freeze(item) for item in value)
+    return value
+
+
+def _thaw(value):
+    """Mutable deep copy of a frozen value"""
+    if isinstance(value, Mapping):
+        return {key: _thaw(item) for key, item in value.items()}
+    if isinstance(value, tuple):
+        return [_thaw(item) for item in value]
+    return value
+
+
+def config_name(path: str) -> str:
+    """Snapshot namespace of a config file ('config/settings.json' -> 'settings')"""
+    return os.path.splitext(os.path.basename(path))[0]
+
+
+class ConfigSnapshot:
+    """Immutable, flattened view of all config files at one point in time."""
+
+    __slots__ = ('version', 'loaded_at', '_values')
+
+    def __init__(self, files: Dict[str, dict], version: int = 0):
+        """
+        Args:
+            files: Parsed JSON per namespace ({'adaptive_params': {...}})
+            version: Increases by one on every swap
+        """
+        self.version = version
+        self.loaded_at = time.time()
+        values = {}
+        for name, data in files.items():
+            self._flatten(name, _freeze(data), values)
+        self._values = values
+
+    @staticmethod
+    def _flatten(prefix: str, value, out: Dict[str, Any]):
+        out[prefix] = value
+        if isinstance(value, Mapping):
+            for key, item in value.items():
+                ConfigSnapshot._flatten(f"{prefix}.{key}", item, out)
+
+    def get(self, path: str, default=None):
+        """Value at 'file.section.key', or default"""
+        return self._values.get(path, default)
+
+    def get_float(self, path: str, default: float = 0.0) -> float:
+        try:
+            return float(self._values.get(path, default))
+        except (TypeError, ValueError):
+            return default
+
+    def get_int(self, path: str, default: int = 0) -> int:
+        try:
+            return int(self._values.get(path, default))
+        except (TypeError, ValueError):
+            return default
+
+    def get_bool(self, path: str, default: bool = False) -> bool:
+        value = self._values.get(path, default)
+        if isinstance(value, str):
+            return value.strip().lower() in ('1', 'true', 'yes', 'on')
+        return bool(value)
+
+    def get_str(self, path: str, default: str = '') -> str:
+        value = self._values.get(path, default)
+        return default if value is None else str(value)
+
+    def section(self, path: str) -> Mapping:
+        """Read-only mapping at path (empty mapping if missing or not a section)"""
+        value = self._values.get(path)
+        return value if isinstance(value, Mapping) else _EMPTY
+
+    def to_dict(self, path: str) -> Dict:
+        """Mutable deep copy of a section (for code that edits the result)"""
+        return _thaw(self.section(path))
+
+    def __contains__(self, path: str) -> bool:
+        return path in self._values
+
+
+class ConfigService:
+    """
+    Owns the current ConfigSnapshot and reloads it when a file changes.
+
+    Usage:
+        service = get_config_service()
+        snapshot = service.snapshot
+        rate = snapshot.get_float('adaptive_params.arbitrage_params.execution.commission_rate', 0.0001)
+        service.subscribe(on_config_changed)     # called with the new snapshot after a reload
+    """
+
+    def __init__(self, files: Dict[str, str] = None, poll_interval: float = 1.0):
+        """
+        Args:
+            files: namespace -> JSON file path (default: adaptive_params + settings)
+            poll_interval: Seconds between mtime checks of the watcher thread
+        """
+        self.files = dict(DEFAULT_FILES if files is None else files)
+        self.poll_interval = poll_interval
+        self.logger = logging.getLogger(__name__)
+
+        self._data: Dict[str, dict] = {}
+        self._stamps: Dict[str, tuple] = {}
+        self._subscribers: List[Callable[[ConfigSnapshot], None]] = []
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._running = False
+        self._snapshot = ConfigSnapshot({})
+
+        self.stats = {'reloads': 0, 'errors': 0}
+        self.refresh(force=True)
+
+    @property
+    def snapshot(self) -> ConfigSnapshot:
+        """Current snapshot (keep a reference for a consistent view across several reads)"""
+        return self._snapshot
+
+    def get(self, path: str, default=None):
+        return self._snapshot.get(path, default)
+
+    def add_file(self, path: str, name: str = None) -> str:
+        """
+        Watch one more JSON file.
+
+        Returns:
+            Namespace of the file in the snapshot
+        """
+        name = name or config_name(path)
+        with self._lock:
+            known = self.files.get(name) == path
+            self.files[name] = path
+        if not known:
+            self.refresh(force=True)
+        return name
+
+    def subscribe(self, callback: Callable[[ConfigSnapshot], None]):
+        """Call callback(snapshot) after every reload"""
+        with self._lock:
+            if callback not in self._subscribers:
+                self._subscribers.append(callback)
+
+    def unsubscribe(self, callback: Callable[[ConfigSnapshot], None]):
+        with self._lock:
+            if callback in self._subscribers:
+                self._subscribers.remove(callback)
+
+    def refresh(self, force: bool = False) -> bool:
+        """
+        Reload files whose mtime/size changed and swap in a new snapshot.
+
+        Returns:
+            True if a new snapshot was published
+        """
+        with self._lock:
+            changed = False
+            for name, path in self.files.items():
+                stamp = self._stamp(path)
+                if not force and stamp == self._stamps.get(name):
+                    continue
+                self._stamps[name] = stamp
+                data = self._read(path) if stamp else {}
+                if data is None:
+                    continue            # parse error - keep the previous contents
+                if data != self._data.get(name):
+                    self._data[name] = data
+                    changed = True
+            if not changed and self._snapshot.version:
+                return False
+            snapshot = ConfigSnapshot(self._data, self._snapshot.version + 1)
+            self._snapshot = snapshot
+            self.stats['reloads'] += 1
+            subscribers = list(self._subscribers)
+
+        if snapshot.version > 1:
+            self.logger.info(f"🔄 Config reloaded (version {snapshot.version})")
+        for callback in subscribers:
+            try:
+                callback(snapshot)
+            except Exception as e:
+                self.logger.error(f"Error applying config to {callback}: {e}")
+        return True
+
+    def start(self):
+        """Start the mtime watcher thread (idempotent)"""
+        if self._running:
+            return
+        self._running = True
+        self._thread = threading.Thread(target=self._run, name="ConfigWatcher", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 2.0):
+        self._running = False
+        if self._thread:
+            self._thread.join(timeout=timeout)
+
+    def get_stats(self) -> Dict:
+        stats = dict(self.stats)
+        stats['version'] = self._snapshot.version
+        stats['files'] = dict(self.files)
+        return stats
+
+    def _run(self):
+        while self._running:
+            time.sleep(self.poll_interval)
+            try:
+                self.refresh()
+            except Exception as e:
+                self.stats['errors'] += 1
+                self.logger.error(f"Error watching config files: {e}")
+
+    @staticmethod
+    def _stamp(path: str) -> Optional[tuple]:
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return None
+        return stat.st_mtime_ns, stat.st_size
+
+    def _read(self, path: str) -> Optional[dict]:
+        for encoding in _ENCODINGS:
+            try:
+                with open(path, 'r', encoding=encoding) as f:
+                    data = json.load(f)
+                return data if isinstance(data, dict) else {}
+            except UnicodeDecodeError:
+                continue
+            except Exception as e:
+                # A half-written file (GUI saving) parses again on the next change
+                self.stats['errors'] += 1
+                self.logger.error(f"Error loading config {path}: {e}")
+                return None
+        self.stats['errors'] += 1
+        self.logger.error(f"Failed to load config {path} with any encoding")
+        return None
+
+
+_service: Optional[ConfigService] = None
+_service_lock = threading.Lock()
+
+
+def get_config_service() -> ConfigService:
+    """Shared ConfigService (created and watching on first use)"""
+    global _service
+    with _service_lock:
+        if _service is None:
+            _service = ConfigService()
+            _service.start()
+        return _service
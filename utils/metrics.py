@@ -0,0 +1,424 @@
+"""
+Metrics Registry
+================
+
+In-process counters, gauges and HDR-style histograms cheap enough to stay
+on in production, plus a periodic exporter to a local JSON file and an
+optional localhost HTTP endpoint.
+
+Key Features:
+- Counter: running total + events in the last minute (60 one-second slots)
+- Gauge: set()/inc()/dec() value, or a callable read at snapshot time
+- Histogram: log-linear buckets (sub_buckets per power of two, ~1.6%
+  relative error at 32) - O(1) record, fixed memory, percentiles from the
+  bucket counts; time() context manager records milliseconds
+- register_source(prefix, get_stats): existing component stats dicts are
+  included in every snapshot as-is
+- MetricsExporter: background thread writing snapshot() atomically to a
+  file every interval; http_port > 0 serves GET /metrics on 127.0.0.1
+"""
+
+import json
+import logging
+import math
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, Optional
+
+RATE_WINDOW = 60            # seconds covered by Counter.per_minute
+SNAPSHOT_PERCENTILES = (50, 90, 95, 99, 99.9)
+
+
+class Counter:
+    """Monotonic event counter with a one-minute rate."""
+
+    __slots__ = ('name', '_lock', '_total', '_slots', '_second')
+
+    def __init__(self, name: str):
+        self.name = name
+        self._lock = threading.Lock()
+        self._total = 0
+        self._slots = [0] * RATE_WINDOW
+        self._second = int(time.monotonic())
+
+    def inc(self, amount: int = 1):
+        second = int(time.monotonic())
+        with self._lock:
+            if second != self._second:
+                self._advance(second)
+            self._total += amount
+            self._slots[second % RATE_WINDOW] += amount
+
+    @property
+    def total(self) -> int:
+        return self._total
+
+    @property
+    def per_minute(self) -> int:
+        """Events in the last RATE_WINDOW seconds"""
+        with self._lock:
+            self._advance(int(time.monotonic()))
+            return sum(self._slots)
+
+    def _advance(self, second: int):
+        """Clear the slots of the seconds that passed without events"""
+        gap = second - self._second
+        if gap >= RATE_WINDOW:
+            self._slots = [0] * RATE_WINDOW
+        else:
+            for passed in range(self._second + 1, second + 1):
+                self._slots[passed % RATE_WINDOW] = 0
+        self._second = max(self._second, second)
+
+
+class Gauge:
+    """Current value - set explicitly or read from a callable at snapshot time."""
+
+    __slots__ = ('name', '_value', '_function')
+
+    def __init__(self, name: str, function: Callable[[], float] = None):
+        self.name = name
+        self._value = 0.0
+        self._function = function
+
+    def set(self, value: float):
+        self._value = value
+
+    def inc(self, amount: float = 1.0):
+        self._value += amount
+
+    def dec(self, amount: float = 1.0):
+        self._value -= amount
+
+    @property
+    def value(self) -> Optional[float]:
+        if self._function is None:
+            return self._value
+        try:
+            return self._function()
+        except Exception:
+            return None
+
+
+class _Timer:
+    """with histogram.time(): ... - records the elapsed milliseconds"""
+
+    __slots__ = ('histogram', 'started')
+
+    def __init__(self, histogram: 'Histogram'):
+        self.histogram = histogram
+        self.started = 0.0
+
+    def __enter__(self) -> '_Timer':
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        self.histogram.record((time.perf_counter() - self.started) * 1000)
+        return False
+
+
+class Histogram:
+    """
+    Log-linear histogram (HDR-style).
+
+    Each power of two between lowest and highest is split into sub_buckets
+    equal-width buckets, so the relative error of any percentile is bounded
+    by 1 / (2 * sub_buckets). Values outside the range are clamped into the
+    first/last bucket (min/max stay exact).
+    """
+
+    __slots__ = ('name', 'unit', 'sub_buckets', 'lowest', '_min_exponent', '_max_exponent', '_lock',
+                 '_counts', '_count', '_sum', '_min', '_max')
+
+    def __init__(self, name: str, unit: str = 'ms', lowest: float = 0.001, highest: float = 1e6,
+                 sub_buckets: int = 32):
+        """
+        Args:
+            name: Metric name
+            unit: Unit of the recorded values (reported only)
+            lowest: Smallest value with full precision
+            highest: Largest value with full precision
+            sub_buckets: Buckets per power of two
+        """
+        self.name = name
+        self.unit = unit
+        self.sub_buckets = sub_buckets
+        self.lowest = lowest
+        self._min_exponent = math.frexp(lowest)[1]
+        self._max_exponent = math.frexp(highest)[1]
+        self._lock = threading.Lock()
+        self._counts = [0] * ((self._max_exponent - self._min_exponent + 1) * sub_buckets)
+        self._count = 0
+        self._sum = 0.0
+        self._min = math.inf
+        self._max = -math.inf
+
+    def record(self, value: float):
+        index = self._index(value)
+        with self._lock:
+            self._counts[index] += 1
+            self._count += 1
+            self._sum += value
+            if value < self._min:
+                self._min = value
+            if value > self._max:
+                self._max = value
+
+    def time(self) -> _Timer:
+        return _Timer(self)
+
+    @property
+    def count(self) -> int:
+        return self._count
+
+    def percentile(self, percent: float) -> float:
+        """Value at or below which percent % of the recorded values fall (0.0 if empty)"""
+        with self._lock:
+            return self._percentiles((percent,))[0]
+
+    def reset(self):
+        with self._lock:
+            self._counts = [0] * len(self._counts)
+            self._count = 0
+            self._sum = 0.0
+            self._min = math.inf
+            self._max = -math.inf
+
+    def snapshot(self) -> Dict:
+        with self._lock:
+            count = self._count
+            values = self._percentiles(SNAPSHOT_PERCENTILES)
+            result = {
+                'unit': self.unit,
+                'count': count,
+                'mean': self._sum / count if count else 0.0,
+                'min': self._min if count else 0.0,
+                'max': self._max if count else 0.0
+            }
+        for percent, value in zip(SNAPSHOT_PERCENTILES, values):
+            result[f"p{percent:g}"] = value
+        return result
+
+    def _index(self, value: float) -> int:
+        if value <= self.lowest:
+            return 0
+        mantissa, exponent = math.frexp(value)        # value = mantissa * 2**exponent, mantissa in [0.5, 1)
+        if exponent > self._max_exponent:
+            return len(self._counts) - 1
+        return (exponent - self._min_exponent) * self.sub_buckets + int((mantissa - 0.5) * 2 * self.sub_buckets)
+
+    def _bucket_value(self, index: int) -> float:
+        """Midpoint of a bucket"""
+        exponent = index // self.sub_buckets + self._min_exponent
+        mantissa = 0.5 + (index % self.sub_buckets + 0.5) / (2 * self.sub_buckets)
+        return math.ldexp(mantissa, exponent)
+
+    def _percentiles(self, percents) -> list:
+        """Percentile values in one pass over the buckets (caller holds the lock)"""
+        if not self._count:
+            return [0.0] * len(percents)
+        targets = [max(1, math.ceil(percent / 100.0 * self._count)) for percent in percents]
+        results = [self._max] * len(percents)
+        cumulative = 0
+        pending = sorted(range(len(targets)), key=targets.__getitem__)
+        position = 0
+        for index, bucket_count in enumerate(self._counts):
+            if not bucket_count:
+                continue
+            cumulative += bucket_count
+            while position < len(pending) and cumulative >= targets[pending[position]]:
+                value = self._bucket_value(index)
+                results[pending[position]] = min(max(value, self._min), self._max)
+                position += 1
+            if position == len(pending):
+                break
+        return results
+
+
+class MetricsRegistry:
+    """
+    Named counters, gauges and histograms.
+
+    Usage:
+        metrics = MetricsRegistry()
+        metrics.counter('funnel.sent').inc()
+        metrics.gauge('groups.active', lambda: len(active_groups))
+        with metrics.timer('loop.iteration_ms'):
+            ...
+        metrics.register_source('watcher', tick_watcher.get_stats)
+        metrics.snapshot()
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters: Dict[str, Counter] = {}
+        self._gauges: Dict[str, Gauge] = {}
+        self._histograms: Dict[str, Histogram] = {}
+        self._sources: Dict[str, Callable[[], Dict]] = {}
+        self._started = time.time()
+
+    def counter(self, name: str) -> Counter:
+        metric = self._counters.get(name)
+        if metric is None:
+            with self._lock:
+                metric = self._counters.setdefault(name, Counter(name))
+        return metric
+
+    def gauge(self, name: str, function: Callable[[], float] = None) -> Gauge:
+        metric = self._gauges.get(name)
+        if metric is None:
+            with self._lock:
+                metric = self._gauges.setdefault(name, Gauge(name, function))
+        return metric
+
+    def histogram(self, name: str, **kwargs) -> Histogram:
+        """Histogram by name (kwargs apply only when it is created)"""
+        metric = self._histograms.get(name)
+        if metric is None:
+            with self._lock:
+                metric = self._histograms.get(name) or self._histograms.setdefault(name, Histogram(name, **kwargs))
+        return metric
+
+    def timer(self, name: str) -> _Timer:
+        """Context manager recording elapsed milliseconds into histogram `name`"""
+        return self.histogram(name).time()
+
+    def register_source(self, prefix: str, get_stats: Callable[[], Dict]):
+        """Include a component's get_stats() dict in every snapshot under `prefix`"""
+        with self._lock:
+            self._sources[prefix] = get_stats
+
+    def snapshot(self) -> Dict:
+        """All metrics as a JSON-serializable dict"""
+        with self._lock:
+            counters = list(self._counters.values())
+            gauges = list(self._gauges.values())
+            histograms = list(self._histograms.values())
+            sources = list(self._sources.items())
+
+        snapshot = {
+            'timestamp': time.time(),
+            'uptime_seconds': time.time() - self._started,
+            'counters': {c.name: {'total': c.total, 'per_minute': c.per_minute} for c in counters},
+            'gauges': {g.name: g.value for g in gauges},
+            'histograms': {h.name: h.snapshot() for h in histograms},
+            'sources': {}
+        }
+        for prefix, get_stats in sources:
+            try:
+                snapshot['sources'][prefix] = get_stats()
+            except Exception as e:
+                snapshot['sources'][prefix] = {'error': str(e)}
+        return snapshot
+
+
+class MetricsExporter:
+    """
+    Periodic snapshot export to a file and/or a localhost HTTP endpoint.
+
+    Usage:
+        exporter = MetricsExporter(metrics, path='data/metrics.json', interval=10.0, http_port=0)
+        exporter.start()
+        exporter.stop()        # writes a final snapshot
+    """
+
+    def __init__(self, registry: MetricsRegistry, path: str = "data/metrics.json", interval: float = 10.0,
+                 http_port: int = 0):
+        """
+        Args:
+            registry: MetricsRegistry to export
+            path: JSON file rewritten every interval ('' = no file)
+            interval: Seconds between file exports
+            http_port: Port for GET /metrics on 127.0.0.1 (0 = no endpoint)
+        """
+        self.registry = registry
+        self.path = path
+        self.interval = interval
+        self.http_port = http_port
+        self.logger = logging.getLogger(__name__)
+
+        self._thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+        self._server: Optional[ThreadingHTTPServer] = None
+        self.stats = {'exports': 0, 'http_requests': 0, 'errors': 0}
+
+    def start(self):
+        if self._thread is not None or self._server is not None:
+            return
+        self._stop.clear()
+        if self.path:
+            self._thread = threading.Thread(target=self._run, name="MetricsExporter", daemon=True)
+            self._thread.start()
+        if self.http_port:
+            self._start_server()
+        self.logger.info(f"📈 Metrics export: {self.path or 'no file'} every {self.interval}s"
+                         f"{f', http://127.0.0.1:{self.http_port}/metrics' if self._server else ''}")
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=2.0)
+            self._thread = None
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+        self.export()
+
+    def export(self) -> bool:
+        """Write one snapshot to the file now (temp file + atomic replace)"""
+        if not self.path:
+            return False
+        try:
+            data = self.registry.snapshot()
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            temp_path = f"{self.path}.tmp"
+            with open(temp_path, 'w', encoding='utf-8') as f:
+                json.dump(data, f, indent=2, default=str)
+            os.replace(temp_path, self.path)
+            self.stats['exports'] += 1
+            return True
+        except Exception as e:
+            self.stats['errors'] += 1
+            self.logger.error(f"Error exporting metrics: {e}")
+            return False
+
+    def get_stats(self) -> Dict:
+        return dict(self.stats)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.export()
+
+    def _start_server(self):
+        exporter = self
+
+        class _MetricsHandler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.rstrip('/') != '/metrics':
+                    self.send_error(404)
+                    return
+                body = json.dumps(exporter.registry.snapshot(), default=str).encode('utf-8')
+                exporter.stats['http_requests'] += 1
+                self.send_response(200)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass        # requests are not worth a log line each
+
+        try:
+            self._server = ThreadingHTTPServer(('127.0.0.1', self.http_port), _MetricsHandler)
+            self._server.daemon_threads = True
+            threading.Thread(target=self._server.serve_forever, name="MetricsHTTP", daemon=True).start()
+        except OSError as e:
+            self.stats['errors'] += 1
+            self._server = None
+            self.logger.error(f"Error starting metrics endpoint on port {self.http_port}: {e}")
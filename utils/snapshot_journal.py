@@ -0,0 +1,265 @@
+"""
+Snapshot Journal
+================
+
+Write-ahead persistence for state that changes one record at a time: an
+append-only JSON-lines journal of mutations on top of a periodically
+compacted JSON snapshot.
+
+Key Features:
+- append(record): one JSON line per mutation - cost does not depend on the
+  size of the state
+- Configurable fsync batching: 'always' (fsync every record), 'batch'
+  (fsync every fsync_batch records or fsync_interval seconds, whichever
+  comes first) or 'never' (leave it to the OS)
+- compact(state): atomic snapshot rewrite (temp file + os.replace) tagged
+  with the last journal sequence, then the journal is truncated
+- load(apply): snapshot + replay of the newer journal records; a torn last
+  line (crash mid-write) is dropped and cut off the file
+- Records already contained in the snapshot (crash between snapshot replace
+  and journal truncate) are skipped by sequence number
+"""
+
+import json
+import logging
+import os
+import threading
+import time
+from typing import Callable, Dict, Optional
+
+FSYNC_ALWAYS = 'always'
+FSYNC_BATCH = 'batch'
+FSYNC_NEVER = 'never'
+
+SEQUENCE_KEY = 'journal_seq'
+
+
+class SnapshotJournal:
+    """
+    Snapshot file + mutation journal.
+
+    Usage:
+        journal = SnapshotJournal('data/active_groups.json')
+        state = journal.load(apply_record)        # None if nothing persisted yet
+        journal.append({'op': 'put', 'key': 'g1', 'value': {...}})
+        if journal.needs_compaction:
+            journal.compact(full_state)
+    """
+
+    def __init__(self, snapshot_path: str, journal_path: str = None, fsync_mode: str = FSYNC_BATCH,
+                 fsync_interval: float = 0.2, fsync_batch: int = 32, compact_every: int = 500):
+        """
+        Args:
+            snapshot_path: JSON snapshot file
+            journal_path: JSON-lines journal (default: snapshot path + '.journal')
+            fsync_mode: FSYNC_ALWAYS / FSYNC_BATCH / FSYNC_NEVER
+            fsync_interval: Max seconds a record stays un-fsynced in batch mode
+            fsync_batch: Records per fsync in batch mode
+            compact_every: Journal records before needs_compaction turns True
+        """
+        self.snapshot_path = snapshot_path
+        self.journal_path = journal_path or f"{snapshot_path}.journal"
+        self.fsync_mode = fsync_mode
+        self.fsync_interval = fsync_interval
+        self.fsync_batch = max(1, fsync_batch)
+        self.compact_every = max(1, compact_every)
+        self.logger = logging.getLogger(__name__)
+
+        self._file = None
+        self._lock = threading.Lock()
+        self._sequence = 0
+        self._journal_records = 0       # records in the journal file since the last compaction
+        self._pending = 0               # written but not fsynced
+        self._last_fsync = time.monotonic()
+        self._flusher: Optional[threading.Thread] = None
+        self._running = False
+
+        self.stats = {'appends': 0, 'fsyncs': 0, 'compactions': 0, 'replayed': 0, 'errors': 0}
+
+    def configure(self, fsync_mode: str = None, fsync_interval: float = None, fsync_batch: int = None,
+                  compact_every: int = None):
+        """Change fsync batching / compaction (config hot reload)"""
+        with self._lock:
+            if fsync_mode is not None:
+                self.fsync_mode = fsync_mode
+            if fsync_interval is not None:
+                self.fsync_interval = fsync_interval
+            if fsync_batch is not None:
+                self.fsync_batch = max(1, fsync_batch)
+            if compact_every is not None:
+                self.compact_every = max(1, compact_every)
+
+    @property
+    def needs_compaction(self) -> bool:
+        return self._journal_records >= self.compact_every
+
+    # ------------------------------------------------------------------
+    # Recovery
+    # ------------------------------------------------------------------
+    def load(self, apply: Callable[[Dict, Dict], None]) -> Optional[Dict]:
+        """
+        Snapshot with the journal replayed on top.
+
+        Args:
+            apply: apply(state, record) - applies one journal record to the state in place
+
+        Returns:
+            Recovered state, or None if neither snapshot nor journal exists
+        """
+        with self._lock:
+            state = None
+            if os.path.exists(self.snapshot_path):
+                with open(self.snapshot_path, 'r') as f:
+                    state = json.load(f)
+            snapshot_sequence = state.get(SEQUENCE_KEY, 0) if state else 0
+            self._sequence = snapshot_sequence
+
+            if not os.path.exists(self.journal_path):
+                return state
+            if state is None:
+                state = {}
+
+            valid_end = 0
+            records = 0
+            with open(self.journal_path, 'rb') as f:
+                for line in f:
+                    try:
+                        if not line.endswith(b'\n'):
+                            raise ValueError("incomplete line")
+                        record = json.loads(line)
+                    except ValueError:
+                        self.logger.warning(f"⚠️ Dropping torn journal tail at byte {valid_end} of {self.journal_path}")
+                        break
+                    valid_end += len(line)
+                    records += 1
+                    sequence = record.get('seq', 0)
+                    if sequence <= snapshot_sequence:
+                        continue        # already in the snapshot
+                    try:
+                        apply(state, record)
+                        self.stats['replayed'] += 1
+                    except Exception as e:
+                        self.stats['errors'] += 1
+                        self.logger.error(f"Error replaying journal record {sequence}: {e}")
+                    self._sequence = max(self._sequence, sequence)
+
+            if valid_end < os.path.getsize(self.journal_path):
+                with open(self.journal_path, 'r+b') as f:
+                    f.truncate(valid_end)
+            self._journal_records = records
+            if self.stats['replayed']:
+                self.logger.info(f"📜 Replayed {self.stats['replayed']} journal records from {self.journal_path}")
+            return state
+
+    # ------------------------------------------------------------------
+    # Writes
+    # ------------------------------------------------------------------
+    def append(self, record: Dict):
+        """Journal one mutation (the record gets the next sequence number as 'seq')"""
+        with self._lock:
+            self._sequence += 1
+            line = json.dumps(dict(record, seq=self._sequence), default=str, separators=(',', ':'))
+            f = self._open()
+            f.write(line + '\n')
+            f.flush()
+            self._journal_records += 1
+            self._pending += 1
+            self.stats['appends'] += 1
+
+            if self.fsync_mode == FSYNC_ALWAYS or (
+                    self.fsync_mode == FSYNC_BATCH and (self._pending >= self.fsync_batch or
+                                                        time.monotonic() - self._last_fsync >= self.fsync_interval)):
+                self._fsync()
+            elif self.fsync_mode == FSYNC_BATCH:
+                self._start_flusher()
+
+    def compact(self, state: Dict):
+        """
+        Write the full state as the new snapshot and truncate the journal.
+
+        Args:
+            state: Complete state (JSON serializable, datetime via str)
+        """
+        with self._lock:
+            directory = os.path.dirname(self.snapshot_path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            data = dict(state)
+            data[SEQUENCE_KEY] = self._sequence
+
+            temp_path = f"{self.snapshot_path}.tmp"
+            with open(temp_path, 'w') as f:
+                json.dump(data, f, indent=2, default=str)
+                f.flush()
+                if self.fsync_mode != FSYNC_NEVER:
+                    os.fsync(f.fileno())
+            os.replace(temp_path, self.snapshot_path)
+
+            # snapshot has every record up to _sequence - the journal can start over
+            f = self._open()
+            f.seek(0)
+            f.truncate()
+            f.flush()
+            self._journal_records = 0
+            self._pending = 0
+            self.stats['compactions'] += 1
+
+    def sync(self):
+        """fsync pending journal records now"""
+        with self._lock:
+            if self._pending:
+                self._fsync()
+
+    def close(self):
+        """fsync and close the journal (stops the batch flusher)"""
+        self._running = False
+        with self._lock:
+            if self._file is not None:
+                if self._pending and self.fsync_mode != FSYNC_NEVER:
+                    self._fsync()
+                self._file.close()
+                self._file = None
+        if self._flusher is not None:
+            self._flusher.join(timeout=2.0)
+            self._flusher = None
+
+    def get_stats(self) -> Dict:
+        stats = dict(self.stats)
+        stats['sequence'] = self._sequence
+        stats['journal_records'] = self._journal_records
+        stats['pending_fsync'] = self._pending
+        stats['fsync_mode'] = self.fsync_mode
+        return stats
+
+    def _open(self):
+        if self._file is None:
+            directory = os.path.dirname(self.journal_path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self._file = open(self.journal_path, 'a', encoding='utf-8')
+        return self._file
+
+    def _fsync(self):
+        try:
+            os.fsync(self._file.fileno())
+            self.stats['fsyncs'] += 1
+        except (OSError, ValueError) as e:
+            self.stats['errors'] += 1
+            self.logger.error(f"Error syncing journal {self.journal_path}: {e}")
+        self._pending = 0
+        self._last_fsync = time.monotonic()
+
+    def _start_flusher(self):
+        """Background fsync so a quiet period never leaves records unsynced longer than fsync_interval"""
+        if self._running:
+            return
+        self._running = True
+        self._flusher = threading.Thread(target=self._flush_loop, name="JournalFlusher", daemon=True)
+        self._flusher.start()
+
+    def _flush_loop(self):
+        while self._running:
+            time.sleep(self.fsync_interval)
+            with self._lock:
+                if self._pending and self._file is not None and self.fsync_mode == FSYNC_BATCH:
+                    self._fsync()